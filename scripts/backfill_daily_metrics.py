@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Backfill do rollup diário de vendas
+===================================
+Preenche a tabela store_daily_metrics a partir do histórico de pedidos.
+Rodar uma vez após a migração 3e7d9a1c5b20 (pode ser repetido: cada dia
+é recalculado por inteiro).
+
+Uso (banco do .env da raiz do projeto):
+    python scripts/backfill_daily_metrics.py                  # todas as lojas, todo o histórico
+    python scripts/backfill_daily_metrics.py <store_id>       # uma loja
+    python scripts/backfill_daily_metrics.py <store_id|all> <YYYY-MM-DD>   # a partir de uma data
+"""
+
+import sys
+import time
+from datetime import date
+from pathlib import Path
+
+# Adiciona o diretório raiz ao path
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.api.admin.services.daily_metrics_service import backfill_daily_metrics
+from src.core.database import SessionLocal
+
+
+def main():
+    store_id = None
+    since = None
+
+    if len(sys.argv) > 1 and sys.argv[1] != "all":
+        store_id = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        since = date.fromisoformat(sys.argv[2])
+
+    print(f"🔄 Backfill do rollup diário (loja: {store_id or 'todas'}, desde: {since or 'o primeiro pedido'})...")
+    start = time.perf_counter()
+
+    with SessionLocal() as db:
+        days = backfill_daily_metrics(db, store_id=store_id, since=since)
+
+    print(f"✅ {days} dia(s) de loja gravado(s) em {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
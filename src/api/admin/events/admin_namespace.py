@@ -1,8 +1,7 @@
 from datetime import datetime, timedelta
 
-from socketio import AsyncNamespace
-
 from src.core import models
+from src.core.monitoring.socketio_metrics import InstrumentedNamespace
 from .handlers.connection_handler import (
     handle_admin_connect,
     handle_admin_disconnect
@@ -12,11 +11,13 @@ from .handlers.order_handler import handle_update_order_status, claim_specific_p
 from .handlers.store_handler import (
     handle_join_store_room,
     handle_leave_store_room,
+    handle_catalog_resync,
+    handle_load_panel,
 
 )
 
 
-class AdminNamespace(AsyncNamespace):
+class AdminNamespace(InstrumentedNamespace):
     def __init__(self, namespace=None):
         super().__init__(namespace)
         self.environ = {}
@@ -31,11 +32,17 @@ class AdminNamespace(AsyncNamespace):
         return await handle_update_order_status(self, sid, data)
 
     async def on_join_store_room(self, sid, data):
-        await handle_join_store_room(sid, data)
+        return await handle_join_store_room(sid, data)
+
+    async def on_load_panel(self, sid, data):
+        return await handle_load_panel(sid, data)
 
     async def on_leave_store_room(self, sid, data):
         await handle_leave_store_room(self, sid, data)
 
+    async def on_catalog_resync(self, sid, data):
+        return await handle_catalog_resync(sid, data)
+
     # ✅ CORREÇÃO 2: Adiciona o método que recebe o evento do cliente
     async def on_claim_specific_print_job(self, sid, data):
         """
@@ -1,6 +1,4 @@
 import asyncio
-import time
-from collections import defaultdict
 from urllib.parse import parse_qs
 
 from src.api.admin.services.store_access_service import StoreAccessService
@@ -10,6 +8,8 @@ from src.api.admin.services.subscription_service import SubscriptionService
 from src.api.schemas.store.store_with_role import StoreWithRole
 from src.core import models
 from src.core.database import get_db_manager
+from src.core.rate_limit.distributed import parse_rate, rate_limiter
+from src.core.rate_limit.rate_limit import RATE_LIMITS
 from src.socketio_instance import sio
 from src.api.admin.utils.authorize_admin import authorize_admin_by_jwt
 
@@ -18,9 +18,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-# ✅ Rate limiting para WebSocket
-connection_attempts = defaultdict(list)
-MAX_CONNECTIONS_PER_MINUTE = 10
+# ✅ Rate limiting para WebSocket (compartilhado entre workers)
+MAX_CONNECTIONS, CONNECTION_WINDOW_SECONDS = parse_rate(RATE_LIMITS["websocket_connect"])
 
 
 async def handle_admin_connect(self, sid, environ):
@@ -57,26 +56,19 @@ async def handle_admin_connect(self, sid, environ):
     else:
         client_ip = "unknown"
 
-    current_time = time.time()
-
-    # Limpa tentativas antigas (mais de 1 minuto)
-    connection_attempts[client_ip] = [
-        t for t in connection_attempts[client_ip]
-        if current_time - t < 60
-    ]
+    limit = await asyncio.to_thread(
+        rate_limiter.hit, "admin_socket_connect", client_ip, MAX_CONNECTIONS, CONNECTION_WINDOW_SECONDS
+    )
 
     # Verifica se excedeu limite
-    if len(connection_attempts[client_ip]) >= MAX_CONNECTIONS_PER_MINUTE:
+    if not limit.allowed:
         logger.warning(
             f"🚨 RATE LIMIT WEBSOCKET EXCEDIDO\n"
             f"   ├─ IP: {client_ip}\n"
-            f"   ├─ Tentativas: {len(connection_attempts[client_ip])}\n"
-            f"   └─ Limite: {MAX_CONNECTIONS_PER_MINUTE}/minuto"
+            f"   ├─ Nova tentativa em: {limit.retry_after:.0f}s\n"
+            f"   └─ Limite: {MAX_CONNECTIONS}/{CONNECTION_WINDOW_SECONDS}s"
         )
-        raise ConnectionRefusedError("Muitas tentativas de conexão. Aguarde 1 minuto.")
-
-    # Registra esta tentativa
-    connection_attempts[client_ip].append(current_time)
+        raise ConnectionRefusedError(f"Muitas tentativas de conexão. Aguarde {max(1, round(limit.retry_after))}s.")
 
     # ═══════════════════════════════════════════════════════════
     # 3. AUTENTICAÇÃO E PROCESSAMENTO
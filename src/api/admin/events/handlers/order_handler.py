@@ -10,14 +10,19 @@ from sqlalchemy.orm import joinedload, selectinload
 from src.api.admin.services import loyalty_service
 from src.api.admin.services.cashback_service import calculate_and_apply_cashback_for_order
 from src.api.admin.services.chatbot.chatbot_notification_service import send_order_status_update, send_new_order_summary
-from src.api.admin.services.stock_service import decrease_stock_for_order, restock_for_canceled_order
+from src.api.admin.services.stock_service import (
+    NO_STOCK_CHANGE,
+    decrease_stock_for_order,
+    restock_for_canceled_order,
+)
 from src.api.admin.services.store_access_service import StoreAccessService
 from src.api.admin.utils.authorize_admin import authorize_admin_by_jwt
 
 from src.core import models
 from src.api.admin.socketio.emitters import (
-    admin_emit_order_updated_from_obj, admin_emit_new_print_jobs, admin_emit_products_updated
+    admin_emit_order_updated_from_obj, admin_emit_new_print_jobs
 )
+from src.api.admin.socketio.catalog_sync import emit_stock_change
 from src.core.cache.cache_manager import logger, cache_manager
 from src.core.database import get_db_manager
 from src.core.utils.enums import OrderStatus, AuditAction, AuditEntityType
@@ -123,13 +128,13 @@ async def handle_update_order_status(self, sid, data):
             # ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
             business_actions = []
+            stock_change = NO_STOCK_CHANGE
 
             # ✅ CORREÇÃO: Compara strings
             if new_status_str == OrderStatus.DELIVERED.value:
-                decrease_stock_for_order(order, db)
+                # ✅ Notifica (após o commit) apenas os produtos cujo estoque mudou
+                stock_change = decrease_stock_for_order(order, db)
                 business_actions.append("Estoque baixado")
-                # ✅ Notifica atualização de produtos após baixa de estoque
-                asyncio.create_task(admin_emit_products_updated(db, order.store_id))
 
             if new_status_str == OrderStatus.FINALIZED.value:
                 calculate_and_apply_cashback_for_order(order, db)
@@ -142,7 +147,8 @@ async def handle_update_order_status(self, sid, data):
                 ])
 
             if new_status_str == OrderStatus.CANCELED.value:
-                restock_for_canceled_order(order, db)
+                # Kits devolvem o estoque dos componentes: notifica os IDs devolvidos
+                stock_change = restock_for_canceled_order(order, db)
                 business_actions.append("Estoque reposto")
 
                 if 'cancellation_reason' in data:
@@ -189,8 +195,7 @@ async def handle_update_order_status(self, sid, data):
 
             db.refresh(order, attribute_names=['customer', 'store'])
 
-            cache_manager.client.delete(f"admin:{order.store_id}:orders:active")
-            cache_manager.client.delete(f"admin:{order.store_id}:order:{order.id}:details")
+            cache_manager.on_order_status_change(order.store_id, order.id)
 
             logger.info(f"🗑️ Cache invalidado para store {order.store_id} após mudança de status")
 
@@ -201,6 +206,8 @@ async def handle_update_order_status(self, sid, data):
             asyncio.create_task(send_order_status_update(db, order))
             await admin_emit_order_updated_from_obj(order)
 
+            await emit_stock_change(db, order.store_id, stock_change)
+
             logger.info(
                 f"✅ [AUDIT] Pedido #{order.public_id} ({order.id}) - "
                 f"Status: {old_status_value} → {new_status_str} - "
@@ -7,45 +7,193 @@ from src.api.admin.socketio import emitters
 
 
 
-from src.core.database import get_db_manager
+from src.core.database import (
+    get_async_db_manager,
+    get_async_read_db_manager,
+    get_db_manager,
+    get_read_db_manager,
+)
 from src.socketio_instance import sio
 
 
 
 
+# ✅ Emissores que SÓ LEEM: sessão na réplica de leitura (se em dia; senão
+# no primário). Ficam de fora os que precisam do estado mais recente:
+# - orders: a projeção de pedidos ativos gravaria no Redis um pedido defasado
+# - catalog: a versão do catálogo (Redis) seria mais nova que os dados lidos
+# - bootstrap (loja/chatbot): leve, e reenviado logo após as alterações
+REPLICA_EMITTERS = {
+    emitters.admin_emit_tables_and_commands,
+    emitters.admin_emit_financials_updated,
+    emitters.admin_emit_dashboard_payables_data_updated,
+    emitters.admin_emit_conversations_initial,
+}
+
+# O dashboard chama serviços síncronos (em threads): precisa de Session
+SYNC_REPLICA_EMITTERS = {
+    emitters.admin_emit_dashboard_data_updated,
+}
+
+
+async def _run_emitter(emitter, **kwargs):
+    """Executa um emissor com uma sessão dedicada (réplica para os que só leem)"""
+    if emitter in SYNC_REPLICA_EMITTERS:
+        with get_read_db_manager() as db:
+            return await emitter(db=db, **kwargs)
+
+    manager = get_async_read_db_manager if emitter in REPLICA_EMITTERS else get_async_db_manager
+    async with manager() as db:
+        return await emitter(db=db, **kwargs)
+
+
+# ✅ Painéis do admin carregados sob demanda ('load_panel').
+# Cada emissor envia APENAS para o socket que pediu (sid).
+ADMIN_PANELS = {
+    'orders': [emitters.admin_emit_orders_initial],
+    'tables': [emitters.admin_emit_tables_and_commands],
+    'catalog': [emitters.admin_emit_products_updated],
+    'financials': [
+        emitters.admin_emit_financials_updated,
+        emitters.admin_emit_dashboard_payables_data_updated,
+    ],
+    'conversations': [emitters.admin_emit_conversations_initial],
+    'dashboard': [emitters.admin_emit_dashboard_data_updated],
+}
+
+# Clientes que não enviam 'panels' no join recebem o conjunto antigo
+# (o dashboard completo continua só sob demanda)
+LEGACY_JOIN_PANELS = ['orders', 'tables', 'catalog', 'financials', 'conversations']
+
+# Dados leves que todo painel usa: enviados já no join
+BOOTSTRAP_EMITTERS = [
+    emitters.admin_emit_store_updated,
+    emitters.emit_chatbot_config_update,
+]
+
+
+async def _run_emitters_for_sid(emitters_to_run, store_id: int, sid: str) -> list:
+    """
+    Roda os emissores em paralelo, todos direcionados ao 'sid'.
+
+    ✅ Cada emissor roda em sua PRÓPRIA sessão assíncrona (asyncpg):
+    uma AsyncSession não aceita operações concorrentes, e assim o gather
+    realmente paraleliza as queries sem bloquear o event loop.
+    """
+    results = await asyncio.gather(
+        *(_run_emitter(emitter, store_id=store_id, sid=sid) for emitter in emitters_to_run),
+        return_exceptions=True
+    )
+
+    for emitter, result in zip(emitters_to_run, results):
+        if isinstance(result, Exception):
+            print(f"❌ [bootstrap] {emitter.__name__} falhou para a loja {store_id}: {result}")
+
+    return results
+
+
+def _resolve_panels(panels) -> tuple[list[str], list[str]]:
+    """Separa os painéis pedidos em (conhecidos, desconhecidos), sem repetição"""
+    if isinstance(panels, str):
+        panels = [panels]
+
+    known, unknown = [], []
+    for panel in panels or []:
+        target = known if panel in ADMIN_PANELS else unknown
+        if panel not in target:
+            target.append(panel)
+    return known, unknown
+
+
 async def handle_join_store_room(sid, data):
+    """
+    Entra na sala da loja e envia o bootstrap SOMENTE para este socket.
+
+    Protocolo:
+    - join_store_room {store_id, panels?}
+        → store_details_updated + chatbot_config_updated (só para o sid)
+        → painéis listados em 'panels' (ex: a tela aberta) já no join
+        → sem 'panels' (clientes antigos): LEGACY_JOIN_PANELS, só para o sid
+    - load_panel {store_id, panel}: carrega um painel quando a UI precisar
+
+    Nada é mais transmitido para a sala inteira no join: os outros
+    dispositivos da loja não recebem o cardápio/loja de novo.
+    """
     store_id = data.get('store_id')
     if not store_id:
-        return
+        return {'status': 'error', 'message': 'store_id é obrigatório'}
 
     await sio.enter_room(sid, f'admin_store_{store_id}', namespace='/admin')
 
-    # ✅ CORREÇÃO: Usamos o 'get_db_manager' diretamente aqui.
-    # A cada chamada, ele cria uma nova sessão de banco de dados, fresca e pronta para uso.
-    with get_db_manager() as db:
-        try:
-            # Agora que o bug do dashboard foi corrigido na fonte, podemos
-            # movê-lo de volta para a lista de confiança.
-            emitters_to_run = [
-                emitters.admin_emit_store_updated(db=db, store_id=store_id),
-              #  emitters.admin_emit_dashboard_data_updated(db=db, store_id=store_id, sid=sid),
-                emitters.admin_emit_dashboard_payables_data_updated(db=db, store_id=store_id, sid=sid),
-                emitters.admin_emit_orders_initial(db=db, store_id=store_id, sid=sid),
-                emitters.admin_emit_tables_and_commands(db=db, store_id=store_id, sid=sid),
-                emitters.admin_emit_products_updated(db=db, store_id=store_id),
-                emitters.emit_chatbot_config_update(db=db, store_id=store_id),
-                emitters.admin_emit_conversations_initial(db=db, store_id=store_id, sid=sid),
-                emitters.admin_emit_financials_updated(db=db, store_id=store_id, sid=sid)
-            ]
-
-            await asyncio.gather(*emitters_to_run, return_exceptions=True)
-
-        except Exception as e:
-            print(f"🔥🔥🔥 [ERRO GERAL] Erro no manipulador de join_store_room: {e}")
-        # O 'with' statement já garante que 'db.close()' será chamado.
-
-    print(f"🏁 [DEBUG] Todos os emissores para a loja {store_id} foram processados.")
+    if 'panels' in data:
+        panels, unknown = _resolve_panels(data.get('panels'))
+    else:
+        panels, unknown = list(LEGACY_JOIN_PANELS), []
+
+    emitters_to_run = list(BOOTSTRAP_EMITTERS)
+    for panel in panels:
+        emitters_to_run.extend(ADMIN_PANELS[panel])
+
+    try:
+        await _run_emitters_for_sid(emitters_to_run, store_id, sid)
+    except Exception as e:
+        print(f"🔥🔥🔥 [ERRO GERAL] Erro no manipulador de join_store_room: {e}")
+        return {'status': 'error', 'message': 'Erro interno do servidor.'}
+
+    print(f"🏁 [join_store_room] Bootstrap da loja {store_id} enviado para {sid} (painéis: {panels or 'nenhum'})")
+
+    return {
+        'status': 'success',
+        'loaded_panels': panels,
+        'unknown_panels': unknown,
+        'available_panels': list(ADMIN_PANELS),
+    }
+
+
+async def handle_load_panel(sid, data):
+    """
+    Carrega um (ou mais) painel do admin sob demanda, apenas para este socket.
+
+    data: {store_id, panel} ou {store_id, panels: [...]}
+    """
+    data = data or {}
+    store_id = data.get('store_id')
+    if not store_id:
+        return {'status': 'error', 'message': 'store_id é obrigatório'}
+
+    room = f'admin_store_{store_id}'
+    if room not in sio.rooms(sid, namespace='/admin'):
+        return {'status': 'error', 'message': 'Socket não está na sala da loja.'}
+
+    panels, unknown = _resolve_panels(data.get('panels', data.get('panel')))
+    if not panels:
+        return {'status': 'error', 'message': f'Painel inválido: {unknown}', 'available_panels': list(ADMIN_PANELS)}
+
+    emitters_to_run = [emitter for panel in panels for emitter in ADMIN_PANELS[panel]]
+    await _run_emitters_for_sid(emitters_to_run, store_id, sid)
+
+    return {'status': 'success', 'loaded_panels': panels, 'unknown_panels': unknown}
+
+
+
+async def handle_catalog_resync(sid, data):
+    """
+    Reenvia o cardápio completo APENAS para o socket que detectou um buraco
+    na sequência de versões do 'catalog_delta'.
+    """
+    store_id = (data or {}).get('store_id')
+    if not store_id:
+        return {'status': 'error', 'message': 'store_id é obrigatório'}
+
+    room = f'admin_store_{store_id}'
+    if room not in sio.rooms(sid, namespace='/admin'):
+        return {'status': 'error', 'message': 'Socket não está na sala da loja.'}
+
+    print(f"🔁 [catalog_resync] Admin {sid} pediu resync da loja {store_id} (versão local: {data.get('version')})")
+
+    await _run_emitter(emitters.admin_emit_products_updated, store_id=store_id, sid=sid)
 
+    return {'status': 'success'}
 
 
 async def handle_leave_store_room(sio_namespace, sid, data):
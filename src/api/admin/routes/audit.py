@@ -9,7 +9,7 @@ from sqlalchemy.orm import joinedload
 from src.api.schemas.audit.audit import AuditLogListResponse, AuditLogDetailResponse, EntityChangeHistory, \
     AuditStatistics
 from src.core import models
-from src.core.database import GetDBDep
+from src.core.database import GetReadDBDep
 from src.core.dependencies import GetStoreDep, GetCurrentUserDep
 from src.core.utils.enums import AuditAction, AuditEntityType
 
@@ -23,7 +23,7 @@ router = APIRouter(prefix="/stores/{store_id}/audit", tags=["Audit Logs"])
 @router.get("", response_model=AuditLogListResponse)
 def get_audit_logs(
         store: GetStoreDep,
-        db: GetDBDep,
+        db: GetReadDBDep,
         current_user: GetCurrentUserDep,
         # Filtros
         entity_type: Optional[AuditEntityType] = Query(None, description="Filtrar por tipo de entidade"),
@@ -110,7 +110,7 @@ def get_audit_logs(
 @router.get("/{log_id}", response_model=AuditLogDetailResponse)
 def get_audit_log_detail(
         store: GetStoreDep,
-        db: GetDBDep,
+        db: GetReadDBDep,
         log_id: int = Path(..., description="ID do log de auditoria")
 ):
     """
@@ -155,7 +155,7 @@ def get_audit_log_detail(
 @router.get("/entity/{entity_type}/{entity_id}", response_model=EntityChangeHistory)
 def get_entity_change_history(
         store: GetStoreDep,
-        db: GetDBDep,
+        db: GetReadDBDep,
         entity_type: AuditEntityType = Path(..., description="Tipo da entidade"),
         entity_id: int = Path(..., description="ID da entidade"),
         limit: int = Query(100, ge=1, le=500, description="Máximo de registros")
@@ -195,7 +195,7 @@ def get_entity_change_history(
 @router.get("/stats/overview", response_model=AuditStatistics)
 def get_audit_statistics(
         store: GetStoreDep,
-        db: GetDBDep,
+        db: GetReadDBDep,
         days: int = Query(30, ge=1, le=365, description="Período para análise")
 ):
     """
@@ -312,7 +312,7 @@ def get_audit_statistics(
 @router.get("/user/{user_id}", response_model=AuditLogListResponse)
 def get_user_audit_logs(
         store: GetStoreDep,
-        db: GetDBDep,
+        db: GetReadDBDep,
         user_id: int = Path(..., description="ID do usuário"),
         days: int = Query(30, ge=1, le=365),
         page: int = Query(1, ge=1),
@@ -7,6 +7,7 @@ from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from src.api.schemas.products.banner import BannerOut
 
 from src.core import models
+from src.core.cache.cache_manager import cache_manager
 from src.core.aws import delete_file, upload_single_file
 from src.core.database import GetDBDep
 from src.core.dependencies import GetStoreDep
@@ -44,6 +45,7 @@ async def create_banner(
     db.add(banner)
     db.commit()
     db.refresh(banner)
+    cache_manager.on_store_view_change(store.id)
 
     return banner
 
@@ -123,6 +125,7 @@ async def update_banner(
 
     db.commit()
     db.refresh(banner)
+    cache_manager.on_store_view_change(store.id)
 
     if old_file_key:
         delete_file(old_file_key)
@@ -150,5 +153,6 @@ async def delete_banner(
 
     db.delete(banner)
     db.commit()
+    cache_manager.on_store_view_change(store.id)
 
 
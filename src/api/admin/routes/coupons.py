@@ -1,13 +1,11 @@
 # src/api/admin/routes/coupons.py
 
-import asyncio
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
 from sqlalchemy.orm import selectinload
 
 from src.api.admin.services.coupon_notification_service import send_coupon_notification_task
-from src.api.admin.socketio.emitters import admin_emit_store_updated
-from src.api.app.socketio.socketio_emitters import emit_store_updated
+from src.api.admin.socketio.emitters import emit_store_updates
 from src.api.schemas.financial.coupon import CouponCreate, CouponUpdate, CouponOut
 from src.core import models
 from src.core.database import GetDBDep
@@ -133,8 +131,7 @@ async def create_coupon(
     db.refresh(db_coupon)
 
     # Emite eventos de atualização
-    await asyncio.create_task(emit_store_updated(db, store.id))
-    await admin_emit_store_updated(db, store.id)
+    await emit_store_updates(db, store.id)
 
     return db_coupon
 
@@ -312,8 +309,7 @@ async def patch_coupon(
     db.refresh(coupon)
 
     # Emite eventos
-    await asyncio.create_task(emit_store_updated(db, store.id))
-    await admin_emit_store_updated(db, store.id)
+    await emit_store_updates(db, store.id)
 
     return coupon
 
@@ -417,7 +413,6 @@ async def delete_coupon(
     db.commit()
 
     # Emite eventos
-    await asyncio.create_task(emit_store_updated(db, store.id))
-    await admin_emit_store_updated(db, store.id)
+    await emit_store_updates(db, store.id)
 
     return None
\ No newline at end of file
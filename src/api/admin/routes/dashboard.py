@@ -8,7 +8,7 @@ from src.api.schemas.analytics.dashboard import (
     DashboardDataSchema,
 
 )
-from src.core.database import GetDBDep
+from src.core.database import GetReadDBDep
 
 router = APIRouter(
     prefix="/admin/stores/{store_id}/dashboard",  # Endpoint um pouco mais limpo
@@ -16,7 +16,7 @@ router = APIRouter(
 )
 @router.get("/", response_model=DashboardDataSchema)
 def get_dashboard_summary(
-        db: GetDBDep,
+        db: GetReadDBDep,
         store_id: int,
         start_date: date = date.today() - timedelta(days=29),
         end_date: date = date.today(),
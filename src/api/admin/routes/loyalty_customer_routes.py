@@ -4,7 +4,7 @@ from fastapi import APIRouter, HTTPException
 from starlette import status
 
 from src.api.schemas.financial.coupon import CouponOut
-from src.core.database import GetDBDep
+from src.core.database import GetDBDep, GetReadDBDep
 from src.api.admin.services import loyalty_service  # Reutilizamos o mesmo serviço
 from src.api.schemas.customer.loyalty_schema import CustomerLoyaltyDashboardSchema
 # Importe sua dependência para pegar o cliente logado
@@ -17,7 +17,7 @@ router = APIRouter(prefix="/loyalty", tags=["Customer Loyalty"])
 @router.get("/store/{store_id}", response_model=CustomerLoyaltyDashboardSchema)
 def get_my_loyalty_dashboard_for_store(
         store_id: int,
-        db: GetDBDep,
+        db: GetReadDBDep,
         # Descomente e ajuste para sua dependência de cliente
         # current_customer: models.Customer = Depends(get_current_customer)
 ):
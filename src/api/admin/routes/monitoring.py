@@ -5,13 +5,22 @@ Endpoints para monitoramento de saúde e métricas do sistema
 
 Autor: PDVix Team
 """
+import hmac
 import time
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 
 from src.core import models
 from src.core.cache.redis_client import redis_client
-from src.core.database import get_pool_stats, check_database_health, GetDBDep
+from src.core.config import config
+from src.core.database import (
+    get_pool_stats,
+    get_database_pools_stats,
+    check_database_health,
+    replica_router,
+    GetDBDep,
+)
 from src.core.dependencies import GetCurrentUserDep
 from src.core.monitoring.metrics import metrics
 
@@ -54,6 +63,8 @@ async def detailed_health_check(user: GetCurrentUserDep):
         "database": {
             "health": db_health,
             "pool": pool_stats,
+            "pools": get_database_pools_stats(),
+            "read_replica": replica_router.get_status(),
         },
         "cache": {
             "redis_available": redis_client.is_available,
@@ -71,6 +82,28 @@ async def get_metrics(user: GetCurrentUserDep):
     return metrics.get_metrics_summary()
 
 
+@router.get("/metrics/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics(request: Request):
+    """
+    📈 Métricas no formato de texto do Prometheus (para scrape)
+
+    Autenticado por 'Authorization: Bearer <METRICS_PROMETHEUS_TOKEN>'.
+    Sem o token configurado, o endpoint fica desligado (404).
+    """
+    token = config.METRICS_PROMETHEUS_TOKEN
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    authorization = request.headers.get("authorization", "")
+    if not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        raise HTTPException(status_code=401, detail="Token de métricas inválido")
+
+    return PlainTextResponse(
+        metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @router.get("/stats/stores")
 async def get_store_stats(db: GetDBDep, user: GetCurrentUserDep):
     """
@@ -114,6 +147,8 @@ async def get_performance_stats(user: GetCurrentUserDep):
 
     return {
         "database_pool": pool_stats,
+        "database_pools": get_database_pools_stats(),
+        "read_replica": replica_router.get_status(),
         "request_metrics": metrics_summary["requests"],
         "database_metrics": metrics_summary["database"],
         "cache_metrics": metrics_summary["cache"],
@@ -161,6 +196,19 @@ async def get_system_alerts(user: GetCurrentUserDep):
             "recommendation": "Verifique logs de erro do banco de dados"
         })
 
+    # Verifica réplica de leitura
+    replica_status = replica_router.get_status()
+    if replica_status["state"] in ("down", "lagging"):
+        alerts.append({
+            "severity": "warning",
+            "type": "read_replica",
+            "message": (
+                "Réplica de leitura fora do ar" if replica_status["state"] == "down"
+                else f"Réplica de leitura atrasada ({replica_status['lag_seconds'] or '?'}s)"
+            ),
+            "recommendation": "Leituras de relatórios estão no primário. Verifique a replicação."
+        })
+
     # Verifica Redis
     if not redis_client.is_available:
         alerts.append({
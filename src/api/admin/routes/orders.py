@@ -9,6 +9,7 @@ from src.api.schemas.orders.order import OrderDetails, Order
 from src.api.schemas.shared.pagination import PaginatedResponse
 from src.core import models
 from src.core.cache.decorators import cache_route
+from src.core.cache.keys import CacheKeys, CacheTags
 from src.core.database import GetDBDep
 from src.core.dependencies import GetStoreDep
 
@@ -21,7 +22,8 @@ router = APIRouter(tags=["Orders"], prefix="/stores/{store_id}/orders")
 @cache_route(
     ttl=30,  # 30 segundos (atualiza rápido para pedidos)
     key_builder=lambda store, page, size, status, **kwargs:
-    f"admin:{store.id}:orders:list:{page}:{size}:{status or 'all'}"
+    f"admin:{store.id}:orders:list:{page}:{size}:{status or 'all'}",
+    tags=lambda store, **kwargs: CacheKeys.store_tags(store.id, CacheTags.ORDERS)
 )
 def get_orders(
         db: GetDBDep,
@@ -70,7 +72,8 @@ def get_orders(
 @cache_route(
     ttl=60,  # 1 minuto
     key_builder=lambda store, order_id, **kwargs:
-    f"admin:{store.id}:order:{order_id}:details"
+    f"admin:{store.id}:order:{order_id}:details",
+    tags=lambda store, **kwargs: [CacheKeys.tag_store(store.id)]
 )
 def get_order(
         db: GetDBDep,
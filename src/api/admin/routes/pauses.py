@@ -1,7 +1,6 @@
 from fastapi import APIRouter, HTTPException
 
-from src.api.admin.socketio.emitters import admin_emit_store_updated
-from src.api.app.socketio.socketio_emitters import emit_store_updated
+from src.api.admin.socketio.emitters import emit_store_updates
 from src.api.schemas.store.scheduled_pauses import ScheduledPauseOut, ScheduledPauseCreate
 from src.core import models
 from src.core.database import GetDBDep
@@ -24,8 +23,7 @@ async def create_pause(store_id: int, pause: ScheduledPauseCreate, db: GetDBDep)
     db.refresh(db_pause)
 
     # TODO: Emitir um evento de socket para notificar a UI da mudança
-    await emit_store_updated(db, store_id)
-    await admin_emit_store_updated(db, store_id)
+    await emit_store_updates(db, store_id)
 
     return db_pause
 
@@ -41,6 +39,5 @@ async def delete_pause(pause_id: int, db: GetDBDep):
     db.delete(db_pause)
     db.commit()
     # TODO: Emitir um evento de socket para notificar a UI da mudança
-    await emit_store_updated(db, store_id_to_update)
-    await admin_emit_store_updated(db, store_id_to_update)
+    await emit_store_updates(db, store_id_to_update)
     return {"ok": True}
\ No newline at end of file
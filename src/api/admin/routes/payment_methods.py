@@ -5,8 +5,7 @@ from pydantic import BaseModel
 from sqlalchemy.orm import joinedload
 from collections import defaultdict
 
-from src.api.admin.socketio.emitters import admin_emit_store_updated
-from src.api.app.socketio.socketio_emitters import emit_store_updated
+from src.api.admin.socketio.emitters import emit_store_updates
 from src.core import models
 from src.core.database import GetDBDep
 from src.core.dependencies import GetStoreDep, GetCurrentUserDep, GetAuditLoggerDep
@@ -251,7 +250,6 @@ async def activate_or_configure_method(
     # 6. EMITE EVENTOS (CRÍTICO PARA SINCRONIZAÇÃO)
     # ═══════════════════════════════════════════════════════════
 
-    await emit_store_updated(db, store_id)
-    await admin_emit_store_updated(db, store_id)
+    await emit_store_updates(db, store_id)
 
     return activation
\ No newline at end of file
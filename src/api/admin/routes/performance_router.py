@@ -12,7 +12,7 @@ from src.api.admin.utils.input_sanitizer import sanitize_search_input
 from src.api.schemas.orders.order import OrderDetails
 from src.api.schemas.shared.pagination import PaginatedResponse
 from src.core import models
-from src.core.database import GetDBDep
+from src.core.database import GetReadDBDep
 from src.core.dependencies import GetStoreDep
 from src.api.schemas.analytics.performance import StorePerformanceSchema, TodaySummarySchema
 from src.api.admin.services.performance_service import get_store_performance_for_date, get_today_summary
@@ -26,7 +26,7 @@ router = APIRouter(
 
 @router.get("", response_model=StorePerformanceSchema)
 def get_performance_data(
-        db: GetDBDep,
+        db: GetReadDBDep,
         store: GetStoreDep,
         start_date: date = Query(..., description="Data de início do período no formato YYYY-MM-DD"),
         end_date: date = Query(..., description="Data de fim do período no formato YYYY-MM-DD"),
@@ -42,7 +42,7 @@ def get_performance_data(
 
 @router.get("/list-by-date", response_model=PaginatedResponse[OrderDetails])
 def list_orders_by_date(
-        db: GetDBDep,
+        db: GetReadDBDep,
         store: GetStoreDep,
         start_date: date = Query(..., description="Data de início do período"),
         end_date: date = Query(..., description="Data de fim do período"),
@@ -157,7 +157,7 @@ def list_orders_by_date(
     summary="Obtém um resumo rápido das vendas do dia de operação atual"
 )
 def get_today_summary_data(
-        db: GetDBDep,
+        db: GetReadDBDep,
         store: GetStoreDep,
 ):
     return get_today_summary(db, store.id)
\ No newline at end of file
@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from src.api import crud
-from src.api.admin.socketio.emitters import emit_updates_products
+from src.api.admin.socketio.catalog_sync import emit_catalog_delta, link_changed
 
 from src.api.crud import crud_product
 from src.api.schemas.products.product_category_link import ProductCategoryLinkOut, ProductCategoryLinkUpdate
@@ -32,7 +32,7 @@ async def remove_product_from_category_route(
     )
     if rows_deleted == 0:
         print(f"Nenhum vínculo encontrado para o produto {product_id} na categoria {category_id}.")
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [link_changed(product_id, category_id)])
     return
 
 
@@ -59,5 +59,5 @@ async def update_product_category_link_route(
     if not updated_link:
         raise HTTPException(status_code=404, detail="Vínculo entre produto e categoria não encontrado.")
 
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [link_changed(product_id, category_id)])
     return updated_link
\ No newline at end of file
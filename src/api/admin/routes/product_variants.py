@@ -5,8 +5,7 @@ from sqlalchemy.orm import Session
 # ✅ Importe os seus schemas Pydantic. Use o "Out" para respostas.
 from src.api.schemas.products.product_variant_link import ProductVariantLinkOut, ProductVariantLinkCreate, ProductVariantLinkUpdate
 
-from src.api.admin.socketio.emitters import admin_emit_products_updated
-from src.api.app.socketio.socketio_emitters import emit_products_updated
+from src.api.admin.socketio.emitters import emit_updates_products
 from src.core.database import GetDBDep
 from src.core import models
 from src.core.dependencies import GetProductDep
@@ -21,9 +20,8 @@ router = APIRouter(
 
 # ✅ Função auxiliar para emitir eventos e evitar repetição de código
 async def _emit_update_events(db: Session, store_id: int):
-    """Emite eventos de atualização para clientes e painéis de admin."""
-    await emit_products_updated(db, store_id)
-    await admin_emit_products_updated(db, store_id)
+    """Emite eventos de atualização para clientes e painéis de admin (agrupados)."""
+    await emit_updates_products(db, store_id)
 
 
 @router.post(
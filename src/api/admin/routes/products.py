@@ -9,7 +9,14 @@ from starlette import status
 log = logging.getLogger(__name__)
 
 from src.api.admin.routes import product_category_link
-from src.api.admin.socketio.emitters import emit_updates_products
+from src.api.admin.services.product_view_ingestion import product_view_buffer
+from src.api.admin.socketio.catalog_sync import (
+    emit_catalog_delta,
+    product_upserted,
+    product_removed,
+    link_changed,
+    price_changed,
+)
 from src.api.crud import crud_product
 from src.api.schemas.products.bulk_actions import BulkDeletePayload, BulkStatusUpdatePayload, BulkCategoryUpdatePayload
 from src.api.schemas.products.product import (
@@ -191,7 +198,7 @@ async def create_simple_product(
 
     db.commit()
     db.refresh(new_product)
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [product_upserted(new_product.id)])
     return new_product
 
 
@@ -291,7 +298,7 @@ async def create_flavor_product(
 
     db.commit()
     db.refresh(new_product)
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [product_upserted(new_product.id)])
     return new_product
 
 
@@ -409,7 +416,7 @@ async def update_product(
         delete_multiple_files(file_keys_to_delete)
 
     db.commit()
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [product_upserted(updated_product.id)])
     return updated_product
 
 
@@ -474,7 +481,7 @@ async def update_simple_product_price(
 
     db.commit()
     db.refresh(db_link)
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [link_changed(product_id, category_id)])
     return db_link
 
 
@@ -526,7 +533,7 @@ async def update_flavor_price(
     db.commit()
     product_to_return = db.query(models.Product).get(db_price_link.product_id)
     db.refresh(product_to_return)
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [price_changed(db_price_link.product_id, flavor_price_id)])
     return product_to_return
 
 
@@ -563,7 +570,7 @@ async def archive_product(
     )
 
     db.commit()
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [product_removed(db_product.id)])
     return
 
 
@@ -607,7 +614,7 @@ async def bulk_archive_products(
     )
 
     db.commit()
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [product_removed(pid) for pid in product_names])
     return
 
 
@@ -670,7 +677,7 @@ async def bulk_update_product_category(
     )
 
     db.commit()
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [product_upserted(pid) for pid in product_names])
     return {"message": "Produtos movidos e reprecificados com sucesso"}
 
 
@@ -721,7 +728,7 @@ async def bulk_update_product_status(
     )
 
     db.commit()
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [product_upserted(pid) for pid in product_names])
     return
 
 
@@ -783,7 +790,7 @@ async def remove_product_from_category_route(
         )
         db.commit()
 
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [link_changed(product_id, category_id)])
     return
 
 
@@ -846,7 +853,7 @@ async def bulk_add_products_to_category(
     )
 
     db.commit()
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [link_changed(pid, payload.target_category_id) for pid in product_names])
     return {"message": "Produtos adicionados/atualizados com sucesso"}
 
 
@@ -910,10 +917,15 @@ def unlink_variant_from_product(
 # ===================================================================
 
 @router.post("/{product_id}/view", status_code=204)
-def record_product_view(product: GetProductDep, store: GetStoreDep, db: GetDBDep):
-    """Registra uma visualização de produto (métrica)."""
-    db.add(models.ProductView(product_id=product.id, store_id=store.id))
-    db.commit()
+def record_product_view(product: GetProductDep, store: GetStoreDep):
+    """Registra uma visualização de produto (métrica), gravada em lote."""
+    if not product_view_buffer.record(store.id, product.id):
+        # Contrapressão: buffer cheio (gravação atrasada/banco indisponível)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas visualizações pendentes. Tente novamente em instantes.",
+            headers={"Retry-After": "1"},
+        )
     return
 
 
@@ -1022,7 +1034,7 @@ async def update_product_category_link(
         setattr(db_link, field, value)
     db.commit()
     db.refresh(db_link)
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [link_changed(product_id, category_id)])
     return db_link
 
 
@@ -1049,7 +1061,7 @@ async def toggle_product_availability_in_category(
     if not db_link:
         raise HTTPException(status_code=404, detail="Vínculo produto-categoria não encontrado.")
 
-    await emit_updates_products(db, store.id)
+    await emit_catalog_delta(db, store.id, [link_changed(product_id, category_id)])
     return db_link
 
 
@@ -1,11 +1,9 @@
-import asyncio
 
 from fastapi import APIRouter, HTTPException
 from sqlalchemy.orm import selectinload
 from starlette import status
 
-from src.api.admin.socketio.emitters import admin_emit_store_updated
-from src.api.app.socketio.socketio_emitters import emit_store_updated
+from src.api.admin.socketio.emitters import emit_store_updates
 from src.core.database import GetDBDep
 from src.core.dependencies import GetStoreDep
 from src.core.models import StoreCity, Store, StoreNeighborhood
@@ -115,10 +113,7 @@ async def upsert_city_with_neighborhoods(
     db.commit()
     db.refresh(city_db)
 
-    await asyncio.gather(
-        emit_store_updated(db, store.id),
-        admin_emit_store_updated(db, store.id)
-    )
+    await emit_store_updates(db, store.id)
 
     return city_db
 
@@ -162,8 +157,5 @@ async def delete_city(
     db.delete(city)
     db.commit()
 
-    await asyncio.gather(
-        emit_store_updated(db, store.id),
-        admin_emit_store_updated(db, store.id)
-    )
+    await emit_store_updates(db, store.id)
     return None
\ No newline at end of file
@@ -2,14 +2,14 @@ from fastapi import APIRouter
 from typing import List
 
 from src.api.schemas.customer.customer import StoreCustomerOut
-from src.core.database import GetDBDep
+from src.core.database import GetReadDBDep
 from src.core.models import StoreCustomer, Customer
 
 
 router = APIRouter(prefix="/stores/{store_id}/customers", tags=["Clientes da Loja"])
 
 @router.get("", response_model=List[StoreCustomerOut])
-def list_store_customers(store_id: int, db: GetDBDep):
+def list_store_customers(store_id: int, db: GetReadDBDep):
     """
     Lista os clientes vinculados à loja, com dados agregados (pedidos, gasto, última compra).
     """
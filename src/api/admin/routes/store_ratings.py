@@ -1,8 +1,13 @@
 from fastapi import APIRouter, HTTPException
 from typing import List
 
+from src.api.app.services.rating import (
+    visible_stars, apply_store_rating_change, apply_product_rating_change
+)
 from src.api.schemas.products.rating import RatingOut
 from src.core.database import GetDBDep
+from src.core.dependencies import GetStoreDep
+from src.core import models
 from src.core.models import StoreRating, ProductRating
 
 router = APIRouter(prefix="/stores/{store_id}/store-ratings", tags=["Avaliações de Lojas"])
@@ -27,6 +32,43 @@ def reply_to_store_rating(rating_id: int, reply: str, db: GetDBDep):
     db.refresh(rating)
     return rating
 
+
+@router.patch("/{rating_id}/visibility", response_model=RatingOut)
+def set_store_rating_visibility(rating_id: int, is_active: bool, db: GetDBDep, store: GetStoreDep):
+    """Oculta/reexibe uma avaliação da loja, mantendo os agregados em dia"""
+    # ✅ A avaliação precisa ser da loja que o usuário administra
+    rating = db.query(StoreRating).filter_by(id=rating_id, store_id=store.id).first()
+    if not rating:
+        raise HTTPException(status_code=404, detail="Avaliação não encontrada.")
+
+    old_stars = visible_stars(rating)
+    rating.is_active = is_active
+    apply_store_rating_change(db, rating.store_id, old_stars, visible_stars(rating))
+
+    db.commit()
+    db.refresh(rating)
+    return rating
+
+
+@router.patch("/product-ratings/{rating_id}/visibility", response_model=RatingOut)
+def set_product_rating_visibility(rating_id: int, is_active: bool, db: GetDBDep, store: GetStoreDep):
+    """Oculta/reexibe uma avaliação de produto, mantendo os agregados em dia"""
+    # ✅ O produto avaliado precisa ser da loja que o usuário administra
+    rating = db.query(ProductRating).join(ProductRating.product).filter(
+        ProductRating.id == rating_id,
+        models.Product.store_id == store.id
+    ).first()
+    if not rating:
+        raise HTTPException(status_code=404, detail="Avaliação não encontrada.")
+
+    old_stars = visible_stars(rating)
+    rating.is_active = is_active
+    apply_product_rating_change(db, rating.product_id, old_stars, visible_stars(rating))
+
+    db.commit()
+    db.refresh(rating)
+    return rating
+
 @router.get("/product/{product_id}", response_model=List[RatingOut])
 def list_product_ratings(product_id: int, db: GetDBDep):
     ratings = db.query(ProductRating).filter_by(product_id=product_id).order_by(ProductRating.created_at.desc()).all()
@@ -26,7 +26,7 @@ from src.api.admin.socketio.emitters import admin_emit_store_updated
 from src.api.app.socketio.socketio_emitters import emit_store_updated
 from src.api.schemas.subscriptions.store_subscription import CreateStoreSubscription
 from src.core import models
-from src.core.database import GetDBDep
+from src.core.database import GetDBDep, GetReadDBDep
 from src.core.dependencies import GetCurrentUserDep, GetAuditLoggerDep, GetStoreForSubscriptionDep
 from src.core.utils.enums import AuditAction, AuditEntityType
 from src.socketio_instance import sio
@@ -696,7 +696,7 @@ async def cancel_subscription(
 
 @router.get("/stores/{store_id}/subscriptions/details")
 async def get_subscription_details(
-        db: GetDBDep,
+        db: GetReadDBDep,
         store: GetStoreForSubscriptionDep,
         user: GetCurrentUserDep,
 ):
@@ -705,6 +705,7 @@ async def get_subscription_details(
 
     Sem auditoria (apenas leitura)
     Estados derivados calculados em tempo real
+    Prévia e histórico de cobrança lidos da réplica (se em dia)
     """
 
     details = SubscriptionService.get_enriched_subscription(
@@ -10,7 +10,7 @@ from src.api.schemas.tables.table import SaloonOut, CreateSaloonRequest, UpdateS
     RemoveItemFromTableRequest, AssignEmployeeRequest, TableActivityReport, SplitPaymentRequest, \
     TableDashboardOut
 
-from src.core.database import GetDBDep
+from src.core.database import GetDBDep, GetReadDBDep
 from src.core.dependencies import GetStoreDep, GetCurrentUserDep, GetAuditLoggerDep
 from src.core.utils.enums import Roles, AuditAction, AuditEntityType
 
@@ -590,7 +590,7 @@ async def assign_employee_to_table(
 
 @router.get("/dashboard", response_model=TableDashboardOut)
 async def get_tables_dashboard(
-    db: GetDBDep,
+    db: GetReadDBDep,
     store: GetStoreDep,
     user: GetCurrentUserDep,
 ):
@@ -607,7 +607,7 @@ async def get_tables_dashboard(
 @router.get("/{table_id}/activity-report", response_model=TableActivityReport)
 async def get_table_activity_report(
     table_id: int,
-    db: GetDBDep,
+    db: GetReadDBDep,
     store: GetStoreDep,
     user: GetCurrentUserDep,
     start_date: datetime | None = None,
@@ -684,7 +684,7 @@ async def split_payment(
 
 @router.get("/statistics/today")
 async def get_today_statistics(
-    db: GetDBDep,
+    db: GetReadDBDep,
     store: GetStoreDep,
     user: GetCurrentUserDep,
 ):
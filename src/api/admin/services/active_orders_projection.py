@@ -0,0 +1,254 @@
+# src/api/admin/services/active_orders_projection.py
+
+"""
+Active Orders Projection
+========================
+
+Projeção por loja dos pedidos ativos, usada no 'orders_initial' do admin.
+
+Em vez de recarregar e re-serializar todos os pedidos ativos a cada
+admin que entra na loja, o Redis mantém:
+
+- Hash  admin:{id}:orders:projection        order_id -> JSON do OrderDetails
+- Set   admin:{id}:orders:projection:dirty  pedidos alterados desde a última leitura
+- Flag  admin:{id}:orders:projection:ready  projeção completa (com TTL)
+
+Atualização incremental:
+- Todo commit que cria/altera um pedido (ou seus itens/logs de impressão)
+  marca o pedido como sujo (eventos da Session, sem serializar nada)
+- Na leitura, apenas os pedidos sujos são recarregados (1 query) e
+  gravados/removidos da projeção
+- Quando a flag expira, a projeção é reconstruída do zero (rede de
+  segurança para escritas que não passam pela Session, ex: SQL puro)
+
+Sem Redis, o payload é montado direto do banco (mesmas queries em lote).
+
+Autor: PDVix Team
+"""
+
+import logging
+from itertools import chain
+from typing import Iterable, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm.util import identity_key
+
+from src.api.schemas.orders.order import OrderDetails
+from src.core import models
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.config import config
+from src.core.utils.enums import OrderStatus
+from src.core.utils.socketio_json import PreEncodedJSON
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_ORDER_STATUSES = [OrderStatus.PENDING, OrderStatus.PREPARING, OrderStatus.READY, OrderStatus.ON_ROUTE]
+
+_SESSION_INFO_KEY = "active_orders_projection_dirty"
+
+
+# ═══════════════════════════════════════════════════════════
+# LEITURA DO BANCO (EM LOTE)
+# ═══════════════════════════════════════════════════════════
+
+def _load_active_orders(db, store_id: int, order_ids: Optional[Iterable[int]] = None) -> list[models.Order]:
+    query = db.query(models.Order).options(
+        selectinload(models.Order.print_logs),
+        selectinload(models.Order.products)
+        .selectinload(models.OrderProduct.variants)
+        .selectinload(models.OrderVariant.options)
+    ).filter(
+        models.Order.store_id == store_id,
+        models.Order.order_status.in_(ACTIVE_ORDER_STATUSES)
+    )
+
+    if order_ids is not None:
+        query = query.filter(models.Order.id.in_(list(order_ids)))
+
+    return query.all()
+
+
+def _customer_order_counts(db, store_id: int, customer_ids: set[int]) -> dict[int, int]:
+    """Total de pedidos de cada cliente na loja (1 query para todos)"""
+    if not customer_ids:
+        return {}
+
+    rows = db.query(models.StoreCustomer.customer_id, models.StoreCustomer.total_orders).filter(
+        models.StoreCustomer.store_id == store_id,
+        models.StoreCustomer.customer_id.in_(customer_ids)
+    ).all()
+
+    return {customer_id: total_orders for customer_id, total_orders in rows}
+
+
+def _serialize_orders(db, store_id: int, orders: list[models.Order]) -> dict[int, bytes]:
+    """order_id -> JSON do OrderDetails (pedidos com erro de serialização são ignorados)"""
+    counts = _customer_order_counts(db, store_id, {o.customer_id for o in orders if o.customer_id})
+
+    serialized = {}
+    for order in orders:
+        try:
+            details = OrderDetails.model_validate(order)
+            details.customer_order_count = counts.get(order.customer_id, 1)
+            serialized[order.id] = details.model_dump_json().encode()
+        except Exception as e:
+            logger.error(f"❌ Erro ao serializar pedido {order.id}: {e}", exc_info=True)
+
+    return serialized
+
+
+def _to_payload(store_id: int, entries: dict[int, bytes]) -> dict:
+    # Lista JSON montada direto dos trechos já serializados
+    orders_json = b"[" + b",".join(entries[order_id] for order_id in sorted(entries)) + b"]"
+    return {
+        "store_id": store_id,
+        "orders": PreEncodedJSON(orders_json),
+    }
+
+
+# ═══════════════════════════════════════════════════════════
+# PROJEÇÃO
+# ═══════════════════════════════════════════════════════════
+
+def _rebuild(db, store_id: int) -> dict[int, bytes]:
+    entries = _serialize_orders(db, store_id, _load_active_orders(db, store_id))
+    ttl = config.ORDERS_PROJECTION_TTL_SECONDS
+
+    pipe = redis_client.pipeline(transaction=True)
+    projection_key = CacheKeys.admin_orders_projection(store_id)
+    pipe.delete(projection_key)
+    if entries:
+        pipe.hset(projection_key, mapping=entries)
+        pipe.expire(projection_key, ttl)
+    pipe.set(CacheKeys.admin_orders_projection_ready(store_id), b"1", ex=ttl)
+    pipe.execute()
+
+    logger.info(f"📋 Projeção de pedidos ativos da loja {store_id} reconstruída ({len(entries)} pedidos)")
+    return entries
+
+
+def _apply_dirty(db, store_id: int, entries: dict[int, bytes], dirty_ids: set[int]) -> dict[int, bytes]:
+    refreshed = _serialize_orders(db, store_id, _load_active_orders(db, store_id, dirty_ids))
+    removed = [order_id for order_id in dirty_ids if order_id not in refreshed]
+
+    projection_key = CacheKeys.admin_orders_projection(store_id)
+    pipe = redis_client.pipeline(transaction=True)
+    if refreshed:
+        pipe.hset(projection_key, mapping=refreshed)
+    if removed:
+        pipe.hdel(projection_key, *removed)
+    pipe.expire(projection_key, config.ORDERS_PROJECTION_TTL_SECONDS)
+    pipe.execute()
+
+    for order_id in removed:
+        entries.pop(order_id, None)
+    entries.update(refreshed)
+
+    logger.debug(f"📋 Projeção da loja {store_id}: {len(refreshed)} atualizados, {len(removed)} removidos")
+    return entries
+
+
+def build_active_orders_payload(db, store_id: int) -> dict:
+    """
+    Payload de 'orders_initial' ({"store_id", "orders"}) a partir da projeção
+
+    Returns:
+        Dict com 'orders' já serializado (PreEncodedJSON)
+    """
+    pipe = redis_client.pipeline(transaction=True)
+    if pipe is None:
+        return _to_payload(store_id, _serialize_orders(db, store_id, _load_active_orders(db, store_id)))
+
+    try:
+        # Leitura atômica: flag + pedidos sujos (consumidos) + projeção atual
+        dirty_key = CacheKeys.admin_orders_projection_dirty(store_id)
+        pipe.exists(CacheKeys.admin_orders_projection_ready(store_id))
+        pipe.smembers(dirty_key)
+        pipe.delete(dirty_key)
+        pipe.hgetall(CacheKeys.admin_orders_projection(store_id))
+        ready, dirty, _, raw_entries = pipe.execute()
+
+        if not ready:
+            entries = _rebuild(db, store_id)
+        else:
+            entries = {int(order_id): value for order_id, value in raw_entries.items()}
+            if dirty:
+                dirty_ids = {int(order_id) for order_id in dirty}
+                try:
+                    entries = _apply_dirty(db, store_id, entries, dirty_ids)
+                except Exception:
+                    # Consumidos acima: voltam para o conjunto e a próxima leitura tenta de novo
+                    mark_orders_dirty((store_id, order_id) for order_id in dirty_ids)
+                    raise
+
+    except RedisError as e:
+        logger.error(f"❌ Erro na projeção de pedidos da loja {store_id}: {e}")
+        entries = _serialize_orders(db, store_id, _load_active_orders(db, store_id))
+
+    return _to_payload(store_id, entries)
+
+
+def mark_orders_dirty(changes: Iterable[tuple[int, int]]) -> None:
+    """Marca pedidos (store_id, order_id) para recarga na próxima leitura"""
+    by_store: dict[int, set[int]] = {}
+    for store_id, order_id in changes:
+        by_store.setdefault(store_id, set()).add(order_id)
+
+    if not by_store:
+        return
+
+    pipe = redis_client.pipeline(transaction=False)
+    if pipe is None:
+        return
+
+    try:
+        for store_id, order_ids in by_store.items():
+            dirty_key = CacheKeys.admin_orders_projection_dirty(store_id)
+            pipe.sadd(dirty_key, *order_ids)
+            pipe.expire(dirty_key, config.ORDERS_PROJECTION_TTL_SECONDS)
+        pipe.execute()
+    except RedisError as e:
+        logger.error(f"❌ Erro ao marcar pedidos na projeção: {e}")
+
+
+# ═══════════════════════════════════════════════════════════
+# EVENTOS DA SESSION (TODA ESCRITA EM PEDIDOS)
+# ═══════════════════════════════════════════════════════════
+
+def _order_ref(session: Session, obj) -> Optional[tuple[int, int]]:
+    if isinstance(obj, models.Order):
+        return (obj.store_id, obj.id) if obj.store_id and obj.id else None
+
+    if isinstance(obj, (models.OrderProduct, models.OrderPrintLog)) and obj.order_id:
+        store_id = getattr(obj, "store_id", None)
+        if not store_id:
+            # Sem query durante o flush: só resolve se o pedido já está na Session
+            order = session.identity_map.get(identity_key(models.Order, obj.order_id))
+            store_id = order.store_id if order is not None else None
+        return (store_id, obj.order_id) if store_id else None
+
+    return None
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_orders(session: Session, flush_context):
+    changed = session.info.setdefault(_SESSION_INFO_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        ref = _order_ref(session, obj)
+        if ref:
+            changed.add(ref)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changed_orders(session: Session):
+    changed = session.info.pop(_SESSION_INFO_KEY, None)
+    if changed:
+        mark_orders_dirty(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_orders(session: Session):
+    session.info.pop(_SESSION_INFO_KEY, None)
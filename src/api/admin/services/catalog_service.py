@@ -0,0 +1,47 @@
+# src/api/admin/services/catalog_service.py
+
+"""
+Catalog Service
+===============
+
+Leituras de produtos do cardápio compartilhadas entre módulos.
+
+- load_store_products: produtos da loja com a árvore completa do ProductOut
+  (vínculos com categorias, complementos, preços por tamanho) em 1 query
+  por relação, não por produto. Usado pelos deltas do cardápio
+  (catalog_sync) e pelo índice de preços do carrinho (live_cart)
+
+Autor: PDVix Team
+"""
+
+from sqlalchemy.orm import selectinload
+
+from src.core import models
+
+
+def load_store_products(db, store_id: int, product_ids: set[int]) -> dict[int, models.Product]:
+    """
+    Carrega os produtos da loja prontos para ProductOut
+
+    Produtos de outra loja (ou inexistentes) ficam de fora.
+
+    Returns:
+        {product_id: Product}
+    """
+    if not product_ids:
+        return {}
+
+    products = db.query(models.Product).options(
+        selectinload(models.Product.category_links).selectinload(models.ProductCategoryLink.category),
+        selectinload(models.Product.default_options),
+        selectinload(models.Product.variant_links)
+        .selectinload(models.ProductVariantLink.variant)
+        .selectinload(models.Variant.options)
+        .selectinload(models.VariantOption.linked_product),
+        selectinload(models.Product.prices).selectinload(models.FlavorPrice.size_option),
+    ).filter(
+        models.Product.store_id == store_id,
+        models.Product.id.in_(product_ids)
+    ).all()
+
+    return {p.id: p for p in products}
@@ -0,0 +1,535 @@
+# src/api/admin/services/daily_metrics_service.py
+
+"""
+Daily Metrics Rollup
+====================
+
+Rollup diário de vendas por loja (tabela store_daily_metrics), lido pelos
+serviços de dashboard e performance no lugar de agregações sobre 'orders'.
+
+Uma linha por (loja, dia UTC) com:
+- vendas concluídas (DELIVERED): quantidade, faturamento, cashback, descontos
+- quebras por hora, por método de pagamento e por tipo de pedido
+- contagem de pedidos por status
+- clientes novos (primeiro pedido na loja no dia) e recorrentes
+
+Atualização:
+- Todo commit que cria/altera/remove um pedido (status, valores, tipo,
+  pagamento, cliente) marca (loja, dia) como pendente (eventos da Session)
+- Antes de ler um intervalo, os dias pendentes da loja são recalculados
+  (1 agregação sobre os pedidos DAQUELE dia, numa sessão própria do
+  primário) — leitura sempre atual (lida da réplica, a defasagem fica no
+  orçamento da réplica)
+- refresh_daily_metrics_job drena as pendências periodicamente e
+  reconcile_daily_metrics_job recalcula os últimos dias todo dia (cobre
+  escritas fora da Session, ex: UPDATE em massa)
+- backfill_daily_metrics preenche o histórico (script scripts/backfill_daily_metrics.py)
+
+Recalcular o dia inteiro (em vez de somar deltas) mantém a linha
+idempotente: uma marcação repetida ou perdida nunca gera desvio permanente.
+
+Autor: PDVix Team
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import chain
+from typing import Iterable, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from src.core import models
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.config import config
+from src.core.database import get_db_manager
+from src.core.utils.enums import OrderStatus
+
+logger = logging.getLogger(__name__)
+
+_SESSION_INFO_KEY = "daily_metrics_dirty"
+
+# Campos do pedido que alteram o rollup
+_TRACKED_ORDER_FIELDS = (
+    "order_status",
+    "total_price",
+    "discounted_total_price",
+    "cashback_amount_generated",
+    "discount_amount",
+    "order_type",
+    "payment_method_id",
+    "customer_id",
+)
+
+
+def _day_bounds(day: date) -> tuple[datetime, datetime]:
+    """[início, fim) do dia em UTC"""
+    start = datetime.combine(day, time.min, tzinfo=timezone.utc)
+    return start, start + timedelta(days=1)
+
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _status_value(status) -> str:
+    return status.value if isinstance(status, OrderStatus) else str(status)
+
+
+# ═══════════════════════════════════════════════════════════
+# CÁLCULO DE UM DIA
+# ═══════════════════════════════════════════════════════════
+
+def compute_daily_metrics(db, store_id: int, day: date) -> Optional[dict]:
+    """
+    Agrega os pedidos de um dia da loja
+
+    Returns:
+        Valores da linha do rollup ou None se não houve pedidos no dia
+    """
+    start, end = _day_bounds(day)
+    in_day = (
+        models.Order.store_id == store_id,
+        models.Order.created_at >= start,
+        models.Order.created_at < end,
+    )
+    hour_expr = func.extract("hour", func.timezone("UTC", models.Order.created_at))
+
+    rows = db.query(
+        models.Order.order_status,
+        models.Order.order_type,
+        models.Order.payment_method_id,
+        hour_expr.label("hour"),
+        func.count(models.Order.id).label("count"),
+        func.coalesce(func.sum(models.Order.total_price), 0).label("total"),
+        func.coalesce(func.sum(models.Order.discounted_total_price), 0).label("revenue"),
+        func.coalesce(func.sum(models.Order.cashback_amount_generated), 0).label("cashback"),
+        func.coalesce(func.sum(models.Order.discount_amount), 0).label("discount"),
+    ).filter(*in_day).group_by(
+        models.Order.order_status,
+        models.Order.order_type,
+        models.Order.payment_method_id,
+        hour_expr,
+    ).all()
+
+    if not rows:
+        return None
+
+    values = {
+        "orders_count": 0,
+        "revenue": 0,
+        "gross_total": 0,
+        "cashback_total": 0,
+        "discount_total": 0,
+    }
+    by_hour = defaultdict(lambda: {"count": 0, "total": 0})
+    by_payment_method = defaultdict(lambda: {"count": 0, "total": 0, "revenue": 0})
+    by_order_type = defaultdict(lambda: {"count": 0, "total": 0, "revenue": 0, "cashback": 0})
+    status_counts = defaultdict(int)
+
+    for row in rows:
+        status_counts[_status_value(row.order_status)] += row.count
+
+        if _status_value(row.order_status) != OrderStatus.DELIVERED.value:
+            continue
+
+        values["orders_count"] += row.count
+        values["revenue"] += int(row.revenue)
+        values["gross_total"] += int(row.total)
+        values["cashback_total"] += int(row.cashback)
+        values["discount_total"] += int(row.discount)
+
+        hour = by_hour[str(int(row.hour))]
+        hour["count"] += row.count
+        hour["total"] += int(row.total)
+
+        if row.payment_method_id is not None:
+            method = by_payment_method[str(row.payment_method_id)]
+            method["count"] += row.count
+            method["total"] += int(row.total)
+            method["revenue"] += int(row.revenue)
+
+        order_type = by_order_type[row.order_type]
+        order_type["count"] += row.count
+        order_type["total"] += int(row.total)
+        order_type["revenue"] += int(row.revenue)
+        order_type["cashback"] += int(row.cashback)
+
+    # Clientes do dia: novos = primeiro pedido na loja caiu neste dia
+    day_customers = select(models.Order.customer_id).where(
+        *in_day, models.Order.customer_id.isnot(None)
+    ).distinct()
+
+    customers_count = db.query(func.count()).select_from(day_customers.subquery()).scalar() or 0
+
+    first_orders_in_day = db.query(models.Order.customer_id).filter(
+        models.Order.store_id == store_id,
+        models.Order.customer_id.in_(day_customers),
+    ).group_by(models.Order.customer_id).having(func.min(models.Order.created_at) >= start)
+
+    new_customers = db.query(func.count()).select_from(first_orders_in_day.subquery()).scalar() or 0
+
+    return {
+        **values,
+        "new_customers": new_customers,
+        "returning_customers": max(customers_count - new_customers, 0),
+        "by_hour": dict(by_hour),
+        "by_payment_method": dict(by_payment_method),
+        "by_order_type": dict(by_order_type),
+        "status_counts": dict(status_counts),
+    }
+
+
+def recompute_daily_metrics(db, store_id: int, day: date) -> None:
+    """Recalcula e grava (upsert) a linha do dia. Não faz commit."""
+    values = compute_daily_metrics(db, store_id, day)
+
+    if values is None:
+        db.query(models.StoreDailyMetrics).filter(
+            models.StoreDailyMetrics.store_id == store_id,
+            models.StoreDailyMetrics.day == day,
+        ).delete(synchronize_session=False)
+        return
+
+    values["updated_at"] = datetime.now(timezone.utc)
+    statement = pg_insert(models.StoreDailyMetrics).values(store_id=store_id, day=day, **values)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[models.StoreDailyMetrics.store_id, models.StoreDailyMetrics.day],
+        set_=values,
+    ))
+
+
+# ═══════════════════════════════════════════════════════════
+# DIAS PENDENTES
+# ═══════════════════════════════════════════════════════════
+
+def mark_days_dirty(changes: Iterable[tuple[int, date]]) -> None:
+    """Marca (store_id, dia) para recálculo"""
+    by_store: dict[int, set[str]] = defaultdict(set)
+    for store_id, day in changes:
+        by_store[store_id].add(day.isoformat())
+
+    if not by_store:
+        return
+
+    pipe = redis_client.pipeline(transaction=False)
+    if pipe is None:
+        return
+
+    try:
+        ttl = config.DAILY_METRICS_DIRTY_TTL_SECONDS
+        for store_id, days in by_store.items():
+            dirty_key = CacheKeys.daily_metrics_dirty(store_id)
+            pipe.sadd(dirty_key, *days)
+            pipe.expire(dirty_key, ttl)
+        pipe.sadd(CacheKeys.daily_metrics_dirty_stores(), *by_store.keys())
+        pipe.expire(CacheKeys.daily_metrics_dirty_stores(), ttl)
+        pipe.execute()
+    except RedisError as e:
+        logger.error(f"❌ Erro ao marcar dias do rollup diário: {e}")
+
+
+def _pop_dirty_days(store_id: int) -> Optional[set[date]]:
+    """Consome os dias pendentes da loja (None se Redis indisponível)"""
+    pipe = redis_client.pipeline(transaction=True)
+    if pipe is None:
+        return None
+
+    try:
+        dirty_key = CacheKeys.daily_metrics_dirty(store_id)
+        pipe.smembers(dirty_key)
+        pipe.delete(dirty_key)
+        pipe.srem(CacheKeys.daily_metrics_dirty_stores(), store_id)
+        members, _, _ = pipe.execute()
+    except RedisError as e:
+        logger.error(f"❌ Erro ao ler dias pendentes do rollup (loja {store_id}): {e}")
+        return None
+
+    return {date.fromisoformat(m.decode() if isinstance(m, bytes) else m) for m in members}
+
+
+def refresh_dirty_days(db, store_id: int) -> int:
+    """
+    Recalcula os dias pendentes da loja e faz commit
+
+    Sem Redis não há marcações: o dia de hoje é sempre recalculado
+    (os anteriores ficam com o job de reconciliação).
+
+    Returns:
+        Quantidade de dias recalculados
+    """
+    days = _pop_dirty_days(store_id)
+    if days is None:
+        days = {datetime.now(timezone.utc).date()}
+
+    if not days:
+        return 0
+
+    try:
+        for day in sorted(days):
+            recompute_daily_metrics(db, store_id, day)
+        db.commit()
+    except Exception as e:
+        logger.error(f"❌ Erro ao recalcular rollup diário da loja {store_id}: {e}", exc_info=True)
+        db.rollback()
+        # Devolve as marcações para a próxima tentativa
+        mark_days_dirty((store_id, day) for day in days)
+        return 0
+
+    return len(days)
+
+
+def list_dirty_stores(limit: int = 500) -> list[int]:
+    """Lojas com dias pendentes (para o job periódico)"""
+    pipe = redis_client.pipeline(transaction=False)
+    if pipe is None:
+        return []
+
+    try:
+        pipe.srandmember(CacheKeys.daily_metrics_dirty_stores(), limit)
+        (members,) = pipe.execute()
+    except RedisError as e:
+        logger.error(f"❌ Erro ao listar lojas pendentes do rollup: {e}")
+        return []
+
+    return [int(m) for m in members or []]
+
+
+# ═══════════════════════════════════════════════════════════
+# LEITURA
+# ═══════════════════════════════════════════════════════════
+
+def load_daily_metrics(
+        db,
+        store_id: int,
+        start_day: date,
+        end_day: date,
+        refresh: bool = True,
+) -> list[models.StoreDailyMetrics]:
+    """
+    Linhas do rollup no intervalo [start_day, end_day]
+
+    Args:
+        refresh: Recalcula antes os dias pendentes da loja (False quando
+            a mesma leitura já atualizou, ex: período de comparação)
+
+    O recálculo roda numa sessão própria do primário (commit e rollback
+    nunca atingem a sessão da requisição, que só lê). Com sessão da
+    réplica, a leitura segue na réplica (defasagem limitada por
+    READ_REPLICA_MAX_LAG_SECONDS).
+    """
+    if refresh:
+        with get_db_manager() as refresh_db:
+            refresh_dirty_days(refresh_db, store_id)
+
+    return db.query(models.StoreDailyMetrics).filter(
+        models.StoreDailyMetrics.store_id == store_id,
+        models.StoreDailyMetrics.day.between(start_day, end_day),
+    ).order_by(models.StoreDailyMetrics.day).all()
+
+
+def summarize_daily_metrics(rows: list[models.StoreDailyMetrics], order_type: Optional[str] = None) -> dict:
+    """
+    Soma as linhas do rollup
+
+    Com 'order_type', vendas/faturamento/cashback vêm só daquele tipo
+    (as quebras por hora e pagamento não são filtráveis por tipo).
+
+    Obs: 'returning_customers' é somado por dia (um cliente que voltou em
+    dois dias do intervalo conta duas vezes).
+    """
+    summary = {
+        "orders_count": 0,
+        "revenue": 0,
+        "gross_total": 0,
+        "cashback_total": 0,
+        "discount_total": 0,
+        "new_customers": 0,
+        "returning_customers": 0,
+        "by_hour": defaultdict(lambda: {"count": 0, "total": 0}),
+        "by_payment_method": defaultdict(lambda: {"count": 0, "total": 0, "revenue": 0}),
+        "by_order_type": defaultdict(lambda: {"count": 0, "total": 0, "revenue": 0, "cashback": 0}),
+        "status_counts": defaultdict(int),
+    }
+
+    for row in rows:
+        if order_type:
+            sales = (row.by_order_type or {}).get(order_type, {})
+            summary["orders_count"] += sales.get("count", 0)
+            summary["revenue"] += sales.get("revenue", 0)
+            summary["gross_total"] += sales.get("total", 0)
+            summary["cashback_total"] += sales.get("cashback", 0)
+        else:
+            summary["orders_count"] += row.orders_count
+            summary["revenue"] += row.revenue
+            summary["gross_total"] += row.gross_total
+            summary["cashback_total"] += row.cashback_total
+            summary["discount_total"] += row.discount_total
+
+        summary["new_customers"] += row.new_customers
+        summary["returning_customers"] += row.returning_customers
+
+        for source, target in (
+                (row.by_hour, summary["by_hour"]),
+                (row.by_payment_method, summary["by_payment_method"]),
+                (row.by_order_type, summary["by_order_type"]),
+        ):
+            for key, bucket in (source or {}).items():
+                for field, value in bucket.items():
+                    target[key][field] += value
+
+        for status, count in (row.status_counts or {}).items():
+            summary["status_counts"][status] += count
+
+    return summary
+
+
+def day_sales(row: models.StoreDailyMetrics, order_type: Optional[str] = None) -> dict:
+    """Vendas de uma linha (opcionalmente de um único tipo de pedido)"""
+    if order_type:
+        sales = (row.by_order_type or {}).get(order_type, {})
+        return {"count": sales.get("count", 0), "revenue": sales.get("revenue", 0), "total": sales.get("total", 0)}
+    return {"count": row.orders_count, "revenue": row.revenue, "total": row.gross_total}
+
+
+def payment_method_labels(db, payment_method_ids: Iterable[str | int]) -> dict[int, tuple[str, Optional[str]]]:
+    """activation_id -> (nome, icon_key) do método da plataforma"""
+    ids = {int(pm_id) for pm_id in payment_method_ids}
+    if not ids:
+        return {}
+
+    rows = db.query(
+        models.StorePaymentMethodActivation.id,
+        models.PlatformPaymentMethod.name,
+        models.PlatformPaymentMethod.icon_key,
+    ).join(
+        models.PlatformPaymentMethod, models.StorePaymentMethodActivation.platform_method
+    ).filter(models.StorePaymentMethodActivation.id.in_(ids)).all()
+
+    return {row.id: (row.name, row.icon_key) for row in rows}
+
+
+# ═══════════════════════════════════════════════════════════
+# RECONCILIAÇÃO E BACKFILL
+# ═══════════════════════════════════════════════════════════
+
+def _store_days_with_orders(db, start_day: date, end_day: date, store_id: Optional[int] = None) -> list[tuple[int, date]]:
+    utc_day = func.date(func.timezone("UTC", models.Order.created_at))
+    start, _ = _day_bounds(start_day)
+    _, end = _day_bounds(end_day)
+
+    query = db.query(models.Order.store_id, utc_day.label("day")).filter(
+        models.Order.created_at >= start,
+        models.Order.created_at < end,
+    )
+    if store_id is not None:
+        query = query.filter(models.Order.store_id == store_id)
+
+    return [(row.store_id, row.day) for row in query.distinct().all()]
+
+
+def reconcile_daily_metrics(db, days: int) -> int:
+    """
+    Recalcula os últimos 'days' dias de todas as lojas (com commit por loja)
+
+    Inclui linhas existentes sem pedidos (são removidas).
+
+    Returns:
+        Quantidade de dias recalculados
+    """
+    end_day = datetime.now(timezone.utc).date()
+    start_day = end_day - timedelta(days=max(days, 1) - 1)
+
+    pairs = set(_store_days_with_orders(db, start_day, end_day))
+    pairs.update(
+        (row.store_id, row.day)
+        for row in db.query(models.StoreDailyMetrics.store_id, models.StoreDailyMetrics.day).filter(
+            models.StoreDailyMetrics.day.between(start_day, end_day)
+        )
+    )
+
+    return _recompute_pairs(db, pairs)
+
+
+def backfill_daily_metrics(db, store_id: Optional[int] = None, since: Optional[date] = None) -> int:
+    """
+    Preenche o rollup a partir do histórico de pedidos
+
+    Args:
+        store_id: Apenas uma loja (padrão: todas)
+        since: Primeiro dia (padrão: primeiro pedido existente)
+
+    Returns:
+        Quantidade de dias gravados
+    """
+    if since is None:
+        first_order = db.query(func.min(models.Order.created_at))
+        if store_id is not None:
+            first_order = first_order.filter(models.Order.store_id == store_id)
+        first_order_at = first_order.scalar()
+        if first_order_at is None:
+            return 0
+        since = _utc_day(first_order_at)
+
+    pairs = _store_days_with_orders(db, since, datetime.now(timezone.utc).date(), store_id)
+    return _recompute_pairs(db, pairs)
+
+
+def _recompute_pairs(db, pairs: Iterable[tuple[int, date]]) -> int:
+    by_store: dict[int, list[date]] = defaultdict(list)
+    for store_id, day in pairs:
+        by_store[store_id].append(day)
+
+    total = 0
+    for store_id, days in by_store.items():
+        try:
+            for day in sorted(days):
+                recompute_daily_metrics(db, store_id, day)
+            db.commit()
+            total += len(days)
+        except Exception as e:
+            logger.error(f"❌ Erro ao recalcular rollup diário da loja {store_id}: {e}", exc_info=True)
+            db.rollback()
+
+    return total
+
+
+# ═══════════════════════════════════════════════════════════
+# EVENTOS DA SESSION (TRANSIÇÕES DE PEDIDOS)
+# ═══════════════════════════════════════════════════════════
+
+def _order_changed(order: models.Order) -> bool:
+    return any(get_history(order, field).has_changes() for field in _TRACKED_ORDER_FIELDS)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_days(session: Session, flush_context):
+    changed = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, models.Order) or not obj.store_id or obj.created_at is None:
+            continue
+        if obj in session.dirty and not _order_changed(obj):
+            continue
+
+        if changed is None:
+            changed = session.info.setdefault(_SESSION_INFO_KEY, set())
+        changed.add((obj.store_id, _utc_day(obj.created_at)))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changed_days(session: Session):
+    changed = session.info.pop(_SESSION_INFO_KEY, None)
+    if changed:
+        mark_days_dirty(changed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_days(session: Session):
+    session.info.pop(_SESSION_INFO_KEY, None)
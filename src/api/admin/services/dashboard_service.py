@@ -1,9 +1,16 @@
 # src/api/admin/services/dashboard_service.py (VERSÃO CORRIGIDA)
 
+from collections import defaultdict
 from datetime import date, timedelta, datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import case, func, extract
 
+from src.api.admin.services.daily_metrics_service import (
+    day_sales,
+    load_daily_metrics,
+    payment_method_labels,
+    summarize_daily_metrics,
+)
 from src.core import models
 from src.api.schemas.analytics.dashboard import (
     DashboardDataSchema,
@@ -40,57 +47,40 @@ def get_dashboard_data_for_period(db: Session, store_id: int, start_date: date,
     if order_type:
         base_order_filter = (*base_order_filter, models.Order.order_type == order_type)
 
-    # --- 1. Cálculo dos KPIs (Esta parte já estava correta) ---
-    kpi_query = db.query(
-        func.coalesce(func.sum(models.Order.discounted_total_price), 0).label("total_revenue"),
-        func.count(models.Order.id).label("transaction_count"),
-        func.coalesce(func.sum(models.Order.cashback_amount_generated), 0).label("total_cashback")
-    ).filter(*base_order_filter).first()
+    # ✅ Totais, clientes e séries vêm do rollup diário (store_daily_metrics):
+    # poucas linhas por período em vez de varrer a tabela de pedidos
+    start_day, end_day = start_date.date(), end_date.date()
+    period_duration = (end_day - start_day).days
+    previous_start_day = start_day - timedelta(days=period_duration + 1)
+    previous_end_day = start_day - timedelta(days=1)
+
+    current_rows = load_daily_metrics(db, store_id, start_day, end_day)
+    current = summarize_daily_metrics(current_rows, order_type)
+    previous = summarize_daily_metrics(
+        load_daily_metrics(db, store_id, previous_start_day, previous_end_day, refresh=False), order_type
+    )
 
-    current_revenue = kpi_query.total_revenue
-    transaction_count = kpi_query.transaction_count
-    total_cashback = kpi_query.total_cashback
+    # --- 1. Cálculo dos KPIs ---
+    current_revenue = current["revenue"]
+    transaction_count = current["orders_count"]
+    total_cashback = current["cashback_total"]
     average_ticket = (current_revenue / transaction_count) if transaction_count > 0 else 0.0
 
-    first_order_subquery = db.query(
-        models.Order.customer_id,
-        func.min(models.Order.created_at).label("first_order_date")
-    ).filter(models.Order.store_id == store_id).group_by(models.Order.customer_id).subquery()
-
-    new_customers_count = db.query(func.count(first_order_subquery.c.customer_id)).filter(
-        first_order_subquery.c.first_order_date.between(start_date, end_date)
-    ).scalar() or 0
-
-    order_count_per_customer_subquery = (
-        db.query(
-            models.Order.customer_id,
-            func.count(models.Order.id).label("order_count")
-        )
-        .filter(models.Order.store_id == store_id)
-        .group_by(models.Order.customer_id)
-        .subquery()
-    )
+    new_customers_count = current["new_customers"]
 
-    returning_customers_count = db.query(func.count(order_count_per_customer_subquery.c.customer_id)).filter(
-        order_count_per_customer_subquery.c.order_count > 1
-    ).scalar() or 0
+    # Retenção sobre a base de clientes da loja (store_customers, sem varrer pedidos)
+    customer_counts = db.query(
+        func.count(models.StoreCustomer.customer_id).label("total"),
+        func.count(case((models.StoreCustomer.total_orders > 1, 1))).label("returning"),
+    ).filter(models.StoreCustomer.store_id == store_id).one()
 
-    total_store_customers_count = db.query(func.count(order_count_per_customer_subquery.c.customer_id)).scalar() or 0
+    total_store_customers_count = customer_counts.total or 0
+    returning_customers_count = customer_counts.returning or 0
 
     retention_rate = (
                                  returning_customers_count / total_store_customers_count) * 100 if total_store_customers_count > 0 else 0.0
 
-    period_duration = (end_date.date() - start_date.date()).days
-    previous_start_date = start_date - timedelta(days=period_duration + 1)
-    previous_end_date = start_date - timedelta(days=1)
-
-    previous_revenue = db.query(
-        func.coalesce(func.sum(models.Order.discounted_total_price), 0)
-    ).filter(
-        models.Order.store_id == store_id,
-        models.Order.created_at.between(previous_start_date, previous_end_date),
-        models.Order.order_status == OrderStatus.DELIVERED
-    ).scalar()
+    previous_revenue = previous["revenue"]
 
     if previous_revenue > 0:
         revenue_change_percentage = ((current_revenue - previous_revenue) / previous_revenue) * 100
@@ -109,22 +99,21 @@ def get_dashboard_data_for_period(db: Session, store_id: int, start_date: date,
         retention_rate=retention_rate,
     )
 
-    # --- 2. DADOS PARA O GRÁFICO DE NOVOS CLIENTES POR MÊS (Esta parte já estava correta) ---
-    six_months_ago = end_date.date() - timedelta(days=180)
-
-    first_order_monthly_subquery = db.query(
-        models.Order.customer_id,
-        func.min(models.Order.created_at).label("first_order_date")
-    ).filter(models.Order.store_id == store_id).group_by(models.Order.customer_id).subquery()
+    # --- 2. DADOS PARA O GRÁFICO DE NOVOS CLIENTES POR MÊS ---
+    six_months_ago = end_day - timedelta(days=180)
 
     monthly_customers_data = (
         db.query(
-            extract('year', first_order_monthly_subquery.c.first_order_date).label('year'),
-            extract('month', first_order_monthly_subquery.c.first_order_date).label('month'),
-            func.count(first_order_monthly_subquery.c.customer_id).label('count')
+            extract('year', models.StoreDailyMetrics.day).label('year'),
+            extract('month', models.StoreDailyMetrics.day).label('month'),
+            func.sum(models.StoreDailyMetrics.new_customers).label('count')
+        )
+        .filter(
+            models.StoreDailyMetrics.store_id == store_id,
+            models.StoreDailyMetrics.day >= six_months_ago,
         )
-        .filter(first_order_monthly_subquery.c.first_order_date >= six_months_ago)
         .group_by('year', 'month')
+        .having(func.sum(models.StoreDailyMetrics.new_customers) > 0)
         .order_by('year', 'month')
         .all()
     )
@@ -134,21 +123,15 @@ def get_dashboard_data_for_period(db: Session, store_id: int, start_date: date,
                  11: "Nov", 12: "Dez"}
     for year, month, count in monthly_customers_data:
         new_customers_over_time.append(
-            MonthlyDataPoint(month=month_map.get(month, '?'), count=count)
+            MonthlyDataPoint(month=month_map.get(int(month), '?'), count=int(count))
         )
 
-    # --- 3. Dados para o Gráfico de Vendas (Esta parte já estava correta) ---
-    sales_over_time_query = db.query(
-        func.date(models.Order.created_at).label("period"),
-        func.coalesce(func.sum(models.Order.discounted_total_price), 0).label("revenue")
-    ).filter(*base_order_filter).group_by(
-        func.date(models.Order.created_at)
-    ).order_by(func.date(models.Order.created_at)).all()
-
-    sales_over_time = [
-        SalesDataPointSchema(period=row.period, revenue=row.revenue / 100)
-        for row in sales_over_time_query
-    ]
+    # --- 3. Dados para o Gráfico de Vendas ---
+    sales_over_time = []
+    for row in current_rows:
+        sales = day_sales(row, order_type)
+        if sales["count"]:
+            sales_over_time.append(SalesDataPointSchema(period=row.day, revenue=sales["revenue"] / 100))
 
     # --- 4. Top 5 Produtos e Categorias (Esta parte já estava correta) ---
     top_products_query = db.query(
@@ -194,17 +177,45 @@ def get_dashboard_data_for_period(db: Session, store_id: int, start_date: date,
     top_categories = [TopItemSchema(name=row.name, count=row.count, revenue=row.revenue / 100) for row in
                       top_categories_query]
 
-    order_type_query = db.query(
-        models.Order.order_type,
-        func.count(models.Order.id).label("count")
-    ).filter(*base_order_filter).group_by(models.Order.order_type).all()
-
     order_type_distribution = [
-        OrderTypeSummarySchema(order_type=row.order_type, count=row.count)
-        for row in order_type_query
+        OrderTypeSummarySchema(order_type=type_name, count=bucket["count"])
+        for type_name, bucket in current["by_order_type"].items()
+        if bucket["count"] and (not order_type or type_name == order_type)
     ]
 
-    # --- 5. Resumo por Método de Pagamento (✅ SEÇÃO CORRIGIDA) ---
+    # --- 5. Resumo por Método de Pagamento ---
+    if order_type:
+        # O rollup não cruza pagamento x tipo de pedido: consulta direta
+        payment_methods = _payment_methods_from_orders(db, base_order_filter)
+    else:
+        labels = payment_method_labels(db, current["by_payment_method"].keys())
+        totals_by_name = defaultdict(int)
+        for pm_id, bucket in current["by_payment_method"].items():
+            name = labels.get(int(pm_id), ("?", None))[0]
+            totals_by_name[name] += bucket["revenue"]
+
+        payment_methods = [
+            PaymentMethodSummarySchema(method_name=name, total_amount=total / 100)
+            for name, total in totals_by_name.items()
+        ]
+
+    # --- Monta a Resposta Final ---
+    return DashboardDataSchema(
+        kpis=kpis,
+        sales_over_time=sales_over_time,
+        top_products=top_products,
+        top_categories=top_categories,
+        payment_methods=payment_methods,
+        new_customers_over_time=new_customers_over_time,
+        user_cards=[],
+        currency_balances=[],
+        top_product_by_revenue=top_product_by_revenue,
+        order_type_distribution=order_type_distribution,
+    )
+
+
+def _payment_methods_from_orders(db: Session, base_order_filter: tuple) -> list[PaymentMethodSummarySchema]:
+    """Resumo por método de pagamento direto dos pedidos (filtro por tipo de pedido)"""
     payment_methods_query = db.query(
         models.PlatformPaymentMethod.name.label("method_name"),
         func.coalesce(func.sum(models.Order.discounted_total_price), 0).label("total_amount")
@@ -218,21 +229,7 @@ def get_dashboard_data_for_period(db: Session, store_id: int, start_date: date,
         models.PlatformPaymentMethod.name
     ).all()
 
-    payment_methods = [
+    return [
         PaymentMethodSummarySchema(method_name=row.method_name, total_amount=row.total_amount / 100)
         for row in payment_methods_query
     ]
-
-    # --- Monta a Resposta Final ---
-    return DashboardDataSchema(
-        kpis=kpis,
-        sales_over_time=sales_over_time,
-        top_products=top_products,
-        top_categories=top_categories,
-        payment_methods=payment_methods,
-        new_customers_over_time=new_customers_over_time,
-        user_cards=[],
-        currency_balances=[],
-        top_product_by_revenue=top_product_by_revenue,
-        order_type_distribution=order_type_distribution,
-    )
\ No newline at end of file
@@ -8,6 +8,11 @@ from sqlalchemy import and_, case, func
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import aliased # ✅ Adicione este import
 
+from src.api.admin.services.daily_metrics_service import (
+    load_daily_metrics,
+    payment_method_labels,
+    summarize_daily_metrics,
+)
 from src.core import models
 from src.core.utils.enums import OrderStatus
 from src.api.schemas.analytics.performance import (
@@ -31,6 +36,11 @@ def _to_real(value: Optional[int | float]) -> float:
     return float((value or 0) / 100)
 
 
+def _hour_floor(value: datetime) -> datetime:
+    """Início da hora (granularidade de product_view_hourly)."""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
 def _build_comparative_metric(current, previous) -> ComparativeMetricSchema:
     """Cria métrica comparativa com % de variação (prev > 0)."""
     current = float(current or 0.0)
@@ -44,37 +54,22 @@ def _time_range_for_day(target: date) -> Tuple[datetime, datetime]:
     return datetime.combine(target, time.min), datetime.combine(target, time.max)
 
 
-def _orders_base_query(
-    db: Session,
-    store_id: int,
-    start_dt: datetime,
-    end_dt: datetime,
-    status: Optional[str] = None,
-):
-    """Query base de pedidos por loja e intervalo, com status opcional."""
-    q = db.query(models.Order).filter(
-        models.Order.store_id == store_id,
-        models.Order.created_at.between(start_dt, end_dt),
-    )
-    if status:
-        q = q.filter(models.Order.order_status == status)
-    return q
-
-
 # ------------- Blocos de cálculo -------------
 
 
 def _calc_sales_and_profit(
         db: Session,
         store_id: int,
+        current: dict,
+        previous: dict,
         start_current: datetime,
         end_current: datetime,
         start_previous: datetime,
         end_previous: datetime,
 ) -> Tuple[DailySummarySchema, ComparativeMetricSchema]:
     """
-    Agregações de vendas e lucro bruto, agora tratando o caso de não haver
-    pedidos no período e buscando o custo do lugar certo.
+    Vendas e ticket vêm do rollup diário; o lucro bruto (custo por item)
+    ainda é agregado a partir dos itens dos pedidos.
     """
     COMPLETED = OrderStatus.DELIVERED.value
     pcl = aliased(models.ProductCategoryLink)
@@ -87,17 +82,8 @@ def _calc_sales_and_profit(
 
     agg = (
         db.query(
-            func.sum(case((models.Order.created_at.between(start_current, end_current), models.Order.total_price),
-                          else_=0)).label("current_total_value"),
-            func.count(
-                case((models.Order.created_at.between(start_current, end_current), models.Order.id), else_=None)).label(
-                "current_sales_count"),
             func.sum(case((models.Order.created_at.between(start_current, end_current), gross_expr), else_=0)).label(
                 "current_gross_profit"),
-            func.sum(case((models.Order.created_at.between(start_previous, end_previous), models.Order.total_price),
-                          else_=0)).label("previous_total_value"),
-            func.count(case((models.Order.created_at.between(start_previous, end_previous), models.Order.id),
-                            else_=None)).label("previous_sales_count"),
             func.sum(case((models.Order.created_at.between(start_previous, end_previous), gross_expr), else_=0)).label(
                 "previous_gross_profit"),
         )
@@ -115,13 +101,11 @@ def _calc_sales_and_profit(
         .first()
     )
 
-    # ✅ A MÁGICA ESTÁ AQUI:
-    # Mesmo que a query não retorne nada e 'agg' seja None,
-    # o getattr com um valor padrão (0) garante que nunca teremos um erro.
-    current_total_value = _to_real(getattr(agg, "current_total_value", 0))
-    previous_total_value = _to_real(getattr(agg, "previous_total_value", 0))
-    current_sales_count = int(getattr(agg, "current_sales_count", 0) or 0)
-    previous_sales_count = int(getattr(agg, "previous_sales_count", 0) or 0)
+    current_total_value = _to_real(current["gross_total"])
+    previous_total_value = _to_real(previous["gross_total"])
+    current_sales_count = current["orders_count"]
+    previous_sales_count = previous["orders_count"]
+    # Mesmo sem pedidos no período ('agg' None), o getattr garante 0
     current_gross_profit = _to_real(getattr(agg, "current_gross_profit", 0))
     previous_gross_profit = _to_real(getattr(agg, "previous_gross_profit", 0))
 
@@ -135,116 +119,52 @@ def _calc_sales_and_profit(
     )
     gross_profit = _build_comparative_metric(current_gross_profit, previous_gross_profit)
 
-    # ✅ A função SEMPRE chegará aqui e retornará a tupla, nunca None.
     return summary, gross_profit
 
 
-def _calc_customer_analytics(
-        db: Session,
-        store_id: int,
-        start_current: datetime,
-        end_current: datetime,
-        start_previous: datetime,
-        end_previous: datetime,
-) -> CustomerAnalyticsSchema:
+def _calc_customer_analytics(current: dict, previous: dict) -> CustomerAnalyticsSchema:
     """
-    Calcula novos vs recorrentes para os períodos atual e comparativo.
-    """
-
-    def _period_counts(start_dt: datetime, end_dt: datetime) -> Tuple[int, int]:
-        """Helper que calcula as contagens para um único intervalo de datas."""
-
-        # 1. Pega os IDs únicos de todos os clientes que fizeram pedidos no período
-        customer_ids_in_period = {
-            row.customer_id
-            for row in db.query(models.Order.customer_id)
-            .filter(
-                models.Order.store_id == store_id,
-                # ✅ ALTERADO: Usa o intervalo de datas em vez de um único dia
-                models.Order.created_at.between(start_dt, end_dt),
-                models.Order.customer_id.isnot(None),
-            )
-            .distinct()
-            .all()
-        }
-
-        if not customer_ids_in_period:
-            return 0, 0
-
-        # 2. Desses clientes, conta quantos foram 'criados' (fizeram a primeira compra) dentro do mesmo período
-        new_customers_count = (
-                db.query(func.count(models.StoreCustomer.customer_id))
-                .filter(
-                    models.StoreCustomer.store_id == store_id,
-                    models.StoreCustomer.customer_id.in_(customer_ids_in_period),
-                    # ✅ ALTERADO: Verifica se a data de criação está no intervalo
-                    models.StoreCustomer.created_at.between(start_dt, end_dt),
-                )
-                .scalar()
-                or 0
-        )
-
-        returning_customers_count = max(len(customer_ids_in_period) - new_customers_count, 0)
-        return new_customers_count, returning_customers_count
-
-    # Calcula para o período atual
-    current_new, current_returning = _period_counts(start_current, end_current)
-    # Calcula para o período anterior
-    previous_new, previous_returning = _period_counts(start_previous, end_previous)
+    Novos vs recorrentes (rollup diário) para os períodos atual e comparativo.
 
-    # Monta a resposta final com a comparação
+    Novo = primeiro pedido na loja dentro do período; recorrentes são
+    contados por dia.
+    """
     return CustomerAnalyticsSchema(
-        new_customers=_build_comparative_metric(current_new, previous_new),
-        returning_customers=_build_comparative_metric(current_returning, previous_returning),
+        new_customers=_build_comparative_metric(current["new_customers"], previous["new_customers"]),
+        returning_customers=_build_comparative_metric(
+            current["returning_customers"], previous["returning_customers"]
+        ),
     )
 
-def _sales_by_hour(
-    db: Session, store_id: int, start_dt: datetime, end_dt: datetime
-) -> list[SalesByHourSchema]:
-    COMPLETED = OrderStatus.DELIVERED.value
-    rows = (
-        _orders_base_query(db, store_id, start_dt, end_dt, COMPLETED)
-        .with_entities(
-            func.extract("hour", models.Order.created_at).label("hour"),
-            func.sum(models.Order.total_price).label("total_value"),
-        )
-        .group_by("hour")
-        .order_by("hour")
-        .all()
-    )
-    return [SalesByHourSchema(hour=int(r.hour), totalValue=_to_real(r.total_value)) for r in rows]
+def _sales_by_hour(current: dict) -> list[SalesByHourSchema]:
+    return [
+        SalesByHourSchema(hour=int(hour), totalValue=_to_real(bucket["total"]))
+        for hour, bucket in sorted(current["by_hour"].items(), key=lambda item: int(item[0]))
+    ]
 
 
-def _payment_methods(
-    db: Session, store_id: int, start_dt: datetime, end_dt: datetime
-) -> list[PaymentMethodSummarySchema]:
+def _payment_methods(db: Session, current: dict) -> list[PaymentMethodSummarySchema]:
     """
-    Soma por método de pagamento (nome e ícone da plataforma).
-    Mantém os joins conforme seu modelo (Order -> payment_method -> platform_method).
+    Soma por método de pagamento (nome e ícone da plataforma), a partir do
+    rollup diário (chaveado pela ativação do método na loja).
     """
-    COMPLETED = OrderStatus.DELIVERED.value
+    labels = payment_method_labels(db, current["by_payment_method"].keys())
+
+    grouped: dict[tuple, dict] = {}
+    for pm_id, bucket in current["by_payment_method"].items():
+        label = labels.get(int(pm_id), ("?", None))
+        totals = grouped.setdefault(label, {"total": 0, "count": 0})
+        totals["total"] += bucket["total"]
+        totals["count"] += bucket["count"]
 
-    rows = (
-        _orders_base_query(db, store_id, start_dt, end_dt, COMPLETED)
-        .join(models.Order.payment_method)  # relacionamento esperado
-        .join(models.StorePaymentMethodActivation.platform_method)
-        .with_entities(
-            models.PlatformPaymentMethod.name.label("name"),
-            models.PlatformPaymentMethod.icon_key.label("icon_key"),
-            func.sum(models.Order.total_price).label("total_value"),
-            func.count(models.Order.id).label("count"),
-        )
-        .group_by(models.PlatformPaymentMethod.name, models.PlatformPaymentMethod.icon_key)
-        .all()
-    )
     return [
         PaymentMethodSummarySchema(
-            method_name=r.name,
-            method_icon=r.icon_key,
-            total_value=_to_real(r.total_value),
-            transaction_count=int(r.count or 0),
+            method_name=name,
+            method_icon=icon_key,
+            total_value=_to_real(totals["total"]),
+            transaction_count=int(totals["count"]),
         )
-        for r in rows
+        for (name, icon_key), totals in grouped.items()
     ]
 
 
@@ -282,16 +202,8 @@ def _top_products(
     ]
 
 
-def _order_status_counts(
-    db: Session, store_id: int, start_dt: datetime, end_dt: datetime
-) -> OrderStatusCountSchema:
-    rows = (
-        _orders_base_query(db, store_id, start_dt, end_dt)
-        .with_entities(models.Order.order_status, func.count(models.Order.id).label("count"))
-        .group_by(models.Order.order_status)
-        .all()
-    )
-    counts = {r.order_status: int(r.count or 0) for r in rows}
+def _order_status_counts(current: dict) -> OrderStatusCountSchema:
+    counts = current["status_counts"]
     return OrderStatusCountSchema(
         concluidos=counts.get(OrderStatus.DELIVERED.value, 0),
         cancelados=counts.get(OrderStatus.CANCELED.value, 0),
@@ -444,19 +356,20 @@ def _product_sales_funnel(
     sales_data = {row.id: row for row in sales_results}
 
     # 2. Obter dados de VISUALIZAÇÕES de produtos no período
+    # ✅ Contadores por hora (product_view_hourly) em vez de contar cada visualização
     view_results = (
         db.query(
-            models.ProductView.product_id,
-            func.count(models.ProductView.id).label("view_count"),
+            models.ProductViewHourly.product_id,
+            func.sum(models.ProductViewHourly.views).label("view_count"),
         )
         .filter(
-            models.ProductView.store_id == store_id,
-            models.ProductView.viewed_at.between(start_dt, end_dt),
+            models.ProductViewHourly.store_id == store_id,
+            models.ProductViewHourly.hour.between(_hour_floor(start_dt), end_dt),
         )
-        .group_by(models.ProductView.product_id)
+        .group_by(models.ProductViewHourly.product_id)
         .all()
     )
-    views_data = {row.product_id: row.view_count for row in view_results}
+    views_data = {row.product_id: int(row.view_count) for row in view_results}
 
     # 3. Combinar os dados em Python
     funnel_list = []
@@ -528,34 +441,19 @@ def get_today_summary(db: Session, store_id: int) -> TodaySummarySchema:
 
 
 
-def _get_daily_trend(db: Session, store_id: int, start_dt: datetime, end_dt: datetime) -> list[DailyTrendPointSchema]:
-    COMPLETED = OrderStatus.DELIVERED.value
-
-    # Query principal que agrupa os pedidos por dia
-    daily_sales = db.query(
-        func.date(models.Order.created_at).label("day"),
-        func.count(models.Order.id).label("sales_count"),
-        func.sum(models.Order.total_price).label("total_value")
-    ).filter(
-        models.Order.store_id == store_id,
-        models.Order.order_status == COMPLETED,
-        models.Order.created_at.between(start_dt, end_dt)
-    ).group_by(func.date(models.Order.created_at)).all()
-
-    # (Lógica para novos clientes por dia - pode ser otimizada depois)
-    # Por enquanto, vamos focar nas métricas de vendas.
-
+def _get_daily_trend(rows: list[models.StoreDailyMetrics]) -> list[DailyTrendPointSchema]:
     trend_points = []
-    for row in daily_sales:
-        count = row.sales_count or 0
-        value = _to_real(row.total_value)
-        ticket = (value / count) if count > 0 else 0.0
+    for row in rows:
+        count = row.orders_count
+        if not count:
+            continue
+        value = _to_real(row.gross_total)
         trend_points.append(DailyTrendPointSchema(
             date=row.day,
             sales_count=count,
             total_value=value,
-            average_ticket=ticket,
-            new_customers=0  # Placeholder por enquanto
+            average_ticket=value / count,
+            new_customers=row.new_customers,
         ))
 
     return trend_points
@@ -575,19 +473,26 @@ def get_store_performance_for_date(db: Session, store_id: int, start_date: date,
     start_previous, end_previous = _time_range_for_day(comparison_start_date)[0], _time_range_for_day(comparison_end_date)[1]
 
 
+    # ✅ Rollup diário (store_daily_metrics): poucas linhas em vez de varrer pedidos
+    current_rows = load_daily_metrics(db, store_id, start_date, end_date)
+    current = summarize_daily_metrics(current_rows)
+    previous = summarize_daily_metrics(
+        load_daily_metrics(db, store_id, comparison_start_date, comparison_end_date, refresh=False)
+    )
+
     # 1) Vendas / Ticket / Lucro
     summary, gross_profit = _calc_sales_and_profit(
-        db, store_id, start_current, end_current, start_previous, end_previous
+        db, store_id, current, previous, start_current, end_current, start_previous, end_previous
     )
 
     # 2) Clientes
-    customer_analytics = _calc_customer_analytics(db, store_id, start_current, end_current, start_previous, end_previous)
+    customer_analytics = _calc_customer_analytics(current, previous)
 
     # 3) Gráficos e breakdowns do dia atual
-    sales_by_hour = _sales_by_hour(db, store_id, start_current, end_current)
-    payment_methods = _payment_methods(db, store_id, start_current, end_current)
+    sales_by_hour = _sales_by_hour(current)
+    payment_methods = _payment_methods(db, current)
     top_selling_products = _top_products(db, store_id, start_current, end_current)
-    order_status_counts = _order_status_counts(db, store_id, start_current, end_current)
+    order_status_counts = _order_status_counts(current)
     top_selling_addons = _top_addons(db, store_id, start_current, end_current)
     coupon_performance = _coupon_performance(db, store_id, start_current, end_current)
 
@@ -595,7 +500,7 @@ def get_store_performance_for_date(db: Session, store_id: int, start_date: date,
 
     product_funnel = _product_sales_funnel(db, store_id, start_current, end_current)
 
-    daily_trend = _get_daily_trend(db, store_id, start_current, end_current)
+    daily_trend = _get_daily_trend(current_rows)
 
     return StorePerformanceSchema(
         query_date=end_date,  # Podemos usar a data final como referência
@@ -0,0 +1,228 @@
+# src/api/admin/services/product_view_ingestion.py
+
+"""
+Product View Ingestion
+======================
+
+Gravação em lote das visualizações de produtos (POST /products/{id}/view).
+
+Problema: cada visualização era um INSERT + COMMIT na requisição. É a
+escrita mais frequente do cardápio e, no pico, ocupava conexões do pool
+que os pedidos precisam.
+
+Como funciona:
+- A rota só anexa (loja, produto, horário) a um buffer em memória do worker
+- Uma thread grava o buffer a cada PRODUCT_VIEW_FLUSH_INTERVAL_MS, ou antes
+  ao acumular PRODUCT_VIEW_FLUSH_BATCH_SIZE visualizações:
+  1 transação = INSERT multi-linhas em 'product_views' + upsert dos
+  contadores por hora em 'product_view_hourly'
+- Contrapressão: com o buffer cheio (PRODUCT_VIEW_BUFFER_CAPACITY, ex: banco
+  fora do ar) a visualização é recusada e a rota responde 429
+- Falha na gravação devolve o lote ao buffer (até a capacidade)
+- No shutdown o buffer é gravado antes de fechar o banco
+
+Visualizações ainda no buffer (no máximo um intervalo) não aparecem no
+funil; se o worker morrer, elas se perdem — aceitável para uma métrica.
+
+Métricas (/monitoring/metrics → product_views).
+
+Autor: PDVix Team
+"""
+
+import logging
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+
+from src.core import models
+from src.core.config import config
+from src.core.database import get_db_manager
+from src.core.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# (store_id, product_id, customer_id, viewed_at)
+ProductViewEntry = tuple[int, int, Optional[int], datetime]
+
+
+class ProductViewBuffer:
+    """
+    ✅ Buffer de visualizações com gravação periódica em lote
+    """
+
+    def __init__(self, capacity: int = 20000, batch_size: int = 1000, flush_interval_ms: int = 1000):
+        self.capacity = capacity
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval_seconds = max(flush_interval_ms, 10) / 1000
+
+        self._buffer: deque[ProductViewEntry] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, store_id: int, product_id: int, customer_id: Optional[int] = None) -> bool:
+        """
+        Enfileira uma visualização
+
+        Returns:
+            False se o buffer estiver cheio (a visualização NÃO foi registrada)
+        """
+        self._ensure_started()
+
+        with self._lock:
+            if len(self._buffer) >= self.capacity:
+                size = None
+            else:
+                self._buffer.append((store_id, product_id, customer_id, datetime.now(timezone.utc)))
+                size = len(self._buffer)
+
+        if size is None:
+            metrics.track_product_views("rejected")
+            self._wakeup.set()
+            return False
+
+        metrics.track_product_views("buffered")
+        if size >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    # ───────────────────────────────────────────────────────────
+    # THREAD DE GRAVAÇÃO
+    # ───────────────────────────────────────────────────────────
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None or self._stopping.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="product-view-flusher", daemon=True)
+                self._thread.start()
+                logger.info("✅ Gravação em lote de visualizações iniciada")
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval_seconds)
+            self._wakeup.clear()
+            self.flush()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para a thread e grava o que restou no buffer (shutdown)"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        flushed = self.flush()
+        if flushed:
+            logger.info(f"💾 {flushed} visualização(ões) pendente(s) gravada(s) no shutdown")
+
+    # ───────────────────────────────────────────────────────────
+    # GRAVAÇÃO
+    # ───────────────────────────────────────────────────────────
+
+    def flush(self) -> int:
+        """
+        Grava o buffer em lotes de até batch_size
+
+        Returns:
+            Quantidade de visualizações gravadas
+        """
+        total = 0
+        while True:
+            with self._lock:
+                if not self._buffer:
+                    break
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+
+            try:
+                total += self._write_batch(batch)
+            except Exception as e:
+                logger.error(f"❌ Erro ao gravar {len(batch)} visualização(ões): {e}", exc_info=True)
+                self._requeue(batch)
+                break
+
+        return total
+
+    def _write_batch(self, batch: list[ProductViewEntry]) -> int:
+        with get_db_manager() as db:
+            try:
+                self._insert(db, batch)
+                db.commit()
+            except IntegrityError:
+                # Produto removido entre o registro e a gravação: descarta só ele
+                db.rollback()
+                batch = self._without_removed_products(db, batch)
+                if batch:
+                    self._insert(db, batch)
+                    db.commit()
+
+        metrics.track_product_views("flushed", len(batch))
+        metrics.track_product_views("flush_batches")
+        return len(batch)
+
+    @staticmethod
+    def _insert(db, batch: list[ProductViewEntry]) -> None:
+        # INSERT multi-linhas (insertmanyvalues do SQLAlchemy 2.0)
+        db.execute(insert(models.ProductView), [
+            {"store_id": store_id, "product_id": product_id, "customer_id": customer_id, "viewed_at": viewed_at}
+            for store_id, product_id, customer_id, viewed_at in batch
+        ])
+
+        hourly = Counter(
+            (store_id, product_id, viewed_at.replace(minute=0, second=0, microsecond=0))
+            for store_id, product_id, _, viewed_at in batch
+        )
+        # Ordem fixa das chaves: evita deadlock entre workers no upsert
+        statement = pg_insert(models.ProductViewHourly).values([
+            {"store_id": store_id, "product_id": product_id, "hour": hour, "views": views}
+            for (store_id, product_id, hour), views in sorted(hourly.items())
+        ])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[
+                models.ProductViewHourly.store_id,
+                models.ProductViewHourly.product_id,
+                models.ProductViewHourly.hour,
+            ],
+            set_={"views": models.ProductViewHourly.views + statement.excluded.views},
+        ))
+
+    @staticmethod
+    def _without_removed_products(db, batch: list[ProductViewEntry]) -> list[ProductViewEntry]:
+        existing = set(db.execute(
+            select(models.Product.id).where(models.Product.id.in_({entry[1] for entry in batch}))
+        ).scalars())
+
+        kept = [entry for entry in batch if entry[1] in existing]
+        if len(kept) < len(batch):
+            metrics.track_product_views("dropped", len(batch) - len(kept))
+            logger.warning(f"⚠️ {len(batch) - len(kept)} visualização(ões) de produtos removidos descartada(s)")
+        return kept
+
+    def _requeue(self, batch: list[ProductViewEntry]) -> None:
+        """Devolve o lote ao início do buffer, até a capacidade"""
+        with self._lock:
+            room = max(self.capacity - len(self._buffer), 0)
+            kept = batch[:room]
+            self._buffer.extendleft(reversed(kept))
+
+        if len(kept) < len(batch):
+            metrics.track_product_views("dropped", len(batch) - len(kept))
+            logger.warning(f"⚠️ Buffer de visualizações cheio: {len(batch) - len(kept)} descartada(s)")
+
+
+# ✅ INSTÂNCIA GLOBAL (uma por worker)
+product_view_buffer = ProductViewBuffer(
+    capacity=config.PRODUCT_VIEW_BUFFER_CAPACITY,
+    batch_size=config.PRODUCT_VIEW_FLUSH_BATCH_SIZE,
+    flush_interval_ms=config.PRODUCT_VIEW_FLUSH_INTERVAL_MS,
+)
@@ -1,16 +1,51 @@
 # Arquivo: src/services/stock_service.py
-from sqlalchemy.orm import Session, selectinload
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import Integer, column, select, update, values
+from sqlalchemy.orm import Session, lazyload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
 from src.core import models
-from src.core.utils.enums import ProductType, ProductStatus
+from src.core.config import config
+from src.core.utils.enums import ProductStatus, StockReservationStatus, OrderStatus
+
+
+class StockChange(NamedTuple):
+    """
+    O que uma baixa/reserva/devolução mudou no cardápio
 
+    availability_changed: algum produto ou complemento zerou ou voltou a ter
+    estoque. O chamador (após o commit) bumpa a versão do conteúdo da loja:
+    snapshot do totem e índice de preços do carrinho guardam a disponibilidade
+    """
+    product_ids: list[int]  # Produtos cujo estoque mudou (componentes, no caso de kits)
+    availability_changed: bool = False
+
+
+NO_STOCK_CHANGE = StockChange([])
 
-def decrease_stock_for_order(order: models.Order, db: Session):
+
+def decrease_stock_for_order(order: models.Order, db: Session) -> StockChange:
     """
     Dá baixa no estoque para cada produto em um pedido, considerando se é um
     produto individual (com variantes) ou um kit (com componentes).
     Esta função deve ser chamada quando um pedido é concluído.
+
+    Pedidos com estoque reservado na criação não baixam de novo: a reserva
+    apenas vira baixa definitiva.
+
+    Returns:
+        StockChange com os produtos cujo estoque mudou
     """
+    if order.stock_reservation_status == StockReservationStatus.RESERVED:
+        commit_stock_reservation(order, db)
+        return NO_STOCK_CHANGE
+
     print(f"📦 Iniciando baixa de estoque para o pedido {order.id}...")
+    changed_product_ids: set[int] = set()
+    availability_changed = False
 
     # Itera sobre cada item do pedido (objetos OrderProduct)
     for order_product in order.products:
@@ -26,7 +61,7 @@ def decrease_stock_for_order(order: models.Order, db: Session):
         order_quantity = order_product.quantity
 
         # --- CAMINHO 1: O PRODUTO É UM KIT/COMBO ---
-        if product_master.product_type == ProductType.KIT:
+        if product_master.components:
             print(f"  -> Item é um Kit: '{product_master.name}'. Dando baixa nos componentes...")
             for component_link in product_master.components:
                 component_product = db.query(models.Product).filter(
@@ -36,6 +71,9 @@ def decrease_stock_for_order(order: models.Order, db: Session):
                 if component_product and component_product.control_stock:
                     quantity_to_decrease = component_link.quantity * order_quantity
                     component_product.stock_quantity -= quantity_to_decrease
+                    changed_product_ids.add(component_product.id)
+                    if component_product.stock_quantity <= 0 < component_product.stock_quantity + quantity_to_decrease:
+                        availability_changed = True
                     print(
                         f"    - Componente '{component_product.name}': baixou {quantity_to_decrease} unidades. Novo estoque: {component_product.stock_quantity}")
                     # ✅ Auto-pausa componente quando estoque zerar
@@ -47,7 +85,7 @@ def decrease_stock_for_order(order: models.Order, db: Session):
             # Nota: O estoque do produto "Kit" em si não é alterado.
 
         # --- CAMINHO 2: O PRODUTO É INDIVIDUAL ---
-        elif product_master.product_type == ProductType.PREPARED:
+        else:
             print(f"  -> Item é Individual: '{product_master.name}'.")
             # 2a: Baixa no estoque do produto principal
             product_to_update = db.query(models.Product).filter(
@@ -56,6 +94,9 @@ def decrease_stock_for_order(order: models.Order, db: Session):
 
             if product_to_update.control_stock:
                 product_to_update.stock_quantity -= order_quantity
+                changed_product_ids.add(product_to_update.id)
+                if product_to_update.stock_quantity <= 0 < product_to_update.stock_quantity + order_quantity:
+                    availability_changed = True
                 print(
                     f"    - Produto principal: baixou {order_quantity} unidades. Novo estoque: {product_to_update.stock_quantity}")
                 # ✅ Auto-pausa produto quando estoque zerar
@@ -75,21 +116,42 @@ def decrease_stock_for_order(order: models.Order, db: Session):
                     if variant_option_master and variant_option_master.track_inventory:
                         quantity_to_decrease = order_option.quantity * order_quantity
                         variant_option_master.stock_quantity -= quantity_to_decrease
+                        if variant_option_master.stock_quantity <= 0 < variant_option_master.stock_quantity + quantity_to_decrease:
+                            availability_changed = True
                         print(
-                            f"      - Complemento '{variant_option_master.resolvedName}': baixou {quantity_to_decrease} unidades. Novo estoque: {variant_option_master.stock_quantity}")
+                            f"      - Complemento '{variant_option_master.resolved_name}': baixou {quantity_to_decrease} unidades. Novo estoque: {variant_option_master.stock_quantity}")
                         # ✅ Auto-pausa complemento quando estoque zerar
                         if variant_option_master.stock_quantity <= 0 and variant_option_master.available:
                             variant_option_master.available = False
-                            print(f"        ⚠️  Complemento '{variant_option_master.resolvedName}' pausado automaticamente (estoque zerado)")
+                            print(f"        ⚠️  Complemento '{variant_option_master.resolved_name}' pausado automaticamente (estoque zerado)")
+
+    if order.stock_reservation_status == StockReservationStatus.RELEASED:
+        # Reserva expirada e pedido entregue mesmo assim: baixa feita acima
+        order.stock_reservation_status = StockReservationStatus.COMMITTED
 
     print("Baixa de estoque concluída.")
+    return StockChange(sorted(changed_product_ids), availability_changed)
 
 
-def restock_for_canceled_order(order: models.Order, db: Session):
+def restock_for_canceled_order(order: models.Order, db: Session) -> StockChange:
     """
     Retorna os itens de um pedido cancelado ao estoque, considerando Kits e Variantes.
+
+    Pedidos com reserva devolvem exatamente o que foi reservado; reservas já
+    devolvidas (expiradas) não devolvem de novo.
+
+    Returns:
+        StockChange com os produtos cujo estoque mudou
     """
+    if order.stock_reservation_status == StockReservationStatus.RESERVED:
+        return release_stock_reservation(order, db)
+    if order.stock_reservation_status == StockReservationStatus.RELEASED:
+        print(f"↩️ Estoque do pedido {order.id} já foi devolvido (reserva liberada).")
+        return NO_STOCK_CHANGE
+
     print(f"↩️ Retornando itens do pedido cancelado {order.id} ao estoque...")
+    changed_product_ids: set[int] = set()
+    availability_changed = False
 
     for order_product in order.products:
         product_master = db.query(models.Product).options(
@@ -102,7 +164,7 @@ def restock_for_canceled_order(order: models.Order, db: Session):
         order_quantity = order_product.quantity
 
         # --- LÓGICA DE DEVOLUÇÃO PARA KITS ---
-        if product_master.product_type == ProductType.KIT:
+        if product_master.components:
             print(f"  -> Item é um Kit: '{product_master.name}'. Devolvendo componentes ao estoque...")
             for component_link in product_master.components:
                 component_product = db.query(models.Product).filter(
@@ -113,6 +175,9 @@ def restock_for_canceled_order(order: models.Order, db: Session):
                     old_stock = component_product.stock_quantity
                     quantity_to_increase = component_link.quantity * order_quantity
                     component_product.stock_quantity += quantity_to_increase
+                    changed_product_ids.add(component_product.id)
+                    if old_stock <= 0 < component_product.stock_quantity:
+                        availability_changed = True
                     print(
                         f"    - Componente '{component_product.name}': devolveu {quantity_to_increase} unidades. Novo estoque: {component_product.stock_quantity}")
                     # ✅ Reativa componente automaticamente se estava com estoque zerado
@@ -123,7 +188,7 @@ def restock_for_canceled_order(order: models.Order, db: Session):
                                 print(f"      ✅ Componente '{component_product.name}' reativado automaticamente (estoque restaurado)")
 
         # --- LÓGICA DE DEVOLUÇÃO PARA PRODUTOS INDIVIDUAIS ---
-        elif product_master.product_type == ProductType.PREPARED:
+        else:
             print(f"  -> Item é Individual: '{product_master.name}'.")
             product_to_update = db.query(models.Product).filter(
                 models.Product.id == product_master.id
@@ -132,6 +197,9 @@ def restock_for_canceled_order(order: models.Order, db: Session):
             if product_to_update.control_stock:
                 old_stock = product_to_update.stock_quantity
                 product_to_update.stock_quantity += order_quantity
+                changed_product_ids.add(product_to_update.id)
+                if old_stock <= 0 < product_to_update.stock_quantity:
+                    availability_changed = True
                 print(
                     f"    - Produto principal: devolveu {order_quantity} unidades. Novo estoque: {product_to_update.stock_quantity}")
                 # ✅ Reativa produto automaticamente se estava com estoque zerado
@@ -151,11 +219,286 @@ def restock_for_canceled_order(order: models.Order, db: Session):
                         old_stock = variant_option_master.stock_quantity
                         quantity_to_increase = order_option.quantity * order_quantity
                         variant_option_master.stock_quantity += quantity_to_increase
+                        if old_stock <= 0 < variant_option_master.stock_quantity:
+                            availability_changed = True
                         print(
-                            f"      - Complemento '{variant_option_master.resolvedName}': devolveu {quantity_to_increase} unidades. Novo estoque: {variant_option_master.stock_quantity}")
+                            f"      - Complemento '{variant_option_master.resolved_name}': devolveu {quantity_to_increase} unidades. Novo estoque: {variant_option_master.stock_quantity}")
                         # ✅ Reativa complemento automaticamente se estava com estoque zerado
                         if old_stock <= 0 and variant_option_master.stock_quantity > 0 and not variant_option_master.available:
                             variant_option_master.available = True
-                            print(f"        ✅ Complemento '{variant_option_master.resolvedName}' reativado automaticamente (estoque restaurado)")
+                            print(f"        ✅ Complemento '{variant_option_master.resolved_name}' reativado automaticamente (estoque restaurado)")
+
+    if order.stock_reservation_status == StockReservationStatus.COMMITTED:
+        order.stock_reservation_status = StockReservationStatus.RELEASED
+
+    print("Retorno ao estoque concluído.")
+    return StockChange(sorted(changed_product_ids), availability_changed)
+
+# ═══════════════════════════════════════════════════════════
+# RESERVA DE ESTOQUE (PEDIDOS DO CARDÁPIO)
+# ═══════════════════════════════════════════════════════════
+#
+# Na criação do pedido o estoque é descontado na mesma transação, em lote:
+#   1. SELECT ... ORDER BY id FOR UPDATE das linhas com estoque controlado
+#      (ordem fixa: checkouts concorrentes não entram em deadlock)
+#   2. UPDATE ... FROM (VALUES ...) WHERE stock_quantity >= quantidade
+#      RETURNING — um por tabela (produtos e complementos)
+# Dois checkouts disputando a última unidade: o segundo espera o lock e
+# recebe InsufficientStockError, sem vender além do estoque.
+#
+# O que foi reservado fica em order_stock_reservations:
+# - Entrega: decrease_stock_for_order só confirma a reserva
+# - Cancelamento: restock_for_canceled_order devolve as linhas reservadas
+# - Expiração: release_expired_stock_reservations devolve reservas de
+#   pedidos ainda pendentes (ou cancelados sem devolução) após o prazo
+
+
+class InsufficientStockError(Exception):
+    """Estoque insuficiente para reservar o pedido"""
+
+    def __init__(self, shortages: list[str]):
+        super().__init__("; ".join(shortages))
+        self.shortages = shortages
+
+
+def _order_stock_demand(order: models.Order, db: Session) -> tuple[Counter, Counter]:
+    """
+    Quantidades necessárias por produto e por complemento.
+    Kits (produtos com componentes) consomem o estoque dos componentes.
+    """
+    ordered_products: Counter[int] = Counter()
+    option_demand: Counter[int] = Counter()
+
+    for order_product in order.products:
+        if order_product.product_id:
+            ordered_products[order_product.product_id] += order_product.quantity
+        for order_variant in order_product.variants:
+            for order_option in order_variant.options:
+                if order_option.variant_option_id:
+                    option_demand[order_option.variant_option_id] += order_option.quantity * order_product.quantity
+
+    product_demand = Counter(ordered_products)
+    if ordered_products:
+        components = db.execute(
+            select(
+                models.KitComponent.kit_product_id,
+                models.KitComponent.component_product_id,
+                models.KitComponent.quantity,
+            ).where(models.KitComponent.kit_product_id.in_(ordered_products.keys()))
+        ).all()
+
+        # O estoque do kit em si não é alterado
+        for kit_product_id in {kit_product_id for kit_product_id, _, _ in components}:
+            product_demand.pop(kit_product_id, None)
+        for kit_product_id, component_product_id, quantity in components:
+            product_demand[component_product_id] += quantity * ordered_products[kit_product_id]
+
+    return product_demand, option_demand
+
+
+def _lock_stock_rows(db: Session, model, ids, tracked_column=None) -> list:
+    """
+    Trava as linhas em ordem de id (a mesma em toda reserva/devolução) e
+    devolve os valores atuais. Com tracked_column, só as de estoque controlado.
+    """
+    if not ids:
+        return []
+
+    statement = select(model).options(lazyload("*")).where(model.id.in_(ids))
+    if tracked_column is not None:
+        statement = statement.where(tracked_column.is_(True))
+
+    return db.execute(
+        statement
+        .order_by(model.id)
+        .with_for_update(of=model)
+        .execution_options(populate_existing=True)
+    ).scalars().all()
+
+
+def _apply_stock_delta(db: Session, rows: list, quantities: dict[int, int], reserve: bool) -> dict[int, int]:
+    """
+    UPDATE em lote do estoque das linhas (já travadas).
+
+    reserve=True desconta só onde stock_quantity >= quantidade;
+    reserve=False devolve. Retorna {id: novo estoque} das linhas alteradas.
+    """
+    if not rows:
+        return {}
+
+    table = type(rows[0]).__table__
+    delta = values(column("id", Integer), column("quantity", Integer), name="stock_delta").data(
+        [(row.id, quantities[row.id]) for row in rows]
+    )
+
+    statement = update(table).where(table.c.id == delta.c.id)
+    if reserve:
+        statement = statement.where(table.c.stock_quantity >= delta.c.quantity).values(
+            stock_quantity=table.c.stock_quantity - delta.c.quantity
+        )
+    else:
+        statement = statement.values(stock_quantity=table.c.stock_quantity + delta.c.quantity)
+
+    updated = dict(db.execute(statement.returning(table.c.id, table.c.stock_quantity)).all())
+
+    # Mantém os objetos da sessão coerentes sem gerar outro UPDATE
+    for row in rows:
+        if row.id in updated:
+            set_committed_value(row, "stock_quantity", updated[row.id])
+    return updated
+
+
+def _set_products_availability(db: Session, product_ids: list[int], available: bool) -> None:
+    if product_ids:
+        db.execute(
+            update(models.ProductCategoryLink)
+            .where(
+                models.ProductCategoryLink.product_id.in_(product_ids),
+                models.ProductCategoryLink.is_available.is_(not available),
+            )
+            .values(is_available=available)
+        )
+
+
+def _set_options_availability(db: Session, option_ids: list[int], available: bool) -> None:
+    if option_ids:
+        db.execute(
+            update(models.VariantOption)
+            .where(models.VariantOption.id.in_(option_ids), models.VariantOption.available.is_(not available))
+            .values(available=available)
+        )
+
+
+def reserve_stock_for_order(order: models.Order, db: Session) -> StockChange:
+    """
+    Reserva (desconta) o estoque de um pedido novo, na transação do pedido.
+
+    Deve ser chamada com os itens já montados em order.products e antes do
+    commit. Em caso de falta levanta InsufficientStockError: o chamador faz
+    rollback, o que desfaz qualquer desconto parcial e libera os locks.
+
+    Returns:
+        StockChange com os produtos cujo estoque mudou (para notificar o cardápio)
+    """
+    product_demand, option_demand = _order_stock_demand(order, db)
+
+    products = _lock_stock_rows(db, models.Product, product_demand.keys(), models.Product.control_stock)
+    options = _lock_stock_rows(db, models.VariantOption, option_demand.keys(), models.VariantOption.track_inventory)
+
+    shortages = [
+        f"Produto '{product.name}': estoque insuficiente. "
+        f"Disponível: {product.stock_quantity}, necessário: {product_demand[product.id]}."
+        for product in products if product.stock_quantity < product_demand[product.id]
+    ] + [
+        f"Complemento '{option.resolved_name}': estoque insuficiente. "
+        f"Disponível: {option.stock_quantity}, necessário: {option_demand[option.id]}."
+        for option in options if option.stock_quantity < option_demand[option.id]
+    ]
+    if shortages:
+        raise InsufficientStockError(shortages)
+
+    updated_products = _apply_stock_delta(db, products, product_demand, reserve=True)
+    updated_options = _apply_stock_delta(db, options, option_demand, reserve=True)
+    if len(updated_products) < len(products) or len(updated_options) < len(options):
+        # Não acontece com as linhas travadas; a condição do UPDATE é a garantia final
+        raise InsufficientStockError(["Estoque alterado durante a reserva. Tente novamente."])
+
+    # ✅ Auto-pausa o que zerou
+    sold_out_products = [pid for pid, stock in updated_products.items() if stock <= 0]
+    sold_out_options = [oid for oid, stock in updated_options.items() if stock <= 0]
+    _set_products_availability(db, sold_out_products, available=False)
+    _set_options_availability(db, sold_out_options, available=False)
+
+    order.stock_reservations.extend(
+        [
+            models.OrderStockReservation(store_id=order.store_id, product_id=product.id,
+                                         quantity=product_demand[product.id])
+            for product in products
+        ] + [
+            models.OrderStockReservation(store_id=order.store_id, variant_option_id=option.id,
+                                         quantity=option_demand[option.id])
+            for option in options
+        ]
+    )
+    order.stock_reservation_status = StockReservationStatus.RESERVED
+    order.stock_reserved_until = datetime.now(timezone.utc) + timedelta(minutes=config.STOCK_RESERVATION_TTL_MINUTES)
+
+    if products or options:
+        print(f"🔒 Estoque reservado: {len(products)} produto(s) e {len(options)} complemento(s).")
+    return StockChange(list(updated_products), bool(sold_out_products or sold_out_options))
+
+
+def commit_stock_reservation(order: models.Order, db: Session) -> None:
+    """Pedido entregue: a reserva vira baixa definitiva (o estoque já foi descontado)"""
+    order.stock_reservations.clear()
+    order.stock_reservation_status = StockReservationStatus.COMMITTED
+    order.stock_reserved_until = None
+    print(f"📦 Reserva de estoque do pedido {order.id} confirmada.")
+
+
+def release_stock_reservation(order: models.Order, db: Session) -> StockChange:
+    """
+    Devolve ao estoque exatamente o que o pedido reservou.
+
+    Returns:
+        StockChange com os produtos cujo estoque mudou
+    """
+    product_quantities: Counter[int] = Counter()
+    option_quantities: Counter[int] = Counter()
+    for reservation in order.stock_reservations:
+        if reservation.product_id:
+            product_quantities[reservation.product_id] += reservation.quantity
+        elif reservation.variant_option_id:
+            option_quantities[reservation.variant_option_id] += reservation.quantity
+
+    # Mesma ordem de locks da reserva; devolve mesmo se o controle foi desligado depois
+    products = _lock_stock_rows(db, models.Product, product_quantities.keys())
+    options = _lock_stock_rows(db, models.VariantOption, option_quantities.keys())
+
+    updated_products = _apply_stock_delta(db, products, product_quantities, reserve=False)
+    updated_options = _apply_stock_delta(db, options, option_quantities, reserve=False)
+
+    # ✅ Reativa o que estava zerado e voltou a ter estoque
+    restocked_products = [
+        pid for pid, stock in updated_products.items() if stock > 0 >= stock - product_quantities[pid]
+    ]
+    restocked_options = [
+        oid for oid, stock in updated_options.items() if stock > 0 >= stock - option_quantities[oid]
+    ]
+    _set_products_availability(db, restocked_products, available=True)
+    _set_options_availability(db, restocked_options, available=True)
+
+    order.stock_reservations.clear()
+    order.stock_reservation_status = StockReservationStatus.RELEASED
+    order.stock_reserved_until = None
+    print(f"↩️ Reserva de estoque do pedido {order.id} devolvida "
+          f"({len(updated_products)} produto(s), {len(updated_options)} complemento(s)).")
+    return StockChange(list(updated_products), bool(restocked_products or restocked_options))
+
+
+def release_expired_stock_reservations(db: Session, limit: int = 200) -> list[tuple[int, StockChange]]:
+    """
+    Devolve reservas vencidas de pedidos que não seguiram adiante:
+    ainda pendentes ou cancelados por um caminho que não devolveu o estoque.
+
+    Um pedido pendente que expirou e depois é entregue volta a ter baixa
+    normal em decrease_stock_for_order.
+
+    Returns:
+        (store_id, StockChange) de cada pedido devolvido; o chamador
+        invalida o cardápio das lojas após o commit
+    """
+    orders = db.execute(
+        select(models.Order)
+        .options(selectinload(models.Order.stock_reservations))
+        .where(
+            models.Order.stock_reservation_status == StockReservationStatus.RESERVED,
+            models.Order.stock_reserved_until < datetime.now(timezone.utc),
+            models.Order.order_status.in_([OrderStatus.PENDING, OrderStatus.CANCELED]),
+        )
+        .order_by(models.Order.id)
+        .limit(limit)
+        .with_for_update(of=models.Order, skip_locked=True)
+    ).scalars().all()
 
-    print("Retorno ao estoque concluído.")
\ No newline at end of file
+    return [(order.store_id, release_stock_reservation(order, db)) for order in orders]
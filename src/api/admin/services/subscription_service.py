@@ -149,6 +149,43 @@ class SubscriptionService:
             logger.error(f"❌ Erro ao enriquecer assinatura da loja {store.id}: {e}", exc_info=True)
             return None
 
+    @staticmethod
+    def is_store_blocked(db, store_id: int) -> bool:
+        """
+        ✅ Apenas o bloqueio da assinatura (sem preview, cartão e histórico)
+
+        Usado a cada conexão do totem: o snapshot do cardápio é cacheado,
+        mas o bloqueio muda com a data, sem nenhuma escrita no banco.
+        Sem assinatura (ou sem plano) a loja é considerada bloqueada.
+        """
+        subscription_db = db.query(models.StoreSubscription).filter(
+            models.StoreSubscription.store_id == store_id
+        ).order_by(models.StoreSubscription.created_at.desc()).first()
+
+        if not subscription_db or subscription_db.subscription_plan_id is None:
+            return True
+
+        now = datetime.now(timezone.utc)
+        end_date = subscription_db.current_period_end
+
+        if end_date and end_date.tzinfo is None:
+            end_date = end_date.replace(tzinfo=timezone.utc)
+
+        days_remaining = (
+            (end_date - now).days
+            if end_date and now < end_date
+            else 0
+        )
+
+        _, is_blocked, _ = SubscriptionService._calculate_status(
+            status=subscription_db.status.lower(),
+            canceled_at=subscription_db.canceled_at,
+            end_date=end_date,
+            days_remaining=days_remaining,
+            now=now
+        )
+        return is_blocked
+
     # ═══════════════════════════════════════════════════════════
     # Métodos auxiliares (mantidos)
     # ═══════════════════════════════════════════════════════════
@@ -5,6 +5,7 @@ from sqlalchemy.exc import IntegrityError
 
 from src.api.schemas.tables.table import CreateSaloonRequest, OpenTableRequest, CreateTableRequest, \
     AddItemToTableRequest, UpdateTableRequest, UpdateSaloonRequest
+from src.api.admin.utils.order_code import next_order_codes
 from src.core import models
 from src.core.utils.enums import TableStatus, CommandStatus, OrderStatus, PaymentStatus, SalesChannel
 
@@ -505,12 +506,13 @@ class TableService:
         base_price = product_link.promotional_price if product_link.is_on_promotion else product_link.price
 
         # 6. Cria o pedido (Order)
+        sequential_id, public_id = next_order_codes(self.db, store_id)
         order = models.Order(
             store_id=store_id,
             table_id=request.table_id,
             command_id=request.command_id,
-            sequential_id=self._get_next_sequential_id(store_id),
-            public_id=self._generate_public_id(store_id),
+            sequential_id=sequential_id,
+            public_id=public_id,
             order_type=SalesChannel.TABLE,
             delivery_type="in_store",
             order_status=OrderStatus.PENDING,  # ✅ Usa o Enum
@@ -626,22 +628,6 @@ class TableService:
 
     # ========== MÉTODOS AUXILIARES ==========
 
-    def _get_next_sequential_id(self, store_id: int) -> int:
-        """Gera o próximo ID sequencial para pedidos da loja"""
-        last_order = self.db.query(models.Order).filter(
-            models.Order.store_id == store_id
-        ).order_by(models.Order.sequential_id.desc()).first()
-
-        return (last_order.sequential_id + 1) if last_order else 1
-
-    def _generate_public_id(self, store_id: int) -> str:
-        """Gera um ID público único para o pedido"""
-        from datetime import datetime
-        import random
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        random_suffix = random.randint(1000, 9999)
-        return f"{store_id}{timestamp}{random_suffix}"
-
     def get_table_with_details(self, table_id: int, store_id: int) -> models.Tables:
         """Busca uma mesa com todos os relacionamentos carregados"""
         return self.db.query(models.Tables).options(
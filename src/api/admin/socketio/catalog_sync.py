@@ -0,0 +1,268 @@
+# src/api/admin/socketio/catalog_sync.py
+
+"""
+Catalog Delta Sync
+==================
+
+Canal versionado de deltas do cardápio para admin e totem.
+
+Em vez de recarregar e re-transmitir o cardápio inteiro a cada mutação,
+as rotas emitem apenas o que mudou (evento 'catalog_delta'):
+
+- product_upserted: produto criado/editado (payload completo do produto)
+- product_removed: produto arquivado/removido
+- link_changed: vínculo produto-categoria alterado (link=None quando removido)
+- price_changed: preço de sabor por tamanho alterado
+
+Cada delta carrega uma versão monotônica por loja (Redis INCR).
+Protocolo do cliente:
+- version == última + 1 → aplica o delta
+- version <= última     → ignora (delta atrasado/duplicado)
+- version >  última + 1 → perdeu eventos, emite 'catalog_resync'
+
+O payload completo ('products_updated') só é enviado no join e no resync,
+e sempre inclui 'version' para o cliente se alinhar.
+
+Autor: PDVix Team
+"""
+
+import logging
+import threading
+from typing import Iterable, Optional
+
+from sqlalchemy.orm import selectinload
+
+from src.api.admin.services.catalog_service import load_store_products
+from src.api.admin.services.stock_service import StockChange
+from src.api.app.services.rating import get_all_ratings_summaries_for_store
+from src.api.schemas.products.product import ProductOut, FlavorPriceOut
+from src.api.schemas.products.product_category_link import ProductCategoryLinkOut
+from src.core import models
+from src.core.cache.cache_manager import cache_manager
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.utils.enums import ProductStatus
+from src.socketio_instance import sio
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogChange:
+    """Tipos de patch suportados no evento 'catalog_delta'"""
+
+    PRODUCT_UPSERTED = "product_upserted"
+    PRODUCT_REMOVED = "product_removed"
+    LINK_CHANGED = "link_changed"
+    PRICE_CHANGED = "price_changed"
+
+
+# ═══════════════════════════════════════════════════════════
+# VERSÃO DO CARDÁPIO
+# ═══════════════════════════════════════════════════════════
+
+# Fallback local quando o Redis não está disponível (um único worker)
+_local_versions: dict[int, int] = {}
+_local_lock = threading.Lock()
+
+
+def next_catalog_version(store_id: int) -> int:
+    """Incrementa e retorna a versão do cardápio da loja"""
+    version = redis_client.incr(CacheKeys.catalog_version(store_id))
+    if version is not None:
+        return version
+
+    with _local_lock:
+        _local_versions[store_id] = _local_versions.get(store_id, 0) + 1
+        return _local_versions[store_id]
+
+
+def get_catalog_version(store_id: int) -> int:
+    """Retorna a versão atual do cardápio (0 se nunca houve mutação)"""
+    value = redis_client.get(CacheKeys.catalog_version(store_id))
+    if value is not None:
+        return int(value)
+
+    with _local_lock:
+        return _local_versions.get(store_id, 0)
+
+
+# ═══════════════════════════════════════════════════════════
+# CONSTRUTORES DE PATCH
+# ═══════════════════════════════════════════════════════════
+
+def product_upserted(product_id: int) -> dict:
+    return {"type": CatalogChange.PRODUCT_UPSERTED, "product_id": product_id}
+
+
+def product_removed(product_id: int) -> dict:
+    return {"type": CatalogChange.PRODUCT_REMOVED, "product_id": product_id}
+
+
+def link_changed(product_id: int, category_id: int) -> dict:
+    return {"type": CatalogChange.LINK_CHANGED, "product_id": product_id, "category_id": category_id}
+
+
+def price_changed(product_id: int, flavor_price_id: int) -> dict:
+    return {"type": CatalogChange.PRICE_CHANGED, "product_id": product_id, "flavor_price_id": flavor_price_id}
+
+
+# ═══════════════════════════════════════════════════════════
+# RESOLUÇÃO DOS DADOS (1 QUERY POR TIPO, NÃO POR ITEM)
+# ═══════════════════════════════════════════════════════════
+
+def _load_links(db, store_id: int, pairs: set[tuple[int, int]]) -> dict[tuple[int, int], models.ProductCategoryLink]:
+    if not pairs:
+        return {}
+
+    product_ids = {product_id for product_id, _ in pairs}
+    links = db.query(models.ProductCategoryLink).join(models.Product).options(
+        selectinload(models.ProductCategoryLink.product),
+        selectinload(models.ProductCategoryLink.category),
+    ).filter(
+        models.Product.store_id == store_id,
+        models.ProductCategoryLink.product_id.in_(product_ids)
+    ).all()
+
+    return {
+        (link.product_id, link.category_id): link
+        for link in links
+        if (link.product_id, link.category_id) in pairs
+    }
+
+
+def _load_flavor_prices(db, store_id: int, price_ids: set[int]) -> dict[int, models.FlavorPrice]:
+    if not price_ids:
+        return {}
+
+    prices = db.query(models.FlavorPrice).join(models.Product).filter(
+        models.Product.store_id == store_id,
+        models.FlavorPrice.id.in_(price_ids)
+    ).all()
+
+    return {p.id: p for p in prices}
+
+
+def build_catalog_changes(db, store_id: int, changes: Iterable[dict]) -> list[dict]:
+    """
+    Resolve os patches em payloads JSON prontos para envio.
+
+    - Patches duplicados são colapsados (o último vence)
+    - Produto arquivado ou inexistente vira 'product_removed'
+    """
+    unique: dict[tuple, dict] = {}
+    for change in changes:
+        key = (change["type"], change.get("product_id"), change.get("category_id"), change.get("flavor_price_id"))
+        unique[key] = change
+
+    product_ids = {c["product_id"] for c in unique.values() if c["type"] == CatalogChange.PRODUCT_UPSERTED}
+    link_pairs = {
+        (c["product_id"], c["category_id"]) for c in unique.values() if c["type"] == CatalogChange.LINK_CHANGED
+    }
+    price_ids = {c["flavor_price_id"] for c in unique.values() if c["type"] == CatalogChange.PRICE_CHANGED}
+
+    products = load_store_products(db, store_id, product_ids)
+    # Mesmo resumo de avaliações do payload completo: o cliente substitui o produto inteiro
+    ratings = get_all_ratings_summaries_for_store(db, store_id=store_id, product_ids=set(products))
+    for product in products.values():
+        product.rating = ratings.get(product.id)
+    links = _load_links(db, store_id, link_pairs)
+    prices = _load_flavor_prices(db, store_id, price_ids)
+
+    resolved = []
+    for change in unique.values():
+        change_type = change["type"]
+        product_id = change["product_id"]
+
+        if change_type == CatalogChange.PRODUCT_UPSERTED:
+            product = products.get(product_id)
+            if not product or product.status == ProductStatus.ARCHIVED:
+                resolved.append(product_removed(product_id))
+                continue
+            resolved.append({
+                **change,
+                "product": ProductOut.model_validate(product).model_dump(mode='json'),
+            })
+
+        elif change_type == CatalogChange.LINK_CHANGED:
+            link = links.get((product_id, change["category_id"]))
+            resolved.append({
+                **change,
+                "link": ProductCategoryLinkOut.model_validate(link).model_dump(mode='json') if link else None,
+            })
+
+        elif change_type == CatalogChange.PRICE_CHANGED:
+            price = prices.get(change["flavor_price_id"])
+            resolved.append({
+                **change,
+                "price": FlavorPriceOut.model_validate(price).model_dump(mode='json') if price else None,
+            })
+
+        else:
+            resolved.append(change)
+
+    return resolved
+
+
+# ═══════════════════════════════════════════════════════════
+# EMISSÃO
+# ═══════════════════════════════════════════════════════════
+
+async def emit_catalog_delta(db, store_id: int, changes: list[dict], stock_only: bool = False) -> Optional[int]:
+    """
+    Emite um delta versionado do cardápio para o admin e para o totem.
+
+    Nunca quebra a requisição principal: erros são apenas registrados.
+
+    stock_only=True (reserva/baixa/devolução de estoque dos pedidos sem
+    produto ou complemento zerando/voltando): invalida o cache de produtos sem
+    bumpar a versão do conteúdo público da loja, que descartaria o snapshot do
+    totem e o índice de preços a cada pedido. Passe stock_only=False quando a
+    disponibilidade mudar (StockChange.availability_changed): aí o snapshot e
+    o índice precisam ser refeitos.
+
+    Returns:
+        Versão emitida ou None se nada foi enviado
+    """
+    if not changes:
+        return None
+
+    try:
+        resolved = build_catalog_changes(db, store_id, changes)
+        version = next_catalog_version(store_id)
+
+        payload = {
+            "store_id": store_id,
+            "version": version,
+            "changes": resolved,
+        }
+
+        await sio.emit('catalog_delta', payload, namespace='/admin', room=f"admin_store_{store_id}")
+        await sio.emit('catalog_delta', payload, namespace='/', room=f"store_{store_id}")
+
+        if stock_only:
+            cache_manager.on_stock_change(store_id)
+        else:
+            cache_manager.on_product_change(store_id)
+
+        logger.info(f"✅ catalog_delta v{version} emitido para loja {store_id} ({len(resolved)} alterações)")
+        return version
+
+    except Exception as e:
+        logger.error(f"❌ Erro ao emitir catalog_delta para loja {store_id}: {e}", exc_info=True)
+        return None
+
+
+async def emit_stock_change(db, store_id: int, change: StockChange) -> Optional[int]:
+    """
+    Notifica (após o commit) o estoque mexido por um pedido.
+
+    Só bumpa a versão do conteúdo público quando a disponibilidade mudou,
+    inclusive quando só complementos zeraram/voltaram (sem delta de produto).
+    """
+    version = await emit_catalog_delta(
+        db, store_id, [product_upserted(pid) for pid in change.product_ids],
+        stock_only=not change.availability_changed,
+    )
+    if version is None and change.availability_changed:
+        cache_manager.on_product_change(store_id)
+    return version
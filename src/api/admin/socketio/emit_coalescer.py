@@ -0,0 +1,135 @@
+# src/api/admin/socketio/emit_coalescer.py
+
+"""
+Emit Coalescer
+==============
+
+Agrupa emissões completas repetidas (cardápio, dados da loja) por loja e
+por tipo de evento.
+
+Problema: rotas em massa (ativar/desativar vários produtos, reordenar
+categorias, importar cardápio) chamam emit_updates_products /
+emit_store_updates a cada clique. Dez cliques em poucos segundos =
+dez re-serializações e re-transmissões da loja inteira.
+
+Como funciona:
+- A mutação apenas marca (evento, loja) como pendente
+- Após a janela (SOCKET_EMIT_COALESCE_WINDOW_MS, padrão 250 ms) o
+  emissor roda UMA vez, com sessão própria, lendo o estado mais recente
+- Pedidos que chegam durante a emissão agendam uma nova rodada após a
+  próxima janela (no máximo 1 emissão por janela)
+- Janela <= 0 desliga o agrupamento (emite na hora)
+
+Métricas (/monitoring/metrics → socketio.emits): pedidos x emitidos
+por evento, para acompanhar a economia.
+
+Autor: PDVix Team
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from src.core.config import config
+from src.core.database import get_db_manager
+from src.core.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Emissor agrupável: recebe (db, store_id)
+CoalescedEmitter = Callable[..., Awaitable[None]]
+
+
+class EmitCoalescer:
+    """
+    ✅ Agenda emissões por (evento, loja), no máximo uma por janela
+    """
+
+    def __init__(self, window_ms: int = 250):
+        self.window_seconds = max(window_ms, 0) / 1000
+
+        self._tasks: dict[tuple[str, int], asyncio.Task] = {}
+        self._emitters: dict[tuple[str, int], CoalescedEmitter] = {}
+        self._running: set[tuple[str, int]] = set()
+        self._dirty: set[tuple[str, int]] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window_seconds > 0
+
+    async def request(self, event: str, store_id: int, emitter: CoalescedEmitter, db=None) -> None:
+        """
+        Pede uma emissão de 'event' para a loja
+
+        Args:
+            event: Nome lógico do evento (chave do agrupamento)
+            store_id: Loja
+            emitter: async (db, store_id) -> None
+            db: Sessão da requisição (usada só com o agrupamento desligado)
+        """
+        metrics.track_socket_emit_requested(event)
+
+        if not self.enabled:
+            await self._emit(event, store_id, emitter, db)
+            return
+
+        key = (event, store_id)
+        # O emissor mais recente vence (todos da mesma chave são equivalentes)
+        self._emitters[key] = emitter
+
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._flush_loop(key))
+        elif key in self._running:
+            # Já está emitindo um estado possivelmente anterior a esta mutação
+            self._dirty.add(key)
+        # else: já agendado para o fim da janela, que lerá o estado mais recente
+
+    async def _flush_loop(self, key: tuple[str, int]) -> None:
+        event, store_id = key
+        try:
+            while True:
+                await asyncio.sleep(self.window_seconds)
+
+                self._running.add(key)
+                self._dirty.discard(key)
+                try:
+                    await self._emit(event, store_id, self._emitters[key])
+                finally:
+                    self._running.discard(key)
+
+                if key not in self._dirty:
+                    break
+        finally:
+            self._tasks.pop(key, None)
+            self._emitters.pop(key, None)
+            self._dirty.discard(key)
+
+    @staticmethod
+    async def _emit(event: str, store_id: int, emitter: CoalescedEmitter, db=None) -> None:
+        try:
+            if db is not None:
+                await emitter(db, store_id)
+            else:
+                # A sessão da requisição já foi fechada: sessão própria
+                with get_db_manager() as own_db:
+                    await emitter(own_db, store_id)
+
+            metrics.track_socket_emit_sent(event)
+
+        except Exception as e:
+            logger.error(f"❌ Erro na emissão agrupada '{event}' da loja {store_id}: {e}", exc_info=True)
+
+    async def flush_all(self, timeout: float = 5.0) -> None:
+        """Aguarda as emissões pendentes (shutdown)"""
+        tasks = list(self._tasks.values())
+        if not tasks:
+            return
+
+        logger.info(f"⏳ Aguardando {len(tasks)} emissão(ões) agrupada(s) pendente(s)...")
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+
+# ✅ INSTÂNCIA GLOBAL
+emit_coalescer = EmitCoalescer(window_ms=config.SOCKET_EMIT_COALESCE_WINDOW_MS)
@@ -4,6 +4,7 @@ from datetime import timedelta, date
 from typing import Optional
 from venv import logger
 
+from src.api.admin.services.active_orders_projection import build_active_orders_payload
 from src.api.admin.services.analytics_service import get_peak_hours_for_store
 from src.api.admin.services.billing_preview_service import BillingPreviewService
 from src.api.admin.services.holiday_service import HolidayService
@@ -11,6 +12,8 @@ from src.api.admin.services.insights_service import InsightsService
 from src.api.admin.services.payable_service import payable_service
 from src.api.admin.services.store_service import StoreService
 from src.api.admin.services.subscription_service import SubscriptionService
+from src.api.admin.socketio.catalog_sync import get_catalog_version
+from src.api.admin.socketio.emit_coalescer import emit_coalescer
 from src.api.app.socketio.socketio_emitters import emit_products_updated, emit_store_updated
 
 from src.api.crud import store_crud
@@ -37,11 +40,11 @@ from src.api.admin.services.product_analytic_services import get_product_analyti
 
 
 from src.api.schemas.orders.order import OrderDetails
-from src.core.cache.redis_client import redis_client
 from src.core.cache.cache_manager import cache_manager
-from src.core.database import get_db_manager
+from src.core.database import get_db_manager, run_db
 from src.core.models import Order
-from src.core.utils.enums import ProductStatus, CommandStatus, OrderStatus
+from src.core.utils.enums import ProductStatus, CommandStatus
+from src.core.utils.socketio_json import dump_list, dump_model
 from src.socketio_instance import sio
 from src.core import models
 
@@ -51,7 +54,22 @@ from sqlalchemy.orm import selectinload
 from src.api.schemas.products.variant import Variant
 
 
-async def admin_emit_store_updated(db, store_id: int):
+def _build_store_details_payload(db, store_id: int) -> Optional[dict]:
+    """Monta o payload de 'store_details_updated' (None se a loja não existir)"""
+    # 1. Busca loja com todas as relações
+    store_model = store_crud.get_store_base_details(db=db, store_id=store_id)
+
+    if not store_model:
+        return None
+
+    # 2. ✅ DELEGA PARA O STORESERVICE
+    return StoreService.get_store_complete_payload(
+        store=store_model,
+        db=db
+    )
+
+
+async def admin_emit_store_updated(db, store_id: int, sid: str | None = None):
     """
     ✅ VERSÃO SIMPLIFICADA: Usa o StoreService
 
@@ -64,27 +82,24 @@ async def admin_emit_store_updated(db, store_id: int):
     1. Busca a loja do banco
     2. Chama StoreService
     3. Emite o resultado
+
+    Aceita Session ou AsyncSession (a montagem roda via run_db).
+    Com 'sid', envia apenas para esse socket (bootstrap do admin).
     """
     try:
-        # 1. Busca loja com todas as relações
-        store_model = store_crud.get_store_base_details(db=db, store_id=store_id)
+        # 1-2. Busca a loja e monta o payload
+        store_payload = await run_db(db, _build_store_details_payload, store_id)
 
-        if not store_model:
+        if store_payload is None:
             logger.warning(f"⚠️ Loja {store_id} não encontrada")
             return
 
-        # 2. ✅ DELEGA PARA O STORESERVICE
-        store_payload = StoreService.get_store_complete_payload(
-            store=store_model,
-            db=db
-        )
-
         # 3. Emite o payload pronto
         await sio.emit(
             'store_details_updated',
             {"store": store_payload},
             namespace='/admin',
-            room=f"admin_store_{store_id}"
+            to=sid or f"admin_store_{store_id}"
         )
 
         logger.info(f"✅ store_details_updated emitido para loja {store_id}")
@@ -93,22 +108,16 @@ async def admin_emit_store_updated(db, store_id: int):
         logger.error(f'❌ Erro ao emitir store_details_updated: {e}', exc_info=True)
 
 
-async def emit_store_updates(db, store_id: int):
-    """
-    Dispara os eventos de atualização de dados da LOJA para o admin e para o totem
-    de forma concorrente e segura.
-    """
+async def _emit_store_updates_now(db, store_id: int):
+    """Dispara os eventos da LOJA para o admin e para o totem (concorrentes)"""
     try:
         print(f"🚀 Disparando eventos de atualização da loja {store_id}...")
 
         # Usa asyncio.gather para executar as duas emissões ao mesmo tempo
         await asyncio.gather(
             admin_emit_store_updated(db, store_id),
-            # Supondo que você tenha ou crie um emissor para o totem também
-             emit_store_updated(db, store_id)
+            emit_store_updated(db, store_id)
         )
-        # ✅ ADICIONAR: Invalida cache de produtos
-       # cache_manager.on_product_change(store_id)
         print(f"✅ Eventos da loja {store_id} emitidos com sucesso.")
 
     except Exception as e:
@@ -116,37 +125,51 @@ async def emit_store_updates(db, store_id: int):
         print(f"❌ Erro ao emitir eventos da loja {store_id}: {e}")
 
 
-
-async def emit_updates_products(db, store_id: int):
+async def emit_store_updates(db, store_id: int):
     """
-    Dispara os eventos de atualização para o admin e para o totem
-    de forma concorrente e segura.
+    Pede a atualização dos dados da LOJA para o admin e para o totem.
+
+    ✅ Agrupada (emit_coalescer): várias mutações seguidas geram UMA
+    emissão ao fim da janela, com o estado mais recente da loja.
     """
+    # O cache do totem é invalidado na hora; só a emissão é adiada
+    cache_manager.on_store_view_change(store_id)
+    await emit_coalescer.request("store_updates", store_id, _emit_store_updates_now, db=db)
+
+
+async def _emit_updates_products_now(db, store_id: int):
+    """Dispara o cardápio completo para o admin e para o totem (concorrentes)"""
     try:
         print(f"🚀 Disparando eventos de atualização para a loja {store_id}...")
 
-        # ✅ 1. USA asyncio.gather PARA EXECUTAR AS TAREFAS EM PARALELO
+        # ✅ USA asyncio.gather PARA EXECUTAR AS TAREFAS EM PARALELO
         #    Isso é mais rápido, pois as duas emissões acontecem ao mesmo tempo.
         await asyncio.gather(
             admin_emit_products_updated(db, store_id),
             emit_products_updated(db, store_id)
         )
-
-        # ✅ ADICIONAR: Invalida cache de produtos
-        cache_manager.on_product_change(store_id)
-
-        logger.info(f"✅ Produtos atualizados e cache invalidado para loja {store_id}")
-
-        # ✅ 2. PRINT CORRETAMENTE INDENTADO
         print(f"✅ Eventos para a loja {store_id} emitidos com sucesso.")
 
     except Exception as e:
-        # ✅ 3. TRATAMENTO DE ERROS
-        #    Se algo der errado com o  Socket.IO, apenas registramos o erro
-        #    e não quebramos a requisição principal da API.
+        # Se algo der errado com o Socket.IO, apenas registramos o erro
+        # e não quebramos a requisição principal da API.
         print(f"❌ Erro ao emitir eventos para a loja {store_id}: {e}")
 
 
+async def emit_updates_products(db, store_id: int):
+    """
+    Pede a re-emissão do cardápio completo para o admin e para o totem.
+
+    ✅ Agrupada (emit_coalescer): cliques em sequência (ex: ativar/desativar,
+    reordenar categorias) viram UMA emissão por janela.
+    """
+    # ✅ Invalida cache de produtos na hora; só a emissão é adiada
+    cache_manager.on_product_change(store_id)
+    logger.info(f"✅ Cache de produtos invalidado para loja {store_id}")
+
+    await emit_coalescer.request("products_updated", store_id, _emit_updates_products_now, db=db)
+
+
 
 
 async def admin_emit_dashboard_data_updated(db, store_id: int, sid: str | None = None):
@@ -208,9 +231,8 @@ async def admin_emit_dashboard_payables_data_updated(db, store_id: int, sid: str
     print(f"🚀 [Socket] Atualizando dados de Contas a Pagar para loja {store_id}...")
     try:
         # 1. Busca os dados usando o service que já temos
-        # Nota: Estamos chamando uma função síncrona de dentro de uma assíncrona.
-        # Para queries pesadas, o ideal seria usar asyncio.to_thread, mas para esta, é aceitável.
-        payables_metrics = payable_service.get_payables_metrics(db, store_id)
+        # (via run_db: com AsyncSession o I/O não bloqueia o event loop)
+        payables_metrics = await run_db(db, payable_service.get_payables_metrics, store_id)
 
         # 2. Prepara o payload para ser enviado via JSON
         payload = payables_metrics.model_dump(mode='json')
@@ -231,46 +253,53 @@ async def admin_emit_dashboard_payables_data_updated(db, store_id: int, sid: str
 
 
 
+def _build_financials_payload(db, store_id: int) -> Optional[dict]:
+    """Monta o payload de 'financials_updated' (None se a loja não existir)"""
+    # 1. Busca a loja e carrega as relações necessárias de forma otimizada
+    store_with_financials = (
+        db.query(models.Store)
+        .options(
+            selectinload(models.Store.payables).joinedload(models.StorePayable.supplier),
+            selectinload(models.Store.suppliers),
+            selectinload(models.Store.payable_categories),
+            selectinload(models.Store.receivables).joinedload(models.StoreReceivable.customer),
+            selectinload(models.Store.receivable_categories),
+        )
+        .filter(models.Store.id == store_id)
+        .one_or_none()
+    )
+
+    if not store_with_financials:
+        return None
+
+    # 2. Prepara o payload usando os Schemas Pydantic para garantir o formato correto
+    return {
+        "payables": [PayableResponse.model_validate(p).model_dump(mode='json') for p in
+                     store_with_financials.payables],
+        "suppliers": [SupplierResponse.model_validate(s).model_dump(mode='json') for s in
+                      store_with_financials.suppliers],
+        "categories": [PayableCategoryResponse.model_validate(c).model_dump(mode='json') for c in
+                       store_with_financials.payable_categories],
+
+        "receivables": [ReceivableResponse.model_validate(r).model_dump(mode='json') for r in
+                        store_with_financials.receivables],
+        "receivable_categories": [ReceivableCategoryResponse.model_validate(c).model_dump(mode='json') for c in
+                                  store_with_financials.receivable_categories],
+    }
+
+
 async def admin_emit_financials_updated(db, store_id: int, sid: str | None = None):
     """
     Carrega e envia as listas completas de Contas a Pagar, Fornecedores e Categorias.
     """
     print(f"🚀 [Socket] Atualizando dados financeiros para loja {store_id}...")
     try:
-        # 1. Busca a loja e carrega as relações necessárias de forma otimizada
-        store_with_financials = (
-            db.query(models.Store)
-            .options(
-                selectinload(models.Store.payables).joinedload(models.StorePayable.supplier),
-                selectinload(models.Store.suppliers),
-                selectinload(models.Store.payable_categories),
-                selectinload(models.Store.receivables).joinedload(models.StoreReceivable.customer),
-                selectinload(models.Store.receivable_categories),
-            )
-            .filter(models.Store.id == store_id)
-            .one_or_none()
-        )
+        # 1-2. Busca as relações e monta o payload
+        payload = await run_db(db, _build_financials_payload, store_id)
 
-        if not store_with_financials:
+        if payload is None:
             return
 
-        # 2. Prepara o payload usando os Schemas Pydantic para garantir o formato correto
-        payload = {
-            "payables": [PayableResponse.model_validate(p).model_dump(mode='json') for p in
-                         store_with_financials.payables],
-            "suppliers": [SupplierResponse.model_validate(s).model_dump(mode='json') for s in
-                          store_with_financials.suppliers],
-            "categories": [PayableCategoryResponse.model_validate(c).model_dump(mode='json') for c in
-                           store_with_financials.payable_categories],
-
-            "receivables": [ReceivableResponse.model_validate(r).model_dump(mode='json') for r in
-                            store_with_financials.receivables],
-            "receivable_categories": [ReceivableCategoryResponse.model_validate(c).model_dump(mode='json') for c in
-                                      store_with_financials.receivable_categories],
-        }
-
-
-
         # 3. Emite o evento com um nome específico
         event_name = "financials_updated"
         target_room = f"admin_store_{store_id}"
@@ -291,85 +320,8 @@ async def admin_emit_financials_updated(db, store_id: int, sid: str | None = Non
 
 async def admin_emit_orders_initial(db, store_id: int, sid: Optional[str] = None):
     try:
-        cache_key = f"admin:{store_id}:orders:active"
-        cached_data = redis_client.get(cache_key)
-
-        if cached_data:
-            logger.debug(f"✅ CACHE HIT: {cache_key}")
-            payload = cached_data
-        else:
-            logger.debug(f"❌ CACHE MISS: {cache_key}")
-
-            active_order_statuses = [OrderStatus.PENDING, OrderStatus.PREPARING, OrderStatus.READY, OrderStatus.ON_ROUTE]
-
-
-            # ✅ ADICIONAR LOGS AQUI
-            print(f"\n🔍 DEBUG orders_initial:")
-            print(f"   Store ID: {store_id}")
-            print(f"   Buscando status: {active_order_statuses}")
-
-            orders = (
-                db.query(models.Order)
-                .options(
-                    selectinload(models.Order.print_logs),
-                    selectinload(models.Order.products)
-                    .selectinload(models.OrderProduct.variants)
-                    .selectinload(models.OrderVariant.options)
-                )
-                .filter(
-                    models.Order.store_id == store_id,
-                    models.Order.order_status.in_(active_order_statuses)
-                )
-                .all()
-            )
-
-            # ✅ ADICIONAR MAIS LOGS
-            print(f"   ✅ Encontrados {len(orders)} pedidos no banco")
-
-            if len(orders) > 0:
-                print(f"   📦 Pedidos encontrados:")
-                for order in orders:
-                    print(f"      - ID: {order.id}, Status: '{order.order_status}', Cliente: {order.customer_name}")
-            else:
-                print(f"   ⚠️ NENHUM pedido encontrado! Verificando motivo...")
-
-                # Query de debug para ver TODOS os pedidos da loja
-                all_orders = db.query(models.Order).filter(
-                    models.Order.store_id == store_id
-                ).all()
-
-                print(f"   Total de pedidos na loja {store_id}: {len(all_orders)}")
-                for order in all_orders:
-                    print(f"      - ID: {order.id}, Status: '{order.order_status}' (tipo: {type(order.order_status)})")
-
-            orders_data = []
-
-            for order in orders:
-                try:
-                    store_customer = db.query(models.StoreCustomer).filter_by(
-                        store_id=store_id,
-                        customer_id=order.customer_id
-                    ).first()
-
-                    order_dict = OrderDetails.model_validate(order).model_dump(mode='json')
-                    order_dict["customer_order_count"] = store_customer.total_orders if store_customer else 1
-
-                    orders_data.append(order_dict)
-                    print(f"   ✅ Pedido {order.id} serializado com sucesso")
-
-                except Exception as e:
-                    print(f"   ❌ ERRO ao serializar pedido {order.id}: {e}")
-                    import traceback
-                    traceback.print_exc()
-
-            print(f"   📤 Enviando {len(orders_data)} pedidos para o frontend\n")
-
-            payload = {
-                "store_id": store_id,
-                "orders": orders_data
-            }
-
-            redis_client.set(cache_key, payload, ttl=15)
+        # Projeção incremental: só os pedidos alterados são recarregados
+        payload = await run_db(db, build_active_orders_payload, store_id)
 
         if sid:
             await sio.emit("orders_initial", payload, namespace='/admin', to=sid)
@@ -394,12 +346,86 @@ async def admin_emit_orders_initial(db, store_id: int, sid: Optional[str] = None
 
 async def admin_emit_order_updated_from_obj(order: models.Order):
     try:
-        order_data = OrderDetails.model_validate(order).model_dump(mode='json')
+        order_data = dump_model(OrderDetails.model_validate(order))
         await sio.emit("order_updated", order_data, namespace='/admin', room=f"admin_store_{order.store_id}")
     except Exception as e:
         logger.error(f'Erro ao emitir order_updated: {e}')
 
 
+def _build_tables_and_commands_payload(db, store_id: int) -> dict:
+    """Monta o payload de 'tables_and_commands_updated' (salões/mesas/comandas)"""
+    # ===== 1. BUSCA SALÕES COM MESAS E COMANDAS (COM EAGER LOADING) =====
+    saloons = db.query(models.Saloon).filter(
+        models.Saloon.store_id == store_id
+    ).options(
+        selectinload(models.Saloon.tables).selectinload(models.Tables.commands).options(
+            selectinload(models.Command.table),  # Para pegar o nome da mesa
+            selectinload(models.Command.orders).selectinload(models.Order.products)
+        )
+    ).order_by(
+        models.Saloon.display_order
+    ).all()
+
+    # ===== 2. BUSCA COMANDAS AVULSAS =====
+    standalone_commands = db.query(models.Command).filter(
+        models.Command.store_id == store_id,
+        models.Command.table_id.is_(None),
+        models.Command.status == CommandStatus.ACTIVE,
+    ).options(
+        selectinload(models.Command.orders).selectinload(models.Order.products)
+    ).order_by(
+        models.Command.created_at.desc()
+    ).all()
+
+    # ===== 3. SERIALIZA SALÕES (PROCESSANDO COMANDAS MANUALMENTE) =====
+    saloons_data = []
+    for saloon in saloons:
+        tables_data = []
+        for table in saloon.tables:
+            # ✅ Processa cada comanda com o método correto
+            commands_data = dump_list(CommandOut, [
+                CommandOut.from_orm_with_totals(cmd)
+                for cmd in table.commands
+                if cmd.status == CommandStatus.ACTIVE
+            ])
+
+            # Monta o dict da mesa
+            table_dict = {
+                'id': table.id,
+                'name': table.name,
+                'max_capacity': table.max_capacity,
+                'location_description': table.location_description,
+                'store_id': table.store_id,
+                'saloon_id': table.saloon_id,
+                'status': table.status.value if hasattr(table.status, 'value') else str(table.status),
+                'commands': commands_data,  # ✅ Comandas processadas
+            }
+            tables_data.append(table_dict)
+
+        # Monta o dict do salão
+        saloon_dict = {
+            'id': saloon.id,
+            'name': saloon.name,
+            'display_order': saloon.display_order,
+            'tables': tables_data,
+        }
+        saloons_data.append(saloon_dict)
+
+    # ===== 4. SERIALIZA COMANDAS AVULSAS =====
+    standalone_commands_data = dump_list(CommandOut, [
+        CommandOut.from_orm_with_totals(cmd)
+        for cmd in standalone_commands
+    ])
+
+    # ===== 5. MONTA PAYLOAD =====
+    return {
+        "store_id": store_id,
+        "saloons": saloons_data,
+        "standalone_commands": standalone_commands_data,
+        "standalone_commands_count": len(standalone_commands),
+    }
+
+
 async def admin_emit_tables_and_commands(db, store_id: int, sid: str | None = None):
     """
     Emite a estrutura completa de salões/mesas/comandas + comandas avulsas
@@ -407,75 +433,9 @@ async def admin_emit_tables_and_commands(db, store_id: int, sid: str | None = No
     logger.info(f"🚀 [EMIT] Preparando dados de mesas/comandas para loja {store_id}")
 
     try:
-        # ===== 1. BUSCA SALÕES COM MESAS E COMANDAS (COM EAGER LOADING) =====
-        saloons = db.query(models.Saloon).filter(
-            models.Saloon.store_id == store_id
-        ).options(
-            selectinload(models.Saloon.tables).selectinload(models.Tables.commands).options(
-                selectinload(models.Command.table),  # Para pegar o nome da mesa
-                selectinload(models.Command.orders).selectinload(models.Order.products)
-            )
-        ).order_by(
-            models.Saloon.display_order
-        ).all()
-
-        # ===== 2. BUSCA COMANDAS AVULSAS =====
-        standalone_commands = db.query(models.Command).filter(
-            models.Command.store_id == store_id,
-            models.Command.table_id.is_(None),
-            models.Command.status == CommandStatus.ACTIVE,
-        ).options(
-            selectinload(models.Command.orders).selectinload(models.Order.products)
-        ).order_by(
-            models.Command.created_at.desc()
-        ).all()
-
-        # ===== 3. SERIALIZA SALÕES (PROCESSANDO COMANDAS MANUALMENTE) =====
-        saloons_data = []
-        for saloon in saloons:
-            tables_data = []
-            for table in saloon.tables:
-                # ✅ Processa cada comanda com o método correto
-                commands_data = [
-                    CommandOut.from_orm_with_totals(cmd).model_dump(mode='json')
-                    for cmd in table.commands
-                    if cmd.status == CommandStatus.ACTIVE
-                ]
-
-                # Monta o dict da mesa
-                table_dict = {
-                    'id': table.id,
-                    'name': table.name,
-                    'max_capacity': table.max_capacity,
-                    'location_description': table.location_description,
-                    'store_id': table.store_id,
-                    'saloon_id': table.saloon_id,
-                    'status': table.status.value if hasattr(table.status, 'value') else str(table.status),
-                    'commands': commands_data,  # ✅ Comandas processadas
-                }
-                tables_data.append(table_dict)
-
-            # Monta o dict do salão
-            saloon_dict = {
-                'id': saloon.id,
-                'name': saloon.name,
-                'display_order': saloon.display_order,
-                'tables': tables_data,
-            }
-            saloons_data.append(saloon_dict)
-
-        # ===== 4. SERIALIZA COMANDAS AVULSAS =====
-        standalone_commands_data = [
-            CommandOut.from_orm_with_totals(cmd).model_dump(mode='json')
-            for cmd in standalone_commands
-        ]
-
-        # ===== 5. MONTA PAYLOAD E EMITE =====
-        payload = {
-            "store_id": store_id,
-            "saloons": saloons_data,
-            "standalone_commands": standalone_commands_data,
-        }
+        payload = await run_db(db, _build_tables_and_commands_payload, store_id)
+        saloons_data = payload["saloons"]
+        standalone_commands_count = payload.pop("standalone_commands_count")
 
         event_name = "tables_and_commands_updated"
 
@@ -486,7 +446,7 @@ async def admin_emit_tables_and_commands(db, store_id: int, sid: str | None = No
             await sio.emit(event_name, payload, namespace='/admin', room=f"admin_store_{store_id}")
             logger.info(f"✅ [EMIT] Dados enviados para sala admin_store_{store_id}")
 
-        logger.info(f"✅ [EMIT] {len(saloons_data)} salões, {len(standalone_commands_data)} comandas avulsas")
+        logger.info(f"✅ [EMIT] {len(saloons_data)} salões, {standalone_commands_count} comandas avulsas")
 
     except Exception as e:
         logger.error(f"❌ Erro ao emitir tables_and_commands: {e}", exc_info=True)
@@ -560,12 +520,10 @@ async def admin_emit_new_print_jobs(store_id: int, order_id: int, jobs: list):
 
 
 
-async def admin_emit_products_updated(db, store_id: int):
-    """
-    Busca os dados COMPLETOS do cardápio (produtos, categorias, complementos)
-    e emite para a sala do admin em um único evento otimizado.
-    """
-    print(f"📢 [ADMIN] Preparando emissão 'products_updated' para a loja {store_id}...")
+def _build_admin_products_payload(db, store_id: int) -> dict:
+    """Monta o payload completo de 'products_updated' do admin (com versão)"""
+    # Versão lida ANTES da busca: deltas posteriores são idempotentes
+    catalog_version = get_catalog_version(store_id)
 
     # 1. Busca os produtos com TODOS os relacionamentos necessários para o admin
     products_from_db = db.query(models.Product).options(
@@ -596,37 +554,59 @@ async def admin_emit_products_updated(db, store_id: int):
         selectinload(models.Category.product_links).selectinload(models.ProductCategoryLink.product)
     ).filter(models.Category.store_id == store_id).order_by(models.Category.priority).all()
 
-    # 4. Serializa todos os dados
-    products_payload = [ProductOut.model_validate(p).model_dump(mode='json') for p in products_from_db]
-    variants_payload = [Variant.model_validate(v).model_dump(mode='json') for v in all_variants_from_db]
-    categories_payload = [Category.model_validate(c).model_dump(mode='json') for c in all_categories_from_db]
+    # 4. Serializa cada lista uma única vez (JSON pronto, embutido no pacote)
+    products_payload = dump_list(ProductOut, products_from_db)
+    variants_payload = dump_list(Variant, all_variants_from_db)
+    categories_payload = dump_list(Category, all_categories_from_db)
 
-    # 5. Emite o payload completo para o admin
-    payload = {
+    return {
         'store_id': store_id,
+        'version': catalog_version,
         'products': products_payload,
         'variants': variants_payload,
         'categories': categories_payload,
     }
+
+
+async def admin_emit_products_updated(db, store_id: int, sid: str | None = None):
+    """
+    Busca os dados COMPLETOS do cardápio (produtos, categorias, complementos)
+    e emite para a sala do admin em um único evento otimizado.
+
+    Usado no join e no resync; mutações pontuais usam 'catalog_delta'.
+    """
+    print(f"📢 [ADMIN] Preparando emissão 'products_updated' para a loja {store_id}...")
+
+    # 1-4. Busca e serializa produtos, complementos e categorias
+    payload = await run_db(db, _build_admin_products_payload, store_id)
+
+    # 5. Emite o payload completo para o admin
     room_name = f'admin_store_{store_id}'
-    await sio.emit('products_updated', payload, to=room_name, namespace='/admin')
+    await sio.emit('products_updated', payload, to=sid or room_name, namespace='/admin')
 
     print(f"✅ [ADMIN] Emissão 'products_updated' (com variants e categories) para a sala: {room_name} concluída.")
 
 
 
-async def emit_chatbot_config_update(db, store_id: int):
+def _build_chatbot_config_payload(db, store_id: int) -> Optional[dict]:
+    """Serializa a configuração do chatbot (None se não existir)"""
+    config = db.query(models.StoreChatbotConfig).filter_by(store_id=store_id).first()
+    if not config:
+        return None
+
+    # Usa o Pydantic Schema para converter os dados para JSON
+    return StoreChatbotConfigSchema.model_validate(config).model_dump(mode='json')
+
+
+async def emit_chatbot_config_update(db, store_id: int, sid: str | None = None):
     """ Emite APENAS a configuração do chatbot para a loja. """
     try:
-        config = db.query(models.StoreChatbotConfig).filter_by(store_id=store_id).first()
-        if not config:
+        payload = await run_db(db, _build_chatbot_config_payload, store_id)
+        if payload is None:
             return
 
-        # Usa o Pydantic Schema para converter os dados para JSON
-        payload = StoreChatbotConfigSchema.model_validate(config).model_dump(mode='json')
-
         # Emite em um novo canal chamado 'chatbot_config_updated'
-        await sio.emit('chatbot_config_updated', payload, namespace='/admin', room=f"admin_store_{store_id}")
+        await sio.emit('chatbot_config_updated', payload, namespace='/admin', to=sid or f"admin_store_{store_id}")
         print(f"✅ [Socket] Evento DEDICADO 'chatbot_config_updated' enviado para loja {store_id}.")
     except Exception as e:
         print(f"❌ Erro ao emitir chatbot_config_updated: {e}")
@@ -680,6 +660,18 @@ async def emit_new_chat_message(db, message: models.ChatbotMessage):
     except Exception as e:
         print(f"❌ Erro ao emitir o evento '{event_name}': {e}")
 
+def _build_conversations_payload(db, store_id: int) -> list[dict]:
+    """Resumos das conversas da loja, das mais recentes para as mais antigas"""
+    # Busca todos os metadados das conversas, ordenando pelas mais recentes
+    conversations = db.query(models.ChatbotConversationMetadata) \
+        .filter_by(store_id=store_id) \
+        .order_by(models.ChatbotConversationMetadata.last_message_timestamp.desc()) \
+        .all()
+
+    # Converte os dados para o formato JSON usando o schema
+    return [ChatbotConversationSchema.model_validate(c).model_dump(mode='json') for c in conversations]
+
+
 # ✅ 2. ADICIONE ESTA NOVA FUNÇÃO NO FINAL DO ARQUIVO
 async def admin_emit_conversations_initial(db, store_id: int, sid: str | None = None):
     """
@@ -688,14 +680,7 @@ async def admin_emit_conversations_initial(db, store_id: int, sid: str | None =
     """
     print(f"🚀 [Socket] Enviando carga inicial de conversas para loja {store_id}...")
     try:
-        # Busca todos os metadados das conversas, ordenando pelas mais recentes
-        conversations = db.query(models.ChatbotConversationMetadata) \
-            .filter_by(store_id=store_id) \
-            .order_by(models.ChatbotConversationMetadata.last_message_timestamp.desc()) \
-            .all()
-
-        # Converte os dados para o formato JSON usando o schema
-        payload = [ChatbotConversationSchema.model_validate(c).model_dump(mode='json') for c in conversations]
+        payload = await run_db(db, _build_conversations_payload, store_id)
 
         event_name = "conversations_initial"
         target_room = f"admin_store_{store_id}"
@@ -705,7 +690,7 @@ async def admin_emit_conversations_initial(db, store_id: int, sid: str | None =
         else:
             await sio.emit(event_name, payload, namespace='/admin', room=target_room)
 
-        print(f"✅ [Socket] Carga inicial de {len(conversations)} conversas enviada para a loja {store_id}.")
+        print(f"✅ [Socket] Carga inicial de {len(payload)} conversas enviada para a loja {store_id}.")
 
     except Exception as e:
         print(f'❌ Erro ao emitir conversations_initial: {e}')
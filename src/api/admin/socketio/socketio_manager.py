@@ -17,6 +17,7 @@ from sqlalchemy.orm import Session
 
 from src.core import models
 from src.core.database import get_db
+from src.core.rate_limit.distributed import rate_limiter
 from src.core.utils.enums import TableStatus, OrderStatus, PaymentStatus
 
 logger = logging.getLogger(__name__)
@@ -55,9 +56,6 @@ class ConnectionManager:
         # Mapeia table_id para conjunto de session_ids observando
         self.table_watchers: Dict[int, Set[str]] = defaultdict(set)
         
-        # Rate limiting por IP
-        self.rate_limits: Dict[str, List[datetime]] = defaultdict(list)
-        
         # Métricas
         self.metrics = {
             "total_connections": 0,
@@ -78,7 +76,7 @@ class ConnectionManager:
         """Adiciona nova conexão"""
         
         # Verifica rate limit
-        if not self._check_rate_limit(ip_address):
+        if not await asyncio.to_thread(self._check_rate_limit, ip_address):
             logger.warning(f"⚠️ Rate limit excedido para IP {ip_address}")
             return False
         
@@ -144,22 +142,8 @@ class ConnectionManager:
             self.session_info[session_id]["last_activity"] = datetime.utcnow()
     
     def _check_rate_limit(self, ip_address: str, max_connections: int = 10) -> bool:
-        """Verifica rate limit por IP"""
-        now = datetime.utcnow()
-        
-        # Remove conexões antigas (mais de 1 hora)
-        self.rate_limits[ip_address] = [
-            timestamp for timestamp in self.rate_limits[ip_address]
-            if now - timestamp < timedelta(hours=1)
-        ]
-        
-        # Verifica limite
-        if len(self.rate_limits[ip_address]) >= max_connections:
-            return False
-        
-        # Adiciona nova conexão
-        self.rate_limits[ip_address].append(now)
-        return True
+        """Verifica rate limit por IP (por hora, compartilhado entre workers)"""
+        return rate_limiter.hit("socket_connect", ip_address, max_connections, 3600).allowed
     
     def get_metrics(self) -> Dict[str, Any]:
         """Retorna métricas do sistema"""
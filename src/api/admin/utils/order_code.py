@@ -1,45 +1,100 @@
+"""
+Códigos dos pedidos
+===================
+Número sequencial do dia (por loja) e código público do pedido.
+
+- sequential_id: contador por loja e dia em 'store_order_counters',
+  incrementado com UPDATE ... RETURNING (1 query, sem MAX na tabela de
+  pedidos). O primeiro pedido do dia cria a linha a partir do maior número
+  já usado no dia (pedidos criados antes do contador existir).
+- public_id: vem da sequência global 'order_public_id_seq' (na mesma query),
+  embaralhada por uma permutação Feistel de 36 bits e escrita em base 36
+  com 7 caracteres. Permutação = sem colisões, sem consulta de existência.
+  Os códigos antigos (aleatórios) têm 6 caracteres e não colidem.
+
+O lock da linha do contador dura até o fim da transação do pedido: chame
+next_order_codes o mais perto possível do commit.
+
+Autor: PDVix Team
+"""
+
 import datetime
-import random
 import string
 
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
 from src.core import models
 
+PUBLIC_ID_LENGTH = 7
+_PUBLIC_ID_ALPHABET = string.digits + string.ascii_uppercase
 
-def gerar_sequencial_do_dia(db, store_id: int) -> int:
-    hoje = datetime.date.today()
-    inicio = datetime.datetime.combine(hoje, datetime.time.min)
-    fim = datetime.datetime.combine(hoje, datetime.time.max)
-
-    ultimo_pedido = (
-        db.query(models.Order)
-        .filter(
-            models.Order.store_id == store_id,
-            models.Order.created_at >= inicio,
-            models.Order.created_at <= fim,
-        )
-        .order_by(models.Order.sequential_id.desc())
-        .first()
-    )
+# Feistel de 36 bits (2 metades de 18): 36^7 > 2^36 cabe em 7 caracteres
+_HALF_BITS = 18
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUND_KEYS = (0x2F1A3, 0x1C9E7, 0x3A5B1, 0x0D4C9)
+
+
+def _feistel_round(value: int, key: int) -> int:
+    return (((value ^ key) * 0x9E3779B1) >> 11) & _HALF_MASK
 
-    if ultimo_pedido:
-        return ultimo_pedido.sequential_id + 1
-    return 1
 
+def public_id_from_sequence(value: int) -> str:
+    """Código público (7 caracteres, único) do n-ésimo valor da sequência"""
+    if not 0 <= value < (1 << (2 * _HALF_BITS)):
+        raise ValueError(f"Sequência de public_id fora da faixa: {value}")
 
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for key in _ROUND_KEYS:
+        left, right = right, left ^ _feistel_round(right, key)
+    scrambled = (left << _HALF_BITS) | right
 
+    chars = []
+    for _ in range(PUBLIC_ID_LENGTH):
+        scrambled, digit = divmod(scrambled, len(_PUBLIC_ID_ALPHABET))
+        chars.append(_PUBLIC_ID_ALPHABET[digit])
+    return "".join(reversed(chars))
 
 
-def generate_public_id(length=6):
-    caracteres = string.ascii_uppercase + string.digits
-    return ''.join(random.choices(caracteres, k=length))
+def next_order_codes(db, store_id: int) -> tuple[int, str]:
+    """
+    Reserva o próximo número do dia da loja e um código público
 
+    Returns:
+        (sequential_id, public_id)
+    """
+    hoje = datetime.date.today()
+    counter = models.StoreOrderCounter
+    returning = (counter.last_value, models.order_public_id_seq.next_value())
+
+    row = db.execute(
+        update(counter)
+        .where(counter.store_id == store_id, counter.day == hoje)
+        .values(last_value=counter.last_value + 1)
+        .returning(*returning)
+    ).first()
 
+    if row is None:
+        # Primeiro pedido do dia: continua do maior número já usado hoje
+        inicio = datetime.datetime.combine(hoje, datetime.time.min)
+        fim = datetime.datetime.combine(hoje, datetime.time.max)
+        seed = (
+            db.query(func.coalesce(func.max(models.Order.sequential_id), 0) + 1)
+            .filter(
+                models.Order.store_id == store_id,
+                models.Order.created_at >= inicio,
+                models.Order.created_at <= fim,
+            )
+            .scalar_subquery()
+        )
 
+        statement = pg_insert(counter).values(store_id=store_id, day=hoje, last_value=seed)
+        row = db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[counter.store_id, counter.day],
+                set_={"last_value": counter.last_value + 1},
+            ).returning(*returning)
+        ).one()
 
-def generate_unique_public_id(db, store_id, max_attempts=5):
-    for _ in range(max_attempts):
-        public_id = generate_public_id()
-        existe = db.query(models.Order).filter_by(public_id=public_id, store_id=store_id).first()
-        if not existe:
-            return public_id
-    raise Exception("Falha ao gerar código público único")
+    sequential_id, public_sequence = row
+    return sequential_id, public_id_from_sequence(public_sequence)
@@ -6,10 +6,11 @@ import traceback
 from sqlalchemy.orm import selectinload, joinedload
 from pydantic import ValidationError
 
+from src.api.app.services import live_cart
 from src.api.app.utils.coupon_logic import apply_coupon
 from src.api.schemas.products.product import ProductOut
 from src.core import models
-from src.core.database import get_db_manager
+from src.core.database import get_async_db_manager, run_db
 from src.socketio_instance import sio
 from src.api.schemas.orders.cart import (CartSchema, CartItemSchema,
                                          CartItemVariantSchema, CartItemVariantOptionSchema,
@@ -185,156 +186,291 @@ def _build_cart_schema(db_cart: models.Cart) -> CartSchema:
 # =====================================================================================
 # SEÇÃO 2: EVENTOS SOCKET.IO
 # =====================================================================================
+# A lógica ORM de cada evento fica em uma função síncrona "_*_sync" executada via
+# run_db() sobre uma sessão assíncrona (asyncpg): o I/O do banco é aguardado
+# sem bloquear o event loop dos demais sockets.
+#
+# ✅ Com Redis, o carrinho ativo vive no Redis (services/live_cart): cada evento
+# é 1 script Lua + preços calculados em memória; o banco só é consultado para a
+# sessão (1ª vez), para carregar o carrinho e para produtos fora do índice.
+# Sem Redis, as funções "_*_sync" abaixo seguem gravando direto no banco.
+
+
+def _variants_for_fingerprint(update_data: UpdateCartItemInput) -> list[dict]:
+    """Converte as variantes do input para o formato de dicionário do fingerprint"""
+    variants_dict = []
+    for variant_input in update_data.variants or []:
+        variant_dict = {
+            'variant_id': variant_input.variant_id,
+            'options': [
+                {'variant_option_id': opt.variant_option_id}
+                for opt in variant_input.options
+                if opt.quantity > 0
+            ]
+        }
+        if variant_dict['options']:
+            variants_dict.append(variant_dict)
+    return variants_dict
+
+
+def _get_live_cart_sync(db, sid):
+    try:
+        identity = live_cart.resolve_session(db, sid)
+        if not identity:
+            return {'error': 'Usuário não autenticado na sessão.'}
+
+        return {"success": True, "cart": live_cart.get_cart(db, *identity)}
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro em get_or_create_cart (carrinho ao vivo): {e}\n{traceback.format_exc()}")
+        return {"error": "Erro interno."}
+
+
+def _update_live_cart_item_sync(db, sid, data):
+    try:
+        update_data = UpdateCartItemInput.model_validate(data)
+
+        identity = live_cart.resolve_session(db, sid)
+        if not identity:
+            return {'error': 'Usuário não autenticado na sessão.'}
+
+        fingerprint = _get_item_fingerprint(
+            update_data.product_id,
+            update_data.category_id,
+            _variants_for_fingerprint(update_data),
+            update_data.note
+        )
+        cart = live_cart.update_item(db, *identity, update_data, fingerprint)
+        return {"success": True, "cart": cart}
+
+    except ValidationError as e:
+        return {'error': 'Dados de entrada inválidos', 'details': e.errors()}
+    except live_cart.CartItemError as e:
+        return {'error': str(e)}
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro em update_cart_item (carrinho ao vivo): {e}\n{traceback.format_exc()}")
+        return {"error": "Erro interno ao atualizar item."}
+
+
+def _clear_live_cart_sync(db, sid):
+    try:
+        identity = live_cart.resolve_session(db, sid)
+        if not identity:
+            return {'error': 'Usuário não autenticado na sessão.'}
+
+        return {"success": True, "cart": live_cart.clear_cart(db, *identity)}
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro em clear_cart (carrinho ao vivo): {e}\n{traceback.format_exc()}")
+        return {"error": "Erro interno."}
+
+
+def _get_or_create_cart_sync(db, sid):
+    try:
+        customer_session = db.query(models.CustomerSession).filter_by(sid=sid).first()
+
+        # A validação agora é mais simples e direta.
+        if not customer_session or not customer_session.customer_id:
+            return {'error': 'Usuário não autenticado na sessão.'}
+
+        # Agora usamos os dados da customer_session para buscar o carrinho.
+        cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
+
+        if not cart:
+            # E para criar o carrinho, se ele não existir.
+            cart = models.Cart(
+                customer_id=customer_session.customer_id,
+                store_id=customer_session.store_id
+            )
+            db.add(cart)
+            db.commit()
+            db.refresh(cart)
 
-
-
-@sio.event
-async def get_or_create_cart(sid, data=None):
-    """
-    Busca o carrinho ativo de um cliente ou cria um novo.
-    """
-    print(f'[CART] Evento get_or_create_cart recebido do SID: {sid}')
-    with get_db_manager() as db:
-        try:
-
-            customer_session = db.query(models.CustomerSession).filter_by(sid=sid).first()
-
-            # A validação agora é mais simples e direta.
-            if not customer_session or not customer_session.customer_id:
-                return {'error': 'Usuário não autenticado na sessão.'}
-
-            # Agora usamos os dados da customer_session para buscar o carrinho.
-            cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
-
-            if not cart:
-                # E para criar o carrinho, se ele não existir.
-                cart = models.Cart(
-                    customer_id=customer_session.customer_id,
-                    store_id=customer_session.store_id
-                )
-                db.add(cart)
-                db.commit()
-                db.refresh(cart)
-
-            # ✅ VERIFICA E REMOVE ITENS SEM ESTOQUE DO CARRINHO
-            items_removed = []
-            for cart_item in list(cart.items):  # Lista convertida para permitir remoção durante iteração
-                product = db.query(models.Product).options(
-                    selectinload(models.Product.variant_links)
-                    .selectinload(models.ProductVariantLink.variant)
-                    .selectinload(models.Variant.options)
-                ).filter_by(id=cart_item.product_id).first()
-                
-                should_remove = False
-                reason = ""
-                
-                if not product:
-                    should_remove = True
-                    reason = "produto não encontrado"
-                elif not product.is_actually_available:
-                    should_remove = True
-                    reason = "produto sem estoque"
-                elif product.control_stock and product.stock_quantity < cart_item.quantity:
-                    should_remove = True
-                    reason = f"estoque insuficiente (disponível: {product.stock_quantity}, solicitado: {cart_item.quantity})"
-                else:
-                    # Verifica estoque das variantes (complementos)
-                    for cart_variant in cart_item.variants:
-                        for cart_option in cart_variant.options:
-                            variant_option = db.query(models.VariantOption).filter_by(
-                                id=cart_option.variant_option_id
-                            ).first()
-                            
-                            if variant_option and not variant_option.is_actually_available:
+        # ✅ VERIFICA E REMOVE ITENS SEM ESTOQUE DO CARRINHO
+        items_removed = []
+        for cart_item in list(cart.items):  # Lista convertida para permitir remoção durante iteração
+            product = db.query(models.Product).options(
+                selectinload(models.Product.variant_links)
+                .selectinload(models.ProductVariantLink.variant)
+                .selectinload(models.Variant.options)
+            ).filter_by(id=cart_item.product_id).first()
+            
+            should_remove = False
+            reason = ""
+            
+            if not product:
+                should_remove = True
+                reason = "produto não encontrado"
+            elif not product.is_actually_available:
+                should_remove = True
+                reason = "produto sem estoque"
+            elif product.control_stock and product.stock_quantity < cart_item.quantity:
+                should_remove = True
+                reason = f"estoque insuficiente (disponível: {product.stock_quantity}, solicitado: {cart_item.quantity})"
+            else:
+                # Verifica estoque das variantes (complementos)
+                for cart_variant in cart_item.variants:
+                    for cart_option in cart_variant.options:
+                        variant_option = db.query(models.VariantOption).filter_by(
+                            id=cart_option.variant_option_id
+                        ).first()
+                        
+                        if variant_option and not variant_option.is_actually_available:
+                            should_remove = True
+                            reason = f"complemento '{variant_option.resolved_name}' sem estoque"
+                            break
+                        elif variant_option and variant_option.track_inventory:
+                            total_quantity_needed = cart_option.quantity * cart_item.quantity
+                            if variant_option.stock_quantity < total_quantity_needed:
                                 should_remove = True
-                                reason = f"complemento '{variant_option.resolvedName}' sem estoque"
+                                reason = f"complemento '{variant_option.resolved_name}' com estoque insuficiente"
                                 break
-                            elif variant_option and variant_option.track_inventory:
-                                total_quantity_needed = cart_option.quantity * cart_item.quantity
-                                if variant_option.stock_quantity < total_quantity_needed:
-                                    should_remove = True
-                                    reason = f"complemento '{variant_option.resolvedName}' com estoque insuficiente"
-                                    break
-                        if should_remove:
-                            break
-                
-                if should_remove:
-                    print(f"🗑️ Removendo '{product.name if product else 'Produto desconhecido'}' do carrinho: {reason}")
-                    items_removed.append(product.name if product else 'Produto desconhecido')
-                    db.delete(cart_item)
+                    if should_remove:
+                        break
             
-            # Salva as remoções se houver
-            if items_removed:
-                db.commit()
-                db.refresh(cart)
-                print(f"✅ {len(items_removed)} itens removidos do carrinho")
+            if should_remove:
+                print(f"🗑️ Removendo '{product.name if product else 'Produto desconhecido'}' do carrinho: {reason}")
+                items_removed.append(product.name if product else 'Produto desconhecido')
+                db.delete(cart_item)
+        
+        # Salva as remoções se houver
+        if items_removed:
+            db.commit()
+            db.refresh(cart)
+            print(f"✅ {len(items_removed)} itens removidos do carrinho")
 
-            final_cart_schema = _build_cart_schema(cart)
-            return {"success": True, "cart": final_cart_schema.model_dump(mode="json")}
+        final_cart_schema = _build_cart_schema(cart)
+        return {"success": True, "cart": final_cart_schema.model_dump(mode="json")}
 
-        except Exception as e:
-            print(f"❌ Erro em get_or_create_cart: {e}\n{traceback.format_exc()}")
-            return {"error": "Erro interno."}
+    except Exception as e:
+        print(f"❌ Erro em get_or_create_cart: {e}\n{traceback.format_exc()}")
+        return {"error": "Erro interno."}
 
 
 @sio.event
-async def update_cart_item(sid, data):
+async def get_or_create_cart(sid, data=None):
     """
-    Função definitiva para adicionar, atualizar, remover ou agrupar itens no carrinho,
-    incluindo a manipulação completa de variantes e opções.
+    Busca o carrinho ativo de um cliente ou cria um novo.
     """
-    print(f'[CART] Evento update_cart_item recebido: {data}')
-    with get_db_manager() as db:
-        try:
-            # 1. Validações Iniciais
-            update_data = UpdateCartItemInput.model_validate(data)
-
-            customer_session = db.query(models.CustomerSession).filter_by(sid=sid).first()
-            if not customer_session or not customer_session.customer_id:
-                return {'error': 'Usuário não autenticado na sessão.'}
-
-            cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
-            if not cart:
-                cart = models.Cart(customer_id=customer_session.customer_id, store_id=customer_session.store_id)
-                db.add(cart)
+    print(f'[CART] Evento get_or_create_cart recebido do SID: {sid}')
+    async with get_async_db_manager() as db:
+        if live_cart.is_enabled():
+            return await run_db(db, _get_live_cart_sync, sid)
+        return await run_db(db, _get_or_create_cart_sync, sid)
+
+
+def _update_cart_item_sync(db, sid, data):
+    try:
+        # 1. Validações Iniciais
+        update_data = UpdateCartItemInput.model_validate(data)
+
+        customer_session = db.query(models.CustomerSession).filter_by(sid=sid).first()
+        if not customer_session or not customer_session.customer_id:
+            return {'error': 'Usuário não autenticado na sessão.'}
+
+        cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
+        if not cart:
+            cart = models.Cart(customer_id=customer_session.customer_id, store_id=customer_session.store_id)
+            db.add(cart)
+            db.flush()
+
+        # 2. Validação das Regras de Negócio
+        product = db.query(models.Product).options(selectinload(models.Product.variant_links)).filter_by(
+            id=update_data.product_id).first()
+        if not product:
+            return {'error': 'Produto não encontrado.'}
+
+        product_rules = {link.variant_id: link for link in product.variant_links}
+        if update_data.variants:
+            for variant_input in update_data.variants:
+                rule = product_rules.get(variant_input.variant_id)
+                if not rule or not rule.available: return {'error': 'Grupo de opção inválido.'}
+                if len(variant_input.options) < rule.min_selected_options: return {
+                    'error': f'Escolha no mínimo {rule.min_selected_options} opção(ões).'}
+                if len(variant_input.options) > rule.max_selected_options: return {
+                    'error': f'Escolha no máximo {rule.max_selected_options} opção(ões).'}
+
+        # --- LÓGICA PRINCIPAL: ADIÇÃO VS. EDIÇÃO ---
+
+        cart_item_id_to_edit = update_data.cart_item_id
+
+        # ✅ --- MODO EDIÇÃO ---
+        if cart_item_id_to_edit:
+            print(f"📝 Modo Edição para o item ID: {cart_item_id_to_edit}")
+            existing_item = db.query(models.CartItem).filter_by(id=cart_item_id_to_edit, cart_id=cart.id).first()
+
+            if not existing_item:
+                return {'error': 'Item para editar não encontrado.'}
+
+            if update_data.quantity <= 0:
+                db.delete(existing_item)
+            else:
+                existing_item.quantity = update_data.quantity
+                existing_item.note = update_data.note or None  # ✅ Garante que string vazia vira None
+                existing_item.category_id = update_data.category_id
+                
+                # Remove variantes antigas
+                for old_variant in list(existing_item.variants):
+                    db.delete(old_variant)
+                existing_item.variants.clear()
                 db.flush()
+                
+                # Adiciona novas variantes
+                if update_data.variants:
+                    for variant_input in update_data.variants:
+                        # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
+                        new_variant = models.CartItemVariant()
+                        new_variant.cart_item_id = existing_item.id
+                        new_variant.variant_id = variant_input.variant_id
+                        new_variant.store_id = customer_session.store_id
+                        db.add(new_variant)
+                        db.flush()
+                        
+                        # Adiciona opções da variante
+                        for option_input in variant_input.options:
+                            if option_input.quantity > 0:
+                                # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
+                                new_option = models.CartItemVariantOption()
+                                new_option.cart_item_variant_id = new_variant.id
+                                new_option.variant_option_id = option_input.variant_option_id
+                                new_option.quantity = option_input.quantity
+                                new_option.store_id = customer_session.store_id
+                                db.add(new_option)
+                
+                existing_item.fingerprint = _get_item_fingerprint(
+                    update_data.product_id,
+                    update_data.category_id,
+                    _variants_for_fingerprint(update_data),
+                    update_data.note
+                )
 
-            # 2. Validação das Regras de Negócio
-            product = db.query(models.Product).options(selectinload(models.Product.variant_links)).filter_by(
-                id=update_data.product_id).first()
-            if not product:
-                return {'error': 'Produto não encontrado.'}
-
-            product_rules = {link.variant_id: link for link in product.variant_links}
-            if update_data.variants:
-                for variant_input in update_data.variants:
-                    rule = product_rules.get(variant_input.variant_id)
-                    if not rule or not rule.available: return {'error': 'Grupo de opção inválido.'}
-                    if len(variant_input.options) < rule.min_selected_options: return {
-                        'error': f'Escolha no mínimo {rule.min_selected_options} opção(ões).'}
-                    if len(variant_input.options) > rule.max_selected_options: return {
-                        'error': f'Escolha no máximo {rule.max_selected_options} opção(ões).'}
-
-            # --- LÓGICA PRINCIPAL: ADIÇÃO VS. EDIÇÃO ---
-
-            cart_item_id_to_edit = update_data.cart_item_id
+        # ✅ --- MODO ADIÇÃO ---
+        else:
+            fingerprint = _get_item_fingerprint(
+                update_data.product_id,
+                update_data.category_id,
+                _variants_for_fingerprint(update_data),
+                update_data.note
+            )
 
-            # ✅ --- MODO EDIÇÃO ---
-            if cart_item_id_to_edit:
-                print(f"📝 Modo Edição para o item ID: {cart_item_id_to_edit}")
-                existing_item = db.query(models.CartItem).filter_by(id=cart_item_id_to_edit, cart_id=cart.id).first()
+            existing_item = db.query(models.CartItem).filter_by(cart_id=cart.id,
+                                                                fingerprint=fingerprint).first()
 
-                if not existing_item:
-                    return {'error': 'Item para editar não encontrado.'}
+            # ✅ LÓGICA CORRIGIDA AGORA ESTÁ DENTRO DO ELSE DO MODO ADIÇÃO
+            if existing_item:
+                existing_item.quantity += update_data.quantity
 
-                if update_data.quantity <= 0:
+                if existing_item.quantity <= 0:
+                    print(f"🗑️ Item (ID: {existing_item.id}) zerado. Removendo do carrinho.")
                     db.delete(existing_item)
                 else:
-                    existing_item.quantity = update_data.quantity
+                    print(
+                        f"🔄 Item idêntico (ID: {existing_item.id}) encontrado. Nova quantidade: {existing_item.quantity}.")
                     existing_item.note = update_data.note or None  # ✅ Garante que string vazia vira None
                     existing_item.category_id = update_data.category_id
                     
-                    # Remove variantes antigas
+                    # Remove variantes antigas e adiciona novas (mesmo que seja idêntico, atualiza para garantir consistência)
                     for old_variant in list(existing_item.variants):
                         db.delete(old_variant)
                     existing_item.variants.clear()
@@ -361,181 +497,111 @@ async def update_cart_item(sid, data):
                                     new_option.quantity = option_input.quantity
                                     new_option.store_id = customer_session.store_id
                                     db.add(new_option)
+
+            else:
+                if update_data.quantity > 0:
+                    print(f"✨ Item novo (Fingerprint: {fingerprint}). Criando no carrinho.")
+                    # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
+                    new_item = models.CartItem()
+                    new_item.cart_id = cart.id
+                    new_item.store_id = customer_session.store_id
+                    new_item.product_id = update_data.product_id
+                    new_item.category_id = update_data.category_id
+                    new_item.quantity = update_data.quantity
+                    new_item.note = update_data.note or None  # ✅ Garante que string vazia vira None
+                    new_item.fingerprint = fingerprint
+                    db.add(new_item)
+                    db.flush()
                     
-                    # Converte variants_input para formato de dicionário para fingerprint
-                    variants_dict = []
+                    # Adiciona variantes para novo item
                     if update_data.variants:
                         for variant_input in update_data.variants:
-                            variant_dict = {
-                                'variant_id': variant_input.variant_id,
-                                'options': [
-                                    {'variant_option_id': opt.variant_option_id}
-                                    for opt in variant_input.options
-                                    if opt.quantity > 0
-                                ]
-                            }
-                            if variant_dict['options']:
-                                variants_dict.append(variant_dict)
-                    
-                    existing_item.fingerprint = _get_item_fingerprint(
-                        update_data.product_id,
-                        update_data.category_id,
-                        variants_dict,
-                        update_data.note
-                    )
-
-            # ✅ --- MODO ADIÇÃO ---
-            else:
-                # Converte variants_input para formato de dicionário para fingerprint
-                variants_dict = []
-                if update_data.variants:
-                    for variant_input in update_data.variants:
-                        variant_dict = {
-                            'variant_id': variant_input.variant_id,
-                            'options': [
-                                {'variant_option_id': opt.variant_option_id}
-                                for opt in variant_input.options
-                                if opt.quantity > 0
-                            ]
-                        }
-                        if variant_dict['options']:
-                            variants_dict.append(variant_dict)
-                
-                fingerprint = _get_item_fingerprint(
-                    update_data.product_id,
-                    update_data.category_id,
-                    variants_dict,
-                    update_data.note
-                )
-
-                existing_item = db.query(models.CartItem).filter_by(cart_id=cart.id,
-                                                                    fingerprint=fingerprint).first()
+                            # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
+                            new_variant = models.CartItemVariant()
+                            new_variant.cart_item_id = new_item.id
+                            new_variant.variant_id = variant_input.variant_id
+                            new_variant.store_id = customer_session.store_id
+                            db.add(new_variant)
+                            db.flush()
+                            
+                            # Adiciona opções da variante
+                            for option_input in variant_input.options:
+                                if option_input.quantity > 0:
+                                    # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
+                                    new_option = models.CartItemVariantOption()
+                                    new_option.cart_item_variant_id = new_variant.id
+                                    new_option.variant_option_id = option_input.variant_option_id
+                                    new_option.quantity = option_input.quantity
+                                    new_option.store_id = customer_session.store_id
+                                    db.add(new_option)
 
-                # ✅ LÓGICA CORRIGIDA AGORA ESTÁ DENTRO DO ELSE DO MODO ADIÇÃO
-                if existing_item:
-                    existing_item.quantity += update_data.quantity
+        # O commit fica no final para salvar qualquer uma das operações
+        db.commit()
+        
+        # ✅ CORREÇÃO: Após commit, precisa fazer refresh do objeto cart em memória
+        # para que os novos itens criados sejam refletidos
+        db.refresh(cart)
+        # Força o carregamento lazy dos itens (se necessário)
+        _ = cart.items
+        
+        # ✅ CORREÇÃO ADICIONAL: Busca o carrinho novamente com eager loading
+        # para garantir que todos os relacionamentos estejam carregados
+        updated_cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
+        
+        if not updated_cart:
+            return {'error': 'Erro ao buscar carrinho atualizado.'}
+        
+        final_cart_schema = _build_cart_schema(updated_cart)
+        return {"success": True, "cart": final_cart_schema.model_dump(mode="json")}
+
+    except ValidationError as e:
+        return {'error': 'Dados de entrada inválidos', 'details': e.errors()}
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro em update_cart_item: {e}\n{traceback.format_exc()}")
+        return {"error": "Erro interno ao atualizar item."}
 
-                    if existing_item.quantity <= 0:
-                        print(f"🗑️ Item (ID: {existing_item.id}) zerado. Removendo do carrinho.")
-                        db.delete(existing_item)
-                    else:
-                        print(
-                            f"🔄 Item idêntico (ID: {existing_item.id}) encontrado. Nova quantidade: {existing_item.quantity}.")
-                        existing_item.note = update_data.note or None  # ✅ Garante que string vazia vira None
-                        existing_item.category_id = update_data.category_id
-                        
-                        # Remove variantes antigas e adiciona novas (mesmo que seja idêntico, atualiza para garantir consistência)
-                        for old_variant in list(existing_item.variants):
-                            db.delete(old_variant)
-                        existing_item.variants.clear()
-                        db.flush()
-                        
-                        # Adiciona novas variantes
-                        if update_data.variants:
-                            for variant_input in update_data.variants:
-                                # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
-                                new_variant = models.CartItemVariant()
-                                new_variant.cart_item_id = existing_item.id
-                                new_variant.variant_id = variant_input.variant_id
-                                new_variant.store_id = customer_session.store_id
-                                db.add(new_variant)
-                                db.flush()
-                                
-                                # Adiciona opções da variante
-                                for option_input in variant_input.options:
-                                    if option_input.quantity > 0:
-                                        # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
-                                        new_option = models.CartItemVariantOption()
-                                        new_option.cart_item_variant_id = new_variant.id
-                                        new_option.variant_option_id = option_input.variant_option_id
-                                        new_option.quantity = option_input.quantity
-                                        new_option.store_id = customer_session.store_id
-                                        db.add(new_option)
 
-                else:
-                    if update_data.quantity > 0:
-                        print(f"✨ Item novo (Fingerprint: {fingerprint}). Criando no carrinho.")
-                        # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
-                        new_item = models.CartItem()
-                        new_item.cart_id = cart.id
-                        new_item.store_id = customer_session.store_id
-                        new_item.product_id = update_data.product_id
-                        new_item.category_id = update_data.category_id
-                        new_item.quantity = update_data.quantity
-                        new_item.note = update_data.note or None  # ✅ Garante que string vazia vira None
-                        new_item.fingerprint = fingerprint
-                        db.add(new_item)
-                        db.flush()
-                        
-                        # Adiciona variantes para novo item
-                        if update_data.variants:
-                            for variant_input in update_data.variants:
-                                # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
-                                new_variant = models.CartItemVariant()
-                                new_variant.cart_item_id = new_item.id
-                                new_variant.variant_id = variant_input.variant_id
-                                new_variant.store_id = customer_session.store_id
-                                db.add(new_variant)
-                                db.flush()
-                                
-                                # Adiciona opções da variante
-                                for option_input in variant_input.options:
-                                    if option_input.quantity > 0:
-                                        # ✅ CORREÇÃO: SQLAlchemy com Mapped precisa atribuir valores após criação
-                                        new_option = models.CartItemVariantOption()
-                                        new_option.cart_item_variant_id = new_variant.id
-                                        new_option.variant_option_id = option_input.variant_option_id
-                                        new_option.quantity = option_input.quantity
-                                        new_option.store_id = customer_session.store_id
-                                        db.add(new_option)
-
-            # O commit fica no final para salvar qualquer uma das operações
+@sio.event
+async def update_cart_item(sid, data):
+    """
+    Função definitiva para adicionar, atualizar, remover ou agrupar itens no carrinho,
+    incluindo a manipulação completa de variantes e opções.
+    """
+    print(f'[CART] Evento update_cart_item recebido: {data}')
+    async with get_async_db_manager() as db:
+        if live_cart.is_enabled():
+            return await run_db(db, _update_live_cart_item_sync, sid, data)
+        return await run_db(db, _update_cart_item_sync, sid, data)
+
+
+def _clear_cart_sync(db, sid):
+    try:
+        # ✅ CORREÇÃO: Busca na tabela correta 'CustomerSession'
+        session = db.query(models.CustomerSession).filter_by(sid=sid).first()
+        if not session or not session.customer_id:
+            return {'error': 'Usuário não autenticado na sessão.'}
+
+        cart = _get_full_cart_query(db, session.customer_id, session.store_id)
+        if cart:
+            cart.items = []
+            cart.coupon_id = None  # Também limpa o cupom
+            cart.coupon_code = None
             db.commit()
-            
-            # ✅ CORREÇÃO: Após commit, precisa fazer refresh do objeto cart em memória
-            # para que os novos itens criados sejam refletidos
-            db.refresh(cart)
-            # Força o carregamento lazy dos itens (se necessário)
-            _ = cart.items
-            
-            # ✅ CORREÇÃO ADICIONAL: Busca o carrinho novamente com eager loading
-            # para garantir que todos os relacionamentos estejam carregados
-            updated_cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
-            
-            if not updated_cart:
-                return {'error': 'Erro ao buscar carrinho atualizado.'}
-            
-            final_cart_schema = _build_cart_schema(updated_cart)
-            return {"success": True, "cart": final_cart_schema.model_dump(mode="json")}
+        updated_cart = _get_full_cart_query(db, session.customer_id, session.store_id)
+        final_cart_schema = _build_cart_schema(updated_cart)
+        return {"success": True, "cart": final_cart_schema.model_dump(mode="json")}
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro em clear_cart: {e}\n{traceback.format_exc()}")
+        return {"error": "Erro interno."}
 
-        except ValidationError as e:
-            return {'error': 'Dados de entrada inválidos', 'details': e.errors()}
-        except Exception as e:
-            db.rollback()
-            print(f"❌ Erro em update_cart_item: {e}\n{traceback.format_exc()}")
-            return {"error": "Erro interno ao atualizar item."}
 
 @sio.event
 async def clear_cart(sid, data=None):
     # (Este evento permanece o mesmo, sua lógica já era sólida)
     print(f'[CART] Evento clear_cart recebido do SID: {sid}')
-    with get_db_manager() as db:
-        try:
-            # ✅ CORREÇÃO: Busca na tabela correta 'CustomerSession'
-            session = db.query(models.CustomerSession).filter_by(sid=sid).first()
-            if not session or not session.customer_id:
-                return {'error': 'Usuário não autenticado na sessão.'}
-
-            cart = _get_full_cart_query(db, session.customer_id, session.store_id)
-            if cart:
-                cart.items = []
-                cart.coupon_id = None  # Também limpa o cupom
-                cart.coupon_code = None
-                db.commit()
-            updated_cart = _get_full_cart_query(db, session.customer_id, session.store_id)
-            final_cart_schema = _build_cart_schema(updated_cart)
-            return {"success": True, "cart": final_cart_schema.model_dump(mode="json")}
-        except Exception as e:
-            db.rollback()
-            print(f"❌ Erro em clear_cart: {e}\n{traceback.format_exc()}")
-            return {"error": "Erro interno."}
\ No newline at end of file
+    async with get_async_db_manager() as db:
+        if live_cart.is_enabled():
+            return await run_db(db, _clear_live_cart_sync, sid)
+        return await run_db(db, _clear_cart_sync, sid)
@@ -9,13 +9,19 @@ from socketio.exceptions import ConnectionRefusedError
 
 from src.api.admin.services.store_service import StoreService
 from src.api.admin.services.subscription_service import SubscriptionService
+from src.api.admin.socketio.catalog_sync import get_catalog_version
+from src.api.app.services import live_cart
 from src.api.app.services.connection_token_service import ConnectionTokenService
-from src.api.app.services.rating import get_store_ratings_summary, get_product_ratings_summary
+from src.api.app.services.initial_state_snapshot import (
+    get_store_view_version, get_cached_initial_state, cache_initial_state
+)
+from src.api.app.socketio.socketio_emitters import emit_products_updated
+from src.api.app.services.rating import get_store_ratings_summary, get_all_ratings_summaries_for_store
 from src.api.crud import store_crud
 from src.api.schemas.products.rating import RatingsSummaryOut
 from src.api.schemas.store.store_details import StoreDetails
 from src.core import models
-from src.core.database import get_db_manager
+from src.core.database import get_db_manager, get_async_db_manager, run_db
 
 # Configura um logger específico para este módulo para melhor rastreabilidade
 logger = getLogger(__name__)
@@ -34,107 +40,35 @@ async def handler_totem_on_connect(self, sid, environ):
         logger.warning(f"❌ [CONEXÃO] {sid} recusada: `connection_token` ausente na query.")
         raise ConnectionRefusedError("Connection token missing")
 
-    with get_db_manager() as db:
+    async with get_async_db_manager() as db:
         try:
-            totem_auth = ConnectionTokenService.validate_and_consume_token(db, connection_token)
-
-            if not totem_auth:
-                logger.warning(f"❌ [CONEXÃO] {sid} recusada: Token de conexão inválido, expirado ou já utilizado.")
-                raise ConnectionRefusedError("Invalid, expired, or used connection token.")
-
-            store_id = totem_auth.store_id
-            logger.info(f"🏪 [CONEXÃO] {sid} autorizado com sucesso para a loja ID: {store_id}")
-
-            customer_session = models.CustomerSession(sid=sid, store_id=store_id, customer_id=None)
-            db.add(customer_session)
-            db.commit()
-            logger.info(f"📝 [SESSÃO] CustomerSession criada para o SID {sid} na loja {store_id}.")
+            store_id = await run_db(db, _authorize_totem_session_sync, sid, connection_token)
 
             await self.enter_room(sid, f"store_{store_id}")
             logger.info(f"🚪 [SALA] SID {sid} adicionado à sala 'store_{store_id}'.")
 
-            logger.info(f"⏳ [DADOS] Buscando estado inicial para a loja {store_id}...")
-            store = store_crud.get_store_for_customer_view(db=db, store_id=store_id)
-            if not store:
-                logger.error(f"❌ [DADOS] Loja {store_id} não encontrada no banco após autorização bem-sucedida.")
-                raise ConnectionRefusedError(f"Store {store_id} not found.")
-
-            # ═══════════════════════════════════════════════════════════════════════════
-            # ✅ USA O MESMO SERVIÇO DO ADMIN - DRY (Don't Repeat Yourself)
-            # ═══════════════════════════════════════════════════════════════════════════
-
-            logger.info(f"🔍 [DEBUG] Buscando subscription details...")
-            subscription_details = SubscriptionService.get_enriched_subscription(store, db)
-
-            if not subscription_details:
-                logger.error(f"❌ [ASSINATURA] Não foi possível obter os detalhes da assinatura para a loja {store_id}.")
-                raise ConnectionRefusedError("Subscription details not found.")
-
-            logger.info(
-                f"✅ [DEBUG] Subscription obtida: status={subscription_details.get('status')}, is_blocked={subscription_details.get('is_blocked')}")
-
-            # ✅ USA O STORESERVICE PARA MONTAR O PAYLOAD (igual ao admin)
-            logger.info(f"🔍 [DEBUG] Montando payload completo da loja com StoreService...")
-            store_dict = StoreService.get_store_complete_payload(store=store, db=db)
-            logger.info(f"✅ [DEBUG] Payload montado com sucesso")
-
-            # ✅ CONVERTE DICT PARA SCHEMA (mas ainda é mutável como dict)
-            # NÃO convertemos para Pydantic ainda, mantemos como dict para poder modificar
-            logger.info(f"✅ [DEBUG] Payload em formato dict")
-
-            # ✅ ADICIONA RATINGS DA LOJA
-            store_ratings = get_store_ratings_summary(db, store_id=store.id)
-            store_dict['ratingsSummary'] = store_ratings
-
-            # ✅ ADICIONA RATINGS DOS PRODUTOS (modifica o dict antes de validar)
-            logger.info(f"🔍 [DEBUG] Adicionando ratings dos produtos...")
-            product_ratings = {p.id: get_product_ratings_summary(db, product_id=p.id) for p in store.products}
-
-            # Modifica os produtos no dict (não no schema Pydantic)
-            if 'products' in store_dict and store_dict['products']:
-                for product_dict in store_dict['products']:
-                    if isinstance(product_dict, dict):
-                        product_dict['rating'] = product_ratings.get(product_dict.get('id'))
-
-            logger.info(f"✅ [DEBUG] Ratings dos produtos adicionados")
-
-            # ✅ AGORA VALIDA COM PYDANTIC (depois de adicionar os ratings)
-            logger.info(f"🔍 [DEBUG] Validando store_dict com Pydantic...")
-            store_schema = StoreDetails.model_validate(store_dict)
-            logger.info(f"✅ [DEBUG] Validação Pydantic concluída")
-
-            # ✅ APLICA STATUS OPERACIONAL BASEADO NA ASSINATURA
-            is_blocked = subscription_details.get('is_blocked', True)
-            is_operational = not is_blocked
-
-            if store_schema.store_operation_config:
-                # ✅ CORREÇÃO: Use model_copy para modificar schema imutável
-                store_schema.store_operation_config = store_schema.store_operation_config.model_copy(
-                    update={'is_operational': is_operational}
-                )
-                logger.info(f"✅ [STATUS] is_operational definido como: {is_operational}")
-            else:
-                logger.warning(f"⚠️ [STATUS] store_operation_config é None para loja {store_id}")
+            # ✅ SNAPSHOT VERSIONADO: versão lida ANTES da montagem
+            view_version = get_store_view_version(store_id)
+            initial_state_payload = (
+                get_cached_initial_state(store_id, view_version) if view_version is not None else None
+            )
 
-            if is_blocked:
-                logger.warning(
-                    f"⚠️ [STATUS] Loja {store_id} está BLOQUEADA: {subscription_details.get('warning_message')}")
+            if initial_state_payload is None:
+                initial_state_payload = await run_db(db, _build_totem_initial_state_sync, store_id)
+                if view_version is not None:
+                    cache_initial_state(store_id, view_version, initial_state_payload)
             else:
-                logger.info(
-                    f"✅ [STATUS] Loja {store_id} está OPERACIONAL (Status: {subscription_details.get('status')})")
+                logger.info(f"⚡ [SNAPSHOT] Estado inicial da loja {store_id} servido do cache (v{view_version})")
 
-            # ✅ MONTA PAYLOAD FINAL
-            initial_state_payload = {
-                "store": store_schema,
-                "theme": store.theme,
-                "products": store_schema.products,
-                "banners": store.banners
-            }
+            # ✅ STATUS OPERACIONAL POR CONEXÃO: o bloqueio da assinatura muda
+            # com a data, sem bump da versão do snapshot
+            is_blocked = await run_db(db, SubscriptionService.is_store_blocked, store_id)
+            initial_state_payload = _with_operational_status(initial_state_payload, not is_blocked)
 
             # ✅ ENVIA PARA O CLIENTE
             await self.emit(
                 "initial_state_loaded",
-                jsonable_encoder(initial_state_payload),
+                initial_state_payload,
                 to=sid
             )
             logger.info(f"🚀 [PAYLOAD] Estado inicial enviado com sucesso para o SID {sid}.")
@@ -143,7 +77,7 @@ async def handler_totem_on_connect(self, sid, environ):
             logger.error(f"❌ [CONNECTION REFUSED] SID {sid}: {str(cre)}")
             raise cre
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             logger.error("=" * 80)
             logger.error(f"❌ [ERRO CRÍTICO] Erro inesperado durante a conexão do SID {sid}")
             logger.error(f"   ├─ Tipo: {e.__class__.__name__}")
@@ -154,12 +88,171 @@ async def handler_totem_on_connect(self, sid, environ):
             raise ConnectionRefusedError("Internal server error during connection setup.")
 
 
+def _authorize_totem_session_sync(db, sid: str, connection_token: str) -> int:
+    """
+    Valida/consome o token de conexão e cria a CustomerSession do SID.
+
+    Executada via run_db() na sessão assíncrona.
+
+    Returns:
+        ID da loja autorizada
+    """
+    totem_auth = ConnectionTokenService.validate_and_consume_token(db, connection_token)
+
+    if not totem_auth:
+        logger.warning(f"❌ [CONEXÃO] {sid} recusada: Token de conexão inválido, expirado ou já utilizado.")
+        raise ConnectionRefusedError("Invalid, expired, or used connection token.")
+
+    store_id = totem_auth.store_id
+    logger.info(f"🏪 [CONEXÃO] {sid} autorizado com sucesso para a loja ID: {store_id}")
+
+    customer_session = models.CustomerSession(sid=sid, store_id=store_id, customer_id=None)
+    db.add(customer_session)
+    db.commit()
+    logger.info(f"📝 [SESSÃO] CustomerSession criada para o SID {sid} na loja {store_id}.")
+
+    return store_id
+
+
+def _with_operational_status(payload: dict, is_operational: bool) -> dict:
+    """
+    Aplica o is_operational atual ao payload do estado inicial.
+
+    O snapshot é compartilhado entre conexões (L1): nunca é alterado no
+    lugar, só copiado no caminho até store_operation_config.
+    """
+    store = payload.get("store") or {}
+    operation_config = store.get("store_operation_config")
+    if not operation_config or operation_config.get("is_operational") == is_operational:
+        return payload
+
+    return {
+        **payload,
+        "store": {
+            **store,
+            "store_operation_config": {**operation_config, "is_operational": is_operational},
+        },
+    }
+
+
+def _build_totem_initial_state_sync(db, store_id: int) -> dict:
+    """
+    Monta o payload 'initial_state_loaded' (já serializado em JSON) da loja.
+
+    Executada via run_db() na sessão assíncrona: os lazy loads de theme/banners
+    acontecem dentro do run_sync, por isso a serialização também fica aqui.
+    """
+    logger.info(f"⏳ [DADOS] Buscando estado inicial para a loja {store_id}...")
+    # Versão lida ANTES da busca: deltas posteriores são idempotentes
+    catalog_version = get_catalog_version(store_id)
+    store = store_crud.get_store_for_customer_view(db=db, store_id=store_id)
+    if not store:
+        logger.error(f"❌ [DADOS] Loja {store_id} não encontrada no banco após autorização bem-sucedida.")
+        raise ConnectionRefusedError(f"Store {store_id} not found.")
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # ✅ USA O MESMO SERVIÇO DO ADMIN - DRY (Don't Repeat Yourself)
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    logger.info(f"🔍 [DEBUG] Buscando subscription details...")
+    subscription_details = SubscriptionService.get_enriched_subscription(store, db)
+
+    if not subscription_details:
+        logger.error(f"❌ [ASSINATURA] Não foi possível obter os detalhes da assinatura para a loja {store_id}.")
+        raise ConnectionRefusedError("Subscription details not found.")
+
+    logger.info(
+        f"✅ [DEBUG] Subscription obtida: status={subscription_details.get('status')}, is_blocked={subscription_details.get('is_blocked')}")
+
+    # ✅ USA O STORESERVICE PARA MONTAR O PAYLOAD (igual ao admin)
+    logger.info(f"🔍 [DEBUG] Montando payload completo da loja com StoreService...")
+    store_dict = StoreService.get_store_complete_payload(store=store, db=db)
+    logger.info(f"✅ [DEBUG] Payload montado com sucesso")
+
+    # ✅ CONVERTE DICT PARA SCHEMA (mas ainda é mutável como dict)
+    # NÃO convertemos para Pydantic ainda, mantemos como dict para poder modificar
+    logger.info(f"✅ [DEBUG] Payload em formato dict")
+
+    # ✅ ADICIONA RATINGS DA LOJA
+    # Agregados O(1) + primeira página; o resto via GET /app/store-ratings/store/{id}
+    store_ratings = get_store_ratings_summary(db, store_id=store.id, limit=20)
+    store_dict['ratingsSummary'] = store_ratings
+
+    # ✅ ADICIONA RATINGS DOS PRODUTOS (modifica o dict antes de validar)
+    # Uma única query agrupada para a loja inteira; a lista de avaliações
+    # é buscada sob demanda (GET /app/product-ratings/product/{id})
+    logger.info(f"🔍 [DEBUG] Adicionando ratings dos produtos...")
+    product_ratings = get_all_ratings_summaries_for_store(db, store_id=store.id)
+
+    # Modifica os produtos no dict (não no schema Pydantic)
+    if 'products' in store_dict and store_dict['products']:
+        for product_dict in store_dict['products']:
+            if isinstance(product_dict, dict):
+                product_dict['rating'] = product_ratings.get(product_dict.get('id'))
+
+    logger.info(f"✅ [DEBUG] Ratings dos produtos adicionados")
+
+    # ✅ AGORA VALIDA COM PYDANTIC (depois de adicionar os ratings)
+    logger.info(f"🔍 [DEBUG] Validando store_dict com Pydantic...")
+    store_schema = StoreDetails.model_validate(store_dict)
+    logger.info(f"✅ [DEBUG] Validação Pydantic concluída")
+
+    # ✅ APLICA STATUS OPERACIONAL BASEADO NA ASSINATURA
+    is_blocked = subscription_details.get('is_blocked', True)
+    is_operational = not is_blocked
+
+    if store_schema.store_operation_config:
+        # ✅ CORREÇÃO: Use model_copy para modificar schema imutável
+        store_schema.store_operation_config = store_schema.store_operation_config.model_copy(
+            update={'is_operational': is_operational}
+        )
+        logger.info(f"✅ [STATUS] is_operational definido como: {is_operational}")
+    else:
+        logger.warning(f"⚠️ [STATUS] store_operation_config é None para loja {store_id}")
+
+    if is_blocked:
+        logger.warning(
+            f"⚠️ [STATUS] Loja {store_id} está BLOQUEADA: {subscription_details.get('warning_message')}")
+    else:
+        logger.info(
+            f"✅ [STATUS] Loja {store_id} está OPERACIONAL (Status: {subscription_details.get('status')})")
+
+    # ✅ MONTA PAYLOAD FINAL
+    initial_state_payload = {
+        "catalog_version": catalog_version,
+        "store": store_schema,
+        "theme": store.theme,
+        "products": store_schema.products,
+        "banners": store.banners
+    }
+
+    return jsonable_encoder(initial_state_payload)
+
+
+async def handler_totem_catalog_resync(self, sid, data=None):
+    """
+    Reenvia o cardápio completo APENAS para o cliente que detectou um buraco
+    na sequência de versões do 'catalog_delta'.
+    A loja vem da sessão do socket, nunca do payload do cliente.
+    """
+    with get_db_manager() as db:
+        session = db.query(models.CustomerSession).filter_by(sid=sid).first()
+        if not session:
+            return {'error': 'Sessão não encontrada.'}
+
+        logger.info(f"🔁 [RESYNC] SID {sid} pediu resync do cardápio da loja {session.store_id}")
+        await emit_products_updated(db, session.store_id, sid=sid)
+
+    return {'success': True}
+
+
 async def handler_totem_on_disconnect(self, sid):
     """
     Handler para quando um cliente se desconecta.
     Limpa a sessão do cliente do banco de dados.
     """
     logger.info(f"🔌 [DESCONEXÃO] Cliente desconectado: {sid}")
+    live_cart.forget_session(sid)
     with get_db_manager() as db:
         try:
             session = db.query(models.CustomerSession).filter_by(sid=sid).first()
@@ -5,6 +5,7 @@ from pydantic import ValidationError
 from sqlalchemy.orm import selectinload
 
 from src.api.admin.utils.coupon_validator import CouponValidator
+from src.api.app.services import live_cart
 # --- Importações do Projeto ---
 from src.core import models
 from src.core.database import get_db_manager
@@ -63,6 +64,8 @@ async def apply_coupon_to_cart(sid, data):
             if not coupon:
                 return {'error': 'Cupom inválido.'}
 
+            # O validador lê o carrinho do banco: grava antes o carrinho ao vivo (Redis)
+            live_cart.persist_cart(db, session.customer_id, session.store_id)
             cart = _get_full_cart_query(db, session.customer_id, session.store_id)
             customer = db.query(models.Customer).filter_by(id=session.customer_id).first()
 
@@ -81,6 +84,10 @@ async def apply_coupon_to_cart(sid, data):
             db.commit()
 
             # 4. Retorna o estado completo e atualizado do carrinho
+            if live_cart.is_enabled():
+                updated = live_cart.set_coupon(db, session.customer_id, session.store_id, coupon.id, coupon.code)
+                return {"success": True, "cart": updated}
+
             updated_cart = _get_full_cart_query(db, session.customer_id, session.store_id)
             final_schema = _build_cart_schema(updated_cart) # Você precisará ajustar _build_cart_schema para aplicar o desconto
             return {"success": True, "cart": final_schema.model_dump(mode="json")}
@@ -102,7 +109,7 @@ async def remove_coupon_from_cart(sid, data=None):
     print(f"[COUPON] Evento remove_coupon_from_cart recebido")
     with get_db_manager() as db:
         try:
-            session = db.query(models.StoreSession).filter_by(sid=sid).first()
+            session = db.query(models.CustomerSession).filter_by(sid=sid).first()
             if not session or not session.customer_id:
                 return {'error': 'Usuário não autenticado'}
 
@@ -112,6 +119,10 @@ async def remove_coupon_from_cart(sid, data=None):
                 cart.coupon_code = None
                 db.commit()
 
+            if live_cart.is_enabled():
+                updated = live_cart.set_coupon(db, session.customer_id, session.store_id, None, None)
+                return {"success": True, "cart": updated}
+
             updated_cart = _get_full_cart_query(db, session.customer_id, session.store_id)
             final_schema = _build_cart_schema(updated_cart)
             return {"success": True, "cart": final_schema.model_dump(mode="json")}
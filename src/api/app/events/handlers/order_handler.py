@@ -1,15 +1,17 @@
 
 from typing import cast
-from sqlalchemy.orm import selectinload
 
 from src.api.admin.events.handlers.order_handler import process_new_order_automations
+from src.api.admin.services.stock_service import InsufficientStockError, reserve_stock_for_order
+from src.api.admin.socketio.catalog_sync import emit_stock_change
 from src.api.admin.socketio.emitters import admin_emit_order_updated_from_obj
-from src.api.admin.utils.order_code import generate_unique_public_id, gerar_sequencial_do_dia
+from src.api.admin.utils.order_code import next_order_codes
+from src.api.app.services import live_cart
 
 
 from src.core import models
 
-from src.core.database import get_db_manager
+from src.core.database import get_db_manager, get_async_db_manager, run_db
 from src.core.utils.enums import OrderStatus, SalesChannel, PaymentStatus, ProductStatus
 
 from src.socketio_instance import sio
@@ -25,222 +27,243 @@ from ...utils.coupon_logic import apply_coupon
 
 
 
-@sio.event
-async def create_order_from_cart(sid, data):
+def _create_order_from_cart_sync(db, sid, data) -> dict:
     """
-    O novo evento para finalizar um pedido. Lê o carrinho do banco de dados,
-    garantindo máxima segurança e consistência.
+    Transação de criação do pedido (carrinho → pedido), executada via run_db().
+
+    Returns:
+        {"order_id": ...} em caso de sucesso ou {"error": ...}
     """
-    print(f'[ORDER] Evento create_order_from_cart recebido: {data}')
-    with get_db_manager() as db:
-        try:
-            # 1. VALIDAÇÕES INICIAIS
-            input_data = CreateOrderInput.model_validate(data)
-
-            customer_session = db.query(models.CustomerSession).filter_by(sid=sid).first()
-            if not customer_session or not customer_session.customer_id:
-                return {'error': 'Usuário não autenticado na sessão.'}
-
-            customer = db.query(models.Customer).filter_by(id=customer_session.customer_id).first()
-            if not customer:
-                return {'error': 'Cliente não encontrado'}
-
-            # 2. ✅ BUSCA O CARRINHO DO BANCO DE DADOS (A FONTE DA VERDADE)
-            cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
-            if not cart or not cart.items:
-                return {'error': 'Seu carrinho está vazio.'}
-
-            # 2.1. ✅ VALIDAÇÃO DE ESTOQUE ANTES DE CRIAR O PEDIDO
-            stock_validation_errors = []
-            for cart_item in cart.items:
-                # Carrega o produto com relacionamentos necessários
-                product = db.query(models.Product).options(
-                    selectinload(models.Product.variant_links)
-                    .selectinload(models.ProductVariantLink.variant)
-                    .selectinload(models.Variant.options)
-                ).filter_by(id=cart_item.product_id).first()
-                
-                if not product:
-                    stock_validation_errors.append(f"Produto '{cart_item.product.name}' não encontrado.")
-                    continue
-                
-                # Valida estoque do produto principal
-                if not product.is_actually_available:
-                    stock_validation_errors.append(
-                        f"Produto '{product.name}' está sem estoque."
-                    )
-                    continue
-                
-                # Valida se a quantidade solicitada está disponível
-                if product.control_stock and product.stock_quantity < cart_item.quantity:
-                    stock_validation_errors.append(
-                        f"Produto '{product.name}': estoque insuficiente. Disponível: {product.stock_quantity}, solicitado: {cart_item.quantity}."
-                    )
-                
-                # Valida estoque das variantes (complementos)
-                for cart_variant in cart_item.variants:
-                    for cart_option in cart_variant.options:
-                        variant_option = db.query(models.VariantOption).filter_by(
-                            id=cart_option.variant_option_id
-                        ).first()
-                        
-                        if variant_option and not variant_option.is_actually_available:
-                            stock_validation_errors.append(
-                                f"Complemento '{variant_option.resolvedName}' do produto '{product.name}' está sem estoque."
-                            )
-                        elif variant_option and variant_option.track_inventory:
-                            # Calcula quantidade total necessária (quantidade do complemento * quantidade do item)
-                            total_quantity_needed = cart_option.quantity * cart_item.quantity
-                            if variant_option.stock_quantity < total_quantity_needed:
-                                stock_validation_errors.append(
-                                    f"Complemento '{variant_option.resolvedName}' do produto '{product.name}': estoque insuficiente. "
-                                    f"Disponível: {variant_option.stock_quantity}, necessário: {total_quantity_needed}."
-                                )
-            
-            if stock_validation_errors:
-                return {'error': 'Erro de estoque: ' + '; '.join(stock_validation_errors)}
-
-            # ✅ A CORREÇÃO FINAL ESTÁ AQUI
-            payment_activation = db.query(models.StorePaymentMethodActivation).filter_by(
-                platform_payment_method_id=input_data.payment_method_id,  # Procura pelo ID da plataforma
-                store_id=customer_session.store_id,
-                is_active=True
-            ).first()
+    try:
+        # 1. VALIDAÇÕES INICIAIS
+        input_data = CreateOrderInput.model_validate(data)
+
+        customer_session = db.query(models.CustomerSession).filter_by(sid=sid).first()
+        if not customer_session or not customer_session.customer_id:
+            return {'error': 'Usuário não autenticado na sessão.'}
+
+        customer = db.query(models.Customer).filter_by(id=customer_session.customer_id).first()
+        if not customer:
+            return {'error': 'Cliente não encontrado'}
+
+        # 2. ✅ BUSCA O CARRINHO DO BANCO DE DADOS (A FONTE DA VERDADE)
+        # O carrinho ao vivo (Redis) é gravado antes, nesta mesma transação
+        live_cart.persist_cart(db, customer_session.customer_id, customer_session.store_id)
+        cart = _get_full_cart_query(db, customer_session.customer_id, customer_session.store_id)
+        if not cart or not cart.items:
+            return {'error': 'Seu carrinho está vazio.'}
+
+        # 2.1. ✅ VALIDAÇÃO DE DISPONIBILIDADE ANTES DE CRIAR O PEDIDO
+        # Usa os produtos/complementos já carregados com o carrinho; as
+        # quantidades são garantidas pela reserva de estoque (passo 7.1)
+        stock_validation_errors = []
+        for cart_item in cart.items:
+            product = cart_item.product
+            if not product:
+                stock_validation_errors.append("Produto do carrinho não encontrado.")
+                continue
+
+            if not product.is_actually_available:
+                stock_validation_errors.append(
+                    f"Produto '{product.name}' está sem estoque."
+                )
+                continue
+
+            for cart_variant in cart_item.variants:
+                for cart_option in cart_variant.options:
+                    variant_option = cart_option.variant_option
+                    if variant_option and not variant_option.is_actually_available:
+                        stock_validation_errors.append(
+                            f"Complemento '{variant_option.resolved_name}' do produto '{product.name}' está sem estoque."
+                        )
+
+        if stock_validation_errors:
+            return {'error': 'Erro de estoque: ' + '; '.join(stock_validation_errors)}
+
+        # ✅ A CORREÇÃO FINAL ESTÁ AQUI
+        payment_activation = db.query(models.StorePaymentMethodActivation).filter_by(
+            platform_payment_method_id=input_data.payment_method_id,  # Procura pelo ID da plataforma
+            store_id=customer_session.store_id,
+            is_active=True
+        ).first()
+
+        if not payment_activation:
+            # Agora esta mensagem só aparecerá se a forma de pagamento for realmente inválida
+            return {'error': 'Forma de pagamento inválida ou inativa para esta loja.'}
+
+
+        address = None
+        if input_data.delivery_type == 'delivery':
+            address = db.query(models.Address).filter_by(id=input_data.address_id,
+                                                                 customer_id=customer_session.customer_id).first()
+            if not address: return {'error': 'Endereço inválido.'}
+
+        # 4. CRIA O OBJETO `Order` COM DADOS CONFIÁVEIS
+        db_order = models.Order(
+            store_id=customer_session.store_id,
+            customer_id=customer.id,
+            customer_name=customer.name,
+            customer_phone=customer.phone,
+            payment_method_id=payment_activation.id,
+            payment_method_name=payment_activation.platform_method.name,
+            order_type=SalesChannel.MENU,
+            delivery_type=input_data.delivery_type,
+            observation=input_data.observation,
+            needs_change=input_data.needs_change,
+            change_amount=input_data.change_for,
+            delivery_fee = input_data.delivery_fee,
+            payment_status=PaymentStatus.PENDING,
+            order_status=OrderStatus.PENDING,
+            is_scheduled=input_data.is_scheduled or False,
+            scheduled_for=input_data.scheduled_for
+        )
+
+        if address:
+            db_order.street = address.street
+            db_order.number = address.number
+            db_order.complement = address.reference
+            db_order.neighborhood = address.neighborhood_name  # ✅ Correto: usa o campo de texto
+            db_order.city = address.city_name  # ✅ Correto: usa o campo de texto
+        # 5. MAPEIA OS ITENS DO CARRINHO PARA ITENS DE PEDIDO E CALCULA O SUBTOTAL
+        subtotal = 0
+        for cart_item in cart.items:
+            # ✅ --- LÓGICA DE PREÇO CORRIGIDA (IGUAL A DO CARRINHO) --- ✅
+
+            # 1. Encontra o link da categoria para saber o preço base correto
+            link = next(
+                (l for l in cart_item.product.category_links if l.category_id == cart_item.category_id),
+                None
+            )
+            if not link:
+                # Isso não deve acontecer se os dados estiverem consistentes, mas é um fallback seguro
+                raise Exception(
+                    f"Não foi possível encontrar o preço para o produto {cart_item.product_id} na categoria {cart_item.category_id}")
+
+            base_price = link.promotional_price if link.is_on_promotion else link.price
 
-            if not payment_activation:
-                # Agora esta mensagem só aparecerá se a forma de pagamento for realmente inválida
-                return {'error': 'Forma de pagamento inválida ou inativa para esta loja.'}
+            # 2. Usa a propriedade correta (.resolved_price) para as opções
+            variants_price = sum(
+                opt.variant_option.resolved_price * opt.quantity for v in cart_item.variants for opt in v.options)
 
+            # O preço final do item é o preço base (da categoria) + o preço dos complementos
+            final_item_price = base_price + variants_price
 
-            address = None
-            if input_data.delivery_type == 'delivery':
-                address = db.query(models.Address).filter_by(id=input_data.address_id,
-                                                                     customer_id=customer_session.customer_id).first()
-                if not address: return {'error': 'Endereço inválido.'}
+            subtotal += final_item_price * cart_item.quantity
 
-            # 4. CRIA O OBJETO `Order` COM DADOS CONFIÁVEIS
-            db_order = models.Order(
-                sequential_id=gerar_sequencial_do_dia(db, customer_session.store_id),
-                public_id=generate_unique_public_id(db, customer_session.store_id),
+            # --- FIM DA CORREÇÃO DE LÓGICA DE PREÇO ---
+
+            # Cria o OrderProduct a partir do CartItem
+            order_product = models.OrderProduct(
                 store_id=customer_session.store_id,
-                customer_id=customer.id,
-                customer_name=customer.name,
-                customer_phone=customer.phone,
-                payment_method_id=payment_activation.id,
-                payment_method_name=payment_activation.platform_method.name,
-                order_type=SalesChannel.MENU,
-                delivery_type=input_data.delivery_type,
-                observation=input_data.observation,
-                needs_change=input_data.needs_change,
-                change_amount=input_data.change_for,
-                delivery_fee = input_data.delivery_fee,
-                payment_status=PaymentStatus.PENDING,
-                order_status=OrderStatus.PENDING,
-                is_scheduled=input_data.is_scheduled or False,
-                scheduled_for=input_data.scheduled_for
+                product_id=cart_item.product_id,
+                category_id=cart_item.category_id,
+                name=cart_item.product.name,
+                price=final_item_price,  # Usa o preço final calculado
+                quantity=cart_item.quantity,
+                note=cart_item.note,
+                image_url=cart_item.product.image_path,
+                original_price=base_price,  # Salva o preço base sem os adicionais
             )
 
-            if address:
-                db_order.street = address.street
-                db_order.number = address.number
-                db_order.complement = address.reference
-                db_order.neighborhood = address.neighborhood_name  # ✅ Correto: usa o campo de texto
-                db_order.city = address.city_name  # ✅ Correto: usa o campo de texto
-            # 5. MAPEIA OS ITENS DO CARRINHO PARA ITENS DE PEDIDO E CALCULA O SUBTOTAL
-            subtotal = 0
-            for cart_item in cart.items:
-                # ✅ --- LÓGICA DE PREÇO CORRIGIDA (IGUAL A DO CARRINHO) --- ✅
-
-                # 1. Encontra o link da categoria para saber o preço base correto
-                link = next(
-                    (l for l in cart_item.product.category_links if l.category_id == cart_item.category_id),
-                    None
+            # Mapeia as variantes e opções do carrinho para o pedido
+            for cart_variant in cart_item.variants:
+                order_variant = models.OrderVariant(
+                    store_id=customer_session.store_id,
+                    variant_id=cart_variant.variant_id,
+                    name=cart_variant.variant.name
                 )
-                if not link:
-                    # Isso não deve acontecer se os dados estiverem consistentes, mas é um fallback seguro
-                    raise Exception(
-                        f"Não foi possível encontrar o preço para o produto {cart_item.product_id} na categoria {cart_item.category_id}")
+                for cart_option in cart_variant.options:
+                    order_variant.options.append(models.OrderVariantOption(
+                        store_id=customer_session.store_id,
+                        variant_option_id=cart_option.variant_option_id,
+                        name=cart_option.variant_option.resolved_name,
+                        # ✅ 3. Usa a propriedade correta aqui também
+                        price=cart_option.variant_option.resolved_price,
+                        quantity=cart_option.quantity,
+                    ))
+                order_product.variants.append(order_variant)
+            db_order.products.append(order_product)
 
-                base_price = link.promotional_price if link.is_on_promotion else link.price
+        db_order.subtotal_price = subtotal
 
-                # 2. Usa a propriedade correta (.resolved_price) para as opções
-                variants_price = sum(
-                    opt.variant_option.resolved_price * opt.quantity for v in cart_item.variants for opt in v.options)
+        # 6. APLICA DESCONTOS E TOTAIS FINAIS (VERSÃO CORRIGIDA)
+        discount = 0
 
-                # O preço final do item é o preço base (da categoria) + o preço dos complementos
-                final_item_price = base_price + variants_price
 
-                subtotal += final_item_price * cart_item.quantity
+        coupon = cast(models.Coupon, cart.coupon)
+        if coupon and coupon.is_now_valid(subtotal_in_cents=subtotal, customer=customer):
+            if coupon.product_id is None:  # Garante que é um cupom de carrinho
+                _, discount = apply_coupon(coupon, subtotal)
+                db_order.coupon = coupon
 
-                # --- FIM DA CORREÇÃO DE LÓGICA DE PREÇO ---
+        db_order.discount_amount = discount
 
-                # Cria o OrderProduct a partir do CartItem
-                order_product = models.OrderProduct(
-                    store_id=customer_session.store_id,
-                    product_id=cart_item.product_id,
-                    category_id=cart_item.category_id,
-                    name=cart_item.product.name,
-                    price=final_item_price,  # Usa o preço final calculado
-                    quantity=cart_item.quantity,
-                    note=cart_item.note,
-                    image_url=cart_item.product.image_path,
-                    original_price=base_price,  # Salva o preço base sem os adicionais
-                )
+        db_order.total_price = subtotal + db_order.delivery_fee
+        db_order.discounted_total_price = (subtotal - discount) + db_order.delivery_fee
 
-                # Mapeia as variantes e opções do carrinho para o pedido
-                for cart_variant in cart_item.variants:
-                    order_variant = models.OrderVariant(
-                        store_id=customer_session.store_id,
-                        variant_id=cart_variant.variant_id,
-                        name=cart_variant.variant.name
-                    )
-                    for cart_option in cart_variant.options:
-                        order_variant.options.append(models.OrderVariantOption(
-                            store_id=customer_session.store_id,
-                            variant_option_id=cart_option.variant_option_id,
-                            name=cart_option.variant_option.resolved_name,
-                            # ✅ 3. Usa a propriedade correta aqui também
-                            price=cart_option.variant_option.resolved_price,
-                            quantity=cart_option.quantity,
-                        ))
-                    order_product.variants.append(order_variant)
-                db_order.products.append(order_product)
 
-            db_order.subtotal_price = subtotal
+        # 7. ATUALIZA O STATUS DO CARRINHO E DO CUPOM
+        cart.status = models.CartStatus.COMPLETED
+        if db_order.coupon:
+            db_order.coupon.used += 1
 
-            # 6. APLICA DESCONTOS E TOTAIS FINAIS (VERSÃO CORRIGIDA)
-            discount = 0
+        # 7.1. ✅ RESERVA O ESTOQUE (atômica, na mesma transação do pedido)
+        try:
+            stock_change = reserve_stock_for_order(db_order, db)
+        except InsufficientStockError as e:
+            db.rollback()
+            return {'error': 'Erro de estoque: ' + '; '.join(e.shortages)}
 
+        # 7.2. ✅ NUMERAÇÃO DO PEDIDO (por último: o contador da loja fica travado até o commit)
+        with db.no_autoflush:
+            db_order.sequential_id, db_order.public_id = next_order_codes(db, customer_session.store_id)
 
-            coupon = cast(models.Coupon, cart.coupon)
-            if coupon and coupon.is_now_valid(subtotal_in_cents=subtotal, customer=customer):
-                if coupon.product_id is None:  # Garante que é um cupom de carrinho
-                    _, discount = apply_coupon(coupon, subtotal)
-                    db_order.coupon = coupon
+        # 8. SALVA TUDO NO BANCO
+        db.add(db_order)
+        db.commit()
+        db.refresh(db_order)
 
-            db_order.discount_amount = discount
+        # O carrinho virou pedido: o próximo nasce vazio do banco
+        live_cart.discard_cart(customer_session.customer_id, customer_session.store_id)
 
-            db_order.total_price = subtotal + db_order.delivery_fee
-            db_order.discounted_total_price = (subtotal - discount) + db_order.delivery_fee
+        return {"order_id": db_order.id, "stock_change": stock_change}
 
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro em create_order_from_cart: {e}\n{traceback.format_exc()}")
+        return {"error": f"Erro interno ao criar pedido: {str(e)}"}
 
-            # 7. ATUALIZA O STATUS DO CARRINHO E DO CUPOM
-            cart.status = models.CartStatus.COMPLETED
-            if db_order.coupon:
-                db_order.coupon.used += 1
 
-            # 8. SALVA TUDO NO BANCO E DISPARA AUTOMAÇÕES
-            db.add(db_order)
-            db.commit()
-            db.refresh(db_order)
+@sio.event
+async def create_order_from_cart(sid, data):
+    """
+    O novo evento para finalizar um pedido. Lê o carrinho do banco de dados,
+    garantindo máxima segurança e consistência.
+    """
+    print(f'[ORDER] Evento create_order_from_cart recebido: {data}')
+    # 1-8. Validação e gravação do pedido na sessão assíncrona (não bloqueia o event loop)
+    async with get_async_db_manager() as db:
+        result = await run_db(db, _create_order_from_cart_sync, sid, data)
+
+    if 'error' in result:
+        return result
+
+    # 9. AUTOMAÇÕES E NOTIFICAÇÕES
+    # Continuam na sessão síncrona: as tarefas de notificação disparadas pelas
+    # automações reutilizam a sessão e os lazy loads do pedido fora do run_sync.
+    with get_db_manager() as db:
+        try:
+            db_order = db.get(models.Order, result['order_id'])
 
             # Reutiliza suas funções de automação
             await process_new_order_automations(db, db_order)
             await admin_emit_order_updated_from_obj(db_order)
+            # ✅ Estoque reservado: atualiza o cardápio dos produtos alterados
+            await emit_stock_change(db, db_order.store_id, result['stock_change'])
 
             return {"success": True, "order": OrderSchema.model_validate(db_order).model_dump()}
 
         except Exception as e:
             db.rollback()
-            print(f"❌ Erro em create_order_from_cart: {e}\n{traceback.format_exc()}")
-            return {"error": f"Erro interno ao criar pedido: {str(e)}"}
\ No newline at end of file
+            print(f"❌ Erro nas automações de create_order_from_cart: {e}\n{traceback.format_exc()}")
+            return {"error": f"Erro interno ao criar pedido: {str(e)}"}
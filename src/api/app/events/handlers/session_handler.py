@@ -1,5 +1,6 @@
 # Em: app/events/handlers/session_handler.py (ou totem_namespace.py)
 
+from src.api.app.services import live_cart
 from src.core import models
 from src.core.database import get_db_manager
 from src.socketio_instance import sio
@@ -33,6 +34,7 @@ async def link_customer_to_session(sid, data):
             #    A sessão deixa de ser anônima e agora pertence a este cliente.
             session.customer_id = customer.id
             db.commit()
+            live_cart.forget_session(sid)
 
             print(f"✅ [SESSÃO] Sessão {sid} agora está vinculada ao cliente ID {customer.id}")
             return {"success": True}
@@ -1,13 +1,17 @@
 # src/api/app/events/totem_namespace.py
 
-from socketio import AsyncNamespace
+from src.core.monitoring.socketio_metrics import InstrumentedNamespace
 
 
-from src.api.app.events.handlers.connection_handler import handler_totem_on_connect, handler_totem_on_disconnect
+from src.api.app.events.handlers.connection_handler import (
+    handler_totem_on_connect,
+    handler_totem_on_disconnect,
+    handler_totem_catalog_resync,
+)
 
 
 
-class TotemNamespace(AsyncNamespace):
+class TotemNamespace(InstrumentedNamespace):
     def __init__(self, namespace=None):
         super().__init__(namespace or "/")
 
@@ -17,3 +21,6 @@ class TotemNamespace(AsyncNamespace):
 
     async def on_disconnect(self, sid):
         await handler_totem_on_disconnect(self, sid)
+
+    async def on_catalog_resync(self, sid, data=None):
+        return await handler_totem_catalog_resync(self, sid, data)
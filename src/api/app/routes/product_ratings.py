@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
-from src.api.schemas.products.rating import ProductRatingCreate, RatingOut
+from src.api.app.services.rating import get_product_ratings_summary, apply_product_rating_change
+from src.api.schemas.products.rating import ProductRatingCreate, RatingOut, RatingsSummaryOut
 from src.core.database import GetDBDep
 from src.core.models import ProductRating
 
@@ -27,7 +28,21 @@ def create_product_rating(data: ProductRatingCreate, db: GetDBDep, user_id: int
     )
 
     db.add(new_rating)
+    apply_product_rating_change(db, data.product_id, None, data.stars)
     db.commit()
     db.refresh(new_rating)
     return new_rating
 
+
+@router.get("/product/{product_id}", response_model=RatingsSummaryOut)
+def get_product_ratings(
+    product_id: int,
+    db: GetDBDep,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Avaliações de um produto, buscadas sob demanda quando o cliente abre
+    as avaliações (o cardápio traz apenas o resumo).
+    """
+    return get_product_ratings_summary(db, product_id=product_id, skip=skip, limit=limit)
@@ -5,6 +5,7 @@ from src.api.schemas.store.review import ReviewCreate
 from src.core.database import GetDBDep
 from src.core import models
 from src.core.dependencies import get_current_customer_dep
+from src.api.app.services.rating import apply_store_rating_change
 
 router = APIRouter(tags=["Reviews"], prefix="/reviews")
 
@@ -42,8 +43,8 @@ def submit_order_review(
     )
 
     db.add(new_review)
+    # Agregados da loja atualizados na mesma transação
+    apply_store_rating_change(db, order.store_id, None, review_in.stars)
     db.commit()
 
-    # Opcional: Recalcular a média de avaliações da loja aqui
-
     return {"message": "Avaliação recebida com sucesso. Obrigado!"}
\ No newline at end of file
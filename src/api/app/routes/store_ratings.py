@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 
-from src.api.schemas.products.rating import StoreRatingCreate, RatingOut
+from src.api.app.services.rating import get_store_ratings_summary, apply_store_rating_change
+from src.api.schemas.products.rating import StoreRatingCreate, RatingOut, RatingsSummaryOut
 from src.core.database import GetDBDep
 from src.core.models import StoreRating
 
@@ -27,6 +28,20 @@ def create_store_rating(data: StoreRatingCreate, db: GetDBDep, user_id: int = 1)
     )
 
     db.add(new_rating)
+    apply_store_rating_change(db, data.store_id, None, data.stars)
     db.commit()
     db.refresh(new_rating)
     return new_rating
+
+
+@router.get("/store/{store_id}", response_model=RatingsSummaryOut)
+def get_store_ratings(
+    store_id: int,
+    db: GetDBDep,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Avaliações da loja paginadas (o estado inicial do totem traz só a primeira página).
+    """
+    return get_store_ratings_summary(db, store_id=store_id, skip=skip, limit=limit)
@@ -0,0 +1,117 @@
+# src/api/app/services/initial_state_snapshot.py
+
+"""
+Initial State Snapshot
+======================
+
+Snapshot por loja do payload 'initial_state_loaded' do totem.
+
+No pico, centenas de clientes abrem o mesmo cardápio em poucos minutos.
+Em vez de remontar a loja inteira a cada conexão, o payload é:
+
+- Serializado UMA vez e guardado como JSON pronto no Redis (L2)
+- Mantido já desserializado em memória no worker (L1)
+- Versionado pela versão do conteúdo público da loja
+  (CacheKeys.store_view_version, incrementada por cache_manager.on_store_view_change)
+
+Uma conexão passa a ser: GET da versão + leitura do snapshot + envio.
+O is_operational (bloqueio da assinatura) depende da data e não bumpa a
+versão: o connection_handler o recalcula por conexão sobre o snapshot.
+Pedidos só bumpam quando um produto ou complemento zera ou volta a ter
+estoque (StockChange.availability_changed): a disponibilidade do snapshot
+fica sempre certa, a quantidade pode ficar atrasada até o próximo bump e o
+totem conectado a recebe pelos deltas do cardápio.
+
+Sem Redis não há versão compartilhada entre workers: o snapshot é
+desativado e o payload é montado a cada conexão (comportamento anterior).
+
+Autor: PDVix Team
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Optional
+
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+# L1: store_id -> (versão, expira_em, payload)
+_l1: dict[int, tuple[int, float, dict]] = {}
+_l1_lock = threading.Lock()
+
+
+def get_store_view_version(store_id: int) -> Optional[int]:
+    """
+    Versão atual do conteúdo público da loja
+
+    Returns:
+        Versão (0 se nunca houve mutação) ou None se o Redis estiver indisponível
+    """
+    if not redis_client.is_available:
+        return None
+
+    value = redis_client.get(CacheKeys.store_view_version(store_id))
+    return int(value) if value is not None else 0
+
+
+def get_cached_initial_state(store_id: int, version: int) -> Optional[dict]:
+    """
+    Busca o snapshot da versão informada (L1 → L2)
+
+    Returns:
+        Payload pronto para envio ou None (cache miss)
+    """
+    now = time.monotonic()
+
+    with _l1_lock:
+        entry = _l1.get(store_id)
+        if entry and entry[0] == version and entry[1] > now:
+            return entry[2]
+
+    raw = redis_client.get_raw(CacheKeys.totem_initial_state(store_id, version))
+    if raw is None:
+        return None
+
+    try:
+        payload = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        logger.error(f"❌ Snapshot corrompido da loja {store_id} (v{version}): {e}")
+        return None
+
+    _store_l1(store_id, version, payload)
+    return payload
+
+
+def cache_initial_state(store_id: int, version: int, payload: dict) -> None:
+    """
+    Guarda o snapshot (payload já passado pelo jsonable_encoder) no L2 e no L1
+
+    A versão deve ter sido lida ANTES da montagem: se o conteúdo mudar
+    durante a montagem, o snapshot fica numa versão que ninguém mais lê.
+    """
+    encoded = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    redis_client.set_raw(
+        CacheKeys.totem_initial_state(store_id, version),
+        encoded,
+        ttl=config.TOTEM_SNAPSHOT_TTL_SECONDS
+    )
+    _store_l1(store_id, version, payload)
+    logger.info(f"📦 [SNAPSHOT] initial_state da loja {store_id} v{version} armazenado ({len(encoded)} bytes)")
+
+
+def _store_l1(store_id: int, version: int, payload: dict) -> None:
+    expires_at = time.monotonic() + config.TOTEM_SNAPSHOT_TTL_SECONDS
+
+    with _l1_lock:
+        _l1.pop(store_id, None)
+        _l1[store_id] = (version, expires_at, payload)
+
+        # Remove as lojas mais antigas (ordem de inserção) acima do limite
+        while len(_l1) > config.TOTEM_SNAPSHOT_L1_MAX_STORES:
+            _l1.pop(next(iter(_l1)))
@@ -0,0 +1,908 @@
+# src/api/app/services/live_cart.py
+
+"""
+Live Cart
+=========
+
+Carrinho ativo do cardápio num hash do Redis, com gravação posterior
+(write-behind) em 'carts'/'cart_items'.
+
+Problema: cada update_cart_item rodava duas vezes a árvore de
+joinedload/selectinload do carrinho, buscava o produto e cada complemento,
+fazia commit e remontava o CartSchema. O carrinho é estado quente e
+efêmero de um único cliente.
+
+Como funciona:
+- Hash CacheKeys.live_cart: cart_id, meta (cupom/observação), seq,
+  item:{id} (JSON), qty:{id} e fp:{fingerprint} → id
+- Adicionar/editar/remover/limpar = 1 script Lua (1 ida ao Redis), que já
+  devolve o hash inteiro e a versão do conteúdo da loja
+- Totais calculados no processo com o índice de preços da loja em memória
+  (StorePriceIndex), versionado por CacheKeys.store_view_version: só vão ao
+  banco os produtos que ainda não estão no índice
+- Primeiro acesso (ou carrinho expirado no Redis): carrega do banco
+- Uma thread grava os carrinhos alterados (CacheKeys.live_cart_dirty) a cada
+  LIVE_CART_PERSIST_INTERVAL_MS: recuperação de carrinho abandonado e
+  limpeza continuam lendo 'carts'/'cart_items'
+- Criação do pedido e cupons gravam o carrinho na própria transação antes
+  de ler o banco
+
+Sem Redis, o cart_handler segue no fluxo antigo (direto no banco).
+
+Autor: PDVix Team
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import selectinload
+
+from src.api.admin.services.catalog_service import load_store_products
+from src.api.app.utils.coupon_logic import apply_coupon
+from src.api.schemas.products.product import ProductOut
+from src.core import models
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.config import config
+from src.core.database import get_db_manager
+
+logger = logging.getLogger(__name__)
+
+
+class CartItemError(Exception):
+    """Item recusado pelas regras do produto (a mensagem vai para o cliente)"""
+
+
+# ═══════════════════════════════════════════════════════════
+# SCRIPTS LUA
+# ═══════════════════════════════════════════════════════════
+
+# KEYS: carrinho, set de carrinhos sujos, versão do conteúdo da loja
+# ARGV: modo, ttl, membro do set de sujos, argumentos do modo...
+# Retorno: {0} se o carrinho não está no Redis, senão {status, HGETALL, versão}
+# (status -1 = item da edição não encontrado)
+_MUTATE_SCRIPT = """
+local cart = KEYS[1]
+if redis.call('EXISTS', cart) == 0 then
+    return {0}
+end
+
+local mode = ARGV[1]
+local status = 1
+
+local function drop_fingerprint(id, raw)
+    local fp = 'fp:' .. cjson.decode(raw)['fingerprint']
+    if redis.call('HGET', cart, fp) == id then
+        redis.call('HDEL', cart, fp)
+    end
+end
+
+if mode == 'add' then
+    -- fingerprint, item (JSON), quantidade: item idêntico soma a quantidade
+    local quantity = tonumber(ARGV[6])
+    local id = redis.call('HGET', cart, 'fp:' .. ARGV[4])
+    if id then
+        if redis.call('HINCRBY', cart, 'qty:' .. id, quantity) <= 0 then
+            redis.call('HDEL', cart, 'item:' .. id, 'qty:' .. id, 'fp:' .. ARGV[4])
+        else
+            redis.call('HSET', cart, 'item:' .. id, ARGV[5])
+        end
+    elseif quantity > 0 then
+        id = redis.call('HINCRBY', cart, 'seq', 1)
+        redis.call('HSET', cart, 'item:' .. id, ARGV[5], 'qty:' .. id, quantity, 'fp:' .. ARGV[4], id)
+    end
+elseif mode == 'edit' then
+    -- id do item, fingerprint, item (JSON), quantidade (0 remove)
+    local id = ARGV[4]
+    local current = redis.call('HGET', cart, 'item:' .. id)
+    if not current then
+        status = -1
+    else
+        drop_fingerprint(id, current)
+        if tonumber(ARGV[7]) <= 0 then
+            redis.call('HDEL', cart, 'item:' .. id, 'qty:' .. id)
+        else
+            redis.call('HSET', cart, 'item:' .. id, ARGV[6], 'qty:' .. id, ARGV[7], 'fp:' .. ARGV[5], id)
+        end
+    end
+elseif mode == 'remove' then
+    -- ids dos itens
+    for i = 4, #ARGV do
+        local current = redis.call('HGET', cart, 'item:' .. ARGV[i])
+        if current then
+            drop_fingerprint(ARGV[i], current)
+            redis.call('HDEL', cart, 'item:' .. ARGV[i], 'qty:' .. ARGV[i])
+        end
+    end
+elseif mode == 'clear' or mode == 'coupon' then
+    -- clear: remove itens e cupom; coupon: id e código do cupom ('' remove)
+    if mode == 'clear' then
+        for _, field in ipairs(redis.call('HKEYS', cart)) do
+            if string.find(field, '^item:') or string.find(field, '^qty:') or string.find(field, '^fp:') then
+                redis.call('HDEL', cart, field)
+            end
+        end
+    end
+    local meta = cjson.decode(redis.call('HGET', cart, 'meta') or '{}')
+    meta['coupon_id'] = tonumber(ARGV[4] or '')
+    meta['coupon_code'] = (ARGV[5] ~= nil and ARGV[5] ~= '') and ARGV[5] or nil
+    redis.call('HSET', cart, 'meta', cjson.encode(meta))
+end
+-- 'read': só renova o TTL e devolve o estado
+
+redis.call('EXPIRE', cart, ARGV[2])
+if status == 1 and mode ~= 'read' then
+    redis.call('SADD', KEYS[2], ARGV[3])
+end
+return {status, redis.call('HGETALL', cart), redis.call('GET', KEYS[3]) or '0'}
+"""
+
+# KEYS: carrinho; ARGV: ttl, campo, valor, ... (não sobrescreve um carrinho já carregado)
+_SEED_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return 1
+"""
+
+_scripts: dict[str, object] = {}
+
+
+def _script(source: str):
+    script = _scripts.get(source)
+    if script is None:
+        script = redis_client.register_script(source)
+        if script is None:
+            raise RedisError("Redis indisponível")
+        _scripts[source] = script
+    return script
+
+
+def is_enabled() -> bool:
+    """Carrinho ao vivo ativo (depende do Redis)"""
+    return redis_client.is_available
+
+
+# ═══════════════════════════════════════════════════════════
+# SESSÃO → CLIENTE (CACHE DO WORKER)
+# ═══════════════════════════════════════════════════════════
+
+# sid -> (customer_id, store_id); só sessões já vinculadas a um cliente
+_sessions: dict[str, tuple[int, int]] = {}
+_sessions_lock = threading.Lock()
+_MAX_SESSIONS = 50000
+
+
+def resolve_session(db, sid: str) -> Optional[tuple[int, int]]:
+    """
+    Cliente e loja da sessão do totem (consulta o banco só na 1ª vez)
+
+    Returns:
+        (customer_id, store_id) ou None se a sessão não tem cliente
+    """
+    identity = _sessions.get(sid)
+    if identity is not None:
+        return identity
+
+    session = db.query(models.CustomerSession).filter_by(sid=sid).first()
+    if not session or not session.customer_id:
+        return None
+
+    identity = (session.customer_id, session.store_id)
+    with _sessions_lock:
+        _sessions[sid] = identity
+        while len(_sessions) > _MAX_SESSIONS:
+            _sessions.pop(next(iter(_sessions)))
+    return identity
+
+
+def forget_session(sid: str) -> None:
+    """Descarta o cache da sessão (vínculo de cliente alterado ou desconexão)"""
+    with _sessions_lock:
+        _sessions.pop(sid, None)
+
+
+# ═══════════════════════════════════════════════════════════
+# ÍNDICE DE PREÇOS POR LOJA (L1 DO WORKER)
+# ═══════════════════════════════════════════════════════════
+
+class _ProductPricing(NamedTuple):
+    payload: dict  # ProductOut (JSON)
+    base_prices: dict[int, int]  # category_id -> preço base (promocional se ativo)
+    rules: dict[int, tuple[bool, int, int]]  # variant_id -> (available, mínimo, máximo)
+    variant_names: dict[int, str]
+    name: str
+    available: bool
+    control_stock: bool
+    stock_quantity: int
+
+
+class _OptionPricing(NamedTuple):
+    name: str
+    price: int
+    available: bool
+    track_inventory: bool
+    stock_quantity: int
+
+
+class _CouponPricing(NamedTuple):
+    # Mesmos nomes do models.Coupon (apply_coupon lê os atributos)
+    discount_type: str
+    discount_value: float
+    is_active: bool
+    start_date: datetime
+    end_date: datetime
+
+
+class StorePriceIndex:
+    """
+    ✅ Preços, regras de complementos e cupons de uma loja, carregados sob
+    demanda e válidos para uma versão do conteúdo da loja
+    """
+
+    def __init__(self, store_id: int, version: Optional[int]):
+        self.store_id = store_id
+        self.version = version
+        # None = produto/cupom inexistente (evita consultar de novo)
+        self.products: dict[int, Optional[_ProductPricing]] = {}
+        self.options: dict[int, _OptionPricing] = {}
+        self.coupons: dict[int, Optional[_CouponPricing]] = {}
+
+    def ensure(self, db, product_ids, coupon_id: Optional[int] = None) -> None:
+        """Carrega do banco o que ainda não está no índice"""
+        missing = {product_id for product_id in product_ids if product_id not in self.products}
+        if missing:
+            self._load_products(db, missing)
+
+        if coupon_id and coupon_id not in self.coupons:
+            coupon = db.get(models.Coupon, coupon_id)
+            self.coupons[coupon_id] = _CouponPricing(
+                coupon.discount_type, coupon.discount_value, coupon.is_active, coupon.start_date, coupon.end_date
+            ) if coupon and coupon.store_id == self.store_id else None
+
+    def _load_products(self, db, product_ids: set[int]) -> None:
+        products = load_store_products(db, self.store_id, product_ids)
+
+        for product in products.values():
+            self.products[product.id] = _ProductPricing(
+                payload=ProductOut.model_validate(product).model_dump(mode="json"),
+                base_prices={
+                    link.category_id: link.promotional_price if link.is_on_promotion else link.price
+                    for link in product.category_links
+                },
+                rules={
+                    link.variant_id: (link.available, link.min_selected_options, link.max_selected_options)
+                    for link in product.variant_links
+                },
+                variant_names={link.variant_id: link.variant.name for link in product.variant_links},
+                name=product.name,
+                available=product.is_actually_available,
+                control_stock=product.control_stock,
+                stock_quantity=product.stock_quantity,
+            )
+            for link in product.variant_links:
+                for option in link.variant.options:
+                    self.options[option.id] = _OptionPricing(
+                        option.resolved_name,
+                        option.resolved_price,
+                        option.is_actually_available,
+                        option.track_inventory,
+                        option.stock_quantity,
+                    )
+
+        for product_id in product_ids - products.keys():
+            self.products[product_id] = None
+
+
+_indexes: dict[int, StorePriceIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _price_index(store_id: int, version: Optional[int] = None) -> StorePriceIndex:
+    """
+    Índice da loja; com 'version', descarta o índice de outra versão
+
+    Sem versão (validação antes do script) serve o índice atual, mesmo que
+    atrasado: a criação do pedido revalida tudo no banco.
+    """
+    with _indexes_lock:
+        index = _indexes.get(store_id)
+        if index is not None and (version is None or index.version == version):
+            return index
+
+        index = StorePriceIndex(store_id, version)
+        _indexes.pop(store_id, None)
+        _indexes[store_id] = index
+
+        # Remove as lojas mais antigas (ordem de inserção) acima do limite
+        while len(_indexes) > config.LIVE_CART_PRICE_INDEX_MAX_STORES:
+            _indexes.pop(next(iter(_indexes)))
+        return index
+
+
+# ═══════════════════════════════════════════════════════════
+# ESTADO DO CARRINHO
+# ═══════════════════════════════════════════════════════════
+
+class _LiveCart(NamedTuple):
+    cart_id: int
+    meta: dict  # coupon_id, coupon_code, observation
+    items: list[dict]  # id, product_id, category_id, note, fingerprint, variants, quantity
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def _decode_cart(fields: dict[str, str]) -> _LiveCart:
+    items = []
+    for field, value in fields.items():
+        if field.startswith("item:"):
+            item_id = int(field[5:])
+            item = json.loads(value)
+            item["id"] = item_id
+            item["quantity"] = int(fields.get(f"qty:{item_id}", 0))
+            items.append(item)
+
+    items.sort(key=lambda item: item["id"])
+    return _LiveCart(int(fields.get("cart_id", 0)), json.loads(fields.get("meta") or "{}"), items)
+
+
+def _member(store_id: int, customer_id: int) -> str:
+    return f"{store_id}:{customer_id}"
+
+
+def _seed(db, customer_id: int, store_id: int) -> None:
+    """Carrega o carrinho ativo do banco (criando se não existir) para o Redis"""
+    cart = db.query(models.Cart).options(
+        selectinload(models.Cart.items)
+        .selectinload(models.CartItem.variants)
+        .selectinload(models.CartItemVariant.options)
+    ).filter(
+        models.Cart.customer_id == customer_id,
+        models.Cart.store_id == store_id,
+        models.Cart.status == models.CartStatus.ACTIVE
+    ).first()
+
+    items = []
+    if cart:
+        items = cart.items
+    else:
+        cart = models.Cart(customer_id=customer_id, store_id=store_id)
+        db.add(cart)
+        db.commit()
+
+    fields = {
+        "cart_id": cart.id,
+        "meta": json.dumps({
+            "coupon_id": cart.coupon_id,
+            "coupon_code": cart.coupon_code,
+            "observation": cart.observation,
+        }),
+        "seq": max((item.id for item in items), default=0),
+    }
+    for item in items:
+        fields[f"item:{item.id}"] = _item_json(item.product_id, item.category_id, item.note, item.fingerprint, [
+            {
+                "variant_id": variant.variant_id,
+                "options": [
+                    {"variant_option_id": option.variant_option_id, "quantity": option.quantity}
+                    for option in variant.options
+                ],
+            }
+            for variant in item.variants
+        ])
+        fields[f"qty:{item.id}"] = item.quantity
+        fields[f"fp:{item.fingerprint}"] = item.id
+
+    args = [config.LIVE_CART_TTL_SECONDS]
+    for field, value in fields.items():
+        args.extend((field, value))
+    _script(_SEED_SCRIPT)(keys=[CacheKeys.live_cart(store_id, customer_id)], args=args)
+    logger.debug(f"🛒 Carrinho {cart.id} (cliente {customer_id}, loja {store_id}) carregado no Redis")
+
+
+def _item_json(product_id: int, category_id: int, note: Optional[str], fingerprint: str, variants: list) -> str:
+    return json.dumps({
+        "product_id": product_id,
+        "category_id": category_id,
+        "note": note or None,
+        "fingerprint": fingerprint,
+        "variants": variants,
+    }, separators=(",", ":"), ensure_ascii=False)
+
+
+def _run(db, customer_id: int, store_id: int, mode: str, *args) -> tuple[int, _LiveCart, StorePriceIndex]:
+    """
+    Executa o script do carrinho (carregando do banco se preciso) e prepara
+    o índice de preços da versão devolvida
+
+    Returns:
+        (status, carrinho, índice)
+    """
+    script = _script(_MUTATE_SCRIPT)
+    keys = [
+        CacheKeys.live_cart(store_id, customer_id),
+        CacheKeys.live_cart_dirty(),
+        CacheKeys.store_view_version(store_id),
+    ]
+    argv = [mode, config.LIVE_CART_TTL_SECONDS, _member(store_id, customer_id), *args]
+
+    result = script(keys=keys, args=argv)
+    if int(result[0]) == 0:
+        _seed(db, customer_id, store_id)
+        result = script(keys=keys, args=argv)
+        if int(result[0]) == 0:
+            raise RedisError(f"Carrinho do cliente {customer_id} não ficou no Redis após a carga")
+
+    if mode != "read":
+        live_cart_persister.ensure_started()
+
+    flat = result[1]
+    fields = {_text(flat[i]): _text(flat[i + 1]) for i in range(0, len(flat), 2)}
+    cart = _decode_cart(fields)
+
+    index = _price_index(store_id, int(_text(result[2])))
+    index.ensure(db, {item["product_id"] for item in cart.items}, cart.meta.get("coupon_id"))
+    return int(result[0]), cart, index
+
+
+# ═══════════════════════════════════════════════════════════
+# PREÇOS E DISPONIBILIDADE
+# ═══════════════════════════════════════════════════════════
+
+def _coupon_is_valid(coupon: _CouponPricing) -> bool:
+    if not coupon.is_active:
+        return False
+    now = datetime.now(timezone.utc) if coupon.start_date.tzinfo else datetime.utcnow()
+    return coupon.start_date <= now <= coupon.end_date
+
+
+def _price_cart(index: StorePriceIndex, cart: _LiveCart) -> dict:
+    """
+    Monta o CartSchema (JSON) com os totais
+
+    Preço unitário = preço base do vínculo com a categoria + complementos,
+    o mesmo cálculo da criação do pedido.
+    """
+    items = []
+    subtotal = 0
+
+    for item in cart.items:
+        product = index.products.get(item["product_id"])
+        if product is None:
+            continue  # Produto removido: sai do carrinho na próxima leitura
+
+        options_price = 0
+        variants = []
+        for variant in item["variants"]:
+            options = []
+            for option in variant["options"]:
+                pricing = index.options.get(option["variant_option_id"])
+                name, price = (pricing.name, pricing.price) if pricing else ("Opção sem nome", 0)
+                options_price += price * option["quantity"]
+                options.append({
+                    "variant_option_id": option["variant_option_id"],
+                    "quantity": option["quantity"],
+                    "name": name,
+                    "price": price,
+                })
+            variants.append({
+                "variant_id": variant["variant_id"],
+                "name": product.variant_names.get(variant["variant_id"], ""),
+                "options": options,
+            })
+
+        unit_price = product.base_prices.get(item["category_id"], 0) + options_price
+        total_price = unit_price * item["quantity"]
+        subtotal += total_price
+
+        items.append({
+            "id": item["id"],
+            "product": product.payload,
+            "quantity": item["quantity"],
+            "note": item["note"],
+            "variants": variants,
+            "unit_price": unit_price,
+            "total_price": total_price,
+        })
+
+    discount = 0
+    coupon = index.coupons.get(cart.meta.get("coupon_id"))
+    if coupon and _coupon_is_valid(coupon):
+        _, discount = apply_coupon(coupon, subtotal)
+
+    return {
+        "id": cart.cart_id,
+        "status": models.CartStatus.ACTIVE.value,
+        "coupon_code": cart.meta.get("coupon_code"),
+        "observation": cart.meta.get("observation"),
+        "items": items,
+        "subtotal": subtotal,
+        "discount": discount,
+        "total": subtotal - discount,
+    }
+
+
+class _LiveStock(NamedTuple):
+    products: dict[int, int]  # product_id -> estoque atual
+    options: dict[int, int]  # variant_option_id -> estoque atual
+
+
+def _live_stock(db, index: StorePriceIndex, items: list[dict]) -> _LiveStock:
+    """
+    Estoque atual (banco) dos produtos e complementos controlados do carrinho
+
+    O índice só é refeito quando a versão da loja muda; reservas de outros
+    pedidos mexem no estoque sem bumpar a versão.
+    """
+    product_ids = {
+        item["product_id"] for item in items
+        if (product := index.products.get(item["product_id"])) and product.control_stock
+    }
+    option_ids = {
+        option["variant_option_id"]
+        for item in items for variant in item["variants"] for option in variant["options"]
+        if (pricing := index.options.get(option["variant_option_id"])) and pricing.track_inventory
+    }
+
+    products = dict(db.execute(
+        select(models.Product.id, models.Product.stock_quantity).where(models.Product.id.in_(product_ids))
+    ).all()) if product_ids else {}
+    options = dict(db.execute(
+        select(models.VariantOption.id, models.VariantOption.stock_quantity)
+        .where(models.VariantOption.id.in_(option_ids))
+    ).all()) if option_ids else {}
+    return _LiveStock(products, options)
+
+
+def _unavailability_reason(index: StorePriceIndex, item: dict, stock: _LiveStock) -> Optional[str]:
+    product = index.products.get(item["product_id"])
+    if product is None:
+        return "produto não encontrado"
+    if not product.available:
+        return "produto sem estoque"
+    if product.control_stock:
+        stock_quantity = stock.products.get(item["product_id"], product.stock_quantity)
+        if stock_quantity <= 0:
+            return "produto sem estoque"
+        if stock_quantity < item["quantity"]:
+            return (f"estoque insuficiente (disponível: {stock_quantity}, "
+                    f"solicitado: {item['quantity']})")
+
+    for variant in item["variants"]:
+        for option in variant["options"]:
+            pricing = index.options.get(option["variant_option_id"])
+            if pricing is None:
+                return "complemento não encontrado"
+            if not pricing.available:
+                return f"complemento '{pricing.name}' sem estoque"
+            if pricing.track_inventory:
+                stock_quantity = stock.options.get(option["variant_option_id"], pricing.stock_quantity)
+                if stock_quantity <= 0:
+                    return f"complemento '{pricing.name}' sem estoque"
+                if stock_quantity < option["quantity"] * item["quantity"]:
+                    return f"complemento '{pricing.name}' com estoque insuficiente"
+    return None
+
+
+# ═══════════════════════════════════════════════════════════
+# OPERAÇÕES (CHAMADAS PELOS HANDLERS VIA run_db)
+# ═══════════════════════════════════════════════════════════
+
+def get_cart(db, customer_id: int, store_id: int) -> dict:
+    """Carrinho atual (JSON do CartSchema), sem os itens indisponíveis"""
+    _, cart, index = _run(db, customer_id, store_id, "read")
+
+    stock = _live_stock(db, index, cart.items)
+    removed = []
+    for item in cart.items:
+        reason = _unavailability_reason(index, item, stock)
+        if reason:
+            product = index.products.get(item["product_id"])
+            logger.info(f"🗑️ Removendo '{product.name if product else 'Produto desconhecido'}' do carrinho: {reason}")
+            removed.append(item["id"])
+
+    if removed:
+        _, cart, index = _run(db, customer_id, store_id, "remove", *removed)
+        logger.info(f"✅ {len(removed)} itens removidos do carrinho")
+
+    return _price_cart(index, cart)
+
+
+def update_item(db, customer_id: int, store_id: int, update_data, fingerprint: str) -> dict:
+    """
+    Adiciona (soma itens idênticos pelo fingerprint), edita ou remove um item
+
+    Raises:
+        CartItemError: produto inexistente, grupo de complemento inválido ou
+        item da edição não encontrado
+    """
+    index = _price_index(store_id)
+    index.ensure(db, {update_data.product_id})
+
+    product = index.products.get(update_data.product_id)
+    if product is None:
+        raise CartItemError('Produto não encontrado.')
+
+    variants = []
+    for variant_input in update_data.variants or []:
+        rule = product.rules.get(variant_input.variant_id)
+        if not rule or not rule[0]:
+            raise CartItemError('Grupo de opção inválido.')
+        if len(variant_input.options) < rule[1]:
+            raise CartItemError(f'Escolha no mínimo {rule[1]} opção(ões).')
+        if len(variant_input.options) > rule[2]:
+            raise CartItemError(f'Escolha no máximo {rule[2]} opção(ões).')
+
+        options = [
+            {"variant_option_id": option.variant_option_id, "quantity": option.quantity}
+            for option in variant_input.options
+            if option.quantity > 0
+        ]
+        if options:
+            variants.append({"variant_id": variant_input.variant_id, "options": options})
+
+    item = _item_json(update_data.product_id, update_data.category_id, update_data.note, fingerprint, variants)
+
+    if update_data.cart_item_id:
+        status, cart, index = _run(
+            db, customer_id, store_id, "edit",
+            update_data.cart_item_id, fingerprint, item, update_data.quantity
+        )
+        if status == -1:
+            raise CartItemError('Item para editar não encontrado.')
+    else:
+        _, cart, index = _run(db, customer_id, store_id, "add", fingerprint, item, update_data.quantity)
+
+    return _price_cart(index, cart)
+
+
+def clear_cart(db, customer_id: int, store_id: int) -> dict:
+    """Remove todos os itens e o cupom"""
+    _, cart, index = _run(db, customer_id, store_id, "clear")
+    return _price_cart(index, cart)
+
+
+def set_coupon(db, customer_id: int, store_id: int, coupon_id: Optional[int], coupon_code: Optional[str]) -> dict:
+    """Aplica (ou remove, com None) o cupom já validado e gravado no banco"""
+    _, cart, index = _run(db, customer_id, store_id, "coupon", coupon_id or "", coupon_code or "")
+    return _price_cart(index, cart)
+
+
+def persist_cart(db, customer_id: int, store_id: int) -> bool:
+    """
+    Grava o carrinho ao vivo em carts/cart_items na transação de 'db' (sem
+    commit), para quem vai ler o carrinho do banco em seguida
+
+    Returns:
+        True se havia carrinho ao vivo e ele foi gravado
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    if pipe is None:
+        return False
+
+    pipe.hgetall(CacheKeys.live_cart(store_id, customer_id))
+    (fields,) = pipe.execute()
+    if not fields:
+        return False
+
+    return _write_cart(db, store_id, _decode_cart({_text(k): _text(v) for k, v in fields.items()}))
+
+
+def discard_cart(customer_id: int, store_id: int) -> None:
+    """Remove o carrinho ao vivo (pedido criado: o próximo carrinho nasce do banco)"""
+    redis_client.unlink(CacheKeys.live_cart(store_id, customer_id))
+
+
+# ═══════════════════════════════════════════════════════════
+# GRAVAÇÃO NO BANCO
+# ═══════════════════════════════════════════════════════════
+
+def _existing_ids(db, model, ids: set[int]) -> set[int]:
+    if not ids:
+        return set()
+    return set(db.execute(select(model.id).where(model.id.in_(ids))).scalars())
+
+
+def _write_cart(db, store_id: int, cart: _LiveCart) -> bool:
+    """
+    Substitui os itens do carrinho no banco pelos do Redis (sem commit)
+
+    O carrinho é travado (FOR UPDATE): se a criação do pedido o concluiu
+    enquanto isso, nada é gravado. Produtos, categorias e complementos
+    removidos do cardápio ficam de fora.
+    """
+    db_cart = db.query(models.Cart).filter(
+        models.Cart.id == cart.cart_id,
+        models.Cart.status == models.CartStatus.ACTIVE
+    ).with_for_update().populate_existing().first()
+    if not db_cart:
+        return False
+
+    variants = [variant for item in cart.items for variant in item["variants"]]
+    products = _existing_ids(db, models.Product, {item["product_id"] for item in cart.items})
+    categories = _existing_ids(db, models.Category, {item["category_id"] for item in cart.items})
+    variant_ids = _existing_ids(db, models.Variant, {variant["variant_id"] for variant in variants})
+    option_ids = _existing_ids(db, models.VariantOption, {
+        option["variant_option_id"] for variant in variants for option in variant["options"]
+    })
+
+    items = [item for item in cart.items if item["product_id"] in products and item["category_id"] in categories]
+
+    db.execute(delete(models.CartItem).where(models.CartItem.cart_id == db_cart.id))
+
+    if items:
+        item_rows = [
+            {
+                "cart_id": db_cart.id,
+                "store_id": store_id,
+                "product_id": item["product_id"],
+                "category_id": item["category_id"],
+                "quantity": item["quantity"],
+                "note": item["note"],
+                "fingerprint": item["fingerprint"],
+            }
+            for item in items
+        ]
+        item_ids = db.execute(
+            insert(models.CartItem).returning(models.CartItem.id, sort_by_parameter_order=True), item_rows
+        ).scalars().all()
+
+        variant_rows, variant_options = [], []
+        for item_id, item in zip(item_ids, items):
+            for variant in item["variants"]:
+                if variant["variant_id"] not in variant_ids:
+                    continue
+                variant_rows.append({"cart_item_id": item_id, "variant_id": variant["variant_id"], "store_id": store_id})
+                variant_options.append([o for o in variant["options"] if o["variant_option_id"] in option_ids])
+
+        if variant_rows:
+            cart_variant_ids = db.execute(
+                insert(models.CartItemVariant).returning(models.CartItemVariant.id, sort_by_parameter_order=True),
+                variant_rows
+            ).scalars().all()
+
+            option_rows = [
+                {
+                    "cart_item_variant_id": cart_variant_id,
+                    "variant_option_id": option["variant_option_id"],
+                    "quantity": option["quantity"],
+                    "store_id": store_id,
+                }
+                for cart_variant_id, options in zip(cart_variant_ids, variant_options)
+                for option in options
+            ]
+            if option_rows:
+                db.execute(insert(models.CartItemVariantOption), option_rows)
+
+    db_cart.coupon_id = cart.meta.get("coupon_id")
+    db_cart.coupon_code = cart.meta.get("coupon_code")
+    db_cart.observation = cart.meta.get("observation")
+    db_cart.updated_at = datetime.now(timezone.utc)
+    db.flush()
+    return True
+
+
+class LiveCartPersister:
+    """
+    ✅ Grava periodicamente no banco os carrinhos alterados no Redis
+
+    Cada worker que altera carrinhos roda uma thread; o set de sujos é
+    compartilhado (SPOP), então cada carrinho é gravado por um worker só.
+    """
+
+    def __init__(self, batch_size: int = 200, interval_ms: int = 2000):
+        self.batch_size = max(batch_size, 1)
+        self.interval_seconds = max(interval_ms, 10) / 1000
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def ensure_started(self) -> None:
+        if self._thread is not None or self._stopping.is_set():
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="live-cart-persister", daemon=True)
+                self._thread.start()
+                logger.info("✅ Gravação dos carrinhos ao vivo iniciada")
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval_seconds):
+            self.flush()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para a thread e grava os carrinhos pendentes (shutdown)"""
+        self._stopping.set()
+        if self._thread is None:
+            return
+        self._thread.join(timeout)
+        self._thread = None
+
+        flushed = self.flush()
+        if flushed:
+            logger.info(f"💾 {flushed} carrinho(s) pendente(s) gravado(s) no shutdown")
+
+    def flush(self) -> int:
+        """
+        Grava os carrinhos sujos em lotes de até batch_size
+
+        Returns:
+            Quantidade de carrinhos gravados
+        """
+        total = 0
+        while True:
+            pipe = redis_client.pipeline(transaction=False)
+            if pipe is None:
+                break
+
+            try:
+                pipe.spop(CacheKeys.live_cart_dirty(), self.batch_size)
+                (members,) = pipe.execute()
+                if not members:
+                    break
+
+                members = [_text(member) for member in members]
+                pipe = redis_client.pipeline(transaction=False)
+                for member in members:
+                    store_id, customer_id = member.split(":")
+                    pipe.hgetall(CacheKeys.live_cart(int(store_id), int(customer_id)))
+                carts = pipe.execute()
+            except RedisError as e:
+                logger.error(f"❌ Erro ao ler carrinhos sujos do Redis: {e}")
+                break
+
+            total += self._write_batch(members, carts)
+            if len(members) < self.batch_size:
+                break
+
+        return total
+
+    def _write_batch(self, members: list[str], carts: list[dict]) -> int:
+        written = 0
+        failed = []
+
+        with get_db_manager() as db:
+            for member, fields in zip(members, carts):
+                if not fields:
+                    continue  # Expirou ou virou pedido
+
+                try:
+                    cart = _decode_cart({_text(k): _text(v) for k, v in fields.items()})
+                    if _write_cart(db, int(member.split(":")[0]), cart):
+                        written += 1
+                    db.commit()
+                except Exception as e:
+                    db.rollback()
+                    failed.append(member)
+                    logger.error(f"❌ Erro ao gravar o carrinho {member}: {e}", exc_info=True)
+
+        if failed:
+            # Volta para o set: tenta de novo no próximo ciclo
+            pipe = redis_client.pipeline(transaction=False)
+            if pipe is not None:
+                try:
+                    pipe.sadd(CacheKeys.live_cart_dirty(), *failed)
+                    pipe.execute()
+                except RedisError as e:
+                    logger.error(f"❌ {len(failed)} carrinho(s) não voltaram para a fila de gravação: {e}")
+
+        if written:
+            logger.debug(f"💾 {written} carrinho(s) ao vivo gravado(s) no banco")
+        return written
+
+
+# ✅ INSTÂNCIA GLOBAL (uma por worker)
+live_cart_persister = LiveCartPersister(
+    batch_size=config.LIVE_CART_PERSIST_BATCH_SIZE,
+    interval_ms=config.LIVE_CART_PERSIST_INTERVAL_MS,
+)
@@ -1,125 +1,293 @@
-from sqlalchemy import func
-from sqlalchemy.orm import Session, joinedload
+from typing import Optional
+
+from sqlalchemy import func, update, case, cast, or_, and_, select, Numeric
+from sqlalchemy.orm import Session, joinedload, aliased
 
-from src.api.schemas.products.rating import RatingsSummaryOut
 from src.core import models
 from src.core.models import StoreRating, ProductRating
 
 
-def get_store_ratings_summary(db: Session, *, store_id: int) -> dict:
-    """
-    Busca um resumo completo e otimizado das avaliações de uma loja.
-    Faz apenas UMA query no banco de dados.
-    """
-    # ✅ 1. Busca todas as avaliações e seus clientes de uma só vez.
-    ratings_list = db.query(StoreRating).options(
-        joinedload(StoreRating.customer)
-    ).filter(StoreRating.store_id == store_id).order_by(StoreRating.created_at.desc()).all()
+# ═══════════════════════════════════════════════════════════
+# AGREGADOS MATERIALIZADOS (Store/Product.rating_*)
+# ═══════════════════════════════════════════════════════════
+# Contam apenas avaliações visíveis (is_active). Cada escrita informa a
+# nota visível ANTES e DEPOIS da mudança:
+#   - criação:           (None, stars)
+#   - edição de nota:    (old, new)
+#   - ocultação:         (stars, None)
+#   - reexibição:        (None, stars)
+#   - remoção:           (stars se visível, None)
+# O UPDATE é atômico no banco (col = col + delta), sem lost updates.
 
-    if not ratings_list:
-        return {
-            "average_rating": 0.0, "total_ratings": 0,
-            "distribution": {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}, "ratings": []
-        }
+def visible_stars(rating) -> Optional[int]:
+    """Nota que a avaliação contribui para os agregados (None se oculta)"""
+    return rating.stars if rating.is_active else None
+
+
+def _aggregate_update_values(model, old_stars: Optional[int], new_stars: Optional[int]) -> dict:
+    count_delta = (1 if new_stars else 0) - (1 if old_stars else 0)
+    sum_delta = (new_stars or 0) - (old_stars or 0)
+
+    new_count = func.coalesce(model.rating_count, 0) + count_delta
+    new_sum = model.rating_sum + sum_delta
+
+    values = {
+        model.rating_count: new_count,
+        model.rating_sum: new_sum,
+        model.rating_average: case(
+            (new_count > 0, func.round(cast(new_sum, Numeric) / new_count, 1)),
+            else_=0,
+        ),
+    }
+
+    if old_stars != new_stars:
+        if old_stars:
+            column = getattr(model, f"rating_stars_{old_stars}")
+            values[column] = column - 1
+        if new_stars:
+            column = getattr(model, f"rating_stars_{new_stars}")
+            values[column] = column + 1
+
+    return values
+
+
+def apply_store_rating_change(db: Session, store_id: int, old_stars: Optional[int], new_stars: Optional[int]):
+    """Atualiza os agregados da loja na transação corrente (sem commit)"""
+    if old_stars == new_stars:
+        return
+    db.execute(
+        update(models.Store)
+        .where(models.Store.id == store_id)
+        .values(_aggregate_update_values(models.Store, old_stars, new_stars))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_product_rating_change(db: Session, product_id: int, old_stars: Optional[int], new_stars: Optional[int]):
+    """Atualiza os agregados do produto na transação corrente (sem commit)"""
+    if old_stars == new_stars:
+        return
+    db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id)
+        .values(_aggregate_update_values(models.Product, old_stars, new_stars))
+        .execution_options(synchronize_session=False)
+    )
 
-    # ✅ 2. Calcula tudo em memória (muito mais rápido).
-    total_ratings = len(ratings_list)
-    total_stars = sum(r.stars for r in ratings_list)
-    average_rating = round(total_stars / total_ratings, 1) if total_ratings > 0 else 0.0
 
-    distribution = {i: 0 for i in range(5, 0, -1)}
-    for r in ratings_list:
-        distribution[r.stars] += 1
+# ═══════════════════════════════════════════════════════════
+# RESUMOS
+# ═══════════════════════════════════════════════════════════
 
-    # ✅ 3. Monta a resposta final.
+def _empty_summary() -> dict:
     return {
-        "average_rating": float(average_rating),
-        "total_ratings": total_ratings,
-        "distribution": distribution,
-        "ratings": [
-            {
-                "id": r.id,
-                "customer_name": r.customer.name if r.customer else "Anônimo",
-                "stars": r.stars,
-                "is_active": r.is_active,
-                "comment": r.comment,
-                "owner_reply": r.owner_reply,
-                "created_at": r.created_at.isoformat() if r.created_at else None,
-            }
-            for r in ratings_list
-        ],
+        "average_rating": 0.0, "total_ratings": 0,
+        "distribution": {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}, "ratings": []
     }
 
 
-def get_product_ratings_summary(db: Session, *, product_id: int) -> dict:
+def _summary_from_star_counts(star_counts: dict[int, int]) -> dict:
+    """Monta o resumo (média, total, distribuição) a partir de {estrelas: quantidade}"""
+    summary = _empty_summary()
+
+    total_ratings = sum(star_counts.values())
+    if total_ratings == 0:
+        return summary
+
+    total_stars = sum(stars * count for stars, count in star_counts.items())
+    for stars, count in star_counts.items():
+        summary["distribution"][stars] = count
+
+    summary["total_ratings"] = total_ratings
+    summary["average_rating"] = float(round(total_stars / total_ratings, 1))
+    return summary
+
+
+def _summary_from_aggregates(target) -> dict:
+    """Resumo a partir das colunas materializadas (sem tocar nas avaliações)"""
+    return _summary_from_star_counts({
+        stars: getattr(target, f"rating_stars_{stars}") or 0 for stars in range(1, 6)
+    })
+
+
+def _serialize_ratings(ratings_list) -> list[dict]:
+    return [
+        {
+            "id": r.id,
+            "customer_name": r.customer.name if r.customer else "Anônimo",
+            "stars": r.stars,
+            "is_active": r.is_active,
+            "comment": r.comment,
+            "owner_reply": r.owner_reply,
+            "created_at": r.created_at.isoformat() if r.created_at else None,
+        }
+        for r in ratings_list
+    ]
+
+
+def get_store_ratings_summary(db: Session, *, store_id: int, skip: int = 0, limit: int | None = None) -> dict:
+    """
+    Resumo das avaliações visíveis de uma loja.
+
+    - Média/total/distribuição: lidos dos agregados da loja (O(1))
+    - Lista: apenas a página pedida (skip/limit), das mais recentes
+    """
+    store = db.get(models.Store, store_id)
+    if not store:
+        return _empty_summary()
+
+    summary = _summary_from_aggregates(store)
+    if summary["total_ratings"] == 0:
+        return summary
+
+    query = db.query(StoreRating).options(
+        joinedload(StoreRating.customer)
+    ).filter(
+        StoreRating.store_id == store_id,
+        StoreRating.is_active.is_(True)
+    ).order_by(StoreRating.created_at.desc()).offset(skip)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    summary["ratings"] = _serialize_ratings(query.all())
+    return summary
+
+
+def get_product_ratings_summary(db: Session, *, product_id: int, skip: int = 0, limit: int | None = None) -> dict:
     """
-    Busca um resumo completo e otimizado das avaliações de um produto.
-    Faz apenas UMA query no banco de dados.
+    Resumo das avaliações visíveis de um produto COM a lista de avaliações.
+
+    Usado sob demanda, quando o cliente abre as avaliações do produto
+    (o cardápio usa get_all_ratings_summaries_for_store, sem a lista).
+
+    - Média/total/distribuição: lidos dos agregados do produto (O(1))
+    - Lista: apenas a página pedida (skip/limit)
     """
-    # ✅ 1. Busca todas as avaliações e seus clientes de uma só vez.
-    ratings_list = db.query(ProductRating).options(
+    product = db.get(models.Product, product_id)
+    if not product:
+        return _empty_summary()
+
+    summary = _summary_from_aggregates(product)
+    if summary["total_ratings"] == 0:
+        return summary
+
+    query = db.query(ProductRating).options(
         joinedload(ProductRating.customer)
-    ).filter(ProductRating.product_id == product_id).order_by(ProductRating.created_at.desc()).all()
+    ).filter(
+        ProductRating.product_id == product_id,
+        ProductRating.is_active.is_(True)
+    ).order_by(ProductRating.created_at.desc()).offset(skip)
+
+    if limit is not None:
+        query = query.limit(limit)
+
+    summary["ratings"] = _serialize_ratings(query.all())
+    return summary
 
-    if not ratings_list:
-        return {
-            "average_rating": 0.0, "total_ratings": 0,
-            "distribution": {5: 0, 4: 0, 3: 0, 2: 0, 1: 0}, "ratings": []
-        }
 
-    # ✅ 2. Calcula tudo em memória.
-    total_ratings = len(ratings_list)
-    total_stars = sum(r.stars for r in ratings_list)
-    average_rating = round(total_stars / total_ratings, 1) if total_ratings > 0 else 0.0
+def get_all_ratings_summaries_for_store(db, store_id: int, product_ids: Optional[set[int]] = None) -> dict[int, dict]:
+    """
+    Busca o resumo das avaliações para TODOS os produtos de uma loja
+    lendo apenas as colunas agregadas dos produtos (nenhuma avaliação é lida).
+
+    Retorna {product_id: resumo} com média, total e distribuição.
+    A lista de avaliações NÃO é carregada ('ratings' vazio): ela é buscada
+    sob demanda via get_product_ratings_summary quando o cliente abre o produto.
+    Produtos sem avaliações não aparecem no dicionário.
+    Com product_ids, lê apenas esses produtos (deltas do cardápio).
+    """
+    star_columns = [getattr(models.Product, f"rating_stars_{stars}") for stars in range(1, 6)]
 
-    distribution = {i: 0 for i in range(5, 0, -1)}
-    for r in ratings_list:
-        distribution[r.stars] += 1
+    query = db.query(models.Product.id, *star_columns) \
+        .filter(models.Product.store_id == store_id, models.Product.rating_count > 0)
+    if product_ids is not None:
+        if not product_ids:
+            return {}
+        query = query.filter(models.Product.id.in_(product_ids))
+    results = query.all()
 
-    # ✅ 3. Monta a resposta final.
     return {
-        "average_rating": float(average_rating),
-        "total_ratings": total_ratings,
-        "distribution": distribution,
-        "ratings": [
-            {
-                "id": r.id,
-                "customer_name": r.customer.name if r.customer else "Anônimo",
-                "stars": r.stars,
-                "is_active": r.is_active,
-                "comment": r.comment,
-                "owner_reply": r.owner_reply,
-                "created_at": r.created_at.isoformat() if r.created_at else None,
-            }
-            for r in ratings_list
-        ],
+        product_id: _summary_from_star_counts({stars: count or 0 for stars, count in enumerate(counts, start=1)})
+        for product_id, *counts in results
     }
 
 
+# ═══════════════════════════════════════════════════════════
+# RECONCILIAÇÃO
+# ═══════════════════════════════════════════════════════════
 
+_RECONCILE_BATCH_SIZE = 1000
 
+_AGGREGATE_COLUMNS = ("rating_count", "rating_sum", *[f"rating_stars_{stars}" for stars in range(1, 6)])
 
-def get_all_ratings_summaries_for_store(db, store_id: int) -> dict[int, RatingsSummaryOut]:
+
+def _reconcile(db: Session, model, rating_model, fk_column) -> int:
     """
-    Busca o resumo das avaliações para TODOS os produtos de uma loja
-    em uma única e eficiente query.
+    Recalcula os agregados a partir das avaliações e corrige apenas quem divergiu
+
+    Em lotes, cada um na sua transação:
+    1. SELECT ... FOR UPDATE dos alvos: escritas incrementais concorrentes
+       esperam o fim do lote
+    2. UPDATE ... FROM (agregação das avaliações): comando novo, vê tudo o
+       que foi commitado antes do lock, então não sobrescreve incrementos
     """
-    # Agrupa por product_id, calcula a média de 'stars' e a contagem de 'id'
-    results = db.query(
-        models.ProductRating.product_id,
-        func.avg(models.ProductRating.stars).label('average_rating'),
-        func.count(models.ProductRating.id).label('rating_count')
-    ).join(models.Product) \
-     .filter(models.Product.store_id == store_id) \
-     .group_by(models.ProductRating.product_id) \
-     .all()
-
-    # Transforma o resultado em um dicionário para acesso rápido:
-    # {product_id: RatingsSummaryOut, ...}
-    return {
-        product_id: RatingsSummaryOut(
-            average_rating=float(avg) if avg is not None else 0.0,
-            rating_count=count
+    candidates = db.execute(
+        select(model.id).where(or_(model.rating_count != 0, model.rating_sum != 0))
+        .union(select(fk_column).where(rating_model.is_active.is_(True)))
+    ).scalars().all()
+    candidate_ids = sorted(set(candidates))
+
+    repaired = 0
+    for start in range(0, len(candidate_ids), _RECONCILE_BATCH_SIZE):
+        batch = candidate_ids[start:start + _RECONCILE_BATCH_SIZE]
+
+        db.execute(select(model.id).where(model.id.in_(batch)).order_by(model.id).with_for_update())
+
+        target = aliased(model)
+        aggregates = select(
+            target.id.label("target_id"),
+            func.count(rating_model.id).label("rating_count"),
+            func.coalesce(func.sum(rating_model.stars), 0).label("rating_sum"),
+            *[
+                func.count(rating_model.id).filter(rating_model.stars == stars).label(f"rating_stars_{stars}")
+                for stars in range(1, 6)
+            ],
+        ).select_from(target).outerjoin(
+            rating_model, and_(fk_column == target.id, rating_model.is_active.is_(True))
+        ).where(target.id.in_(batch)).group_by(target.id).subquery()
+
+        result = db.execute(
+            update(model)
+            .where(
+                model.id == aggregates.c.target_id,
+                or_(*[getattr(model, column).is_distinct_from(aggregates.c[column]) for column in _AGGREGATE_COLUMNS]),
+            )
+            .values(
+                **{column: aggregates.c[column] for column in _AGGREGATE_COLUMNS},
+                rating_average=case(
+                    (aggregates.c.rating_count > 0,
+                     func.round(cast(aggregates.c.rating_sum, Numeric) / aggregates.c.rating_count, 1)),
+                    else_=0,
+                ),
+            )
+            .execution_options(synchronize_session=False)
         )
-        for product_id, avg, count in results
-    }
\ No newline at end of file
+        db.commit()
+        repaired += result.rowcount
+
+    return repaired
+
+
+def reconcile_rating_aggregates(db: Session) -> dict:
+    """
+    Repara divergências entre os agregados e as avaliações reais
+
+    Faz commit a cada lote (os locks não ficam presos até o fim).
+
+    Returns:
+        {"stores": n_corrigidas, "products": n_corrigidos}
+    """
+    stores = _reconcile(db, models.Store, StoreRating, StoreRating.store_id)
+    products = _reconcile(db, models.Product, ProductRating, ProductRating.product_id)
+    return {"stores": stores, "products": products}
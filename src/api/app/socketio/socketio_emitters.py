@@ -4,16 +4,19 @@ from sqlalchemy.orm import selectinload
 
 from src.api.admin.services.store_service import StoreService
 from src.api.admin.services.subscription_service import SubscriptionService
+from src.api.admin.socketio.catalog_sync import get_catalog_version
 from src.api.crud import store_crud
 from src.api.schemas.products.category import Category
 from src.core import models
 
 from src.core.utils.enums import ProductStatus
+from src.core.utils.socketio_json import dump_list
 from src.socketio_instance import sio
 from src.api.schemas.products.product import ProductOut, logger
 from src.api.schemas.store.store_details import StoreDetails
 from src.api.schemas.store.store_theme import StoreThemeOut
-from src.api.app.services.rating import get_store_ratings_summary
+from src.api.app.services.rating import get_all_ratings_summaries_for_store
+from src.core.cache.cache_manager import cache_manager
 
 
 
@@ -24,6 +27,9 @@ async def emit_store_updated(db, store_id: int):
 
     Emite detalhes atualizados da loja para o namespace /totem (público)
     """
+    # Qualquer mudança notificada ao totem torna o snapshot inicial obsoleto
+    cache_manager.on_store_view_change(store_id)
+
     try:
         # ✅ 1. BUSCA A LOJA DO BANCO
         store_model = store_crud.get_store_base_details(db=db, store_id=store_id)
@@ -59,6 +65,7 @@ async def emit_store_updated(db, store_id: int):
 
 async def emit_theme_updated(theme: models.StoreTheme):
     """ Emite uma atualização do tema da loja. (Sua função original está correta) """
+    cache_manager.on_store_view_change(theme.store_id)
     pydantic_theme = StoreThemeOut.model_validate(theme).model_dump(mode='json')
     await sio.emit(
         'theme_updated',
@@ -68,13 +75,23 @@ async def emit_theme_updated(theme: models.StoreTheme):
 
 
 
-async def emit_products_updated(db, store_id: int):
+async def emit_products_updated(db, store_id: int, sid: str | None = None):
     """
     Busca TODOS os dados do cardápio (produtos E categorias) e emite para os clientes.
     Esta é a fonte da verdade para o frontend.
+
+    Com 'sid', envia apenas para o socket que pediu resync ('catalog_resync').
     """
     print(f"📢 Preparando emissão completa de cardápio para a loja {store_id}...")
 
+    if sid is None:
+        # Cardápio alterado (complementos): snapshot do totem e índice de
+        # preços do carrinho ao vivo ficam obsoletos
+        cache_manager.on_store_view_change(store_id)
+
+    # Versão lida ANTES da busca: deltas posteriores são idempotentes
+    catalog_version = get_catalog_version(store_id)
+
     # --- 1. BUSCA DE PRODUTOS (COM RELACIONAMENTOS CORRIGIDOS) ---
     products_from_db = db.query(models.Product).options(
         selectinload(models.Product.category_links).selectinload(models.ProductCategoryLink.category),
@@ -93,8 +110,8 @@ async def emit_products_updated(db, store_id: int):
         models.Product.status != ProductStatus.ARCHIVED
     ).order_by(models.Product.priority).all()
 
-    # --- 2. BUSCA DAS AVALIAÇÕES (SUA OTIMIZAÇÃO, ESTÁ PERFEITA) ---
-    all_ratings = get_store_ratings_summary(db, store_id=store_id)
+    # --- 2. BUSCA DAS AVALIAÇÕES (UMA QUERY AGRUPADA PARA TODOS OS PRODUTOS) ---
+    all_ratings = get_all_ratings_summaries_for_store(db, store_id=store_id)
     for product in products_from_db:
         product.rating = all_ratings.get(product.id)
 
@@ -110,15 +127,17 @@ async def emit_products_updated(db, store_id: int):
     ).order_by(models.Category.priority).all()
 
     # --- 4. SERIALIZAÇÃO E MONTAGEM DO PAYLOAD FINAL ---
-    products_payload = [ProductOut.model_validate(p).model_dump(mode='json') for p in products_from_db]
-    categories_payload = [Category.model_validate(c).model_dump(mode='json') for c in categories_from_db]
+    #    Cada lista é serializada uma única vez e embutida pronta no pacote
+    products_payload = dump_list(ProductOut, products_from_db)
+    categories_payload = dump_list(Category, categories_from_db)
 
     final_payload = {
+        "version": catalog_version,
         "products": products_payload,
         "categories": categories_payload
     }
 
     # --- 5. EMISSÃO PARA O SOCKET ---
     room_name = f'store_{store_id}'
-    await sio.emit('products_updated', final_payload, to=room_name)
+    await sio.emit('products_updated', final_payload, to=sid or room_name)
     print(f"✅ Emissão 'products_updated' para a sala: {room_name} concluída.")
\ No newline at end of file
@@ -0,0 +1,409 @@
+# src/api/job_coordinator.py
+
+"""
+Coordenação dos Jobs Agendados
+==============================
+
+Garante que cada execução de um job agendado roda em UM processo só, mesmo
+com vários workers do uvicorn, réplicas e o entrypoint dedicado (src.worker).
+
+Como funciona:
+- Todo processo agenda os jobs (APScheduler) com disparos alinhados ao
+  relógio: jobs 'interval' partem de 1970-01-01 UTC (a cada 5 minutos =
+  :00, :05, :10... em todos os processos, não a partir do boot de cada um)
+- Cada disparo pertence a um slot: floor(agora / intervalo) (cron: o
+  minuto). No disparo, o wrapper coordinated() tenta pegar, num script
+  Lua, o lock de execução do job E o lock do slot. Quem não pega, pula
+- O lock do slot fica retido pelo intervalo inteiro: o mesmo disparo em
+  outro processo (relógio um pouco adiantado ou atrasado) encontra o slot
+  já usado, por mais rápido que o job tenha sido
+- O lock de execução (job inteiro) impede que o slot seguinte comece em
+  outro processo enquanto uma execução longa ainda roda. O valor do lock
+  é um token crescente por job: renovação e liberação só valem para o
+  dono do token, e uma execução que perdeu o lock não apaga o da seguinte.
+  Os jobs não conferem o token nas escritas: ele NÃO é um fencing token
+- Renovação a cada JOB_LOCK_TTL_SECONDS / 3 enquanto o job roda. Se a
+  renovação falhar (lock expirou e outro processo pode assumir), jobs
+  async são cancelados; jobs síncronos não podem ser interrompidos e só
+  ficam marcados como 'lock_lost'
+- Jobs exclusive (cobrança, mensagens ao cliente, cancelamento de pedidos)
+  seguram também um pg_try_advisory_lock numa conexão dedicada pela
+  execução inteira. Esse lock não expira: só o fim da execução ou a
+  queda da conexão (processo morto) o libera. Um processo que pega o lock
+  do Redis enquanto outro ainda segura o advisory lock pula o disparo
+- Redis indisponível → o mesmo advisory lock (liberado pelo banco se o
+  processo morrer), sem token. O slot é conferido em 'job_runs': com o
+  lock na mão, uma execução já iniciada no slot faz o disparo ser pulado
+- Cada execução com lock vira uma linha em 'job_runs' (status, duração,
+  erro, token, host) e entra nas métricas (pdvix_job_runs_total,
+  pdvix_job_duration_seconds)
+
+Autor: PDVix Team
+"""
+
+import asyncio
+import functools
+import hashlib
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, NamedTuple, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.core import models
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.config import config
+from src.core.database import engine, get_db_manager
+from src.core.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+HOST_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# KEYS[1] = lock do job | KEYS[2] = contador de tokens | KEYS[3] = lock do slot
+# ARGV[1] = TTL (ms) | ARGV[2] = retenção do slot (ms)
+# Retorno: token (> 0) ou 0 se outro processo está rodando ou já rodou o slot
+_ACQUIRE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 or redis.call('EXISTS', KEYS[3]) == 1 then
+    return 0
+end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], token, 'PX', ARGV[1])
+redis.call('SET', KEYS[3], token, 'PX', ARGV[2])
+return token
+"""
+
+# KEYS[1] = lock do job | ARGV[1] = token | ARGV[2] = TTL (ms)
+_RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS[1] = lock do job | ARGV[1] = token
+# O lock do slot não é apagado: expira sozinho no fim da retenção
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+# ═══════════════════════════════════════════════════════════
+# LOCKS
+# ═══════════════════════════════════════════════════════════
+
+class JobSlot(NamedTuple):
+    """Disparo de um job: slot = floor(epoch / duração)"""
+    number: int
+    seconds: int
+
+    @classmethod
+    def current(cls, seconds: int) -> "JobSlot":
+        return cls(int(time.time() // seconds), seconds)
+
+    @property
+    def starts_at(self) -> datetime:
+        return datetime.fromtimestamp(self.number * self.seconds, tz=timezone.utc)
+
+
+class JobLease(NamedTuple):
+    job_id: str
+    token: Optional[int]  # Token do lock no Redis; None = só o lock do Postgres
+    connection: object = None  # Conexão que segura o advisory lock
+
+
+class JobLocks:
+    """Locks dos jobs (execução + slot): Redis com token de dono, advisory lock do Postgres"""
+
+    def __init__(self, ttl_seconds: int = 60):
+        self.ttl_ms = max(ttl_seconds, 3) * 1000
+        self._scripts: dict[str, object] = {}
+
+    def _script(self, source: str):
+        script = self._scripts.get(source)
+        if script is None:
+            script = redis_client.register_script(source)
+            if script is not None:
+                self._scripts[source] = script
+        return script
+
+    def acquire(self, job_id: str, slot: JobSlot) -> Optional[JobLease]:
+        """
+        Tenta pegar o lock do job para o slot
+
+        None = outro processo está rodando o job ou já rodou este slot
+        """
+        script = self._script(_ACQUIRE_SCRIPT)
+        if script is not None:
+            try:
+                token = int(script(
+                    keys=[
+                        CacheKeys.job_lock(job_id),
+                        CacheKeys.job_lock_token(job_id),
+                        CacheKeys.job_slot_lock(job_id, slot.number),
+                    ],
+                    args=[self.ttl_ms, slot.seconds * 1000],
+                ))
+                return JobLease(job_id, token) if token else None
+            except RedisError as e:
+                logger.warning(f"⚠️ Lock do job '{job_id}' no Redis falhou, usando o Postgres: {e}")
+
+        return self._acquire_postgres(job_id, slot)
+
+    def hold(self, lease: JobLease) -> Optional[JobLease]:
+        """
+        Segura também o advisory lock do job pela execução inteira (jobs exclusive)
+
+        None = outra execução ainda segura o lock (o lock do Redis já foi devolvido)
+        """
+        if lease.connection is not None:
+            return lease
+
+        connection = self._try_advisory_lock(lease.job_id)
+        if connection is None:
+            self.release(lease)
+            return None
+        return lease._replace(connection=connection)
+
+    def renew(self, lease: JobLease) -> bool:
+        """Estende o lock; False = o lock não é mais desta execução"""
+        if lease.token is None:
+            return True  # Advisory lock vive enquanto a conexão estiver aberta
+
+        script = self._script(_RENEW_SCRIPT)
+        if script is None:
+            return False
+
+        try:
+            return bool(script(keys=[CacheKeys.job_lock(lease.job_id)], args=[lease.token, self.ttl_ms]))
+        except RedisError as e:
+            logger.error(f"❌ Erro ao renovar o lock do job '{lease.job_id}': {e}")
+            return False
+
+    def release(self, lease: JobLease) -> None:
+        """Libera o lock de execução (o do slot continua até expirar)"""
+        if lease.connection is not None:
+            self._release_postgres(lease)
+        if lease.token is None:
+            return
+
+        script = self._script(_RELEASE_SCRIPT)
+        if script is None:
+            return
+
+        try:
+            script(keys=[CacheKeys.job_lock(lease.job_id)], args=[lease.token])
+        except RedisError as e:
+            # O lock expira sozinho em ttl
+            logger.error(f"❌ Erro ao liberar o lock do job '{lease.job_id}': {e}")
+
+    @staticmethod
+    def _advisory_key(job_id: str) -> int:
+        # bigint com sinal, estável entre processos (hash() do Python não é)
+        return int.from_bytes(hashlib.blake2b(job_id.encode(), digest_size=8).digest(), "big", signed=True)
+
+    def _try_advisory_lock(self, job_id: str):
+        """Conexão dedicada segurando o advisory lock do job, ou None"""
+        connection = engine.connect()
+        try:
+            acquired = connection.execute(select(func.pg_try_advisory_lock(self._advisory_key(job_id)))).scalar()
+            # Encerra a transação implícita; o advisory lock é da sessão
+            connection.commit()
+        except SQLAlchemyError as e:
+            connection.invalidate()
+            connection.close()
+            logger.error(f"❌ Lock do job '{job_id}' no Postgres falhou: {e}")
+            return None
+
+        if not acquired:
+            connection.close()
+            return None
+        return connection
+
+    def _acquire_postgres(self, job_id: str, slot: JobSlot) -> Optional[JobLease]:
+        connection = self._try_advisory_lock(job_id)
+        if connection is None:
+            return None
+
+        lease = JobLease(job_id, None, connection)
+        try:
+            # Com o lock na mão: o slot já teve execução (em qualquer processo)?
+            slot_used = connection.execute(
+                select(
+                    select(models.JobRun.id)
+                    .where(models.JobRun.job_id == job_id, models.JobRun.started_at >= slot.starts_at)
+                    .exists()
+                )
+            ).scalar()
+            connection.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"❌ Conferência do slot do job '{job_id}' falhou: {e}")
+            slot_used = True
+
+        if slot_used:
+            self._release_postgres(lease)
+            return None
+        return lease
+
+    def _release_postgres(self, lease: JobLease) -> None:
+        try:
+            lease.connection.execute(select(func.pg_advisory_unlock(self._advisory_key(lease.job_id))))
+            lease.connection.commit()
+        except SQLAlchemyError as e:
+            # A conexão voltaria ao pool segurando o lock: descarta (o banco libera ao desconectar)
+            logger.error(f"❌ Erro ao liberar o advisory lock do job '{lease.job_id}': {e}")
+            lease.connection.invalidate()
+        finally:
+            lease.connection.close()
+
+
+job_locks = JobLocks(ttl_seconds=config.JOB_LOCK_TTL_SECONDS)
+
+
+# ═══════════════════════════════════════════════════════════
+# HISTÓRICO
+# ═══════════════════════════════════════════════════════════
+
+def _record_start(lease: JobLease, started_at: datetime) -> Optional[int]:
+    try:
+        with get_db_manager() as db:
+            run = models.JobRun(
+                job_id=lease.job_id,
+                status="running",
+                fencing_token=lease.token,
+                host=HOST_ID,
+                started_at=started_at,
+            )
+            db.add(run)
+            db.commit()
+            return run.id
+    except SQLAlchemyError as e:
+        # O histórico não pode impedir o job de rodar
+        logger.error(f"❌ Erro ao registrar início do job '{lease.job_id}': {e}")
+        return None
+
+
+def _record_finish(run_id: Optional[int], status: str, duration_ms: int, error: Optional[str]) -> None:
+    if run_id is None:
+        return
+
+    try:
+        with get_db_manager() as db:
+            db.execute(
+                update(models.JobRun)
+                .where(models.JobRun.id == run_id)
+                .values(
+                    status=status,
+                    finished_at=datetime.now(timezone.utc),
+                    duration_ms=duration_ms,
+                    error=error[:2000] if error else None,
+                )
+            )
+            db.commit()
+    except SQLAlchemyError as e:
+        logger.error(f"❌ Erro ao registrar fim do job (run {run_id}): {e}")
+
+
+def prune_job_runs() -> int:
+    """Apaga o histórico mais antigo que JOB_RUN_HISTORY_DAYS"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=config.JOB_RUN_HISTORY_DAYS)
+    with get_db_manager() as db:
+        deleted = db.execute(delete(models.JobRun).where(models.JobRun.started_at < cutoff)).rowcount
+        db.commit()
+
+    if deleted:
+        logger.info(f"🧹 {deleted} execução(ões) antiga(s) removida(s) do histórico de jobs")
+    return deleted
+
+
+# ═══════════════════════════════════════════════════════════
+# WRAPPER
+# ═══════════════════════════════════════════════════════════
+
+async def _keep_alive(lease: JobLease, job_task: Optional[asyncio.Task], lost: asyncio.Event) -> None:
+    interval = job_locks.ttl_ms / 3000
+    while True:
+        await asyncio.sleep(interval)
+        if await asyncio.to_thread(job_locks.renew, lease):
+            continue
+
+        if lease.connection is not None:
+            # O advisory lock segue com esta execução: nenhum outro processo roda o job
+            logger.warning(f"⚠️ Job '{lease.job_id}' perdeu o lock do Redis; segue pelo advisory lock")
+            return
+
+        lost.set()
+        logger.error(f"🚨 Job '{lease.job_id}' perdeu o lock (token {lease.token}): outro processo pode assumir")
+        if job_task is not None:
+            job_task.cancel()
+        return
+
+
+def coordinated(job_id: str, job: Callable, slot_seconds: int, exclusive: bool = False) -> Callable:
+    """
+    Envolve um job (sync ou async) com lock distribuído, histórico e métricas
+
+    A função retornada é uma corrotina: o APScheduler a executa no event
+    loop e os jobs síncronos vão para uma thread.
+
+    Args:
+        job_id: ID do job no scheduler
+        job: Função do job
+        slot_seconds: Duração de um disparo (intervalo do job; 60 para cron)
+        exclusive: Segura o advisory lock do Postgres pela execução inteira
+            (jobs com efeitos externos: cobrança, mensagens, cancelamentos)
+    """
+    is_async = asyncio.iscoroutinefunction(job)
+
+    @functools.wraps(job)
+    async def run():
+        # Slot pelo relógio do disparo, antes de qualquer espera
+        slot = JobSlot.current(slot_seconds)
+        lease = await asyncio.to_thread(job_locks.acquire, job_id, slot)
+        if lease is not None and exclusive:
+            lease = await asyncio.to_thread(job_locks.hold, lease)
+        if lease is None:
+            metrics.track_job_skipped(job_id)
+            logger.debug(f"⏭️ Job '{job_id}' (slot {slot.number}) em execução ou já executado em outro processo")
+            return
+
+        started_at = datetime.now(timezone.utc)
+        run_id = await asyncio.to_thread(_record_start, lease, started_at)
+        start = time.perf_counter()
+
+        job_task = asyncio.ensure_future(job()) if is_async else None
+        lost = asyncio.Event()
+        keep_alive = asyncio.create_task(_keep_alive(lease, job_task, lost))
+
+        status, error = "success", None
+        try:
+            if job_task is not None:
+                await job_task
+            else:
+                await asyncio.to_thread(job)
+        except asyncio.CancelledError:
+            if not lost.is_set():
+                raise
+        except Exception as e:
+            status, error = "error", f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            keep_alive.cancel()
+            if lost.is_set():
+                status = "lock_lost"
+
+            duration_ms = int((time.perf_counter() - start) * 1000)
+            metrics.track_job_run(job_id, duration_ms, status)
+            await asyncio.to_thread(job_locks.release, lease)
+            await asyncio.to_thread(_record_finish, run_id, status, duration_ms, error)
+
+    return run
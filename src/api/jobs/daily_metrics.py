@@ -0,0 +1,48 @@
+# src/api/jobs/daily_metrics.py
+import logging
+
+from src.api.admin.services.daily_metrics_service import (
+    list_dirty_stores,
+    reconcile_daily_metrics,
+    refresh_dirty_days,
+)
+from src.core.config import config
+from src.core.database import get_db_manager
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_daily_metrics_job():
+    """
+    Recalcula os dias pendentes do rollup diário (store_daily_metrics)
+    marcados pelas transições de pedidos, para que as linhas fiquem
+    atuais mesmo sem leituras do dashboard.
+    """
+    store_ids = list_dirty_stores()
+    if not store_ids:
+        return
+
+    with get_db_manager() as db:
+        refreshed = sum(refresh_dirty_days(db, store_id) for store_id in store_ids)
+
+    print(f"✅ Rollup diário: {refreshed} dia(s) recalculado(s) em {len(store_ids)} loja(s).")
+
+
+def reconcile_daily_metrics_job():
+    """
+    Recalcula os últimos dias do rollup diário de todas as lojas.
+
+    As transições de pedidos já mantêm o rollup; este job repara desvios
+    (ex: pedidos alterados por UPDATE em massa ou direto no banco).
+    O histórico completo é preenchido por scripts/backfill_daily_metrics.py.
+    """
+    print("▶️  Executando job de reconciliação do rollup diário...")
+
+    with get_db_manager() as db:
+        try:
+            recomputed = reconcile_daily_metrics(db, days=config.DAILY_METRICS_RECONCILE_DAYS)
+            print(f"✅ Rollup diário reconciliado: {recomputed} dia(s) de loja recalculado(s).")
+
+        except Exception as e:
+            print(f"❌ ERRO CRÍTICO no job de reconciliação do rollup diário: {e}")
+            db.rollback()
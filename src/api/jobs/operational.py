@@ -9,7 +9,9 @@ from sqlalchemy.orm import selectinload
 from src.core.config import config
 from src.core.database import get_db_manager
 from src.core import models
-from src.core.utils.enums import OrderStatus  # Importe seu Enum de status
+from src.core.utils.enums import OrderStatus, StockReservationStatus  # Importe seu Enum de status
+from src.api.admin.services.stock_service import release_stock_reservation
+from src.api.admin.socketio.catalog_sync import emit_stock_change
 from src.api.admin.socketio.emitters import (
     admin_emit_stuck_order_alert,
     admin_emit_order_updated_from_obj
@@ -180,15 +182,22 @@ async def cancel_old_pending_orders():
                 return
 
             print(f"🔍 Encontrados {len(orders_to_cancel)} pedidos pendentes para cancelar.")
+            stock_changes = []
 
             for order in orders_to_cancel:
                 print(f"  - Cancelando pedido ID {order.id} ({order.public_id}) por falta de aceite.")
                 # ✅ CORREÇÃO: Atribui o enum Python direto (SQLAlchemy converte automaticamente)
                 order.order_status = OrderStatus.CANCELED
+                # ✅ Devolve o estoque reservado na criação (pendente = nunca baixado)
+                if order.stock_reservation_status == StockReservationStatus.RESERVED:
+                    stock_changes.append((order.store_id, release_stock_reservation(order, db)))
 
                 await admin_emit_order_updated_from_obj(order)
 
             db.commit()
+
+            for store_id, stock_change in stock_changes:
+                await emit_stock_change(db, store_id, stock_change)
             print(f"✅ Processamento de cancelamento concluído.")
 
         except Exception as e:
@@ -0,0 +1,36 @@
+# src/api/jobs/ratings.py
+import logging
+
+from src.api.app.services.rating import reconcile_rating_aggregates
+from src.core.database import get_db_manager
+
+logger = logging.getLogger(__name__)
+
+
+def reconcile_ratings_job():
+    """
+    Recalcula os agregados de avaliações (Store/Product.rating_*) a partir
+    das avaliações visíveis e corrige apenas o que divergiu.
+
+    As escritas já mantêm os agregados incrementalmente (e a migração fez o
+    preenchimento inicial); este job repara desvios (ex: avaliações
+    alteradas direto no banco).
+    """
+    print("▶️  Executando job de reconciliação de avaliações...")
+
+    with get_db_manager() as db:
+        try:
+            repaired = reconcile_rating_aggregates(db)
+            db.commit()
+
+            if repaired["stores"] or repaired["products"]:
+                logger.warning(
+                    f"⚠️ Agregados de avaliações corrigidos: "
+                    f"{repaired['stores']} lojas, {repaired['products']} produtos"
+                )
+            else:
+                print("✅ Agregados de avaliações consistentes.")
+
+        except Exception as e:
+            print(f"❌ ERRO CRÍTICO no job de reconciliação de avaliações: {e}")
+            db.rollback()
@@ -0,0 +1,32 @@
+# src/api/jobs/stock_reservations.py
+from src.api.admin.services.stock_service import release_expired_stock_reservations
+from src.core.cache.cache_manager import cache_manager
+from src.core.database import get_db_manager
+
+
+def release_expired_stock_reservations_job():
+    """
+    Devolve ao estoque as reservas vencidas (STOCK_RESERVATION_TTL_MINUTES)
+    de pedidos do cardápio ainda pendentes ou cancelados sem devolução.
+    """
+    with get_db_manager() as db:
+        try:
+            released = release_expired_stock_reservations(db)
+            db.commit()
+
+            # Após o commit: lojas com produto/complemento reativado refazem o snapshot
+            availability_by_store: dict[int, bool] = {}
+            for store_id, change in released:
+                availability_by_store[store_id] = availability_by_store.get(store_id, False) or change.availability_changed
+            for store_id, availability_changed in availability_by_store.items():
+                if availability_changed:
+                    cache_manager.on_product_change(store_id)
+                else:
+                    cache_manager.on_stock_change(store_id)
+
+            if released:
+                print(f"✅ {len(released)} reserva(s) de estoque expirada(s) devolvida(s).")
+
+        except Exception as e:
+            print(f"❌ ERRO CRÍTICO no job de expiração de reservas de estoque: {e}")
+            db.rollback()
@@ -9,23 +9,31 @@ Gerencia execução automatizada de jobs:
 - ✅ Billing (cobrança mensal)
 - ✅ Lifecycle (assinaturas) ← ATUALIZADO
 - ✅ Expiration (assinaturas canceladas) ← NOVO
+- ✅ Coordenação entre processos (job_coordinator): cada disparo roda em
+  um processo só, com histórico em 'job_runs'. Jobs 'interval' são
+  alinhados ao relógio (mesmos horários em todos os processos). Com o
+  worker dedicado (python -m src.worker) no ar, use RUN_SCHEDULER_IN_WEB=false
 
 Autor: Sistema
 Última atualização: 2025-01-17
 """
 
 import logging
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.events import EVENT_JOB_EXECUTED, EVENT_JOB_ERROR
 
+from src.api.job_coordinator import coordinated, prune_job_runs
 from src.api.jobs.billing import generate_monthly_charges
 from src.api.jobs.cart_recovery import find_and_notify_abandoned_carts
 from src.api.jobs.cleanup import delete_old_inactive_carts
 from src.api.jobs.lifecycle import manage_subscription_lifecycle
 from src.api.jobs.subscription_expiration import process_expired_subscriptions  # ✅ NOVO
 from src.api.jobs.marketing import reactivate_inactive_customers
+from src.api.jobs.ratings import reconcile_ratings_job
+from src.api.jobs.daily_metrics import refresh_daily_metrics_job, reconcile_daily_metrics_job
+from src.api.jobs.stock_reservations import release_expired_stock_reservations_job
 from src.api.jobs.operational import (
     cancel_old_pending_orders,
     check_for_stuck_orders,
@@ -67,6 +75,39 @@ def job_listener(event):
         })
 
 
+# Origem dos disparos 'interval': todo processo dispara nos mesmos horários
+_INTERVAL_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Cron dispara no minuto: o slot de um disparo cron é o minuto
+_CRON_SLOT_SECONDS = 60
+
+
+def _add_job(job, trigger: str, *, id: str, name: str, exclusive: bool = False, **trigger_args):
+    """
+    add_job com lock distribuído, histórico e métricas (job_coordinator)
+
+    Jobs 'interval' partem de _INTERVAL_EPOCH em vez do boot do processo:
+    a cada 5 minutos = :00, :05, :10... em todos os workers, e o slot do
+    disparo (floor(agora / intervalo)) é o mesmo em todos eles.
+
+    exclusive=True para jobs com efeitos que não podem duplicar (cobranças,
+    mensagens ao cliente): segura o advisory lock pela execução inteira.
+    """
+    if trigger == 'interval':
+        trigger_args.setdefault('start_date', _INTERVAL_EPOCH)
+        slot_seconds = int(timedelta(**{
+            unit: trigger_args[unit]
+            for unit in ('weeks', 'days', 'hours', 'minutes', 'seconds')
+            if unit in trigger_args
+        }).total_seconds())
+    else:
+        slot_seconds = _CRON_SLOT_SECONDS
+
+    scheduler.add_job(
+        coordinated(id, job, slot_seconds, exclusive=exclusive), trigger, id=id, name=name, **trigger_args
+    )
+
+
 def start_scheduler():
     """
     ✅ INICIALIZA: Configura e inicia todos os jobs agendados
@@ -81,16 +122,26 @@ def start_scheduler():
     # ═══════════════════════════════════════════════════════════
 
     # ✅ Cancela pedidos pendentes antigos (a cada 1 minuto)
-    scheduler.add_job(
+    _add_job(
         cancel_old_pending_orders,
         'interval',
         minutes=1,
         id='cancel_orders_job',
-        name='Cancelar Pedidos Pendentes Antigos'
+        name='Cancelar Pedidos Pendentes Antigos',
+        exclusive=True
+    )
+
+    # ✅ Devolve reservas de estoque expiradas (a cada 1 minuto)
+    _add_job(
+        release_expired_stock_reservations_job,
+        'interval',
+        minutes=1,
+        id='stock_reservations_expiration_job',
+        name='Expirar Reservas de Estoque'
     )
 
     # ✅ Verifica pedidos travados (a cada 5 minutos)
-    scheduler.add_job(
+    _add_job(
         check_for_stuck_orders,
         'interval',
         minutes=5,
@@ -99,25 +150,36 @@ def start_scheduler():
     )
 
     # ✅ Recuperação de carrinhos abandonados (a cada 5 minutos)
-    scheduler.add_job(
+    _add_job(
         find_and_notify_abandoned_carts,
         'interval',
         minutes=5,
         id='cart_recovery_job',
-        name='Recuperação de Carrinhos Abandonados'
+        name='Recuperação de Carrinhos Abandonados',
+        exclusive=True
     )
 
     # ✅ Solicita avaliações de pedidos entregues (a cada 15 minutos)
-    scheduler.add_job(
+    _add_job(
         request_reviews_for_delivered_orders,
         'interval',
         minutes=15,
         id='request_reviews_job',
-        name='Solicitar Avaliações'
+        name='Solicitar Avaliações',
+        exclusive=True
+    )
+
+    # ✅ Recalcula dias pendentes do rollup diário de vendas (a cada 5 minutos)
+    _add_job(
+        refresh_daily_metrics_job,
+        'interval',
+        minutes=5,
+        id='daily_metrics_refresh_job',
+        name='Atualizar Rollup Diário de Vendas'
     )
 
     # ✅ Finaliza pedidos entregues antigos (a cada 1 hora)
-    scheduler.add_job(
+    _add_job(
         finalize_old_delivered_orders,
         'interval',
         hours=1,
@@ -130,16 +192,17 @@ def start_scheduler():
     # ═══════════════════════════════════════════════════════════
 
     # ✅ Reativação de clientes inativos (todo dia às 10h UTC)
-    scheduler.add_job(
+    _add_job(
         reactivate_inactive_customers,
         'cron',
         hour='10',
         id='reactivation_job',
-        name='Reativação de Clientes Inativos'
+        name='Reativação de Clientes Inativos',
+        exclusive=True
     )
 
     # ✅ Limpeza de carrinhos antigos (todo dia às 4h UTC)
-    scheduler.add_job(
+    _add_job(
         delete_old_inactive_carts,
         'cron',
         hour='4',
@@ -147,22 +210,53 @@ def start_scheduler():
         name='Limpeza de Carrinhos Antigos'
     )
 
+    # ✅ Reconciliação dos agregados de avaliações (todo dia às 4h30 UTC)
+    _add_job(
+        reconcile_ratings_job,
+        'cron',
+        hour='4',
+        minute='30',
+        id='ratings_reconcile_job',
+        name='Reconciliação de Agregados de Avaliações'
+    )
+
+    # ✅ Reconciliação do rollup diário de vendas (todo dia às 4h45 UTC)
+    _add_job(
+        reconcile_daily_metrics_job,
+        'cron',
+        hour='4',
+        minute='45',
+        id='daily_metrics_reconcile_job',
+        name='Reconciliação do Rollup Diário de Vendas'
+    )
+
+    # ✅ Limpeza do histórico de execuções dos jobs (todo dia às 4h15 UTC)
+    _add_job(
+        prune_job_runs,
+        'cron',
+        hour='4',
+        minute='15',
+        id='job_runs_cleanup_job',
+        name='Limpeza do Histórico de Jobs'
+    )
+
     # ═══════════════════════════════════════════════════════════
     # JOBS MENSAIS/CRÍTICOS
     # ═══════════════════════════════════════════════════════════
 
     # ✅ BILLING: Roda TODO DIA útil às 3h
-    scheduler.add_job(
+    _add_job(
         generate_monthly_charges,
         'cron',
         hour='3',
         minute='0',
         id='monthly_billing_job',
-        name='Cobrança Mensal (verifica se é dia útil)'
+        name='Cobrança Mensal (verifica se é dia útil)',
+        exclusive=True
     )
 
     # ✅ LIFECYCLE: Roda todo dia às 2h
-    scheduler.add_job(
+    _add_job(
         manage_subscription_lifecycle,
         'cron',
         hour='2',
@@ -177,7 +271,7 @@ def start_scheduler():
 
     # Roda todo dia às 00:05 (logo após meia-noite)
     # Processa assinaturas canceladas que expiraram no dia anterior
-    scheduler.add_job(
+    _add_job(
         process_expired_subscriptions,
         'cron',
         hour='0',
@@ -7,6 +7,7 @@ import logging
 from .product_category_link import ProductCategoryLinkCreate, ProductCategoryLinkOut
 
 from .product_variant_link import ProductVariantLinkOut, ProductVariantLinkCreate
+from .rating import RatingsSummaryOut
 
 
 from src.core.aws import S3_PUBLIC_BASE_URL
@@ -251,6 +252,9 @@ class ProductOut(AppBaseModel):
     prices: List[FlavorPriceOut]
     components: List[KitComponentOut]
 
+    # Resumo de avaliações (cardápio). A lista vem vazia: é buscada sob demanda.
+    rating: Optional[RatingsSummaryOut] = None
+
 
 
     @computed_field
@@ -6,14 +6,26 @@ Cache Manager
 
 Gerenciador de alto nível para operações de cache com invalidação inteligente.
 
+Invalidação por tags:
+- Toda escrita registra a chave nos sets de tags da loja e do domínio
+  (CacheKeys.store_tags)
+- Invalidar = ler os sets e remover as chaves com UNLINK em pipeline
+- SCAN por pattern só como fallback (Redis com erro na invalidação por tag
+  ou CACHE_INVALIDATION_SCAN_FALLBACK ligado para chaves antigas sem tags)
+- Chaves removidas por trigger ficam em metrics ("cache.invalidations")
+- As mesmas tags são derrubadas do L1 de todos os workers (enterprise_cache)
+
 Autor: PDVix Team
 Data: 2025-01-18
 """
 
 import logging
 
-from src.core.cache.keys import CacheKeys
+from src.core.cache.enterprise_cache import enterprise_cache
+from src.core.cache.keys import CacheKeys, CacheTags
 from src.core.cache.redis_client import redis_client
+from src.core.config import config
+from src.core.monitoring.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -28,15 +40,64 @@ class CacheManager:
     - Invalidação em cascata
     """
 
+    PRODUCT_DOMAINS = (CacheTags.PRODUCTS, CacheTags.CATEGORIES)
+    ANALYTICS_DOMAINS = (CacheTags.DASHBOARD, CacheTags.PERFORMANCE, CacheTags.ANALYTICS)
+
     def __init__(self):
         self.client = redis_client
         self.keys = CacheKeys()
 
+    # ═══════════════════════════════════════════════════════════
+    # NÚCLEO DA INVALIDAÇÃO
+    # ═══════════════════════════════════════════════════════════
+
+    def _invalidate(self, trigger: str, tags: list[str], fallback_patterns: list[str]) -> int:
+        """
+        Remove as chaves das tags e registra a métrica do trigger
+
+        Os patterns (SCAN) só são usados se a invalidação por tag falhar
+        ou se CACHE_INVALIDATION_SCAN_FALLBACK estiver ligado.
+        """
+        keys = self.client.pop_tag_members(*tags)
+        total = self.client.unlink(*keys) if keys is not None else None
+
+        # L1 em memória: local + demais workers (pub/sub)
+        enterprise_cache.invalidate(keys=keys or (), tags=tags)
+
+        scan_fallback = total is None or config.CACHE_INVALIDATION_SCAN_FALLBACK
+        if scan_fallback:
+            total = total or 0
+            for pattern in fallback_patterns:
+                if "*" in pattern:
+                    total += self.client.delete_pattern(pattern)
+                else:
+                    total += self.client.delete(pattern)
+
+        metrics.track_cache_invalidation(trigger, total, scan_fallback=scan_fallback)
+        return total
+
+    def _store_domain_tags(self, store_id: int, domains) -> list[str]:
+        return [self.keys.tag_store_domain(store_id, domain) for domain in domains]
+
+    def _product_patterns(self, store_id: int) -> list[str]:
+        return [
+            self.keys.store_products_list(store_id),
+            self.keys.store_categories_list(store_id),
+            self.keys.admin_products_pattern(store_id),
+        ]
+
+    def _analytics_patterns(self, store_id: int) -> list[str]:
+        return [
+            self.keys.dashboard_pattern(store_id),
+            self.keys.performance_pattern(store_id),
+            self.keys.analytics_pattern(store_id),
+        ]
+
     # ═══════════════════════════════════════════════════════════
     # INVALIDAÇÃO POR TIPO
     # ═══════════════════════════════════════════════════════════
 
-    def invalidate_store_products(self, store_id: int) -> int:
+    def invalidate_store_products(self, store_id: int, trigger: str = "invalidate_store_products") -> int:
         """
         ✅ Invalida cache de produtos de uma loja
 
@@ -48,23 +109,16 @@ class CacheManager:
         Returns:
             Número de chaves removidas
         """
-        patterns = [
-            self.keys.store_products_list(store_id),
-            self.keys.store_categories_list(store_id),
-            self.keys.admin_products_pattern(store_id),
-        ]
-
-        total = 0
-        for pattern in patterns:
-            if "*" in pattern:
-                total += self.client.delete_pattern(pattern)
-            else:
-                total += self.client.delete(pattern)
+        total = self._invalidate(
+            trigger,
+            self._store_domain_tags(store_id, self.PRODUCT_DOMAINS),
+            self._product_patterns(store_id),
+        )
 
         logger.info(f"🗑️ Invalidado cache de produtos da loja {store_id}: {total} chaves")
         return total
 
-    def invalidate_store_analytics(self, store_id: int) -> int:
+    def invalidate_store_analytics(self, store_id: int, trigger: str = "invalidate_store_analytics") -> int:
         """
         ✅ Invalida cache de analytics de uma loja
 
@@ -74,15 +128,11 @@ class CacheManager:
         - Customer analytics
         - Product analytics
         """
-        patterns = [
-            self.keys.dashboard_pattern(store_id),
-            self.keys.performance_pattern(store_id),
-            self.keys.analytics_pattern(store_id),
-        ]
-
-        total = 0
-        for pattern in patterns:
-            total += self.client.delete_pattern(pattern)
+        total = self._invalidate(
+            trigger,
+            self._store_domain_tags(store_id, self.ANALYTICS_DOMAINS),
+            self._analytics_patterns(store_id),
+        )
 
         logger.info(f"📊 Invalidado cache de analytics da loja {store_id}: {total} chaves")
         return total
@@ -96,8 +146,11 @@ class CacheManager:
         - Importação em massa de produtos
         - Reset completo necessário
         """
-        pattern = self.keys.store_all_pattern(store_id)
-        total = self.client.delete_pattern(pattern)
+        total = self._invalidate(
+            "invalidate_store_all",
+            [self.keys.tag_store(store_id)],
+            [self.keys.store_all_pattern(store_id)],
+        )
 
         logger.warning(f"🗑️ Invalidado TODO cache da loja {store_id}: {total} chaves")
         return total
@@ -116,9 +169,26 @@ class CacheManager:
         - Status alterado
         - Categoria alterada
         """
-        self.invalidate_store_products(store_id)
-        # Analytics também devem ser invalidados
-        self.invalidate_store_analytics(store_id)
+        # Produtos + analytics numa única invalidação por tags
+        total = self._invalidate(
+            "on_product_change",
+            self._store_domain_tags(store_id, self.PRODUCT_DOMAINS + self.ANALYTICS_DOMAINS),
+            self._product_patterns(store_id) + self._analytics_patterns(store_id),
+        )
+        logger.info(f"🗑️ Invalidado cache de produtos/analytics da loja {store_id}: {total} chaves")
+
+        # Snapshot do cardápio do totem fica obsoleto
+        self.on_store_view_change(store_id)
+
+    def on_stock_change(self, store_id: int):
+        """
+        ✅ Trigger quando só o estoque dos produtos muda (pedidos)
+
+        Invalida as listas de produtos, mas não a versão do conteúdo público:
+        estoque muda a cada pedido e não altera preços nem o cardápio montado.
+        Se um produto/complemento zerou ou voltou, use on_product_change
+        """
+        self.invalidate_store_products(store_id, trigger="on_stock_change")
 
     def on_order_completed(self, store_id: int):
         """
@@ -126,13 +196,30 @@ class CacheManager:
 
         Invalida apenas analytics (produtos não mudam)
         """
-        self.invalidate_store_analytics(store_id)
+        self.invalidate_store_analytics(store_id, trigger="on_order_completed")
 
     def on_category_change(self, store_id: int):
         """
         ✅ Trigger quando categorias são alteradas
         """
-        self.invalidate_store_products(store_id)
+        self.invalidate_store_products(store_id, trigger="on_category_change")
+        self.on_store_view_change(store_id)
+
+    def on_store_view_change(self, store_id: int):
+        """
+        ✅ Trigger quando o conteúdo PÚBLICO da loja muda
+
+        Incrementa a versão do conteúdo, tornando obsoleto o snapshot
+        'initial_state_loaded' do totem (as chaves antigas expiram pelo TTL).
+
+        Chamado quando:
+        - Produtos/categorias alterados (on_product_change/on_category_change)
+        - Loja, horários, pausas, cupons, formas de pagamento (emit_store_updated)
+        - Tema e banners
+        """
+        version = self.client.incr(self.keys.store_view_version(store_id))
+        logger.debug(f"🔄 Versão do conteúdo da loja {store_id}: {version}")
+        return version
 
     # ═══════════════════════════════════════════════════════════
     # ESTATÍSTICAS
@@ -151,10 +238,12 @@ class CacheManager:
         Invalida:
         - Lista de pedidos ativos (Socket.IO)
         - Lista paginada de pedidos
-        - Detalhes individuais de pedidos
         """
-        pattern = self.keys.admin_orders_pattern(store_id)
-        total = self.client.delete_pattern(pattern)
+        total = self._invalidate(
+            "invalidate_store_orders",
+            [self.keys.tag_store_domain(store_id, CacheTags.ORDERS)],
+            [self.keys.admin_orders_pattern(store_id)],
+        )
 
         logger.info(f"🗑️ Invalidado cache de pedidos da loja {store_id}: {total} chaves")
         return total
@@ -169,16 +258,17 @@ class CacheManager:
         - Pedido cancelado
         - Pedido entregue
         """
-        # Invalida apenas o necessário
-        keys_to_delete = [
-            self.keys.admin_orders_active(store_id),
-            self.keys.admin_order_details(store_id, order_id),
-        ]
-
-        # Também invalida lista paginada (todas as páginas)
-        self.client.delete_pattern(f"admin:{store_id}:orders:list:*")
-
-        total = self.client.delete(*keys_to_delete)
+        # Pedidos ativos + lista paginada (todas as páginas) via tag
+        total = self._invalidate(
+            "on_order_status_change",
+            [self.keys.tag_store_domain(store_id, CacheTags.ORDERS)],
+            [self.keys.admin_orders_active(store_id), f"admin:{store_id}:orders:list:*"],
+        )
+
+        # Detalhes: apenas o pedido alterado
+        details_key = self.keys.admin_order_details(store_id, order_id)
+        total += self.client.delete(details_key)
+        enterprise_cache.invalidate(keys=[details_key])
         logger.info(f"🗑️ Invalidado cache de pedido {order_id} (loja {store_id}): {total} chaves")
 
 
@@ -0,0 +1,264 @@
+# src/core/cache/codec.py
+
+"""
+Cache Codec
+===========
+
+Serialização dos valores do cache (Redis) com formato autodescritivo.
+
+Formato:
+    [1 byte de cabeçalho][corpo]
+
+    Cabeçalho = serializador (nibble baixo) | compressão (nibble alto)
+    - 0x01 orjson      0x02 msgpack
+    - 0x00 sem compressão   0x40 zstd   0x80 lz4
+
+Entradas antigas (JSON puro gravado por json.dumps, sem cabeçalho)
+continuam sendo lidas: JSON nunca começa com esses bytes.
+
+Configuração (config.py):
+- CACHE_SERIALIZER: "orjson" (padrão) ou "msgpack"
+- CACHE_COMPRESSION: "zstd" (padrão), "lz4" ou "none"
+- CACHE_COMPRESSION_MIN_BYTES: só comprime corpos a partir desse tamanho
+
+msgpack e lz4 são opcionais: se não estiverem instalados, o codec
+usa orjson / zstd e registra um aviso.
+
+Autor: PDVix Team
+"""
+
+import datetime
+import enum
+import logging
+import threading
+import uuid
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+from src.core.config import config
+from src.core.utils.socketio_json import PreEncodedJSON
+
+try:
+    import zstandard
+except ImportError:  # Dependência opcional
+    zstandard = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:  # Dependência opcional
+    lz4_frame = None
+
+try:
+    import msgpack
+except ImportError:  # Dependência opcional
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+
+class CacheCodecError(ValueError):
+    """Valor que não pode ser codificado/decodificado pelo cache"""
+
+
+# ═══════════════════════════════════════════════════════════
+# CABEÇALHO
+# ═══════════════════════════════════════════════════════════
+
+SERIALIZER_ORJSON = 0x01
+SERIALIZER_MSGPACK = 0x02
+
+COMPRESSION_NONE = 0x00
+COMPRESSION_ZSTD = 0x40
+COMPRESSION_LZ4 = 0x80
+
+_SERIALIZER_MASK = 0x0F
+_COMPRESSION_MASK = 0xF0
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+# ═══════════════════════════════════════════════════════════
+# TIPOS NÃO NATIVOS
+# ═══════════════════════════════════════════════════════════
+
+def _default(value: Any) -> Any:
+    """
+    Converte tipos que o orjson/msgpack não conhecem
+
+    Tipos desconhecidos levantam TypeError (antes viravam str() em silêncio).
+    """
+    if isinstance(value, PreEncodedJSON):
+        # Trecho já serializado pelos emitters: embutido sem reprocessar
+        return orjson.Fragment(value.data)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    if isinstance(value, Decimal):
+        # Mesmo formato do Pydantic em mode='json'
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Tipo não serializável no cache: {type(value).__name__}")
+
+
+def _msgpack_default(value: Any) -> Any:
+    if isinstance(value, PreEncodedJSON):
+        return orjson.loads(value.data)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, enum.Enum):
+        return value.value
+    return _default(value)
+
+
+# ═══════════════════════════════════════════════════════════
+# CODEC
+# ═══════════════════════════════════════════════════════════
+
+class CacheCodec:
+    """
+    ✅ Codifica/decodifica valores do cache
+
+    A escolha de serializador/compressão vale apenas para ESCRITA;
+    a leitura segue o cabeçalho de cada entrada.
+    """
+
+    def __init__(
+            self,
+            serializer: str = "orjson",
+            compression: str = "zstd",
+            compression_min_bytes: int = 4096,
+            zstd_level: int = 3,
+    ):
+        self.serializer = self._resolve_serializer(serializer)
+        self.compression = self._resolve_compression(compression)
+        self.compression_min_bytes = compression_min_bytes
+        self.zstd_level = zstd_level
+
+        # Contextos zstd não são thread-safe: um por thread
+        self._local = threading.local()
+
+    @staticmethod
+    def _resolve_serializer(name: str) -> int:
+        if name == "msgpack":
+            if msgpack is not None:
+                return SERIALIZER_MSGPACK
+            logger.warning("⚠️ msgpack não instalado: cache usará orjson")
+        elif name != "orjson":
+            logger.warning(f"⚠️ Serializador de cache desconhecido '{name}': usando orjson")
+        return SERIALIZER_ORJSON
+
+    @staticmethod
+    def _resolve_compression(name: str) -> int:
+        if name == "none":
+            return COMPRESSION_NONE
+        if name == "lz4":
+            if lz4_frame is not None:
+                return COMPRESSION_LZ4
+            logger.warning("⚠️ lz4 não instalado: tentando zstd")
+        elif name != "zstd":
+            logger.warning(f"⚠️ Compressão de cache desconhecida '{name}': tentando zstd")
+
+        if zstandard is not None:
+            return COMPRESSION_ZSTD
+        logger.warning("⚠️ zstandard não instalado: cache sem compressão")
+        return COMPRESSION_NONE
+
+    # ───────────────────────────────────────────────────────────
+
+    def encode(self, value: Any) -> bytes:
+        """
+        Serializa (e comprime acima do limite) com o cabeçalho
+
+        Raises:
+            CacheCodecError: valor com tipo não suportado
+        """
+        try:
+            if self.serializer == SERIALIZER_MSGPACK:
+                body = msgpack.packb(value, default=_msgpack_default, use_bin_type=True)
+            else:
+                body = orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+        except (TypeError, ValueError, orjson.JSONEncodeError) as e:
+            raise CacheCodecError(str(e)) from e
+
+        compression = COMPRESSION_NONE
+        if self.compression != COMPRESSION_NONE and len(body) >= self.compression_min_bytes:
+            compressed = self._compress(self.compression, body)
+            # Só vale a pena se realmente diminuir
+            if len(compressed) < len(body):
+                body = compressed
+                compression = self.compression
+
+        return bytes((self.serializer | compression,)) + body
+
+    def decode(self, data: bytes) -> Any:
+        """
+        Decodifica uma entrada (com cabeçalho ou JSON legado)
+
+        Raises:
+            CacheCodecError: entrada corrompida ou codec não instalado
+        """
+        if not data:
+            raise CacheCodecError("Entrada vazia")
+
+        header = data[0]
+        serializer = header & _SERIALIZER_MASK
+        compression = header & _COMPRESSION_MASK
+
+        try:
+            # Entrada legada: JSON puro sem cabeçalho
+            if serializer not in (SERIALIZER_ORJSON, SERIALIZER_MSGPACK) or compression not in (
+                    COMPRESSION_NONE, COMPRESSION_ZSTD, COMPRESSION_LZ4
+            ):
+                return orjson.loads(data)
+
+            body = memoryview(data)[1:]
+            if compression != COMPRESSION_NONE:
+                body = self._decompress(compression, body)
+
+            if serializer == SERIALIZER_MSGPACK:
+                if msgpack is None:
+                    raise CacheCodecError("Entrada msgpack, mas msgpack não está instalado")
+                return msgpack.unpackb(body, raw=False, strict_map_key=False)
+
+            return orjson.loads(body)
+
+        except CacheCodecError:
+            raise
+        except Exception as e:
+            raise CacheCodecError(f"Entrada de cache inválida: {e}") from e
+
+    # ───────────────────────────────────────────────────────────
+
+    def _compress(self, compression: int, body: bytes) -> bytes:
+        if compression == COMPRESSION_ZSTD:
+            compressor = getattr(self._local, "zstd_compressor", None)
+            if compressor is None:
+                compressor = self._local.zstd_compressor = zstandard.ZstdCompressor(level=self.zstd_level)
+            return compressor.compress(body)
+        return lz4_frame.compress(body)
+
+    def _decompress(self, compression: int, body) -> bytes:
+        if compression == COMPRESSION_ZSTD:
+            if zstandard is None:
+                raise CacheCodecError("Entrada zstd, mas zstandard não está instalado")
+            decompressor = getattr(self._local, "zstd_decompressor", None)
+            if decompressor is None:
+                decompressor = self._local.zstd_decompressor = zstandard.ZstdDecompressor()
+            return decompressor.decompress(body)
+
+        if lz4_frame is None:
+            raise CacheCodecError("Entrada lz4, mas lz4 não está instalado")
+        return lz4_frame.decompress(body)
+
+
+# ✅ INSTÂNCIA GLOBAL (configurada pelo .env)
+cache_codec = CacheCodec(
+    serializer=config.CACHE_SERIALIZER,
+    compression=config.CACHE_COMPRESSION,
+    compression_min_bytes=config.CACHE_COMPRESSION_MIN_BYTES,
+)
@@ -11,6 +11,10 @@ Uso:
     def get_products(store_id: int):
         return expensive_db_query()
 
+Tags de invalidação (opcional):
+    @cache(ttl=300, key_prefix="products",
+           tags=lambda store_id: CacheKeys.store_tags(store_id, CacheTags.PRODUCTS))
+
 Autor: PDVix Team
 Data: 2025-01-18
 """
@@ -19,18 +23,33 @@ import logging
 import hashlib
 import json
 from functools import wraps
-from typing import Callable, Any, Optional
+from typing import Callable, Any, Iterable, Optional, Union
 
+from src.core.cache.enterprise_cache import enterprise_cache
 from src.core.cache.redis_client import redis_client
 
 logger = logging.getLogger(__name__)
 
+# Tags fixas ou função com a mesma assinatura da função cacheada
+TagsSpec = Optional[Union[Iterable[str], Callable[..., Iterable[str]]]]
+
+
+def _resolve_tags(tags: TagsSpec, args: tuple, kwargs: dict) -> Optional[list[str]]:
+    """Resolve as tags de invalidação de uma escrita"""
+    if tags is None:
+        return None
+    if callable(tags):
+        return list(tags(*args, **kwargs))
+    return list(tags)
+
 
 def cache(
         ttl: int = 300,
         key_prefix: str = "",
         key_builder: Optional[Callable] = None,
-        skip_on_error: bool = True
+        skip_on_error: bool = True,
+        tags: TagsSpec = None,
+        l1: bool = False
 ):
     """
     ✅ Decorator para cachear resultado de funções
@@ -40,6 +59,9 @@ def cache(
         key_prefix: Prefixo da chave (ex: "products", "dashboard")
         key_builder: Função customizada para gerar chave do cache
         skip_on_error: Se True, ignora erros e executa função normalmente
+        tags: Tags de invalidação (lista ou função que recebe os mesmos args)
+        l1: Se True, usa o enterprise_cache (L1 em memória + Redis, com
+            single-flight: misses concorrentes executam a função uma vez)
 
     Exemplo:
         @cache(ttl=300, key_prefix="store_products")
@@ -53,8 +75,8 @@ def cache(
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            # Se Redis não disponível, executa função diretamente
-            if not redis_client.is_available:
+            # Se Redis não disponível, executa função diretamente (o L1 funciona sem Redis)
+            if not l1 and not redis_client.is_available:
                 logger.debug(f"⚠️ Redis indisponível, executando {func.__name__} sem cache")
                 return func(*args, **kwargs)
 
@@ -70,6 +92,14 @@ def cache(
                         kwargs
                     )
 
+                if l1:
+                    return enterprise_cache.get_or_set(
+                        cache_key,
+                        lambda: func(*args, **kwargs),
+                        ttl=ttl,
+                        tags=_resolve_tags(tags, args, kwargs)
+                    )
+
                 # Tenta buscar no cache
                 cached_value = redis_client.get(cache_key)
 
@@ -82,7 +112,7 @@ def cache(
                 result = func(*args, **kwargs)
 
                 # Armazena no cache
-                redis_client.set(cache_key, result, ttl=ttl)
+                redis_client.set(cache_key, result, ttl=ttl, tags=_resolve_tags(tags, args, kwargs))
 
                 return result
 
@@ -100,7 +130,8 @@ def cache(
             func.__name__,
             key_prefix,
             args,
-            kwargs
+            kwargs,
+            l1=l1
         )
 
         return wrapper
@@ -151,10 +182,15 @@ def _invalidate_cache(
         func_name: str,
         prefix: str,
         args: tuple,
-        kwargs: dict
+        kwargs: dict,
+        l1: bool = False
 ) -> int:
     """Invalida cache de uma função específica com parâmetros específicos"""
     cache_key = _default_key_builder(func_name, prefix, args, kwargs)
+    if l1:
+        # Remove do Redis e do L1 de todos os workers
+        enterprise_cache.delete(cache_key)
+        return 1
     return redis_client.delete(cache_key)
 
 
@@ -164,7 +200,8 @@ def _invalidate_cache(
 
 def cache_route(
         ttl: int = 300,
-        key_builder: Optional[Callable] = None
+        key_builder: Optional[Callable] = None,
+        tags: TagsSpec = None
 ):
     """
     ✅ Decorator específico para rotas FastAPI
@@ -174,6 +211,8 @@ def cache_route(
     - Query params
     - Request body (se necessário)
 
+    `tags` segue a mesma convenção de `key_builder` (recebe os kwargs da rota)
+
     Exemplo:
         @router.get("/products")
         @cache_route(ttl=300)
@@ -222,7 +261,7 @@ def cache_route(
                     result = func(*args, **kwargs)
 
                 # Armazena no cache
-                redis_client.set(cache_key, result, ttl=ttl)
+                redis_client.set(cache_key, result, ttl=ttl, tags=_resolve_tags(tags, args, kwargs))
 
                 return result
 
@@ -263,7 +302,7 @@ def cache_route(
                 logger.debug(f"❌ ROUTE CACHE MISS: {cache_key}")
                 result = func(*args, **kwargs)
 
-                redis_client.set(cache_key, result, ttl=ttl)
+                redis_client.set(cache_key, result, ttl=ttl, tags=_resolve_tags(tags, args, kwargs))
 
                 return result
 
@@ -4,43 +4,175 @@ Enterprise Cache Layer
 Sistema de cache em múltiplas camadas para alta performance
 
 Camadas:
-1. L1: Cache em memória (local)
+1. L1: Cache em memória (local, por worker)
 2. L2: Redis (compartilhado)
 3. L3: Database
 
+L1:
+- LRU limitado por quantidade de itens E por bytes
+- TTL por entrada (nunca maior que o TTL do L2 nem que L1_CACHE_MAX_TTL_SECONDS)
+- Índice de tags: invalidar uma tag também derruba as chaves do L1
+
+Proteção contra stampede (single-flight):
+- Misses concorrentes na mesma chave executam o loader UMA vez;
+  os demais aguardam o resultado (threads e corrotinas)
+
+Invalidação entre workers:
+- delete/invalidate publicam no canal Redis CacheKeys.l1_invalidation_channel()
+- Cada worker escuta o canal (start_invalidation_listener) e limpa o seu L1
+
 Autor: PDVix Team
 """
 
+import asyncio
 import hashlib
 import json
-import pickle
-from typing import Any, Optional, Callable
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Optional, Callable, Iterable
 from functools import wraps
 import logging
 
+from src.core.cache.codec import cache_codec, CacheCodecError
+from src.core.cache.keys import CacheKeys
 from src.core.cache.redis_client import redis_client
+from src.core.config import config
 
 logger = logging.getLogger(__name__)
 
+# Sentinela para diferenciar "não está no cache" de um valor None cacheado
+_MISSING = object()
+
+
+class _L1Entry:
+    __slots__ = ("value", "expires_at", "size", "tags")
+
+    def __init__(self, value: Any, expires_at: float, size: int, tags: tuple):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+
 
 class MultiLayerCache:
     """
     Cache em múltiplas camadas com fallback automático
     """
 
-    def __init__(self):
-        self.l1_cache = {}  # Cache em memória (limitado a 1000 itens)
-        self.l1_max_size = 1000
+    def __init__(
+            self,
+            l1_max_size: Optional[int] = None,
+            l1_max_bytes: Optional[int] = None,
+            l1_max_ttl: Optional[int] = None,
+    ):
+        self.l1_cache: "OrderedDict[str, _L1Entry]" = OrderedDict()
+        self.l1_max_size = l1_max_size or config.L1_CACHE_MAX_ITEMS
+        self.l1_max_bytes = l1_max_bytes or config.L1_CACHE_MAX_BYTES
+        self.l1_max_ttl = l1_max_ttl or config.L1_CACHE_MAX_TTL_SECONDS
+        self.l1_bytes = 0
+        self._l1_tags: dict[str, set[str]] = {}
+        self._lock = threading.RLock()
+
+        # Single-flight: chave -> evento (threads) / future (corrotinas)
+        self._inflight: dict[str, threading.Event] = {}
+        self._inflight_async: dict[str, asyncio.Future] = {}
+
+        # Pub/sub de invalidação
+        self.instance_id = uuid.uuid4().hex
+        self._pubsub = None
+        self._listener_thread = None
+
         self.l1_hits = 0
         self.l2_hits = 0
         self.l3_hits = 0
         self.misses = 0
+        self.l1_evictions = 0
+        self.l1_expirations = 0
+        self.coalesced_waits = 0
+        self.remote_invalidations = 0
 
     def _generate_key(self, prefix: str, *args, **kwargs) -> str:
         """Gera chave única baseada nos parâmetros"""
         key_data = f"{prefix}:{args}:{sorted(kwargs.items())}"
         return hashlib.md5(key_data.encode()).hexdigest()
 
+    # ═══════════════════════════════════════════════════════════
+    # L1 (MEMÓRIA LOCAL)
+    # ═══════════════════════════════════════════════════════════
+
+    def _get_l1(self, key: str) -> Any:
+        with self._lock:
+            entry = self.l1_cache.get(key)
+            if entry is None:
+                return _MISSING
+
+            if entry.expires_at <= time.monotonic():
+                self._remove_l1(key)
+                self.l1_expirations += 1
+                return _MISSING
+
+            self.l1_cache.move_to_end(key)
+            return entry.value
+
+    def _set_l1(self, key: str, value: Any, ttl: int, size: int, tags: Iterable[str] = ()):
+        """Armazena em L1 respeitando TTL, limite de itens e de bytes (LRU)"""
+        if size > self.l1_max_bytes:
+            return
+
+        ttl = min(ttl, self.l1_max_ttl)
+        if ttl <= 0:
+            return
+
+        tags = tuple(tags or ())
+
+        with self._lock:
+            self._remove_l1(key)
+
+            self.l1_cache[key] = _L1Entry(value, time.monotonic() + ttl, size, tags)
+            self.l1_bytes += size
+            for tag in tags:
+                self._l1_tags.setdefault(tag, set()).add(key)
+
+            # Remove os menos usados recentemente até caber nos limites
+            while self.l1_cache and (
+                    len(self.l1_cache) > self.l1_max_size or self.l1_bytes > self.l1_max_bytes
+            ):
+                oldest_key = next(iter(self.l1_cache))
+                self._remove_l1(oldest_key)
+                self.l1_evictions += 1
+
+    def _remove_l1(self, key: str) -> bool:
+        """Remove uma chave do L1 (chamar com o lock adquirido)"""
+        entry = self.l1_cache.pop(key, None)
+        if entry is None:
+            return False
+
+        self.l1_bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._l1_tags.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._l1_tags[tag]
+        return True
+
+    def _drop_local(self, keys: Iterable[str] = (), tags: Iterable[str] = ()) -> int:
+        """Remove chaves e tags do L1 deste worker"""
+        removed = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._l1_tags.get(tag, ())):
+                    removed += self._remove_l1(key)
+            for key in keys:
+                removed += self._remove_l1(key)
+        return removed
+
+    # ═══════════════════════════════════════════════════════════
+    # LEITURA / ESCRITA
+    # ═══════════════════════════════════════════════════════════
+
     def get(self, key: str) -> Optional[Any]:
         """
         Busca valor no cache (L1 -> L2 -> None)
@@ -51,27 +183,41 @@ class MultiLayerCache:
         Returns:
             Valor cacheado ou None
         """
+        value = self._lookup(key)
+        return None if value is _MISSING else value
+
+    def _lookup(self, key: str) -> Any:
         # L1: Memória local
-        if key in self.l1_cache:
+        value = self._get_l1(key)
+        if value is not _MISSING:
             self.l1_hits += 1
             logger.debug(f"🎯 L1 Cache HIT: {key}")
-            return self.l1_cache[key]
+            return value
 
         # L2: Redis
         if redis_client.is_available:
-            value = redis_client.get(key)
-            if value is not None:
+            raw = redis_client.get_bytes(key)
+            if raw is not None:
+                try:
+                    value = cache_codec.decode(raw)
+                except CacheCodecError as e:
+                    logger.error(f"❌ Valor corrompido no L2 '{key}': {e}")
+                    return _MISSING
+
                 self.l2_hits += 1
                 logger.debug(f"🎯 L2 Cache HIT: {key}")
-                # Promove para L1
-                self._set_l1(key, value)
+
+                # Promove para L1 pelo tempo que ainda resta no L2
+                remaining = redis_client.ttl(key)
+                if remaining > 0:
+                    self._set_l1(key, value, remaining, len(raw))
                 return value
 
         self.misses += 1
         logger.debug(f"❌ Cache MISS: {key}")
-        return None
+        return _MISSING
 
-    def set(self, key: str, value: Any, ttl: int = 300):
+    def set(self, key: str, value: Any, ttl: int = 300, tags: Optional[Iterable[str]] = None):
         """
         Armazena valor em todas as camadas de cache
 
@@ -79,38 +225,200 @@ class MultiLayerCache:
             key: Chave do cache
             value: Valor a ser cacheado
             ttl: Time to live em segundos
+            tags: Tags de invalidação (ver CacheKeys.store_tags)
         """
-        # L1: Memória local
-        self._set_l1(key, value)
+        tags = list(tags or ())
+        try:
+            encoded = cache_codec.encode(value)
+        except CacheCodecError as e:
+            logger.error(f"❌ Valor não cacheável '{key}': {e}")
+            return
+
+        # L1: Memória local (tamanho = bytes codificados)
+        self._set_l1(key, value, ttl, len(encoded), tags)
 
         # L2: Redis
         if redis_client.is_available:
-            redis_client.set(key, value, ttl)
+            redis_client.set_bytes(key, encoded, ttl, tags=tags)
+
+    def get_or_set(
+            self,
+            key: str,
+            loader: Callable[[], Any],
+            ttl: int = 300,
+            tags: Optional[Iterable[str]] = None,
+            wait_timeout: float = 10.0,
+    ) -> Any:
+        """
+        Busca no cache ou executa `loader` com single-flight (threads)
 
-    def _set_l1(self, key: str, value: Any):
-        """Armazena em L1 com limite de tamanho"""
-        if len(self.l1_cache) >= self.l1_max_size:
-            # Remove item mais antigo (FIFO)
-            oldest_key = next(iter(self.l1_cache))
-            del self.l1_cache[oldest_key]
+        Se várias threads erram a mesma chave ao mesmo tempo, apenas a
+        primeira executa o loader; as outras aguardam e leem o resultado.
+        Se o loader falhar (ou demorar mais que wait_timeout), quem esperava
+        executa o loader por conta própria.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        with self._lock:
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = threading.Event()
+                self._inflight[key] = event
+
+        if not leader:
+            self.coalesced_waits += 1
+            event.wait(wait_timeout)
+            value = self._get_l1(key)
+            if value is not _MISSING:
+                return value
+            return loader()
+
+        try:
+            value = loader()
+            self.set(key, value, ttl, tags)
+            return value
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+
+    async def aget_or_set(
+            self,
+            key: str,
+            loader: Callable[[], Any],
+            ttl: int = 300,
+            tags: Optional[Iterable[str]] = None,
+    ) -> Any:
+        """
+        Versão assíncrona de get_or_set (single-flight entre corrotinas)
 
-        self.l1_cache[key] = value
+        `loader` é uma função sem argumentos que retorna uma corrotina.
+        """
+        value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+
+        future = self._inflight_async.get(key)
+        if future is not None:
+            self.coalesced_waits += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_async[key] = future
+        try:
+            value = await loader()
+            self.set(key, value, ttl, tags)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evita "Future exception was never retrieved" quando ninguém esperava
+            future.exception()
+            raise
+        finally:
+            self._inflight_async.pop(key, None)
+
+    # ═══════════════════════════════════════════════════════════
+    # INVALIDAÇÃO
+    # ═══════════════════════════════════════════════════════════
 
     def delete(self, key: str):
-        """Remove valor de todas as camadas"""
+        """Remove valor de todas as camadas (e do L1 dos outros workers)"""
         # L1
-        if key in self.l1_cache:
-            del self.l1_cache[key]
+        self._drop_local(keys=[key])
 
         # L2
         if redis_client.is_available:
             redis_client.delete(key)
 
+        self.publish_invalidation(keys=[key])
+
+    def invalidate(self, keys: Iterable[str] = (), tags: Iterable[str] = ()) -> int:
+        """
+        Remove do L1 (local e dos outros workers) as chaves e tags informadas
+
+        O L2 é limpo pelo CacheManager (pop_tag_members + unlink). As chaves
+        lidas das tags no Redis também vão na mensagem: entradas promovidas
+        do L2 para o L1 não conhecem as próprias tags.
+        """
+        keys = list(keys)
+        tags = list(tags)
+        removed = self._drop_local(keys=keys, tags=tags)
+        self.publish_invalidation(keys=keys, tags=tags)
+        return removed
+
+    def publish_invalidation(self, keys: Iterable[str] = (), tags: Iterable[str] = (), clear: bool = False):
+        """Avisa os outros workers para limparem o L1"""
+        message = {
+            "origin": self.instance_id,
+            "keys": list(keys),
+            "tags": list(tags),
+            "clear": clear,
+        }
+        redis_client.publish(CacheKeys.l1_invalidation_channel(), json.dumps(message))
+
+    def _handle_invalidation_message(self, message: dict):
+        """Callback do pub/sub (roda na thread do listener)"""
+        try:
+            data = json.loads(message["data"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        if data.get("origin") == self.instance_id:
+            return
+
+        self.remote_invalidations += 1
+        if data.get("clear"):
+            self._clear_l1()
+        else:
+            self._drop_local(keys=data.get("keys", ()), tags=data.get("tags", ()))
+
+    def start_invalidation_listener(self):
+        """
+        Inicia a thread que escuta invalidações dos outros workers
+
+        Chamado no startup da aplicação (lifespan).
+        """
+        if self._listener_thread is not None:
+            return
+
+        pubsub = redis_client.pubsub()
+        if pubsub is None:
+            logger.warning("⚠️ Redis indisponível: L1 sem invalidação entre workers")
+            return
+
+        pubsub.subscribe(**{CacheKeys.l1_invalidation_channel(): self._handle_invalidation_message})
+        self._pubsub = pubsub
+        self._listener_thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+        logger.info("✅ Listener de invalidação do L1 iniciado")
+
+    def stop_invalidation_listener(self):
+        """Encerra a thread do pub/sub (shutdown)"""
+        if self._listener_thread is not None:
+            self._listener_thread.stop()
+            self._listener_thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+    def _clear_l1(self):
+        with self._lock:
+            self.l1_cache.clear()
+            self._l1_tags.clear()
+            self.l1_bytes = 0
+
     def clear_all(self):
         """Limpa todo o cache"""
-        self.l1_cache.clear()
+        self._clear_l1()
+        self.publish_invalidation(clear=True)
         if redis_client.is_available:
-            redis_client.clear()
+            redis_client.flush_all()
 
     def get_stats(self) -> dict:
         """Retorna estatísticas do cache"""
@@ -125,6 +433,12 @@ class MultiLayerCache:
             "hit_rate": round((self.l1_hits + self.l2_hits) / total_requests * 100, 2) if total_requests > 0 else 0,
             "l1_size": len(self.l1_cache),
             "l1_max_size": self.l1_max_size,
+            "l1_bytes": self.l1_bytes,
+            "l1_max_bytes": self.l1_max_bytes,
+            "l1_evictions": self.l1_evictions,
+            "l1_expirations": self.l1_expirations,
+            "coalesced_waits": self.coalesced_waits,
+            "remote_invalidations": self.remote_invalidations,
         }
 
 
@@ -152,19 +466,9 @@ def cached(prefix: str, ttl: int = 300):
             # Gera chave única
             cache_key = enterprise_cache._generate_key(prefix, *args, **kwargs)
 
-            # Tenta buscar no cache
-            cached_value = enterprise_cache.get(cache_key)
-            if cached_value is not None:
-                return cached_value
-
-            # Se não encontrou, executa função
-            result = func(*args, **kwargs)
-
-            # Armazena no cache
-            enterprise_cache.set(cache_key, result, ttl)
-
-            return result
+            # Busca no cache ou executa a função (uma única vez por chave)
+            return enterprise_cache.get_or_set(cache_key, lambda: func(*args, **kwargs), ttl)
 
         return wrapper
 
-    return decorator
\ No newline at end of file
+    return decorator
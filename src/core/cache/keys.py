@@ -11,6 +11,7 @@ Padrão de chaves:
 - store:{store_id}:categories:list
 - auth:login_failed:{email}
 - auth:user_locations:{email}
+- tag:store:{store_id}[:{domínio}]  (sets de tags para invalidação)
 
 Autor: PDVix Team
 Data: 2025-01-19
@@ -57,13 +58,48 @@ class CacheKeys:
     @staticmethod
     def user_sessions(email: str) -> str:
         """
-        Lista de sessões ativas do usuário
+        Sorted set dos JTIs ativos do usuário (score = expiração em epoch)
 
         TTL: 30 dias (mesmo do refresh token)
         Uso: Logout de todos dispositivos
         """
         return f"auth:user_sessions:{email}"
 
+    @staticmethod
+    def token_blacklist(jti: str) -> str:
+        """
+        Flag de token revogado
+
+        TTL: Até a expiração natural do token
+        Uso: Logout / troca de senha
+        """
+        return f"blacklist:{jti}"
+
+    @staticmethod
+    def token_revocation_generation() -> str:
+        """
+        Contador de revogações de token (1 por revogação publicada)
+
+        TTL: Sem expiração (permanente)
+        Uso: Detectar mensagens de revogação perdidas pelo filtro local
+        """
+        return "auth:token_revocation:generation"
+
+    @staticmethod
+    def token_revocation_channel() -> str:
+        """Canal pub/sub dos JTIs revogados (filtro local de cada worker)"""
+        return "auth:token_revocation:channel"
+
+    @staticmethod
+    def rate_limit(scope: str, identifier: str) -> str:
+        """
+        TAT (GCRA) do cliente no rate limiter distribuído
+
+        TTL: Até a janela esvaziar (definido pelo script)
+        Uso: Rate limit de sockets, PIN e middleware HTTP
+        """
+        return f"rl:gcra:{scope}:{identifier}"
+
     @staticmethod
     def account_locked(email: str) -> str:
         """
@@ -94,6 +130,70 @@ class CacheKeys:
         """
         return f"auth:suspicious_alert:{email}"
 
+    @staticmethod
+    def principal_user(email: str) -> str:
+        """
+        Snapshot das colunas do usuário (get_current_user)
+
+        TTL: PRINCIPAL_CACHE_TTL_SECONDS
+        Uso: Autenticação sem consulta ao banco
+        """
+        return f"auth:principal:user:{email}"
+
+    @staticmethod
+    def principal_store_access(user_id: int, store_id: int) -> str:
+        """
+        Role do usuário na loja (GetStore)
+
+        TTL: PRINCIPAL_CACHE_TTL_SECONDS
+        Uso: Autorização sem consulta ao banco
+        """
+        return f"auth:principal:access:{user_id}:{store_id}"
+
+    @staticmethod
+    def principal_store(store_id: int) -> str:
+        """
+        Snapshot das colunas da loja (GetStore)
+
+        TTL: PRINCIPAL_CACHE_TTL_SECONDS
+        Uso: Autorização sem consulta ao banco
+        """
+        return f"auth:principal:store:{store_id}"
+
+    # ═══════════════════════════════════════════════════════════
+    # JOBS AGENDADOS
+    # ═══════════════════════════════════════════════════════════
+
+    @staticmethod
+    def job_lock(job_id: str) -> str:
+        """
+        Lock de execução de um job (valor = token do dono)
+
+        TTL: JOB_LOCK_TTL_SECONDS (renovado enquanto o job roda)
+        Uso: Uma execução por vez entre todos os processos
+        """
+        return f"jobs:lock:{job_id}"
+
+    @staticmethod
+    def job_slot_lock(job_id: str, slot: int) -> str:
+        """
+        Lock de um disparo do job (slot = floor(epoch / intervalo))
+
+        TTL: Intervalo do job (retido mesmo depois do fim da execução)
+        Uso: Um disparo roda em um processo só, mesmo com relógios defasados
+        """
+        return f"jobs:slot:{job_id}:{slot}"
+
+    @staticmethod
+    def job_lock_token(job_id: str) -> str:
+        """
+        Contador dos tokens do lock de um job
+
+        TTL: Sem expiração (permanente)
+        Uso: Distinguir a execução atual de uma que perdeu o lock
+        """
+        return f"jobs:token:{job_id}"
+
     # ═══════════════════════════════════════════════════════════
     # PRODUTOS (APP - CARDÁPIO DIGITAL)
     # ═══════════════════════════════════════════════════════════
@@ -113,11 +213,58 @@ class CacheKeys:
         """Detalhes básicos da loja por slug"""
         return f"store:slug:{store_slug}:details"
 
+    @staticmethod
+    def catalog_version(store_id: int) -> str:
+        """
+        Versão monotônica do cardápio da loja (deltas via Socket.IO)
+
+        TTL: Sem expiração
+        Obs: Fica fora de "store:{id}:*" para não ser zerada por invalidate_store_all
+        """
+        return f"catalog:{store_id}:version"
+
+    @staticmethod
+    def store_view_version(store_id: int) -> str:
+        """
+        Versão do conteúdo público da loja (cardápio, tema, banners, horários, pausas)
+
+        TTL: Sem expiração
+        Obs: Fica fora de "store:{id}:*" para não ser zerada por invalidate_store_all
+        """
+        return f"storeview:{store_id}:version"
+
+    @staticmethod
+    def totem_initial_state(store_id: int, version: int) -> str:
+        """
+        Snapshot JSON pré-serializado do 'initial_state_loaded' do totem
+
+        TTL: TOTEM_SNAPSHOT_TTL_SECONDS (versões antigas expiram sozinhas)
+        """
+        return f"storeview:{store_id}:initial_state:v{version}"
+
     @staticmethod
     def store_all_pattern(store_id: int) -> str:
         """Pattern para invalidar TUDO de uma loja"""
         return f"store:{store_id}:*"
 
+    # ═══════════════════════════════════════════════════════════
+    # CARRINHO AO VIVO (APP - CARDÁPIO DIGITAL)
+    # ═══════════════════════════════════════════════════════════
+
+    @staticmethod
+    def live_cart(store_id: int, customer_id: int) -> str:
+        """
+        Carrinho ativo do cliente (hash: cart_id, meta, seq, item:{id}, qty:{id}, fp:{fingerprint})
+
+        TTL: LIVE_CART_TTL_SECONDS (renovado a cada acesso)
+        """
+        return f"cart:{store_id}:{customer_id}"
+
+    @staticmethod
+    def live_cart_dirty() -> str:
+        """Set de carrinhos ("{store_id}:{customer_id}") alterados e ainda não gravados no banco"""
+        return "cart:dirty"
+
     # ═══════════════════════════════════════════════════════════
     # DASHBOARD & ANALYTICS (ADMIN)
     # ═══════════════════════════════════════════════════════════
@@ -187,6 +334,16 @@ class CacheKeys:
         """Pattern para invalidar todos analytics"""
         return f"analytics:{store_id}:*"
 
+    @staticmethod
+    def daily_metrics_dirty(store_id: int) -> str:
+        """Set de dias (ISO) do rollup diário a recalcular"""
+        return f"metrics:daily:{store_id}:dirty"
+
+    @staticmethod
+    def daily_metrics_dirty_stores() -> str:
+        """Set de lojas com dias pendentes no rollup diário"""
+        return "metrics:daily:dirty_stores"
+
     # ═══════════════════════════════════════════════════════════
     # ORDERS (ADMIN) - TEMPO REAL
     # ═══════════════════════════════════════════════════════════
@@ -196,6 +353,25 @@ class CacheKeys:
         """Lista de pedidos ativos (para Socket.IO)"""
         return f"admin:{store_id}:orders:active"
 
+    @staticmethod
+    def admin_orders_projection(store_id: int) -> str:
+        """
+        Projeção dos pedidos ativos (hash: order_id -> JSON do OrderDetails)
+
+        TTL: ORDERS_PROJECTION_TTL_SECONDS (renovado a cada atualização)
+        """
+        return f"admin:{store_id}:orders:projection"
+
+    @staticmethod
+    def admin_orders_projection_ready(store_id: int) -> str:
+        """Flag de projeção completa (ao expirar, a projeção é reconstruída)"""
+        return f"admin:{store_id}:orders:projection:ready"
+
+    @staticmethod
+    def admin_orders_projection_dirty(store_id: int) -> str:
+        """Set de pedidos alterados desde a última leitura da projeção"""
+        return f"admin:{store_id}:orders:projection:dirty"
+
     @staticmethod
     def admin_order_details(store_id: int, order_id: int) -> str:
         """Detalhes de um pedido específico"""
@@ -215,4 +391,46 @@ class CacheKeys:
     @staticmethod
     def admin_orders_pattern(store_id: int) -> str:
         """Pattern para invalidar TODOS pedidos de uma loja"""
-        return f"admin:{store_id}:orders:*"
\ No newline at end of file
+        return f"admin:{store_id}:orders:*"
+
+    # ═══════════════════════════════════════════════════════════
+    # TAGS DE INVALIDAÇÃO
+    # ═══════════════════════════════════════════════════════════
+    # Cada escrita de cache registra a chave nos sets das suas tags
+    # (loja + domínio). A invalidação lê o set e remove as chaves,
+    # sem varrer o keyspace.
+
+    @staticmethod
+    def tag_store(store_id: int) -> str:
+        """Set com TODAS as chaves cacheadas de uma loja"""
+        return f"tag:store:{store_id}"
+
+    @staticmethod
+    def tag_store_domain(store_id: int, domain: str) -> str:
+        """Set com as chaves de um domínio (CacheTags) de uma loja"""
+        return f"tag:store:{store_id}:{domain}"
+
+    @classmethod
+    def store_tags(cls, store_id: int, domain: str) -> list[str]:
+        """Tags padrão de uma escrita: loja + domínio"""
+        return [cls.tag_store(store_id), cls.tag_store_domain(store_id, domain)]
+
+    @staticmethod
+    def l1_invalidation_channel() -> str:
+        """
+        Canal pub/sub para invalidar o L1 (memória) de todos os workers
+
+        Mensagem: {"origin", "keys", "tags", "clear"}
+        """
+        return "cache:l1:invalidate"
+
+
+class CacheTags:
+    """Domínios usados nas tags de invalidação"""
+
+    PRODUCTS = "products"
+    CATEGORIES = "categories"
+    DASHBOARD = "dashboard"
+    PERFORMANCE = "performance"
+    ANALYTICS = "analytics"
+    ORDERS = "orders"
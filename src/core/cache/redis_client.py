@@ -12,24 +12,29 @@ Características:
 - ✅ Fallback gracioso (se Redis não disponível)
 - ✅ Retry automático
 - ✅ Logging detalhado
+- ✅ Invalidação por tags (sets de chaves + UNLINK em pipeline)
+- ✅ Valores binários via CacheCodec (orjson/msgpack + zstd/lz4)
 
 Autor: PDVix Team
 Data: 2025-01-18
 """
 
-import json
 import logging
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 from functools import wraps
 
 import redis
 from redis.connection import ConnectionPool
 from redis.exceptions import RedisError, ConnectionError as RedisConnectionError
 
+from src.core.cache.codec import cache_codec, CacheCodecError
 from src.core.config import config
 
 logger = logging.getLogger(__name__)
 
+# Quantidade de chaves por comando UNLINK/SCAN (evita comandos gigantes)
+_BATCH_SIZE = 500
+
 
 class RedisClient:
     """
@@ -41,6 +46,7 @@ class RedisClient:
 
     _instance: Optional["RedisClient"] = None
     _client: Optional[redis.Redis] = None
+    _binary_client: Optional[redis.Redis] = None
     _is_available: bool = False
 
     def __new__(cls):
@@ -81,6 +87,17 @@ class RedisClient:
 
             self._client = redis.Redis(connection_pool=pool)
 
+            # Pool sem decode_responses para os valores do cache (codec binário)
+            binary_pool = ConnectionPool.from_url(
+                config.REDIS_URL,
+                max_connections=10,
+                decode_responses=False,
+                socket_timeout=5,
+                socket_connect_timeout=5,
+                retry_on_timeout=True
+            )
+            self._binary_client = redis.Redis(connection_pool=binary_pool)
+
             # Testa conexão
             self._client.ping()
 
@@ -93,6 +110,7 @@ class RedisClient:
             logger.warning("⚠️ Aplicação continuará sem cache")
             self._is_available = False
             self._client = None
+            self._binary_client = None
 
     @property
     def is_available(self) -> bool:
@@ -109,16 +127,13 @@ class RedisClient:
         Returns:
             Valor deserializado ou None se não encontrado
         """
-        if not self._is_available or not self._client:
+        value = self.get_bytes(key)
+        if not value:
             return None
 
         try:
-            value = self._client.get(key)
-            if value:
-                # Deserializa JSON
-                return json.loads(value)
-            return None
-        except (RedisError, json.JSONDecodeError) as e:
+            return cache_codec.decode(value)
+        except CacheCodecError as e:
             logger.error(f"❌ Erro ao buscar chave '{key}': {e}")
             return None
 
@@ -126,15 +141,17 @@ class RedisClient:
             self,
             key: str,
             value: Any,
-            ttl: int = 300
+            ttl: int = 300,
+            tags: Optional[Iterable[str]] = None
     ) -> bool:
         """
         ✅ Armazena valor no cache
 
         Args:
             key: Chave do cache
-            value: Valor a ser armazenado (será serializado em JSON)
+            value: Valor a ser armazenado (serializado pelo cache_codec)
             ttl: Tempo de vida em segundos (padrão: 5 minutos)
+            tags: Sets de tags onde a chave é registrada (ver CacheKeys.store_tags)
 
         Returns:
             True se sucesso, False se falhou
@@ -143,19 +160,104 @@ class RedisClient:
             return False
 
         try:
-            # Serializa para JSON
-            serialized = json.dumps(value, default=str)
+            # Serializa (cabeçalho + corpo, comprimido acima do limite)
+            serialized = cache_codec.encode(value)
+
+            # Armazena com TTL (e registra nas tags no mesmo round-trip)
+            self._setex_tagged(key, ttl, serialized, tags)
+
+            logger.debug(f"✅ Cache SET: {key} (TTL: {ttl}s, {len(serialized)} bytes)")
+            return True
+
+        except (RedisError, CacheCodecError) as e:
+            logger.error(f"❌ Erro ao armazenar chave '{key}': {e}")
+            return False
+
+    def get_raw(self, key: str) -> Optional[str]:
+        """
+        ✅ Busca o valor SEM desserializar (payloads já codificados)
+
+        Returns:
+            String armazenada ou None se não encontrada
+        """
+        if not self._is_available or not self._client:
+            return None
+
+        try:
+            return self._client.get(key)
+        except RedisError as e:
+            logger.error(f"❌ Erro ao buscar chave '{key}': {e}")
+            return None
+
+    def set_raw(self, key: str, value: str, ttl: int = 300, tags: Optional[Iterable[str]] = None) -> bool:
+        """
+        ✅ Armazena uma string já serializada (sem passar por json.dumps)
 
-            # Armazena com TTL
-            self._client.setex(key, ttl, serialized)
+        Returns:
+            True se sucesso, False se falhou
+        """
+        if not self._is_available or not self._client:
+            return False
 
-            logger.debug(f"✅ Cache SET: {key} (TTL: {ttl}s)")
+        try:
+            self._setex_tagged(key, ttl, value, tags)
+            logger.debug(f"✅ Cache SET RAW: {key} (TTL: {ttl}s)")
             return True
+        except RedisError as e:
+            logger.error(f"❌ Erro ao armazenar chave '{key}': {e}")
+            return False
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """
+        ✅ Busca o valor binário como está no Redis (sem decodificar)
+
+        Returns:
+            Bytes armazenados ou None se não encontrado
+        """
+        if not self._is_available or not self._binary_client:
+            return None
+
+        try:
+            return self._binary_client.get(key)
+        except RedisError as e:
+            logger.error(f"❌ Erro ao buscar chave '{key}': {e}")
+            return None
 
-        except (RedisError, TypeError, ValueError) as e:
+    def set_bytes(self, key: str, value: bytes, ttl: int = 300, tags: Optional[Iterable[str]] = None) -> bool:
+        """
+        ✅ Armazena um valor já codificado (ex: cache_codec.encode)
+
+        Returns:
+            True se sucesso, False se falhou
+        """
+        if not self._is_available or not self._binary_client:
+            return False
+
+        try:
+            self._setex_tagged(key, ttl, value, tags)
+            logger.debug(f"✅ Cache SET BYTES: {key} (TTL: {ttl}s, {len(value)} bytes)")
+            return True
+        except RedisError as e:
             logger.error(f"❌ Erro ao armazenar chave '{key}': {e}")
             return False
 
+    def _setex_tagged(self, key: str, ttl: int, value, tags: Optional[Iterable[str]]):
+        """SETEX + SADD da chave em cada tag, num único pipeline"""
+        tags = list(tags or ())
+        if not tags:
+            self._binary_client.setex(key, ttl, value)
+            return
+
+        # O set da tag vive pelo menos tanto quanto a chave mais longa
+        tag_ttl = max(ttl, config.CACHE_TAG_TTL_SECONDS)
+
+        pipe = self._binary_client.pipeline(transaction=False)
+        pipe.setex(key, ttl, value)
+        for tag in tags:
+            pipe.sadd(tag, key)
+            pipe.expire(tag, tag_ttl)
+        pipe.execute()
+
     def delete(self, *keys: str) -> int:
         """
         ✅ Remove uma ou mais chaves do cache
@@ -181,6 +283,9 @@ class RedisClient:
         """
         ✅ Remove todas as chaves que correspondem ao pattern
 
+        ⚠️ Varre o keyspace (SCAN): use apenas como fallback.
+        O caminho normal é invalidate_tags().
+
         Args:
             pattern: Pattern com wildcards (ex: "store:123:*")
 
@@ -191,20 +296,198 @@ class RedisClient:
             return 0
 
         try:
-            # Busca todas as chaves que correspondem
-            keys = self._client.keys(pattern)
+            count = 0
+            batch = []
 
-            if keys:
-                count = self._client.delete(*keys)
+            # SCAN é incremental (não bloqueia o Redis como KEYS)
+            for key in self._client.scan_iter(match=pattern, count=_BATCH_SIZE):
+                batch.append(key)
+                if len(batch) >= _BATCH_SIZE:
+                    count += self._client.unlink(*batch)
+                    batch = []
+
+            if batch:
+                count += self._client.unlink(*batch)
+
+            if count:
                 logger.debug(f"🗑️ Cache DELETE PATTERN '{pattern}': {count} chaves")
-                return count
+            return count
+
+        except RedisError as e:
+            logger.error(f"❌ Erro ao deletar pattern '{pattern}': {e}")
+            return 0
+
+    def pop_tag_members(self, *tags: str) -> Optional[list[str]]:
+        """
+        ✅ Lê e apaga os sets de tags numa única transação
+
+        SMEMBERS + DEL na mesma MULTI: escritas posteriores já entram
+        num set novo e não se perdem.
+
+        Returns:
+            Chaves registradas nas tags, ou None se a operação falhou
+        """
+        if not self._is_available or not self._client:
+            return []
+
+        if not tags:
+            return []
 
+        try:
+            pipe = self._client.pipeline(transaction=True)
+            for tag in tags:
+                pipe.smembers(tag)
+            pipe.delete(*tags)
+            results = pipe.execute()
+
+            keys = set()
+            for members in results[:-1]:
+                keys.update(members)
+            return list(keys)
+
+        except RedisError as e:
+            logger.error(f"❌ Erro ao ler tags {list(tags)}: {e}")
+            return None
+
+    def unlink(self, *keys: str) -> int:
+        """
+        ✅ Remove chaves com UNLINK (liberação de memória em background),
+        em lotes num único pipeline
+
+        Returns:
+            Número de chaves removidas
+        """
+        if not self._is_available or not self._client or not keys:
             return 0
 
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for i in range(0, len(keys), _BATCH_SIZE):
+                pipe.unlink(*keys[i:i + _BATCH_SIZE])
+            return sum(pipe.execute())
         except RedisError as e:
-            logger.error(f"❌ Erro ao deletar pattern '{pattern}': {e}")
+            logger.error(f"❌ Erro ao remover chaves: {e}")
+            return 0
+
+    def invalidate_tags(self, *tags: str) -> Optional[int]:
+        """
+        ✅ Remove todas as chaves registradas nas tags informadas
+
+        Args:
+            *tags: Sets de tags (ex: CacheKeys.tag_store_domain(1, "products"))
+
+        Returns:
+            Número de chaves removidas, ou None se a operação falhou
+            (o chamador pode recorrer ao SCAN)
+        """
+        keys = self.pop_tag_members(*tags)
+        if keys is None:
+            return None
+
+        count = self.unlink(*keys)
+        logger.debug(f"🏷️ Cache INVALIDATE TAGS {list(tags)}: {count} chaves")
+        return count
+
+    def incr(self, key: str, ttl: Optional[int] = None) -> Optional[int]:
+        """
+        ✅ Incrementa atomicamente um contador inteiro
+
+        Args:
+            key: Chave do contador
+            ttl: Tempo de vida em segundos (renovado a cada incremento)
+
+        Returns:
+            Novo valor do contador ou None se Redis indisponível
+        """
+        if not self._is_available or not self._client:
+            return None
+
+        try:
+            if ttl:
+                pipe = self._client.pipeline()
+                pipe.incr(key)
+                pipe.expire(key, ttl)
+                value, _ = pipe.execute()
+                return int(value)
+            return int(self._client.incr(key))
+        except RedisError as e:
+            logger.error(f"❌ Erro ao incrementar chave '{key}': {e}")
+            return None
+
+    @property
+    def binary_client(self) -> Optional[redis.Redis]:
+        """
+        ✅ Cliente binário (respostas em bytes) para comandos sem método
+        próprio aqui (SCAN, MEMORY USAGE, GET de contadores...)
+
+        O chamador trata RedisError.
+
+        Returns:
+            redis.Redis ou None se Redis indisponível
+        """
+        if not self._is_available:
+            return None
+
+        return self._binary_client
+
+    def pipeline(self, transaction: bool = True):
+        """
+        ✅ Pipeline no cliente binário (valores em bytes) para estruturas
+        que não cabem nos métodos acima (hashes, sets de projeções...)
+
+        O chamador trata RedisError.
+
+        Returns:
+            redis.client.Pipeline ou None se Redis indisponível
+        """
+        if not self._is_available or not self._binary_client:
+            return None
+
+        return self._binary_client.pipeline(transaction=transaction)
+
+    def register_script(self, script: str):
+        """
+        ✅ Registra um script Lua no cliente binário (EVALSHA, com EVAL
+        automático se o servidor ainda não conhecer o script)
+
+        O chamador trata RedisError.
+
+        Returns:
+            redis.commands.core.Script ou None se Redis indisponível
+        """
+        if not self._is_available or not self._binary_client:
+            return None
+
+        return self._binary_client.register_script(script)
+
+    def publish(self, channel: str, message: str) -> int:
+        """
+        ✅ Publica uma mensagem num canal pub/sub
+
+        Returns:
+            Número de inscritos que receberam (0 se Redis indisponível)
+        """
+        if not self._is_available or not self._client:
+            return 0
+
+        try:
+            return self._client.publish(channel, message)
+        except RedisError as e:
+            logger.error(f"❌ Erro ao publicar no canal '{channel}': {e}")
             return 0
 
+    def pubsub(self):
+        """
+        ✅ Cria um objeto PubSub (usa uma conexão dedicada do pool)
+
+        Returns:
+            redis.client.PubSub ou None se Redis indisponível
+        """
+        if not self._is_available or not self._client:
+            return None
+
+        return self._client.pubsub(ignore_subscribe_messages=True)
+
     def exists(self, key: str) -> bool:
         """Verifica se uma chave existe no cache"""
         if not self._is_available or not self._client:
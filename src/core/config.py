@@ -33,6 +33,15 @@ class Config(BaseSettings):
     # ═══════════════════════════════════════════════════════════
 
     DATABASE_URL: str
+    DATABASE_READ_REPLICA_URL: Optional[str] = None  # Réplica de leitura (analytics/relatórios)
+
+    # ═══════════════════════════════════════════════════════════
+    # 🪞 RÉPLICA DE LEITURA
+    # ═══════════════════════════════════════════════════════════
+
+    READ_REPLICA_MAX_LAG_SECONDS: float = 5.0  # Acima disso as leituras voltam para o primário
+    READ_REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5.0
+    READ_REPLICA_RETRY_AFTER_SECONDS: int = 30  # Réplica fora do ar: tempo até tentar de novo
 
     # ═══════════════════════════════════════════════════════════
     # 🔴 REDIS
@@ -41,6 +50,88 @@ class Config(BaseSettings):
     REDIS_URL: Optional[str] = None
     RATE_LIMIT_ENABLED: bool = True
 
+    # ═══════════════════════════════════════════════════════════
+    # 🏷️ INVALIDAÇÃO DE CACHE POR TAGS
+    # ═══════════════════════════════════════════════════════════
+
+    CACHE_TAG_TTL_SECONDS: int = 86400  # Sets de tags expiram se a loja ficar sem escritas
+    CACHE_INVALIDATION_SCAN_FALLBACK: bool = False  # Também varre por SCAN (chaves gravadas sem tags)
+
+    # ═══════════════════════════════════════════════════════════
+    # 🧠 CACHE L1 (MEMÓRIA DO WORKER)
+    # ═══════════════════════════════════════════════════════════
+
+    L1_CACHE_MAX_ITEMS: int = 1000
+    L1_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # Tamanho serializado somado das entradas
+    L1_CACHE_MAX_TTL_SECONDS: int = 60  # Limita a defasagem se uma invalidação pub/sub se perder
+
+    # ═══════════════════════════════════════════════════════════
+    # 🗜️ SERIALIZAÇÃO DO CACHE
+    # ═══════════════════════════════════════════════════════════
+
+    CACHE_SERIALIZER: str = "orjson"  # "orjson" ou "msgpack" (opcional)
+    CACHE_COMPRESSION: str = "zstd"  # "zstd", "lz4" (opcional) ou "none"
+    CACHE_COMPRESSION_MIN_BYTES: int = 4096
+
+    # ═══════════════════════════════════════════════════════════
+    # 📋 PROJEÇÃO DE PEDIDOS ATIVOS (ADMIN)
+    # ═══════════════════════════════════════════════════════════
+
+    ORDERS_PROJECTION_TTL_SECONDS: int = 300  # Reconstrução completa periódica (rede de segurança)
+
+    # ═══════════════════════════════════════════════════════════
+    # 📈 ROLLUP DIÁRIO DE VENDAS (DASHBOARD)
+    # ═══════════════════════════════════════════════════════════
+
+    DAILY_METRICS_RECONCILE_DAYS: int = 2  # Dias recentes recalculados pelo job diário
+    DAILY_METRICS_DIRTY_TTL_SECONDS: int = 172800  # Marcações pendentes (48h; o job diário cobre o resto)
+
+    # ═══════════════════════════════════════════════════════════
+    # 📊 MÉTRICAS (PROMETHEUS)
+    # ═══════════════════════════════════════════════════════════
+
+    METRICS_PROMETHEUS_TOKEN: Optional[str] = None  # Bearer do scrape; None = endpoint desligado
+    SQL_N_PLUS_ONE_THRESHOLD: int = 10  # Mesmo statement repetido N vezes numa unidade = provável N+1
+    SQL_DIAGNOSTIC_HEADERS: bool = False  # Headers X-DB-* fora de development (opt-in, ex: staging)
+
+    # ═══════════════════════════════════════════════════════════
+    # 👁️ INGESTÃO DE VISUALIZAÇÕES DE PRODUTOS
+    # ═══════════════════════════════════════════════════════════
+
+    PRODUCT_VIEW_BUFFER_CAPACITY: int = 20000  # Cheio: novas visualizações recebem 429
+    PRODUCT_VIEW_FLUSH_BATCH_SIZE: int = 1000  # Grava antes do intervalo ao atingir esse tamanho
+    PRODUCT_VIEW_FLUSH_INTERVAL_MS: int = 1000
+
+    # ═══════════════════════════════════════════════════════════
+    # 🔒 RESERVA DE ESTOQUE
+    # ═══════════════════════════════════════════════════════════
+
+    # Pedidos do cardápio reservam o estoque na criação. Reservas de pedidos
+    # ainda pendentes (ou cancelados sem devolução) expiram após esse prazo.
+    STOCK_RESERVATION_TTL_MINUTES: int = 15
+
+    # ═══════════════════════════════════════════════════════════
+    # 🛒 CARRINHO AO VIVO (REDIS)
+    # ═══════════════════════════════════════════════════════════
+
+    LIVE_CART_TTL_SECONDS: int = 86400  # Carrinho parado sai do Redis (o banco guarda a cópia)
+    LIVE_CART_PERSIST_INTERVAL_MS: int = 2000  # Atraso máximo da cópia em carts/cart_items
+    LIVE_CART_PERSIST_BATCH_SIZE: int = 200  # Carrinhos gravados por transação
+    LIVE_CART_PRICE_INDEX_MAX_STORES: int = 256
+
+    # ═══════════════════════════════════════════════════════════
+    # 📡 AGRUPAMENTO DE EMISSÕES (SOCKET.IO)
+    # ═══════════════════════════════════════════════════════════
+
+    SOCKET_EMIT_COALESCE_WINDOW_MS: int = 250  # 0 = emite na hora, sem agrupar
+
+    # ═══════════════════════════════════════════════════════════
+    # 📦 SNAPSHOT DO CARDÁPIO (TOTEM)
+    # ═══════════════════════════════════════════════════════════
+
+    TOTEM_SNAPSHOT_TTL_SECONDS: int = 300  # Limita a defasagem de dados dependentes de tempo
+    TOTEM_SNAPSHOT_L1_MAX_STORES: int = 256
+
     # ═══════════════════════════════════════════════════════════
     # 🔐 JWT (AUTENTICAÇÃO CARDÁPIO)
     # ═══════════════════════════════════════════════════════════
@@ -50,6 +141,41 @@ class Config(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
 
+    # ═══════════════════════════════════════════════════════════
+    # 🔑 CACHE DE AUTORIZAÇÃO (USUÁRIO / ACESSO À LOJA)
+    # ═══════════════════════════════════════════════════════════
+
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60  # Limita a defasagem de UPDATEs em massa (fora dos eventos da Session)
+
+    # ═══════════════════════════════════════════════════════════
+    # 🚫 FILTRO LOCAL DE TOKENS REVOGADOS
+    # ═══════════════════════════════════════════════════════════
+
+    TOKEN_REVOCATION_FILTER_CAPACITY: int = 100_000  # JTIs revogados antes de redimensionar
+    TOKEN_REVOCATION_FILTER_ERROR_RATE: float = 0.01  # Falsos positivos (confirmados no Redis)
+    TOKEN_REVOCATION_FILTER_SYNC_SECONDS: float = 5.0  # Detecção de mensagens pub/sub perdidas
+    TOKEN_REVOCATION_FILTER_REBUILD_SECONDS: float = 3600.0  # Descarta os tokens já expirados
+
+    # ═══════════════════════════════════════════════════════════
+    # 🚦 RATE LIMIT DISTRIBUÍDO (GCRA)
+    # ═══════════════════════════════════════════════════════════
+
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = 10_000  # Fallback em memória quando o Redis cai (por worker)
+
+    # ═══════════════════════════════════════════════════════════
+    # ⏰ JOBS AGENDADOS (COORDENAÇÃO ENTRE PROCESSOS)
+    # ═══════════════════════════════════════════════════════════
+
+    # True: cada processo web (cada worker do uvicorn, cada réplica) também
+    # agenda os jobs; o lock por disparo (job_coordinator) garante uma
+    # execução por slot. Em produção, rode o worker dedicado
+    # (python -m src.worker) e defina RUN_SCHEDULER_IN_WEB=false: sem isso
+    # todo processo web acorda em cada disparo só para disputar o lock.
+    # Sem worker no ar, deixe True — senão nenhum job roda.
+    RUN_SCHEDULER_IN_WEB: bool = True
+    JOB_LOCK_TTL_SECONDS: int = 60  # Renovado a cada 1/3 enquanto o job roda
+    JOB_RUN_HISTORY_DAYS: int = 30
+
     # ═══════════════════════════════════════════════════════════
     # ☁️ AWS S3
     # ═══════════════════════════════════════════════════════════
@@ -5,7 +5,7 @@ Suporta 5.000-10.000 lojas simultâneas com alta disponibilidade
 
 Características:
 - ✅ Connection pooling otimizado
-- ✅ Read replicas para separação de carga
+- ✅ Read replicas para separação de carga (com checagem de atraso)
 - ✅ Health checks automáticos
 - ✅ Circuit breaker pattern
 - ✅ Monitoring e métricas
@@ -17,19 +17,23 @@ Autor: PDVix Team
 Última atualização: 2025-01-19
 """
 
+import asyncio
 import logging
+import threading
 import time
-from contextlib import contextmanager
-from typing import Annotated, Optional
+from contextlib import contextmanager, asynccontextmanager
+from typing import Annotated, Optional, Callable, TypeVar
 from functools import wraps
 
 from fastapi import Depends, HTTPException, status
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import QueuePool, NullPool
 from sqlalchemy.exc import DBAPIError, OperationalError, DisconnectionError
 
 from src.core.config import config
+from src.core.monitoring.sql_instrumentation import instrument_engine
 
 logger = logging.getLogger(__name__)
 
@@ -204,11 +208,70 @@ engine = create_engine(config.DATABASE_URL, **engine_config)
 
 # Read Replica (se configurada)
 read_engine = None
-if hasattr(config, 'DATABASE_READ_REPLICA_URL') and config.DATABASE_READ_REPLICA_URL:
+if config.DATABASE_READ_REPLICA_URL:
     read_engine = create_engine(config.DATABASE_READ_REPLICA_URL, **engine_config)
     logger.info("✅ Read Replica configurada")
 
 
+# ═══════════════════════════════════════════════════════════
+# ENGINE ASSÍNCRONO (asyncpg) - SOCKET.IO
+# ═══════════════════════════════════════════════════════════
+
+def get_async_database_url(url: str) -> str:
+    """
+    Converte a URL síncrona (psycopg2) para o driver asyncpg
+
+    postgresql://... / postgres://... / postgresql+psycopg2://... → postgresql+asyncpg://...
+    """
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    return url
+
+
+def get_async_engine_config() -> dict:
+    """
+    Configuração do engine assíncrono
+
+    Mesmos limites do engine síncrono, mas com o pool adaptado para asyncio
+    e os connect_args no formato do asyncpg.
+    """
+    if config.is_test:
+        return {"poolclass": NullPool, "echo": False}
+
+    is_production = config.is_production
+    return {
+        "pool_size": DatabaseConfig.PRODUCTION_POOL_SIZE if is_production else DatabaseConfig.DEV_POOL_SIZE,
+        "max_overflow": DatabaseConfig.PRODUCTION_MAX_OVERFLOW if is_production else DatabaseConfig.DEV_MAX_OVERFLOW,
+        "pool_timeout": DatabaseConfig.PRODUCTION_POOL_TIMEOUT if is_production else DatabaseConfig.DEV_POOL_TIMEOUT,
+        "pool_recycle": DatabaseConfig.PRODUCTION_POOL_RECYCLE if is_production else DatabaseConfig.DEV_POOL_RECYCLE,
+        "pool_pre_ping": True,
+        "echo": False if is_production else config.DEBUG,
+        "connect_args": {
+            "timeout": 10,
+            "server_settings": {
+                "application_name": "pdvix_api_async",
+                "statement_timeout": "30000",  # 30s query timeout
+            },
+        },
+    }
+
+
+# Engine assíncrono (WRITE) - usado pelos handlers/emissores do Socket.IO
+async_engine = create_async_engine(
+    get_async_database_url(config.DATABASE_URL),
+    **get_async_engine_config()
+)
+
+# Engine assíncrono (READ) - emissores que só leem
+async_read_engine = None
+if config.DATABASE_READ_REPLICA_URL:
+    async_read_engine = create_async_engine(
+        get_async_database_url(config.DATABASE_READ_REPLICA_URL),
+        **get_async_engine_config()
+    )
+
+
 # ═══════════════════════════════════════════════════════════
 # EVENT LISTENERS PARA MONITORAMENTO
 # ═══════════════════════════════════════════════════════════
@@ -238,6 +301,162 @@ def receive_checkin(dbapi_conn, connection_record):
     logger.debug("🔵 Conexão retornou ao pool")
 
 
+# ✅ Queries/tempo por requisição ou evento + detector de N+1 (todos os engines)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+if read_engine:
+    instrument_engine(read_engine)
+if async_read_engine:
+    instrument_engine(async_read_engine.sync_engine)
+
+
+# ═══════════════════════════════════════════════════════════
+# ROTEAMENTO DE LEITURA (RÉPLICA)
+# ═══════════════════════════════════════════════════════════
+
+# Atraso da réplica em segundos (0 = em dia; NULL = sem replay ainda)
+REPLICA_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaRouter:
+    """
+    Decide se uma leitura vai para a réplica ou para o primário
+
+    - A réplica só é usada se o atraso medido estiver dentro do orçamento
+      (READ_REPLICA_MAX_LAG_SECONDS)
+    - O atraso é medido no máximo uma vez por intervalo, por uma única
+      thread; as demais usam o último valor
+    - Erro de conexão na réplica (checagem ou query) a tira de uso por
+      READ_REPLICA_RETRY_AFTER_SECONDS: as leituras voltam ao primário
+    """
+
+    def __init__(self, max_lag_seconds: float, check_interval_seconds: float, retry_after_seconds: float):
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.retry_after_seconds = retry_after_seconds
+
+        self.lag_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._last_check = 0.0
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._routed = {"replica": 0, "primary": 0}
+
+    @property
+    def configured(self) -> bool:
+        return read_engine is not None
+
+    @property
+    def check_due(self) -> bool:
+        """True se a próxima decisão vai medir o atraso (I/O)"""
+        return (
+            self.configured
+            and time.monotonic() >= self._down_until
+            and time.monotonic() - self._last_check >= self.check_interval_seconds
+        )
+
+    def use_replica(self) -> bool:
+        """True se a próxima leitura pode ir para a réplica"""
+        if not self.configured:
+            return False
+
+        if self.check_due and self._lock.acquire(blocking=False):
+            try:
+                self._check_lag()
+            finally:
+                self._lock.release()
+
+        healthy = (
+            time.monotonic() >= self._down_until
+            and self.lag_seconds is not None
+            and self.lag_seconds <= self.max_lag_seconds
+        )
+        self._routed["replica" if healthy else "primary"] += 1
+        return healthy
+
+    def _check_lag(self) -> None:
+        was_healthy = self.lag_seconds is not None and self.lag_seconds <= self.max_lag_seconds
+        try:
+            with read_engine.connect() as conn:
+                lag = conn.execute(REPLICA_LAG_QUERY).scalar()
+        except Exception as e:
+            self.mark_down(e)
+            return
+        finally:
+            self._last_check = time.monotonic()
+
+        self.lag_seconds = float(lag) if lag is not None else float("inf")
+        self.last_error = None
+
+        if self.lag_seconds > self.max_lag_seconds and was_healthy:
+            logger.warning(
+                f"⚠️ Réplica de leitura atrasada ({self.lag_seconds:.1f}s > "
+                f"{self.max_lag_seconds}s): leituras voltam para o primário"
+            )
+        elif self.lag_seconds <= self.max_lag_seconds and not was_healthy:
+            logger.info(f"✅ Réplica de leitura em dia ({self.lag_seconds:.1f}s): leituras voltam para a réplica")
+
+    def mark_down(self, error: Exception) -> None:
+        """Tira a réplica de uso por READ_REPLICA_RETRY_AFTER_SECONDS"""
+        if time.monotonic() >= self._down_until:
+            logger.error(
+                f"❌ Réplica de leitura indisponível: leituras no primário por "
+                f"{self.retry_after_seconds}s. Erro: {error}"
+            )
+        self._down_until = time.monotonic() + self.retry_after_seconds
+        self.lag_seconds = None
+        self.last_error = str(error)
+
+    def get_status(self) -> dict:
+        """Estado da réplica e contagem de leituras roteadas"""
+        if not self.configured:
+            state = "not_configured"
+        elif time.monotonic() < self._down_until:
+            state = "down"
+        elif self.lag_seconds is None:
+            state = "unknown"
+        elif self.lag_seconds > self.max_lag_seconds:
+            state = "lagging"
+        else:
+            state = "healthy"
+
+        routed_total = sum(self._routed.values())
+        return {
+            "state": state,
+            # Sem replay ainda (atraso infinito) vira None: JSON não tem Infinity
+            "lag_seconds": round(self.lag_seconds, 3) if self.lag_seconds not in (None, float("inf")) else None,
+            "max_lag_seconds": self.max_lag_seconds,
+            "last_error": self.last_error,
+            "routed_reads": dict(self._routed),
+            "replica_percent": round(self._routed["replica"] / routed_total * 100, 2) if routed_total else 0,
+        }
+
+
+replica_router = ReplicaRouter(
+    max_lag_seconds=config.READ_REPLICA_MAX_LAG_SECONDS,
+    check_interval_seconds=config.READ_REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+    retry_after_seconds=config.READ_REPLICA_RETRY_AFTER_SECONDS,
+)
+
+
+def _on_replica_error(context):
+    """Queda de conexão na réplica: próximas leituras vão para o primário"""
+    if context.is_disconnect:
+        replica_router.mark_down(context.original_exception)
+
+
+if read_engine:
+    event.listen(read_engine, "handle_error", _on_replica_error)
+if async_read_engine:
+    event.listen(async_read_engine.sync_engine, "handle_error", _on_replica_error)
+
+
 # ═══════════════════════════════════════════════════════════
 # SESSION MAKERS
 # ═══════════════════════════════════════════════════════════
@@ -249,17 +468,40 @@ SessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+# Marca das sessões da réplica (não aceitam escrita)
+READ_REPLICA_SESSION_INFO = "read_replica"
+
 if read_engine:
     ReadSessionLocal = sessionmaker(
         autocommit=False,
         autoflush=False,
         bind=read_engine,
-        expire_on_commit=False
+        expire_on_commit=False,
+        info={READ_REPLICA_SESSION_INFO: True}
     )
 else:
     ReadSessionLocal = SessionLocal
 
 
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+if async_read_engine:
+    AsyncReadSessionLocal = async_sessionmaker(
+        bind=async_read_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+        info={READ_REPLICA_SESSION_INFO: True}
+    )
+else:
+    AsyncReadSessionLocal = AsyncSessionLocal
+
+
 # ═══════════════════════════════════════════════════════════
 # RETRY LOGIC
 # ═══════════════════════════════════════════════════════════
@@ -370,9 +612,11 @@ def get_read_db():
     """
     Dependency para operações de LEITURA (SELECT)
 
-    Usa read replica se disponível, senão usa engine principal
+    Usa a read replica se configurada, em dia (atraso dentro de
+    READ_REPLICA_MAX_LAG_SECONDS) e no ar; senão usa o engine principal.
+    A sessão pode estar na réplica: não grave nada com ela.
     """
-    db = ReadSessionLocal()
+    db = ReadSessionLocal() if replica_router.use_replica() else SessionLocal()
     try:
         yield db
     except Exception as e:
@@ -386,6 +630,76 @@ def get_read_db():
 get_db_manager = contextmanager(get_db)
 get_read_db_manager = contextmanager(get_read_db)
 
+
+@asynccontextmanager
+async def get_async_db_manager():
+    """
+    Sessão assíncrona (asyncpg) para handlers e emissores do Socket.IO
+
+    O I/O do banco é aguardado no event loop em vez de bloqueá-lo,
+    então uma query lenta de uma loja não trava os sockets das outras.
+
+    Uso:
+        async with get_async_db_manager() as db:
+            result = await db.run_sync(funcao_sincrona, arg1, arg2)
+    """
+    db = AsyncSessionLocal()
+    try:
+        yield db
+    except Exception as e:
+        logger.error(f"❌ Erro na sessão assíncrona: {e}", exc_info=True)
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+@asynccontextmanager
+async def get_async_read_db_manager():
+    """
+    Sessão assíncrona de LEITURA para emissores que só leem
+
+    Mesma regra do get_read_db (réplica em dia ou primário). A medição
+    de atraso, quando vencida, roda em thread para não bloquear o loop.
+    """
+    if replica_router.check_due:
+        use_replica = await asyncio.to_thread(replica_router.use_replica)
+    else:
+        use_replica = replica_router.use_replica()
+
+    db = AsyncReadSessionLocal() if use_replica else AsyncSessionLocal()
+    try:
+        yield db
+    except Exception as e:
+        logger.error(f"❌ Erro na sessão assíncrona de leitura: {e}", exc_info=True)
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+def is_read_replica_session(db) -> bool:
+    """True se a sessão (Session ou AsyncSession) aponta para a réplica"""
+    return bool(db.info.get(READ_REPLICA_SESSION_INFO))
+
+
+T = TypeVar("T")
+
+
+async def run_db(db, fn: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Executa código ORM síncrono com qualquer tipo de sessão
+
+    - AsyncSession: roda via run_sync (lazy loads e db.query funcionam,
+      mas o I/O é feito pelo asyncpg sem bloquear o event loop)
+    - Session: chama a função diretamente (compatibilidade com rotas HTTP)
+
+    A função recebe a sessão síncrona como primeiro argumento.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return fn(db, *args, **kwargs)
+
 GetDBDep = Annotated[Session, Depends(get_db)]
 GetReadDBDep = Annotated[Session, Depends(get_read_db)]
 
@@ -430,6 +744,24 @@ def get_pool_stats(engine_instance=None) -> dict:
     }
 
 
+def get_database_pools_stats() -> dict:
+    """
+    Estatísticas de pool por engine (primário, réplica, síncrono e asyncpg)
+
+    Returns:
+        dict: engine -> estatísticas do pool (réplicas só se configuradas)
+    """
+    pools = {
+        "primary": get_pool_stats(engine),
+        "primary_async": get_pool_stats(async_engine.sync_engine),
+    }
+    if read_engine:
+        pools["replica"] = get_pool_stats(read_engine)
+    if async_read_engine:
+        pools["replica_async"] = get_pool_stats(async_read_engine.sync_engine)
+    return pools
+
+
 def check_database_health() -> dict:
     """
     Verifica saúde completa do banco de dados
@@ -466,18 +798,20 @@ def check_database_health() -> dict:
         health_status["healthy"] = False
         health_status["checks"]["pool"]["warning"] = "Pool utilization critical"
 
-    # 3. Verifica read replica (se configurada)
+    # 3. Verifica read replica (se configurada) - direto, sem o roteador
     if read_engine:
         try:
-            with get_read_db_manager() as db:
+            with ReadSessionLocal() as db:
                 result = db.execute(text("SELECT 1")).scalar()
                 health_status["checks"]["read_replica"] = {
-                    "status": "healthy"
+                    "status": "healthy",
+                    **replica_router.get_status(),
                 }
         except Exception as e:
             health_status["checks"]["read_replica"] = {
                 "status": "unhealthy",
-                "error": str(e)
+                "error": str(e),
+                **replica_router.get_status(),
             }
 
     # 4. Circuit breaker status
@@ -508,6 +842,11 @@ def force_close_idle_connections():
     if read_engine:
         read_engine.dispose()
 
+    # O engine assíncrono descarta as conexões no próximo checkout
+    async_engine.sync_engine.dispose(close=False)
+    if async_read_engine:
+        async_read_engine.sync_engine.dispose(close=False)
+
     stats_after = get_pool_stats()
     logger.info(f"✅ Após: {stats_after['total_connections']} conexões ativas")
 
@@ -544,7 +883,7 @@ def validate_database_connection():
         )
 
         if read_engine:
-            with get_read_db_manager() as db:
+            with ReadSessionLocal() as db:
                 result = db.execute(text("SELECT version()")).scalar()
                 logger.info(f"✅ Read Replica conectada: {result}")
 
@@ -5,11 +5,12 @@ from typing import Annotated
 
 from fastapi import Header
 from fastapi import HTTPException, Request
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session
 
 from src.api.admin.services.subscription_service import SubscriptionService
 from src.core import models
 from src.core.database import GetDBDep
+from src.core.security import principal_cache
 from src.core.security.security import verify_access_token, oauth2_scheme
 from src.core.utils.enums import Roles
 from fastapi import Depends
@@ -28,7 +29,7 @@ def get_user_from_token(token: str, db: Session):
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = principal_cache.get_user(db, email)
 
     if not user:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -54,7 +55,7 @@ def get_current_user(
     if not email:
         raise HTTPException(status_code=401, detail="Invalid token payload")
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = principal_cache.get_user(db, email)
 
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
@@ -140,10 +141,7 @@ class GetStore:
 
         # ✅ 1. ADMIN VÊ TUDO
         if user.is_superuser:
-            store = db.query(models.Store).options(
-                joinedload(models.Store.subscriptions)
-                .joinedload(models.StoreSubscription.plan)
-            ).filter(models.Store.id == store_id).first()
+            store = principal_cache.get_store(db, store_id)
 
             if not store:
                 raise HTTPException(
@@ -154,12 +152,9 @@ class GetStore:
             return store
 
         # ✅ 2. USUÁRIO COMUM: VALIDA ACESSO
-        db_store_access = db.query(models.StoreAccess).filter(
-            models.StoreAccess.user == user,
-            models.StoreAccess.store_id == store_id
-        ).first()
+        role = principal_cache.get_store_role(db, user.id, store_id)
 
-        if not db_store_access:
+        if role is None:
             raise HTTPException(
                 status_code=403,
                 detail={
@@ -169,7 +164,7 @@ class GetStore:
             )
 
         # ✅ 3. VALIDA ROLE (OWNER, MANAGER, etc)
-        if db_store_access.role.machine_name not in [e.value for e in self.roles]:
+        if role not in [e.value for e in self.roles]:
             raise HTTPException(
                 status_code=403,
                 detail={
@@ -178,7 +173,12 @@ class GetStore:
                 }
             )
 
-        store = db_store_access.store
+        store = principal_cache.get_store(db, store_id)
+        if not store:
+            raise HTTPException(
+                status_code=404,
+                detail="Store not found"
+            )
 
         # ✅ 4. REMOVED: NÃO VALIDAMOS BLOQUEIO AQUI
         # O bloqueio por assinatura expirada deve ser feito por endpoint específico
@@ -218,10 +218,7 @@ class GetStoreForSubscriptionRoutes:
 
         # ✅ 1. ADMIN VÊ TUDO
         if user.is_superuser:
-            store = db.query(models.Store).options(
-                joinedload(models.Store.subscriptions)
-                .joinedload(models.StoreSubscription.plan)
-            ).filter(models.Store.id == store_id).first()
+            store = principal_cache.get_store(db, store_id)
 
             if not store:
                 raise HTTPException(
@@ -232,12 +229,9 @@ class GetStoreForSubscriptionRoutes:
             return store
 
         # ✅ 2. USUÁRIO COMUM: VALIDA ACESSO
-        db_store_access = db.query(models.StoreAccess).filter(
-            models.StoreAccess.user == user,
-            models.StoreAccess.store_id == store_id
-        ).first()
+        role = principal_cache.get_store_role(db, user.id, store_id)
 
-        if not db_store_access:
+        if role is None:
             raise HTTPException(
                 status_code=403,
                 detail={
@@ -247,7 +241,7 @@ class GetStoreForSubscriptionRoutes:
             )
 
         # ✅ 3. VALIDA ROLE (OWNER só para gerenciar assinaturas)
-        if db_store_access.role.machine_name not in [e.value for e in self.roles]:
+        if role not in [e.value for e in self.roles]:
             raise HTTPException(
                 status_code=403,
                 detail={
@@ -256,7 +250,12 @@ class GetStoreForSubscriptionRoutes:
                 }
             )
 
-        store = db_store_access.store
+        store = principal_cache.get_store(db, store_id)
+        if not store:
+            raise HTTPException(
+                status_code=404,
+                detail="Store not found"
+            )
 
         # ✅ 4. NÃO VALIDAMOS BLOQUEIO AQUI!
         # Isso permite que o usuário crie nova assinatura mesmo se a anterior expirou
@@ -7,89 +7,66 @@ Rate limiting, validação de headers, CORS
 from fastapi import Request, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response
+import asyncio
+import math
 import time
 import logging
 from typing import Callable
 
 from src.core.config import config
+from src.core.rate_limit.distributed import rate_limiter
 
 logger = logging.getLogger(__name__)
 
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Middleware para rate limiting"""
-    
+    """Middleware para rate limiting (compartilhado entre workers)"""
+
+    # Endpoints críticos com limites mais restritivos
+    CRITICAL_ENDPOINTS = {
+        "/api/auth/login": (5, 300),        # 5 tentativas em 5 minutos
+        "/api/auth/register": (3, 3600),    # 3 registros por hora
+        "/api/payments": (10, 60),          # 10 pagamentos por minuto
+        "/api/auth/pin-login": (3, 180),    # 3 tentativas de PIN em 3 minutos
+    }
+
     def __init__(self, app, calls: int = 60, period: int = 60):
         super().__init__(app)
         self.calls = calls
         self.period = period
-        self.clients = {}
-    
+
     async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # Identifica cliente pelo IP
-        client_ip = request.client.host
-        
-        # Endpoints críticos com limites mais restritivos
-        critical_endpoints = {
-            "/api/auth/login": (5, 300),        # 5 tentativas em 5 minutos
-            "/api/auth/register": (3, 3600),    # 3 registros por hora
-            "/api/payments": (10, 60),          # 10 pagamentos por minuto
-            "/api/auth/pin-login": (3, 180),    # 3 tentativas de PIN em 3 minutos
-        }
-        
-        # Verifica se é endpoint crítico
+        client_ip = request.client.host if request.client else "unknown"
+
+        # Verifica se é endpoint crítico (limite próprio por endpoint)
         path = request.url.path
-        for endpoint, (limit, window) in critical_endpoints.items():
+        scope, calls, period = "http", self.calls, self.period
+        for endpoint, (limit, window) in self.CRITICAL_ENDPOINTS.items():
             if path.startswith(endpoint):
-                self.calls = limit
-                self.period = window
+                scope, calls, period = f"http:{endpoint}", limit, window
                 break
-        
-        # Limpa clientes antigos
-        now = time.time()
-        self._clean_old_clients(now)
-        
+
         # Verifica rate limit
-        if client_ip in self.clients:
-            client_data = self.clients[client_ip]
-            if now - client_data["start"] < self.period:
-                if client_data["count"] >= self.calls:
-                    logger.warning(f"⚠️ Rate limit excedido para {client_ip} em {path}")
-                    raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail="Muitas requisições. Tente novamente mais tarde."
-                    )
-                client_data["count"] += 1
-            else:
-                # Reset do contador
-                self.clients[client_ip] = {"start": now, "count": 1}
-        else:
-            self.clients[client_ip] = {"start": now, "count": 1}
-        
+        result = await asyncio.to_thread(rate_limiter.hit, scope, client_ip, calls, period)
+        if not result.allowed:
+            logger.warning(f"⚠️ Rate limit excedido para {client_ip} em {path}")
+            return JSONResponse(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                content={"detail": "Muitas requisições. Tente novamente mais tarde."},
+                headers={"Retry-After": str(max(1, math.ceil(result.retry_after)))},
+            )
+
         # Processa requisição
         response = await call_next(request)
-        
+
         # Adiciona headers de rate limit
-        response.headers["X-RateLimit-Limit"] = str(self.calls)
-        response.headers["X-RateLimit-Remaining"] = str(
-            self.calls - self.clients.get(client_ip, {}).get("count", 0)
-        )
-        response.headers["X-RateLimit-Reset"] = str(
-            int(self.clients.get(client_ip, {}).get("start", now) + self.period)
-        )
-        
+        response.headers["X-RateLimit-Limit"] = str(calls)
+        response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+        response.headers["X-RateLimit-Reset"] = str(int(time.time() + result.reset_after))
+
         return response
-    
-    def _clean_old_clients(self, now: float):
-        """Remove clientes com janela expirada"""
-        expired = []
-        for ip, data in self.clients.items():
-            if now - data["start"] > self.period * 2:
-                expired.append(ip)
-        
-        for ip in expired:
-            del self.clients[ip]
 
 
 class SecurityHeadersMiddleware(BaseHTTPMiddleware):
@@ -16,14 +16,14 @@ from src.core.security.encryption import encryption_service
 from src.core.utils.enums import CashbackType, TableStatus, CommandStatus, StoreVerificationStatus, PaymentMethodType, \
     CartStatus, ProductType, OrderStatus, PayableStatus, ThemeMode, CategoryType, FoodTagEnum, AvailabilityTypeEnum, \
     BeverageTagEnum, PricingStrategyType, CategoryTemplateType, OptionGroupType, ProductStatus, ChatbotMessageGroupEnum, \
-    PaymentStatus
+    PaymentStatus, StockReservationStatus
 from src.api.schemas.shared.base import VariantType, UIDisplayMode
 
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy import Text
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 import uuid
-from sqlalchemy import Column, Integer, ForeignKey, String, Enum, Numeric, Boolean
+from sqlalchemy import Column, Integer, ForeignKey, String, Enum, Numeric, Boolean, Sequence
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 
@@ -49,7 +49,23 @@ class TimestampMixin:
     )
 
 
-class Store(Base, TimestampMixin):
+class RatingAggregateMixin:
+    """
+    Agregados materializados de avaliações (apenas avaliações visíveis)
+
+    Mantidos incrementalmente a cada criação/edição/ocultação/remoção
+    (src/api/app/services/rating.py) e reconciliados periodicamente
+    pelo job de ratings. Leitura do resumo em O(1).
+    """
+    rating_sum: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    rating_stars_1: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    rating_stars_2: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    rating_stars_3: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    rating_stars_4: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    rating_stars_5: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+
+
+class Store(Base, TimestampMixin, RatingAggregateMixin):
     __tablename__ = "stores"
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -729,7 +745,7 @@ class FlavorPrice(Base, TimestampMixin):
     )
 
 
-class Product(Base, TimestampMixin):
+class Product(Base, TimestampMixin, RatingAggregateMixin):
     __tablename__ = "products"
 
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -768,6 +784,8 @@ class Product(Base, TimestampMixin):
     weight: Mapped[int | None] = mapped_column(nullable=True, doc="Peso do item em gramas ou ml")
 
     product_ratings: Mapped[List["ProductRating"]] = relationship(back_populates="product")
+    rating_average: Mapped[float] = mapped_column(default=0.0, server_default=text("0"))
+    rating_count: Mapped[int] = mapped_column(default=0, server_default=text("0"))
     sold_count: Mapped[int] = mapped_column(nullable=False, default=0)
 
     cashback_type: Mapped[CashbackType] = mapped_column(Enum(CashbackType, name="cashback_type_enum"),
@@ -2185,6 +2203,22 @@ class Order(Base, TimestampMixin):
         doc="Timestamp de quando o alerta de pedido preso foi enviado."
     )
 
+    # Reserva de estoque (ver stock_service.reserve_stock_for_order)
+    stock_reservation_status: Mapped[StockReservationStatus | None] = mapped_column(
+        Enum(StockReservationStatus, native_enum=False),
+        nullable=True,
+        doc="Nulo = pedido sem reserva (estoque baixado apenas na entrega)."
+    )
+    stock_reserved_until: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        doc="Expiração da reserva enquanto o pedido estiver pendente."
+    )
+    stock_reservations: Mapped[list["OrderStockReservation"]] = relationship(
+        back_populates="order",
+        cascade="all, delete-orphan"
+    )
+
     @hybrid_property
     def is_printed(self) -> bool:
         return len(self.print_logs) > 0
@@ -2192,6 +2226,12 @@ class Order(Base, TimestampMixin):
 
     __table_args__ = (
         Index('idx_orders_store_status', 'store_id', 'order_status'),
+        # Varredura de reservas de estoque expiradas
+        Index(
+            'idx_orders_stock_reserved_until',
+            'stock_reserved_until',
+            postgresql_where=text("stock_reservation_status = 'RESERVED'")
+        ),
         Index('idx_orders_store_created', 'store_id', 'created_at'),
         Index('idx_orders_store_customer', 'store_id', 'customer_id'),
 
@@ -2280,6 +2320,36 @@ class OrderVariant(Base, TimestampMixin):
     options: Mapped[List["OrderVariantOption"]] = relationship(back_populates="order_variant")
 
 
+class OrderStockReservation(Base):
+    """
+    Uma linha de estoque reservada por um pedido: produto (ou componente de
+    kit) OU complemento, com a quantidade exata descontada na criação.
+
+    A devolução (cancelamento/expiração) usa estas linhas, e não a composição
+    atual do produto, que pode ter mudado desde o pedido.
+    """
+    __tablename__ = "order_stock_reservations"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id", ondelete="CASCADE"), index=True)
+    order: Mapped["Order"] = relationship(back_populates="stock_reservations")
+
+    store_id: Mapped[int] = mapped_column(ForeignKey("stores.id", ondelete="CASCADE"))
+    product_id: Mapped[int | None] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=True)
+    variant_option_id: Mapped[int | None] = mapped_column(
+        ForeignKey("variant_options.id", ondelete="CASCADE"),
+        nullable=True
+    )
+    quantity: Mapped[int] = mapped_column()
+
+    __table_args__ = (
+        CheckConstraint(
+            '(product_id IS NULL) <> (variant_option_id IS NULL)',
+            name='check_stock_reservation_single_target'
+        ),
+    )
+
+
 class OrderVariantOption(Base, TimestampMixin):
     __tablename__ = "order_variant_options"
 
@@ -3064,6 +3134,53 @@ class ProductView(Base):
         return f"<ProductView(product_id={self.product_id}, viewed_at='{self.viewed_at}')>"
 
 
+class ProductViewHourly(Base):
+    """
+    Contador pré-agregado de visualizações por produto e hora (UTC).
+
+    Incrementado junto com a gravação em lote de 'product_views' (ver
+    product_view_ingestion). O funil de produtos lê estas linhas em vez
+    de contar as visualizações individuais.
+    """
+    __tablename__ = "product_view_hourly"
+
+    store_id: Mapped[int] = mapped_column(ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    hour: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, doc="Início da hora (UTC)")
+
+    views: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    __table_args__ = (
+        Index("ix_product_view_hourly_store_id_hour", "store_id", "hour"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ProductViewHourly(product_id={self.product_id}, hour='{self.hour}', views={self.views})>"
+
+
+class StoreOrderCounter(Base):
+    """
+    Contador diário de pedidos por loja (Order.sequential_id).
+
+    Incrementado com UPDATE ... RETURNING na transação do pedido (ver
+    order_code.next_order_codes): o lock fica só nesta linha, em vez de
+    MAX/ORDER BY na tabela de pedidos. Pedidos desfeitos (rollback) não
+    consomem número.
+    """
+    __tablename__ = "store_order_counters"
+
+    store_id: Mapped[int] = mapped_column(ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    last_value: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    def __repr__(self) -> str:
+        return f"<StoreOrderCounter(store_id={self.store_id}, day='{self.day}', last_value={self.last_value})>"
+
+
+# Sequência global que origina os public_id (embaralhada em order_code)
+order_public_id_seq = Sequence("order_public_id_seq", metadata=Base.metadata)
+
+
 class MasterProduct(Base):
     __tablename__ = "master_products"
 
@@ -3528,4 +3645,90 @@ class MetricsSnapshot(Base):
             f"<MetricsSnapshot(metric_name='{self.metric_name}', "
             f"value={self.metric_value}, "
             f"created_at={self.created_at})>"
-        )
\ No newline at end of file
+        )
+
+
+class StoreDailyMetrics(Base):
+    """
+    Rollup diário de vendas por loja (dia em UTC de Order.created_at).
+
+    Mantido pelas transições de status dos pedidos (ver
+    daily_metrics_service) e reconciliado pelo job diário. Os dashboards
+    leem estas linhas em vez de varrer a tabela de pedidos.
+
+    Valores monetários em centavos. Vendas = pedidos DELIVERED.
+    """
+    __tablename__ = "store_daily_metrics"
+
+    store_id: Mapped[int] = mapped_column(ForeignKey("stores.id", ondelete="CASCADE"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+
+    # Vendas concluídas
+    orders_count: Mapped[int] = mapped_column(default=0, server_default="0")
+    revenue: Mapped[int] = mapped_column(default=0, server_default="0", doc="Soma de discounted_total_price")
+    gross_total: Mapped[int] = mapped_column(default=0, server_default="0", doc="Soma de total_price")
+    cashback_total: Mapped[int] = mapped_column(default=0, server_default="0")
+    discount_total: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    # Clientes (com pedido no dia, qualquer status)
+    new_customers: Mapped[int] = mapped_column(default=0, server_default="0", doc="Primeiro pedido na loja neste dia")
+    returning_customers: Mapped[int] = mapped_column(default=0, server_default="0")
+
+    # Quebras (JSONB)
+    by_hour: Mapped[dict] = mapped_column(
+        JSONB, default=dict, server_default=text("'{}'::jsonb"),
+        doc="{hora: {count, total}} das vendas concluídas"
+    )
+    by_payment_method: Mapped[dict] = mapped_column(
+        JSONB, default=dict, server_default=text("'{}'::jsonb"),
+        doc="{payment_method_id: {count, total, revenue}} das vendas concluídas"
+    )
+    by_order_type: Mapped[dict] = mapped_column(
+        JSONB, default=dict, server_default=text("'{}'::jsonb"),
+        doc="{order_type: {count, total, revenue, cashback}} das vendas concluídas"
+    )
+    status_counts: Mapped[dict] = mapped_column(
+        JSONB, default=dict, server_default=text("'{}'::jsonb"),
+        doc="{order_status: quantidade} de todos os pedidos do dia"
+    )
+
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc)
+    )
+
+    store: Mapped["Store"] = relationship()
+
+    def __repr__(self) -> str:
+        return f"<StoreDailyMetrics(store_id={self.store_id}, day={self.day}, orders={self.orders_count})>"
+
+
+class JobRun(Base):
+    """
+    Histórico de execuções dos jobs agendados (ver job_coordinator).
+
+    Uma linha por execução que obteve o lock do job, em qualquer processo
+    (web ou worker). fencing_token é o token do lock do Redis, crescente a
+    cada lock concedido: uma execução antiga que perdeu o lock tem token
+    menor que a atual (só histórico; os jobs não o conferem).
+    """
+    __tablename__ = "job_runs"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    job_id: Mapped[str] = mapped_column(String(100))
+    status: Mapped[str] = mapped_column(String(20), doc="running | success | error | lock_lost")
+    fencing_token: Mapped[Optional[int]] = mapped_column(doc="None quando o lock foi do Postgres (Redis fora)")
+    host: Mapped[str] = mapped_column(String(255), doc="hostname:pid do processo que executou")
+
+    started_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    duration_ms: Mapped[Optional[int]] = mapped_column()
+    error: Mapped[Optional[str]] = mapped_column(Text)
+
+    __table_args__ = (
+        Index("ix_job_runs_job_id_started_at", "job_id", "started_at"),
+    )
+
+    def __repr__(self) -> str:
+        return f"<JobRun(job_id='{self.job_id}', status='{self.status}', started_at='{self.started_at}')>"
@@ -0,0 +1,112 @@
+"""
+Latency Histogram
+=================
+Histograma log-linear (estilo HDR) com memória fixa por série
+
+Características:
+- ✅ Memória constante: 528 contadores, independente do tráfego
+- ✅ Percentis (p50/p95/p99) com erro relativo <= 6,25%
+- ✅ Buckets cumulativos fixos para exposição Prometheus
+- ✅ Resolução de 1µs, faixa até ~19h
+
+Como funciona:
+    Valores em microssegundos. Abaixo de 16µs cada valor tem seu bucket;
+    acima, cada potência de 2 ([2^k, 2^(k+1))) é dividida em 16 buckets
+    lineares. O percentil devolve o ponto médio do bucket.
+
+Autor: PDVix Team
+"""
+
+from typing import Iterable
+
+SUB_BUCKETS = 16  # Buckets lineares por potência de 2
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+MAX_EXPONENT = 36  # 2^36 µs ≈ 19h (valores maiores caem no último bucket)
+BUCKET_COUNT = SUB_BUCKETS + (MAX_EXPONENT - _SUB_BITS) * SUB_BUCKETS
+
+# Limites (ms) dos buckets cumulativos do Prometheus
+PROMETHEUS_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _bucket_index(value_us: int) -> int:
+    if value_us < SUB_BUCKETS:
+        return max(value_us, 0)
+
+    exponent = value_us.bit_length() - 1
+    shift = exponent - _SUB_BITS
+    index = SUB_BUCKETS + shift * SUB_BUCKETS + ((value_us >> shift) - SUB_BUCKETS)
+    return min(index, BUCKET_COUNT - 1)
+
+
+def _bucket_bounds(index: int) -> tuple[int, int]:
+    """[início, fim) do bucket em µs"""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+
+    shift, sub = divmod(index - SUB_BUCKETS, SUB_BUCKETS)
+    return (SUB_BUCKETS + sub) << shift, (SUB_BUCKETS + sub + 1) << shift
+
+
+class LatencyHistogram:
+    """
+    ✅ Histograma de latências (ms) com memória fixa
+    """
+
+    __slots__ = ("counts", "prometheus_counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.prometheus_counts = [0] * len(PROMETHEUS_BUCKETS_MS)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms: float) -> None:
+        """Registra uma observação em milissegundos"""
+        duration_ms = max(duration_ms, 0.0)
+        self.counts[_bucket_index(int(duration_ms * 1000))] += 1
+        self.count += 1
+        self.sum_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+
+        for i, bound in enumerate(PROMETHEUS_BUCKETS_MS):
+            if duration_ms <= bound:
+                self.prometheus_counts[i] += 1
+                break
+
+    def percentile(self, percentile: float) -> float:
+        """Percentil aproximado em ms (0 sem observações)"""
+        if not self.count:
+            return 0.0
+
+        rank = max(1, int(round(self.count * percentile / 100)))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                start, end = _bucket_bounds(index)
+                # Ponto médio do bucket, nunca acima do máximo observado
+                return min((start + end) / 2 / 1000, self.max_ms)
+        return self.max_ms
+
+    def summary(self, percentiles: Iterable[int] = (50, 95, 99)) -> dict:
+        """Contagem, média, máximo e percentis (ms, arredondados)"""
+        result = {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else 0,
+            "max_ms": round(self.max_ms, 2),
+        }
+        for p in percentiles:
+            result[f"p{p}_ms"] = round(self.percentile(p), 2)
+        return result
+
+    def cumulative_buckets(self) -> list[tuple[str, int]]:
+        """Buckets cumulativos (le, contagem) em segundos, com +Inf"""
+        buckets = []
+        running = 0
+        for bound, bucket_count in zip(PROMETHEUS_BUCKETS_MS, self.prometheus_counts):
+            running += bucket_count
+            buckets.append((f"{bound / 1000:g}", running))
+        buckets.append(("+Inf", self.count))
+        return buckets
@@ -4,7 +4,10 @@ Enterprise Monitoring & Metrics
 Sistema de métricas e observabilidade para produção
 
 Features:
-- ✅ Prometheus metrics
+- ✅ Prometheus metrics (exposição em texto: render_prometheus)
+- ✅ Histogramas de latência com memória fixa por série
+- ✅ Thread-safe: escritas sob lock, leituras sobre uma cópia
+- ✅ Séries por rota (template), não pelo caminho concreto
 - ✅ Custom business metrics
 - ✅ Performance tracking
 - ✅ Error tracking
@@ -14,11 +17,16 @@ Autor: PDVix Team
 """
 
 import time
+import asyncio
 import logging
+import threading
 from typing import Dict, Any, Optional
 from datetime import datetime, timezone
-from collections import defaultdict
+from collections import defaultdict, deque
 from functools import wraps
+from types import SimpleNamespace
+
+from src.core.monitoring.histogram import LatencyHistogram
 
 logger = logging.getLogger(__name__)
 
@@ -29,16 +37,49 @@ class MetricsCollector:
     """
 
     def __init__(self):
-        # Contadores
+        # Escritas vêm de threads (to_thread, jobs, instrumentação do banco):
+        # toda alteração dos contadores e a cópia para leitura passam pelo lock
+        self._lock = threading.Lock()
+
+        # Contadores HTTP por (método, template da rota)
         self.request_count = defaultdict(int)
         self.error_count = defaultdict(int)
         self.db_query_count = 0
         self.cache_hits = 0
         self.cache_misses = 0
 
-        # Latências (em ms)
-        self.request_latencies = defaultdict(list)
-        self.db_query_latencies = []
+        # Invalidação de cache por trigger (ex: "on_product_change")
+        self.cache_invalidation_calls = defaultdict(int)
+        self.cache_invalidated_keys = defaultdict(int)
+        self.cache_scan_fallbacks = defaultdict(int)
+
+        # Emissões Socket.IO agrupadas: pedidas x realmente emitidas
+        self.socket_emits_requested = defaultdict(int)
+        self.socket_emits_sent = defaultdict(int)
+
+        # Queries por unidade de trabalho (kind, nome) e suspeitas de N+1
+        self.db_units = defaultdict(lambda: {"units": 0, "queries": 0, "db_time_ms": 0.0, "rows": 0, "max_queries": 0})
+        self.db_n_plus_one = {}
+
+        # Visualizações de produtos: bufferizadas, gravadas em lote, descartadas
+        self.product_views = defaultdict(int)
+
+        # Jobs agendados: execuções por (job, status) e puladas (lock de outro processo)
+        self.job_runs = defaultdict(int)
+        self.job_skipped = defaultdict(int)
+
+        # Eventos Socket.IO recebidos por (namespace, evento)
+        self.socket_event_count = defaultdict(int)
+        self.socket_event_errors = defaultdict(int)
+
+        # Latências (em ms) - histogramas de memória fixa
+        self.request_latencies = defaultdict(LatencyHistogram)
+        self.socket_event_latencies = defaultdict(LatencyHistogram)
+        self.db_query_latencies = LatencyHistogram()
+        self.job_latencies = defaultdict(LatencyHistogram)
+
+        # Atraso do event loop (em ms) - últimas amostras do monitor
+        self.event_loop_lag = deque(maxlen=1200)
 
         # Business metrics
         self.active_stores = 0
@@ -50,26 +91,142 @@ class MetricsCollector:
         self.last_reset = datetime.now(timezone.utc)
 
     def track_request(self, endpoint: str, method: str, duration_ms: float, status_code: int):
-        """Registra métrica de requisição HTTP"""
-        key = f"{method}_{endpoint}"
-        self.request_count[key] += 1
-        self.request_latencies[key].append(duration_ms)
+        """
+        Registra métrica de requisição HTTP
+
+        Args:
+            endpoint: Template da rota (ex: /admin/stores/{store_id}/products),
+                nunca o caminho concreto - cada id viraria uma série nova
+        """
+        with self._lock:
+            key = (method, endpoint)
+            self.request_count[key] += 1
+            self.request_latencies[key].record(duration_ms)
+
+            if status_code >= 400:
+                self.error_count[key] += 1
 
-        if status_code >= 400:
-            self.error_count[key] += 1
+    def track_socket_event(self, namespace: str, event: str, duration_ms: float, failed: bool = False):
+        """Registra um evento Socket.IO recebido (tempo do handler)"""
+        with self._lock:
+            key = (namespace, event)
+            self.socket_event_count[key] += 1
+            self.socket_event_latencies[key].record(duration_ms)
+
+            if failed:
+                self.socket_event_errors[key] += 1
 
     def track_db_query(self, duration_ms: float):
         """Registra métrica de query do banco"""
-        self.db_query_count += 1
-        self.db_query_latencies.append(duration_ms)
+        with self._lock:
+            self.db_query_count += 1
+            self.db_query_latencies.record(duration_ms)
+
+    # Limite de formatos distintos guardados como suspeitas de N+1
+    MAX_N_PLUS_ONE_ENTRIES = 200
+
+    def track_unit_queries(self, kind: str, name: str, query_count: int, db_time_ms: float, rows: int,
+                           n_plus_one: list[tuple[str, int]]):
+        """Registra as queries de uma requisição HTTP / evento Socket.IO"""
+        with self._lock:
+            unit = self.db_units[(kind, name)]
+            unit["units"] += 1
+            unit["queries"] += query_count
+            unit["db_time_ms"] += db_time_ms
+            unit["rows"] += rows
+            unit["max_queries"] = max(unit["max_queries"], query_count)
+
+            for shape, count in n_plus_one:
+                key = (kind, name, shape)
+                entry = self.db_n_plus_one.get(key)
+                if entry is None:
+                    if len(self.db_n_plus_one) >= self.MAX_N_PLUS_ONE_ENTRIES:
+                        continue
+                    entry = self.db_n_plus_one[key] = {"occurrences": 0, "max_repeats": 0}
+                entry["occurrences"] += 1
+                entry["max_repeats"] = max(entry["max_repeats"], count)
+
+    def track_event_loop_lag(self, lag_ms: float):
+        """Registra o atraso observado do event loop"""
+        with self._lock:
+            self.event_loop_lag.append(lag_ms)
 
     def track_cache_hit(self):
         """Registra cache hit"""
-        self.cache_hits += 1
+        with self._lock:
+            self.cache_hits += 1
 
     def track_cache_miss(self):
         """Registra cache miss"""
-        self.cache_misses += 1
+        with self._lock:
+            self.cache_misses += 1
+
+    def track_cache_invalidation(self, trigger: str, keys_removed: int, scan_fallback: bool = False):
+        """Registra uma invalidação de cache e quantas chaves ela removeu"""
+        with self._lock:
+            self.cache_invalidation_calls[trigger] += 1
+            self.cache_invalidated_keys[trigger] += keys_removed
+            if scan_fallback:
+                self.cache_scan_fallbacks[trigger] += 1
+
+    def track_socket_emit_requested(self, event: str):
+        """Registra um pedido de emissão (antes do agrupamento)"""
+        with self._lock:
+            self.socket_emits_requested[event] += 1
+
+    def track_socket_emit_sent(self, event: str):
+        """Registra uma emissão realmente enviada"""
+        with self._lock:
+            self.socket_emits_sent[event] += 1
+
+    def track_product_views(self, outcome: str, count: int = 1):
+        """Registra visualizações por resultado (buffered, flushed, rejected, dropped)"""
+        with self._lock:
+            self.product_views[outcome] += count
+
+    def track_job_run(self, job_id: str, duration_ms: float, status: str):
+        """Registra uma execução de job agendado (success, error, lock_lost)"""
+        with self._lock:
+            self.job_runs[(job_id, status)] += 1
+            self.job_latencies[job_id].record(duration_ms)
+
+    def track_job_skipped(self, job_id: str):
+        """Registra um disparo pulado (job rodando em outro processo)"""
+        with self._lock:
+            self.job_skipped[job_id] += 1
+
+    def _snapshot(self) -> SimpleNamespace:
+        """
+        Cópia dos contadores feita sob o lock
+
+        Iterar os dicts originais enquanto threads registram métricas
+        levanta "dictionary changed size during iteration" no scrape.
+        Os histogramas são os mesmos objetos (tamanho fixo, sem risco).
+        """
+        with self._lock:
+            return SimpleNamespace(
+                request_count=dict(self.request_count),
+                error_count=dict(self.error_count),
+                db_query_count=self.db_query_count,
+                cache_hits=self.cache_hits,
+                cache_misses=self.cache_misses,
+                cache_invalidation_calls=dict(self.cache_invalidation_calls),
+                cache_invalidated_keys=dict(self.cache_invalidated_keys),
+                cache_scan_fallbacks=dict(self.cache_scan_fallbacks),
+                socket_emits_requested=dict(self.socket_emits_requested),
+                socket_emits_sent=dict(self.socket_emits_sent),
+                db_units={key: dict(unit) for key, unit in self.db_units.items()},
+                db_n_plus_one={key: dict(entry) for key, entry in self.db_n_plus_one.items()},
+                product_views=dict(self.product_views),
+                job_runs=dict(self.job_runs),
+                job_skipped=dict(self.job_skipped),
+                socket_event_count=dict(self.socket_event_count),
+                socket_event_errors=dict(self.socket_event_errors),
+                request_latencies=dict(self.request_latencies),
+                socket_event_latencies=dict(self.socket_event_latencies),
+                job_latencies=dict(self.job_latencies),
+                event_loop_lag=list(self.event_loop_lag),
+            )
 
     def get_metrics_summary(self) -> Dict[str, Any]:
         """
@@ -78,31 +235,88 @@ class MetricsCollector:
         Returns:
             dict: Métricas agregadas
         """
+        snapshot = self._snapshot()
         uptime_seconds = time.time() - self.start_time
 
-        # Calcula latências médias
-        avg_request_latencies = {}
-        for endpoint, latencies in self.request_latencies.items():
-            if latencies:
-                avg_request_latencies[endpoint] = {
-                    "avg_ms": round(sum(latencies) / len(latencies), 2),
-                    "min_ms": round(min(latencies), 2),
-                    "max_ms": round(max(latencies), 2),
-                    "p95_ms": round(self._percentile(latencies, 95), 2),
-                    "p99_ms": round(self._percentile(latencies, 99), 2),
-                }
-
-        avg_db_latency = (
-            round(sum(self.db_query_latencies) / len(self.db_query_latencies), 2)
-            if self.db_query_latencies else 0
+        # Latências (percentis calculados dos histogramas)
+        request_latencies = {
+            f"{method} {route}": histogram.summary()
+            for (method, route), histogram in snapshot.request_latencies.items()
+        }
+
+        socket_events = {
+            f"{namespace} {event}": {
+                **histogram.summary(),
+                "errors": snapshot.socket_event_errors.get((namespace, event), 0),
+            }
+            for (namespace, event), histogram in snapshot.socket_event_latencies.items()
+        }
+
+        db_units = {
+            f"{kind} {name}": {
+                "units": unit["units"],
+                "queries": unit["queries"],
+                "avg_queries": round(unit["queries"] / unit["units"], 2),
+                "max_queries": unit["max_queries"],
+                "avg_db_time_ms": round(unit["db_time_ms"] / unit["units"], 2),
+                "rows": unit["rows"],
+            }
+            for (kind, name), unit in snapshot.db_units.items()
+        }
+
+        n_plus_one = sorted(
+            (
+                {"unit": f"{kind} {name}", "statement": shape, **entry}
+                for (kind, name, shape), entry in snapshot.db_n_plus_one.items()
+            ),
+            key=lambda item: item["occurrences"],
+            reverse=True,
         )
 
-        cache_total = self.cache_hits + self.cache_misses
+        jobs = {
+            job_id: {
+                **histogram.summary(),
+                "by_status": {
+                    status: count for (job, status), count in snapshot.job_runs.items() if job == job_id
+                },
+                "skipped": snapshot.job_skipped.get(job_id, 0),
+            }
+            for job_id, histogram in snapshot.job_latencies.items()
+        }
+
+        total_requests = sum(snapshot.request_count.values())
+        total_errors = sum(snapshot.error_count.values())
+
+        lag_samples = snapshot.event_loop_lag
+
+        cache_total = snapshot.cache_hits + snapshot.cache_misses
         cache_hit_rate = (
-            round((self.cache_hits / cache_total) * 100, 2)
+            round((snapshot.cache_hits / cache_total) * 100, 2)
             if cache_total > 0 else 0
         )
 
+        invalidations = {
+            trigger: {
+                "calls": calls,
+                "keys_removed": snapshot.cache_invalidated_keys.get(trigger, 0),
+                "avg_keys_per_call": round(snapshot.cache_invalidated_keys.get(trigger, 0) / calls, 2),
+                "scan_fallbacks": snapshot.cache_scan_fallbacks.get(trigger, 0),
+            }
+            for trigger, calls in snapshot.cache_invalidation_calls.items()
+        }
+
+        socket_emits = {}
+        for event, requested in snapshot.socket_emits_requested.items():
+            sent = snapshot.socket_emits_sent.get(event, 0)
+            socket_emits[event] = {
+                "requested": requested,
+                "emitted": sent,
+                "coalesced": max(requested - sent, 0),
+                "savings_percent": round((1 - sent / requested) * 100, 2) if requested else 0,
+            }
+
+        views = snapshot.product_views
+
         return {
             "system": {
                 "uptime_seconds": round(uptime_seconds, 2),
@@ -110,27 +324,50 @@ class MetricsCollector:
                 "last_reset": self.last_reset.isoformat(),
             },
             "requests": {
-                "total": sum(self.request_count.values()),
-                "by_endpoint": dict(self.request_count),
-                "errors": sum(self.error_count.values()),
-                "error_rate": round(
-                    (sum(self.error_count.values()) / sum(self.request_count.values()) * 100)
-                    if sum(self.request_count.values()) > 0 else 0, 2
-                ),
-                "latencies": avg_request_latencies,
+                "total": total_requests,
+                "by_endpoint": {f"{method} {route}": count for (method, route), count in snapshot.request_count.items()},
+                "errors": total_errors,
+                "error_rate": round((total_errors / total_requests * 100) if total_requests > 0 else 0, 2),
+                "latencies": request_latencies,
             },
             "database": {
-                "total_queries": self.db_query_count,
-                "avg_latency_ms": avg_db_latency,
+                "total_queries": snapshot.db_query_count,
+                "avg_latency_ms": self.db_query_latencies.summary()["avg_ms"],
+                "latency": self.db_query_latencies.summary(),
+                "by_unit": db_units,
+                "n_plus_one": n_plus_one,
                 "queries_per_second": round(
-                    self.db_query_count / uptime_seconds, 2
+                    snapshot.db_query_count / uptime_seconds, 2
                 ) if uptime_seconds > 0 else 0,
             },
+            "event_loop": {
+                "samples": len(lag_samples),
+                "avg_lag_ms": round(sum(lag_samples) / len(lag_samples), 2) if lag_samples else 0,
+                "p95_lag_ms": round(self._percentile(lag_samples, 95), 2),
+                "p99_lag_ms": round(self._percentile(lag_samples, 99), 2),
+                "max_lag_ms": round(max(lag_samples), 2) if lag_samples else 0,
+            },
             "cache": {
-                "hits": self.cache_hits,
-                "misses": self.cache_misses,
+                "hits": snapshot.cache_hits,
+                "misses": snapshot.cache_misses,
                 "hit_rate_percent": cache_hit_rate,
+                "invalidations": invalidations,
+            },
+            "socketio": {
+                "events": socket_events,
+                "emits": socket_emits,
+            },
+            "product_views": {
+                "buffered": views.get("buffered", 0),
+                "flushed": views.get("flushed", 0),
+                "flush_batches": views.get("flush_batches", 0),
+                "rejected_buffer_full": views.get("rejected", 0),
+                "dropped": views.get("dropped", 0),
+                "avg_batch_size": round(
+                    views.get("flushed", 0) / views["flush_batches"], 2
+                ) if views.get("flush_batches") else 0,
             },
+            "jobs": jobs,
             "business": {
                 "active_stores": self.active_stores,
                 "active_orders": self.active_orders,
@@ -138,6 +375,120 @@ class MetricsCollector:
             }
         }
 
+    def render_prometheus(self) -> str:
+        """
+        Exposição em texto do Prometheus (formato 0.0.4)
+
+        Latências como histogramas (buckets cumulativos em segundos).
+        """
+        snapshot = self._snapshot()
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, labels: str, hist: LatencyHistogram):
+            separator = "," if labels else ""
+            for le, count in hist.cumulative_buckets():
+                lines.append(f'{name}_bucket{{{labels}{separator}le="{le}"}} {count}')
+            label_block = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}_sum{label_block} {hist.sum_ms / 1000:.6f}")
+            lines.append(f"{name}_count{label_block} {hist.count}")
+
+        metric("pdvix_uptime_seconds", "gauge", "Tempo desde o início do processo")
+        lines.append(f"pdvix_uptime_seconds {time.time() - self.start_time:.0f}")
+
+        metric("pdvix_http_requests_total", "counter", "Requisições HTTP por rota")
+        for (method, route), count in snapshot.request_count.items():
+            errors = snapshot.error_count.get((method, route), 0)
+            labels = f'method="{method}",route="{_escape_label(route)}"'
+            lines.append(f'pdvix_http_requests_total{{{labels},outcome="success"}} {count - errors}')
+            lines.append(f'pdvix_http_requests_total{{{labels},outcome="error"}} {errors}')
+
+        metric("pdvix_http_request_duration_seconds", "histogram", "Latência das requisições HTTP")
+        for (method, route), hist in snapshot.request_latencies.items():
+            histogram(
+                "pdvix_http_request_duration_seconds",
+                f'method="{method}",route="{_escape_label(route)}"',
+                hist,
+            )
+
+        metric("pdvix_socketio_events_total", "counter", "Eventos Socket.IO recebidos")
+        for (namespace, event), count in snapshot.socket_event_count.items():
+            errors = snapshot.socket_event_errors.get((namespace, event), 0)
+            labels = f'namespace="{_escape_label(namespace)}",event="{_escape_label(event)}"'
+            lines.append(f'pdvix_socketio_events_total{{{labels},outcome="success"}} {count - errors}')
+            lines.append(f'pdvix_socketio_events_total{{{labels},outcome="error"}} {errors}')
+
+        metric("pdvix_socketio_event_duration_seconds", "histogram", "Tempo dos handlers Socket.IO")
+        for (namespace, event), hist in snapshot.socket_event_latencies.items():
+            histogram(
+                "pdvix_socketio_event_duration_seconds",
+                f'namespace="{_escape_label(namespace)}",event="{_escape_label(event)}"',
+                hist,
+            )
+
+        metric("pdvix_socketio_emits_total", "counter", "Emissões agrupáveis pedidas x enviadas")
+        for event, requested in snapshot.socket_emits_requested.items():
+            lines.append(f'pdvix_socketio_emits_total{{event="{_escape_label(event)}",stage="requested"}} {requested}')
+            lines.append(
+                f'pdvix_socketio_emits_total{{event="{_escape_label(event)}",stage="sent"}} '
+                f'{snapshot.socket_emits_sent.get(event, 0)}'
+            )
+
+        metric("pdvix_db_query_duration_seconds", "histogram", "Latência das queries do banco")
+        histogram("pdvix_db_query_duration_seconds", "", self.db_query_latencies)
+
+        metric("pdvix_db_unit_queries_total", "counter", "Queries por rota HTTP / evento Socket.IO")
+        for (kind, name), unit in snapshot.db_units.items():
+            lines.append(f'pdvix_db_unit_queries_total{{kind="{kind}",name="{_escape_label(name)}"}} {unit["queries"]}')
+
+        metric("pdvix_db_unit_time_seconds_total", "counter", "Tempo de banco por rota HTTP / evento Socket.IO")
+        for (kind, name), unit in snapshot.db_units.items():
+            lines.append(
+                f'pdvix_db_unit_time_seconds_total{{kind="{kind}",name="{_escape_label(name)}"}} '
+                f'{unit["db_time_ms"] / 1000:.6f}'
+            )
+
+        metric("pdvix_db_units_total", "counter", "Unidades de trabalho instrumentadas")
+        for (kind, name), unit in snapshot.db_units.items():
+            lines.append(f'pdvix_db_units_total{{kind="{kind}",name="{_escape_label(name)}"}} {unit["units"]}')
+
+        metric("pdvix_db_n_plus_one_total", "counter", "Ocorrências de provável N+1 por rota/evento")
+        n_plus_one_by_unit = defaultdict(int)
+        for (kind, name, _), entry in snapshot.db_n_plus_one.items():
+            n_plus_one_by_unit[(kind, name)] += entry["occurrences"]
+        for (kind, name), occurrences in n_plus_one_by_unit.items():
+            lines.append(f'pdvix_db_n_plus_one_total{{kind="{kind}",name="{_escape_label(name)}"}} {occurrences}')
+
+        metric("pdvix_cache_requests_total", "counter", "Leituras do cache")
+        lines.append(f'pdvix_cache_requests_total{{result="hit"}} {snapshot.cache_hits}')
+        lines.append(f'pdvix_cache_requests_total{{result="miss"}} {snapshot.cache_misses}')
+
+        metric("pdvix_product_views_total", "counter", "Visualizações de produtos por resultado")
+        for outcome, count in snapshot.product_views.items():
+            lines.append(f'pdvix_product_views_total{{outcome="{outcome}"}} {count}')
+
+        metric("pdvix_job_runs_total", "counter", "Execuções de jobs agendados por status")
+        for (job_id, status), count in snapshot.job_runs.items():
+            lines.append(f'pdvix_job_runs_total{{job="{_escape_label(job_id)}",status="{status}"}} {count}')
+        for job_id, count in snapshot.job_skipped.items():
+            lines.append(f'pdvix_job_runs_total{{job="{_escape_label(job_id)}",status="skipped"}} {count}')
+
+        metric("pdvix_job_duration_seconds", "histogram", "Duração dos jobs agendados")
+        for job_id, hist in snapshot.job_latencies.items():
+            histogram("pdvix_job_duration_seconds", f'job="{_escape_label(job_id)}"', hist)
+
+        lag_samples = snapshot.event_loop_lag
+        metric("pdvix_event_loop_lag_seconds", "gauge", "Atraso do event loop (p99 das amostras recentes)")
+        lines.append(f"pdvix_event_loop_lag_seconds {self._percentile(lag_samples, 99) / 1000:.6f}")
+
+        metric("pdvix_active_websocket_connections", "gauge", "Conexões WebSocket ativas")
+        lines.append(f"pdvix_active_websocket_connections {self.active_websocket_connections}")
+
+        return "\n".join(lines) + "\n"
+
     def reset_metrics(self):
         """Reseta todas as métricas (útil para testes)"""
         self.__init__()
@@ -152,10 +503,36 @@ class MetricsCollector:
         return sorted_values[min(index, len(sorted_values) - 1)]
 
 
+def _escape_label(value: str) -> str:
+    """Escapa um valor de label do Prometheus"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
 # Instância global
 metrics = MetricsCollector()
 
 
+async def monitor_event_loop_lag(interval: float = 0.5, warn_threshold_ms: float = 200):
+    """
+    Mede continuamente o atraso do event loop
+
+    Dorme `interval` segundos e mede quanto tempo a mais levou para acordar:
+    qualquer código síncrono pesado (ex: query bloqueante) aparece como lag.
+
+    Uso (lifespan):
+        task = asyncio.create_task(monitor_event_loop_lag())
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag_ms = max(0.0, (loop.time() - start - interval) * 1000)
+        metrics.track_event_loop_lag(lag_ms)
+
+        if lag_ms > warn_threshold_ms:
+            logger.warning(f"⚠️ Event loop bloqueado por {lag_ms:.0f}ms")
+
+
 def track_performance(metric_name: str):
     """
     Decorator para rastrear performance de funções
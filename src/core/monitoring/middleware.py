@@ -13,9 +13,23 @@ from starlette.requests import Request
 from starlette.responses import Response
 
 from src.core.monitoring.metrics import metrics
+from src.core.monitoring.sql_instrumentation import begin_unit, end_unit, response_headers
 
 logger = logging.getLogger(__name__)
 
+# Série única para caminhos sem rota (404, scanners): evita explosão de séries
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def get_route_template(request: Request) -> str:
+    """
+    Template da rota que atendeu a requisição (ex: /admin/stores/{store_id})
+
+    O roteador do FastAPI grava a rota em scope["route"] ao casar o caminho.
+    """
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
 
 class MetricsMiddleware(BaseHTTPMiddleware):
     """
@@ -29,6 +43,9 @@ class MetricsMiddleware(BaseHTTPMiddleware):
 
         start_time = time.time()
 
+        # Queries desta requisição (rota e correlation-id só são conhecidos depois)
+        query_unit, unit_token = begin_unit("http", UNMATCHED_ROUTE)
+
         # Executa requisição
         try:
             response: Response = await call_next(request)
@@ -40,10 +57,11 @@ class MetricsMiddleware(BaseHTTPMiddleware):
         finally:
             # Calcula duração
             duration_ms = (time.time() - start_time) * 1000
+            route = get_route_template(request)
 
-            # Registra métrica
+            # Registra métrica (por template da rota, não pelo caminho com ids)
             metrics.track_request(
-                endpoint=request.url.path,
+                endpoint=route,
                 method=request.method,
                 duration_ms=duration_ms,
                 status_code=status_code
@@ -51,6 +69,10 @@ class MetricsMiddleware(BaseHTTPMiddleware):
 
             # Log estruturado com correlation-id
             cid = getattr(request.state, "correlation_id", None)
+
+            query_unit.name = f"{request.method} {route}"
+            query_unit.correlation_id = cid
+            end_unit(query_unit, unit_token)
             try:
                 logger.info(
                     {
@@ -59,6 +81,8 @@ class MetricsMiddleware(BaseHTTPMiddleware):
                         "path": request.url.path,
                         "status": status_code,
                         "duration_ms": round(duration_ms, 2),
+                        "db_queries": query_unit.query_count,
+                        "db_time_ms": round(query_unit.db_time_ms, 2),
                         "correlationId": cid,
                     }
                 )
@@ -76,4 +100,7 @@ class MetricsMiddleware(BaseHTTPMiddleware):
                     f"levou {duration_ms:.2f}ms (status: {status_code})"
                 )
 
+        # Diagnóstico de queries (headers X-DB-*, apenas em development ou com SQL_DIAGNOSTIC_HEADERS)
+        response.headers.update(response_headers(query_unit))
+
         return response
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Socket.IO Metrics
+=================
+Namespace base que mede os eventos recebidos (contagem, erros e latência)
+e as queries de cada evento (ver sql_instrumentation)
+
+Uso:
+    class AdminNamespace(InstrumentedNamespace):
+        async def on_join_store_room(self, sid, data): ...
+
+Autor: PDVix Team
+"""
+
+import time
+
+from socketio import AsyncNamespace
+
+from src.core.monitoring.metrics import metrics
+from src.core.monitoring.sql_instrumentation import begin_unit, end_unit
+
+# Série única para eventos sem handler (nomes arbitrários enviados por clientes)
+UNHANDLED_EVENT = "<unhandled>"
+
+
+class InstrumentedNamespace(AsyncNamespace):
+    """
+    AsyncNamespace com métricas por evento em /monitoring/metrics
+    """
+
+    async def trigger_event(self, event, *args):
+        label = event if hasattr(self, f"on_{event or ''}") else UNHANDLED_EVENT
+        namespace = self.namespace or "/"
+
+        # Correlation id do evento: socket que o enviou (1º argumento = sid)
+        sid = args[0] if args else None
+        query_unit, unit_token = begin_unit("socketio", f"{namespace} {label}", correlation_id=f"sio-{sid}")
+
+        start_time = time.perf_counter()
+        failed = False
+        try:
+            return await super().trigger_event(event, *args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            end_unit(query_unit, unit_token)
+            metrics.track_socket_event(
+                namespace=namespace,
+                event=label,
+                duration_ms=(time.perf_counter() - start_time) * 1000,
+                failed=failed,
+            )
@@ -0,0 +1,147 @@
+"""
+SQL Instrumentation
+===================
+Contagem de queries por unidade de trabalho e detector de N+1
+
+Características:
+- ✅ Hooks before/after_cursor_execute em todos os engines (sync e asyncpg)
+- ✅ Queries, tempo de banco e linhas atribuídos à rota HTTP ou ao evento
+  Socket.IO atual (com o correlation id)
+- ✅ N+1 provável: o mesmo formato de statement repetido muitas vezes
+  dentro de uma unidade (SQL_N_PLUS_ONE_THRESHOLD)
+- ✅ Resultados em /monitoring/metrics (database.by_unit / n_plus_one) e,
+  em development (ou com SQL_DIAGNOSTIC_HEADERS), nos headers X-DB-* da resposta
+
+A unidade atual vive em um ContextVar: acompanha a requisição nas threads
+do threadpool (rotas síncronas) e nas sessões assíncronas (run_sync).
+Queries fora de uma unidade (jobs, emissões agrupadas) entram só no total.
+
+Autor: PDVix Team
+"""
+
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from typing import Optional
+
+from sqlalchemy import event
+
+from src.core.config import config
+from src.core.monitoring.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo do formato de statement guardado (chave do detector)
+_MAX_SHAPE_LENGTH = 300
+
+
+class QueryUnit:
+    """Queries de uma unidade de trabalho (requisição HTTP ou evento Socket.IO)"""
+
+    __slots__ = ("kind", "name", "correlation_id", "query_count", "db_time_ms", "rows", "shapes")
+
+    def __init__(self, kind: str, name: str, correlation_id: Optional[str] = None):
+        self.kind = kind
+        self.name = name
+        self.correlation_id = correlation_id
+        self.query_count = 0
+        self.db_time_ms = 0.0
+        self.rows = 0
+        self.shapes: Counter[str] = Counter()
+
+    def n_plus_one_suspects(self) -> list[tuple[str, int]]:
+        """Formatos repetidos acima do limite, do mais repetido ao menos"""
+        threshold = config.SQL_N_PLUS_ONE_THRESHOLD
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+_current_unit: ContextVar[Optional[QueryUnit]] = ContextVar("sql_query_unit", default=None)
+
+
+# ═══════════════════════════════════════════════════════════
+# UNIDADES DE TRABALHO
+# ═══════════════════════════════════════════════════════════
+
+def begin_unit(kind: str, name: str, correlation_id: Optional[str] = None) -> tuple[QueryUnit, Token]:
+    """Abre uma unidade no contexto atual (fechar com end_unit)"""
+    unit = QueryUnit(kind, name, correlation_id)
+    return unit, _current_unit.set(unit)
+
+
+def end_unit(unit: QueryUnit, token: Token) -> QueryUnit:
+    """Fecha a unidade, registra as métricas e avisa sobre N+1"""
+    _current_unit.reset(token)
+
+    suspects = unit.n_plus_one_suspects()
+    metrics.track_unit_queries(
+        kind=unit.kind,
+        name=unit.name,
+        query_count=unit.query_count,
+        db_time_ms=unit.db_time_ms,
+        rows=unit.rows,
+        n_plus_one=suspects,
+    )
+
+    for shape, count in suspects:
+        logger.warning(
+            f"🔁 Provável N+1 em {unit.kind} '{unit.name}' "
+            f"(correlationId={unit.correlation_id}): {count}x {shape[:120]}"
+        )
+
+    return unit
+
+
+def current_unit() -> Optional[QueryUnit]:
+    return _current_unit.get()
+
+
+def response_headers(unit: QueryUnit) -> dict[str, str]:
+    """Headers de diagnóstico (development ou SQL_DIAGNOSTIC_HEADERS=true)"""
+    if not (config.is_development or config.SQL_DIAGNOSTIC_HEADERS):
+        return {}
+
+    return {
+        "X-DB-Query-Count": str(unit.query_count),
+        "X-DB-Time-Ms": f"{unit.db_time_ms:.2f}",
+        "X-DB-Rows": str(unit.rows),
+        "X-DB-N-Plus-One": str(len(unit.n_plus_one_suspects())),
+    }
+
+
+# ═══════════════════════════════════════════════════════════
+# HOOKS DO ENGINE
+# ═══════════════════════════════════════════════════════════
+
+def _statement_shape(statement: str) -> str:
+    # Os parâmetros já são placeholders: basta normalizar espaços
+    return " ".join(statement.split())[:_MAX_SHAPE_LENGTH]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Um valor por conexão (sobrescrito a cada query; query com erro não deixa resto)
+    conn.info["query_start_time"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_time = conn.info.pop("query_start_time", None)
+    if start_time is None:
+        return
+    duration_ms = (time.perf_counter() - start_time) * 1000
+
+    metrics.track_db_query(duration_ms)
+
+    unit = _current_unit.get()
+    if unit is None:
+        return
+
+    unit.query_count += 1
+    unit.db_time_ms += duration_ms
+    unit.rows += max(getattr(cursor, "rowcount", 0) or 0, 0)
+    unit.shapes[_statement_shape(statement)] += 1
+
+
+def instrument_engine(engine) -> None:
+    """Registra os hooks em um engine síncrono (para asyncpg: engine.sync_engine)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
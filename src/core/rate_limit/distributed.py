@@ -0,0 +1,201 @@
+# src/core/rate_limit/distributed.py
+
+"""
+Rate Limiter Distribuído (GCRA)
+===============================
+
+Limite "N por período" compartilhado entre todos os workers.
+
+- GCRA (Generic Cell Rate Algorithm) num script Lua atômico: uma chave por
+  cliente guardando só o "theoretical arrival time" (TAT), com PEXPIRE até
+  a janela esvaziar. Equivale a uma janela deslizante sem guardar cada
+  requisição, e permite rajada de até N
+- O relógio é o do Redis (TIME): workers com relógios diferentes veem o
+  mesmo limite
+- Intervalo entre requisições em float (período / N, sem arredondar):
+  "3/second" é 333,33ms, nem mais nem menos que 3 por segundo
+- Redis indisponível (ou erro no script) → mesmo algoritmo em memória,
+  num LRU limitado a RATE_LIMIT_LOCAL_MAX_KEYS chaves por worker
+
+Uso:
+    result = rate_limiter.hit("socket_connect", client_ip, 10, 60)
+    if not result.allowed:
+        ...  # result.retry_after segundos
+
+Para cobrar só as falhas (ex: PIN), consulte com dry_run=True antes e
+chame hit() depois da tentativa que falhou.
+
+Autor: PDVix Team
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from redis.exceptions import RedisError
+
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.config import config
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400,
+}
+
+# Folga para o erro de ponto flutuante (N × período/N pode passar do período)
+_EPSILON_MS = 1e-6
+
+# KEYS[1] = chave do cliente
+# ARGV[1] = intervalo entre requisições (ms, float) | ARGV[2] = período (ms) | ARGV[3] = custo
+# ARGV[4] = folga (ms) | ARGV[5] = 1 para só consultar (não consome)
+# Retorno: {permitido (0/1), restantes, retry_after (ms), reset_after (ms)}
+_GCRA_SCRIPT = """
+local clock = redis.call('TIME')
+local now = clock[1] * 1000 + math.floor(clock[2] / 1000)
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local epsilon = tonumber(ARGV[4])
+
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then
+    tat = now
+end
+
+local new_tat = tat + interval * cost
+if new_tat - now > period + epsilon then
+    return {0, 0, math.ceil(new_tat - now - period), math.ceil(tat - now)}
+end
+
+if ARGV[5] ~= '1' then
+    -- Formato explícito: o tostring do Lua guarda só 14 dígitos
+    redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+end
+return {1, math.floor((period - (new_tat - now)) / interval + epsilon), 0, math.ceil(new_tat - now)}
+"""
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float  # segundos até a próxima requisição ser aceita
+    reset_after: float  # segundos até o limite voltar ao máximo
+
+
+def parse_rate(limit: str) -> tuple[int, int]:
+    """
+    "5/minute" → (5, 60)
+
+    O período também pode vir em segundos: "3/180" → (3, 180)
+    """
+    count, _, period = limit.partition("/")
+    period = period.strip() or "minute"
+    seconds = int(period) if period.isdigit() else _PERIODS.get(period.rstrip("s"), 60)
+    return int(count), seconds
+
+
+class DistributedRateLimiter:
+    """
+    ✅ Rate limiter GCRA no Redis com fallback local limitado
+    """
+
+    def __init__(self, local_max_keys: int = 10_000):
+        self.local_max_keys = max(local_max_keys, 1)
+
+        self._script = None
+        self._lock = threading.Lock()
+        self._local: "OrderedDict[str, float]" = OrderedDict()
+
+        # Métricas simples (monitoramento)
+        self.rejected = 0
+        self.local_fallbacks = 0
+
+    def hit(
+            self,
+            scope: str,
+            identifier: str,
+            limit: int,
+            period_seconds: float,
+            cost: int = 1,
+            dry_run: bool = False,
+    ) -> RateLimitResult:
+        """
+        Consome `cost` do limite de `identifier` em `scope`
+
+        Args:
+            scope: Tipo do limite (ex: "socket_connect", "pin_login")
+            identifier: Cliente (IP, loja...)
+            limit: Requisições permitidas por período
+            period_seconds: Tamanho do período em segundos
+            cost: Quanto esta requisição consome
+            dry_run: Só informa se `cost` caberia, sem consumir
+        """
+        key = CacheKeys.rate_limit(scope, identifier)
+        period_ms = max(int(period_seconds * 1000), 1)
+        interval_ms = period_ms / max(limit, 1)
+
+        result = self._hit_redis(key, interval_ms, period_ms, cost, dry_run)
+        if result is None:
+            self.local_fallbacks += 1
+            result = self._hit_local(key, interval_ms, period_ms, cost, dry_run)
+
+        if not result.allowed:
+            self.rejected += 1
+        return result
+
+    def _hit_redis(
+            self, key: str, interval_ms: float, period_ms: int, cost: int, dry_run: bool
+    ) -> Optional[RateLimitResult]:
+        try:
+            if self._script is None:
+                self._script = redis_client.register_script(_GCRA_SCRIPT)
+                if self._script is None:
+                    return None
+
+            allowed, remaining, retry_after, reset_after = self._script(
+                keys=[key], args=[interval_ms, period_ms, cost, _EPSILON_MS, int(dry_run)]
+            )
+        except RedisError as e:
+            logger.warning(f"⚠️ Rate limit no Redis falhou, usando memória local: {e}")
+            return None
+
+        return RateLimitResult(bool(allowed), int(remaining), int(retry_after) / 1000, int(reset_after) / 1000)
+
+    def _hit_local(self, key: str, interval_ms: float, period_ms: int, cost: int, dry_run: bool) -> RateLimitResult:
+        """Mesmo GCRA do script, em memória (limite por worker)"""
+        now = time.time() * 1000
+
+        with self._lock:
+            tat = max(self._local.get(key, now), now)
+            new_tat = tat + interval_ms * cost
+
+            if new_tat - now > period_ms + _EPSILON_MS:
+                return RateLimitResult(False, 0, (new_tat - now - period_ms) / 1000, (tat - now) / 1000)
+
+            if not dry_run:
+                self._local[key] = new_tat
+                self._local.move_to_end(key)
+                while len(self._local) > self.local_max_keys:
+                    self._local.popitem(last=False)
+
+        return RateLimitResult(
+            True, int((period_ms - (new_tat - now)) / interval_ms + _EPSILON_MS), 0.0, (new_tat - now) / 1000
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            "rejected": self.rejected,
+            "local_fallbacks": self.local_fallbacks,
+            "local_keys": len(self._local),
+        }
+
+
+# ✅ Instância global
+rate_limiter = DistributedRateLimiter(local_max_keys=config.RATE_LIMIT_LOCAL_MAX_KEYS)
@@ -79,6 +79,7 @@ RATE_LIMITS = {
     "write": "30/minute",
     "webhook": "1000/hour",
     "websocket_connect": "10/minute",
+    "pin_login": "10/minute",  # Tentativas ERRADAS por loja + cliente
     "admin_write": "60/minute",
     "public": "200/minute",
 }
@@ -0,0 +1,196 @@
+# src/core/security/principal_cache.py
+
+"""
+Principal Cache
+===============
+
+Cache das consultas de autorização das rotas do admin.
+
+Problema: toda requisição autenticada passava por get_current_user
+(User por email) e GetStore (StoreAccess + role lazy + Store), ou seja,
+3 a 5 idas ao banco antes da lógica da rota.
+
+Como funciona:
+- Snapshots das colunas em enterprise_cache (L1 do worker + L2 Redis), TTL
+  curto (PRINCIPAL_CACHE_TTL_SECONDS):
+  - email → User
+  - (user_id, store_id) → role (machine_name) do StoreAccess
+  - store_id → Store
+- No hit, o snapshot vira uma instância ORM persistente da Session da
+  requisição sem SQL (make_transient_to_detached + merge(load=False)):
+  as rotas continuam recebendo models.User/models.Store e podem alterá-los.
+  Colunas sensíveis não vão para o cache e relacionamentos carregam sob
+  demanda (lazy), como antes
+- Invalidação pelos eventos da Session (after_flush → after_commit):
+  qualquer escrita ORM em User, StoreAccess ou Store derruba as chaves
+  em todos os workers (enterprise_cache.delete publica no pub/sub)
+
+UPDATEs em massa (ex: agregados de avaliação da loja) não passam pelos
+eventos: a defasagem fica limitada ao TTL.
+
+Autor: PDVix Team
+"""
+
+import logging
+from datetime import date, datetime, time
+from decimal import Decimal
+from itertools import chain
+from typing import Optional
+
+from sqlalchemy import Enum as SAEnum
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import get_history
+
+from src.core import models
+from src.core.cache.enterprise_cache import enterprise_cache
+from src.core.cache.keys import CacheKeys
+from src.core.config import config
+
+logger = logging.getLogger(__name__)
+
+# Nunca vão para o Redis: carregam do banco só se a rota acessar
+_USER_PRIVATE_COLUMNS = frozenset({"hashed_password", "verification_code", "pin_code"})
+
+_SESSION_INFO_KEY = "principal_cache_changed"
+
+
+# ═══════════════════════════════════════════════════════════
+# SNAPSHOT ↔ INSTÂNCIA ORM
+# ═══════════════════════════════════════════════════════════
+
+def _snapshot(obj, exclude: frozenset = frozenset()) -> dict:
+    mapper = sa_inspect(obj).mapper
+    return {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs if attr.key not in exclude}
+
+
+def _coerce(column_type, value):
+    """Desfaz a serialização JSON do L2 (datas em ISO, enums pelo valor)"""
+    if value is None:
+        return None
+
+    if isinstance(column_type, SAEnum) and column_type.enum_class is not None:
+        return value if isinstance(value, column_type.enum_class) else column_type.enum_class(value)
+
+    try:
+        python_type = column_type.python_type
+    except NotImplementedError:
+        return value
+
+    if isinstance(value, str) and python_type in (datetime, date, time):
+        return python_type.fromisoformat(value)
+    if python_type is Decimal and not isinstance(value, Decimal):
+        return Decimal(str(value))
+    return value
+
+
+def _attach(db: Session, model, data: dict):
+    """Instância persistente na Session a partir do snapshot, sem SQL"""
+    mapper = sa_inspect(model)
+    obj = mapper.class_manager.new_instance()
+
+    for attr in mapper.column_attrs:
+        if attr.key in data:
+            setattr(obj, attr.key, _coerce(attr.columns[0].type, data[attr.key]))
+
+    # Colunas ausentes do snapshot ficam expiradas (carregam se acessadas)
+    make_transient_to_detached(obj)
+    return db.merge(obj, load=False)
+
+
+# ═══════════════════════════════════════════════════════════
+# CONSULTAS
+# ═══════════════════════════════════════════════════════════
+
+def get_user(db: Session, email: str) -> Optional[models.User]:
+    """Usuário pelo email (sub do JWT)"""
+    key = CacheKeys.principal_user(email)
+    data = enterprise_cache.get(key)
+    if data is not None:
+        return _attach(db, models.User, data)
+
+    user = db.query(models.User).filter(models.User.email == email).first()
+    if user:
+        enterprise_cache.set(key, _snapshot(user, _USER_PRIVATE_COLUMNS), ttl=config.PRINCIPAL_CACHE_TTL_SECONDS)
+    return user
+
+
+def get_store_role(db: Session, user_id: int, store_id: int) -> Optional[str]:
+    """machine_name da role do usuário na loja (None = sem acesso)"""
+    key = CacheKeys.principal_store_access(user_id, store_id)
+    data = enterprise_cache.get(key)
+    if data is not None:
+        return data["role"]
+
+    role = db.query(models.Role.machine_name).join(
+        models.StoreAccess, models.StoreAccess.role_id == models.Role.id
+    ).filter(
+        models.StoreAccess.user_id == user_id,
+        models.StoreAccess.store_id == store_id
+    ).scalar()
+
+    if role is not None:
+        enterprise_cache.set(key, {"role": role}, ttl=config.PRINCIPAL_CACHE_TTL_SECONDS)
+    return role
+
+
+def get_store(db: Session, store_id: int) -> Optional[models.Store]:
+    """Loja pelo id (relacionamentos carregam sob demanda)"""
+    key = CacheKeys.principal_store(store_id)
+    data = enterprise_cache.get(key)
+    if data is not None:
+        return _attach(db, models.Store, data)
+
+    store = db.get(models.Store, store_id)
+    if store:
+        enterprise_cache.set(key, _snapshot(store), ttl=config.PRINCIPAL_CACHE_TTL_SECONDS)
+    return store
+
+
+# ═══════════════════════════════════════════════════════════
+# EVENTOS DA SESSION (INVALIDAÇÃO)
+# ═══════════════════════════════════════════════════════════
+
+def _changed_keys(obj) -> list[str]:
+    if isinstance(obj, models.User):
+        # O email antigo também sai (troca de email)
+        history = get_history(obj, "email")
+        emails = set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+        return [CacheKeys.principal_user(email) for email in emails if email]
+
+    if isinstance(obj, models.StoreAccess):
+        if obj.user_id and obj.store_id:
+            return [CacheKeys.principal_store_access(obj.user_id, obj.store_id)]
+        return []
+
+    if isinstance(obj, models.Store):
+        return [CacheKeys.principal_store(obj.id)] if obj.id else []
+
+    return []
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_principals(session: Session, flush_context):
+    changed = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        keys = _changed_keys(obj)
+        if keys:
+            if changed is None:
+                changed = session.info.setdefault(_SESSION_INFO_KEY, set())
+            changed.update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_principals(session: Session):
+    changed = session.info.pop(_SESSION_INFO_KEY, None)
+    if not changed:
+        return
+
+    for key in changed:
+        enterprise_cache.delete(key)
+    logger.debug(f"🔑 Cache de autorização invalidado: {len(changed)} chave(s)")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_principals(session: Session):
+    session.info.pop(_SESSION_INFO_KEY, None)
@@ -0,0 +1,321 @@
+# src/core/security/revocation_filter.py
+
+"""
+Revocation Filter
+=================
+
+Filtro de Bloom local (por worker) dos JTIs revogados, na frente do
+EXISTS da blacklist no Redis.
+
+- "Não está no filtro" → token não revogado, sem ida ao Redis
+- "Talvez esteja" → confirma no Redis (falso positivo ~ERROR_RATE)
+- Sem filtro pronto (Redis fora no startup, falha do listener) → sempre
+  consulta o Redis, como antes
+
+Como o filtro se mantém correto:
+- Startup: inscreve no canal de revogações e só então faz SCAN das chaves
+  da blacklist (revogações durante o SCAN entram pelas duas vias)
+- Cada revogação incrementa um contador de geração no Redis e publica
+  {geração, JTIs}; o worker que revogou já adiciona no próprio filtro
+- A cada SYNC_SECONDS o worker compara o contador com as gerações
+  recebidas: se faltar alguma (mensagem perdida numa reconexão), reconstrói
+- A cada REBUILD_SECONDS reconstrói do zero (Bloom não remove: os tokens
+  expirados saem e o filtro é redimensionado)
+
+Autor: PDVix Team
+"""
+
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from typing import Iterable, Optional
+
+from redis.exceptions import RedisError
+
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
+from src.core.config import config
+
+logger = logging.getLogger(__name__)
+
+
+# ═══════════════════════════════════════════════════════════
+# FILTRO DE BLOOM
+# ═══════════════════════════════════════════════════════════
+
+class BloomFilter:
+    """Filtro de Bloom em bytearray (double hashing sobre blake2b)"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+# ═══════════════════════════════════════════════════════════
+# FILTRO DE TOKENS REVOGADOS (POR WORKER)
+# ═══════════════════════════════════════════════════════════
+
+class RevokedTokenFilter:
+    """
+    ✅ Conjunto local e aproximado dos JTIs revogados
+
+    might_contain() nunca dá falso negativo enquanto o filtro está pronto;
+    quando não está, responde True (o chamador consulta o Redis).
+    """
+
+    def __init__(
+            self,
+            capacity: int = 100_000,
+            error_rate: float = 0.01,
+            sync_seconds: float = 5.0,
+            rebuild_seconds: float = 3600.0,
+    ):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = max(sync_seconds, 0.5)
+        self.rebuild_seconds = rebuild_seconds
+
+        self._lock = threading.Lock()
+        self._filter: Optional[BloomFilter] = None
+        self._built_at = 0.0
+        # JTIs recebidos durante uma reconstrução (entram no filtro novo)
+        self._pending: Optional[list[str]] = None
+
+        # Gerações: todas até _confirmed chegaram; _received = recebidas acima disso
+        self._confirmed = 0
+        self._last_remote = 0
+        self._received: set[int] = set()
+
+        self._pubsub = None
+        self._listener_thread = None
+        self._stopping = threading.Event()
+        self._sync_thread: Optional[threading.Thread] = None
+
+        # Métricas simples (monitoramento)
+        self.skipped_lookups = 0
+        self.rebuilds = 0
+
+    @property
+    def is_ready(self) -> bool:
+        return self._filter is not None
+
+    def might_contain(self, jti: str) -> bool:
+        current = self._filter
+        if current is None:
+            return True
+
+        if jti in current:
+            return True
+
+        self.skipped_lookups += 1
+        return False
+
+    def add(self, jtis: Iterable[str]) -> None:
+        jtis = list(jtis)
+        with self._lock:
+            if self._filter is not None:
+                for jti in jtis:
+                    self._filter.add(jti)
+            if self._pending is not None:
+                self._pending.extend(jtis)
+
+    # ───────────────────────────────────────────────────────
+    # Pub/sub
+    # ───────────────────────────────────────────────────────
+
+    @staticmethod
+    def publish(generation: int, jtis: list[str]) -> None:
+        """Avisa todos os workers (inclusive este) dos JTIs revogados"""
+        message = json.dumps({"generation": generation, "jtis": jtis})
+        redis_client.publish(CacheKeys.token_revocation_channel(), message)
+
+    def _handle_message(self, message: dict) -> None:
+        """Callback do pub/sub (roda na thread do listener)"""
+        try:
+            data = json.loads(message["data"])
+            generation = int(data["generation"])
+            jtis = data["jtis"]
+        except (KeyError, TypeError, ValueError):
+            return
+
+        self.add(jtis)
+        with self._lock:
+            if generation > self._confirmed:
+                self._received.add(generation)
+
+    def _handle_listener_error(self, error, pubsub, thread) -> None:
+        # Mensagens podem ter se perdido: consulta o Redis até reconstruir
+        logger.error(f"❌ Listener de revogação de tokens: {error}")
+        with self._lock:
+            self._filter = None
+        time.sleep(1.0)
+
+    # ───────────────────────────────────────────────────────
+    # Reconstrução e sincronização
+    # ───────────────────────────────────────────────────────
+
+    def rebuild(self) -> bool:
+        """
+        Reconstrói o filtro a partir das chaves da blacklist no Redis
+
+        Returns:
+            True se o filtro ficou pronto
+        """
+        client = redis_client.binary_client
+        if client is None:
+            return False
+
+        with self._lock:
+            self._pending = []
+
+        try:
+            # Geração lida ANTES do SCAN: revogações posteriores chegam por mensagem
+            generation = int(client.get(CacheKeys.token_revocation_generation()) or 0)
+
+            prefix = CacheKeys.token_blacklist("")
+            jtis = []
+            cursor = 0
+            while True:
+                cursor, keys = client.scan(cursor=cursor, match=f"{prefix}*", count=1000)
+                jtis.extend(key.decode()[len(prefix):] for key in keys)
+                if cursor == 0:
+                    break
+        except RedisError as e:
+            logger.error(f"❌ Erro ao reconstruir o filtro de tokens revogados: {e}")
+            with self._lock:
+                self._pending = None
+                self._filter = None
+            return False
+
+        rebuilt = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            rebuilt.add(jti)
+
+        with self._lock:
+            for jti in self._pending:
+                rebuilt.add(jti)
+            self._pending = None
+            self._filter = rebuilt
+            self._built_at = time.monotonic()
+            self._confirmed = self._last_remote = generation
+            self._received = {received for received in self._received if received > generation}
+
+        self.rebuilds += 1
+        logger.info(f"🚫 Filtro de tokens revogados: {len(jtis)} JTI(s), {rebuilt.size // 8 // 1024} KB")
+        return True
+
+    def sync(self) -> None:
+        """Reconstrói se o filtro não está pronto, está velho ou perdeu mensagens"""
+        if self._filter is None or time.monotonic() - self._built_at > self.rebuild_seconds:
+            self.rebuild()
+            return
+
+        client = redis_client.binary_client
+        if client is None:
+            return
+
+        try:
+            remote = int(client.get(CacheKeys.token_revocation_generation()) or 0)
+        except RedisError as e:
+            logger.error(f"❌ Erro ao sincronizar o filtro de tokens revogados: {e}")
+            return
+
+        # As gerações até a leitura anterior já tiveram SYNC_SECONDS para chegar
+        with self._lock:
+            target = self._last_remote
+            missing = any(
+                generation not in self._received
+                for generation in range(self._confirmed + 1, target + 1)
+            )
+            if not missing:
+                self._received = {received for received in self._received if received > target}
+                self._confirmed = target
+                self._last_remote = remote
+
+        if missing:
+            logger.warning("⚠️ Revogações de token não recebidas pelo pub/sub: reconstruindo o filtro")
+            self.rebuild()
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.sync_seconds):
+            self.sync()
+
+    def start(self) -> None:
+        """
+        Inscreve no canal de revogações, carrega o filtro e inicia a
+        sincronização periódica. Chamado no startup (lifespan).
+        """
+        if self._sync_thread is not None:
+            return
+
+        pubsub = redis_client.pubsub()
+        if pubsub is None:
+            logger.warning("⚠️ Redis indisponível: blacklist de tokens sem filtro local")
+            return
+
+        pubsub.subscribe(**{CacheKeys.token_revocation_channel(): self._handle_message})
+        self._pubsub = pubsub
+        self._listener_thread = pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=self._handle_listener_error
+        )
+
+        self.rebuild()
+
+        self._stopping.clear()
+        self._sync_thread = threading.Thread(target=self._run, name="revoked-token-filter", daemon=True)
+        self._sync_thread.start()
+        logger.info("✅ Filtro de tokens revogados iniciado")
+
+    def stop(self) -> None:
+        """Encerra as threads (shutdown)"""
+        self._stopping.set()
+        if self._sync_thread is not None:
+            self._sync_thread.join(timeout=5.0)
+            self._sync_thread = None
+        if self._listener_thread is not None:
+            self._listener_thread.stop()
+            self._listener_thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+        with self._lock:
+            self._filter = None
+
+    def get_stats(self) -> dict:
+        current = self._filter
+        return {
+            "ready": current is not None,
+            "entries": current.count if current else 0,
+            "size_bytes": len(current._bits) if current else 0,
+            "skipped_lookups": self.skipped_lookups,
+            "rebuilds": self.rebuilds,
+        }
+
+
+# ✅ Instância global (uma por worker)
+revoked_token_filter = RevokedTokenFilter(
+    capacity=config.TOKEN_REVOCATION_FILTER_CAPACITY,
+    error_rate=config.TOKEN_REVOCATION_FILTER_ERROR_RATE,
+    sync_seconds=config.TOKEN_REVOCATION_FILTER_SYNC_SECONDS,
+    rebuild_seconds=config.TOKEN_REVOCATION_FILTER_REBUILD_SECONDS,
+)
@@ -11,23 +11,17 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
-import redis
 from fastapi import HTTPException, status
 
 from src.core import models
 from src.core.config import config
+from src.core.rate_limit.distributed import parse_rate, rate_limiter
+from src.core.rate_limit.rate_limit import RATE_LIMITS
+from src.core.security.token_blacklist import TokenBlacklist
 
 # Configuração do contexto de senha
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# Redis para rate limiting e cache
-redis_client = redis.Redis(
-    host=config.REDIS_HOST,
-    port=config.REDIS_PORT,
-    db=0,
-    decode_responses=True
-)
-
 
 class SecurityService:
     """Serviço completo de segurança para produção"""
@@ -228,11 +222,10 @@ class SecurityService:
             jti: JWT ID do token
         """
         if jti:
-            # Adiciona à blacklist no Redis com TTL
-            redis_client.setex(
-                f"revoked_token:{jti}",
-                timedelta(days=self.refresh_token_expire_days + 1),
-                "1"
+            # Mesma blacklist do login do admin (TTL cobre o refresh token)
+            TokenBlacklist.add_token(
+                jti,
+                int(timedelta(days=self.refresh_token_expire_days + 1).total_seconds())
             )
     
     # ═══════════════════════════════════════════════════════════
@@ -265,17 +258,30 @@ class SecurityService:
         
         return pin
     
-    def verify_pin(self, pin: str, store_id: int) -> Optional[models.User]:
+    def verify_pin(self, pin: str, store_id: int, client_id: Optional[str] = None) -> Optional[models.User]:
         """
         Verifica PIN e retorna o usuário
         
         Args:
             pin: PIN de 6 dígitos
             store_id: ID da loja
+            client_id: IP ou dispositivo de quem tenta (limite de tentativas)
             
         Returns:
             Usuário se o PIN for válido, None caso contrário
         """
+        # Tentativas erradas por loja + cliente (um PIN errado não identifica
+        # o usuário): só as falhas contam, e um terminal errando não bloqueia
+        # os outros terminais da loja
+        limit, period = parse_rate(RATE_LIMITS["pin_login"])
+        limit_key = f"{store_id}:{client_id}" if client_id else str(store_id)
+        attempt = rate_limiter.hit("pin_login", limit_key, limit, period, dry_run=True)
+        if not attempt.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Muitas tentativas de PIN. Tente novamente em {max(1, round(attempt.retry_after))}s"
+            )
+
         # Hash do PIN fornecido
         pin_hash = hashlib.sha256(pin.encode()).hexdigest()
         
@@ -289,6 +295,7 @@ class SecurityService:
         ).first()
         
         if not user:
+            rate_limiter.hit("pin_login", limit_key, limit, period)
             return None
         
         # Verifica se está bloqueado
@@ -352,26 +359,7 @@ class SecurityService:
         Returns:
             True se dentro do limite, False se excedeu
         """
-        pipe = redis_client.pipeline()
-        now = datetime.now().timestamp()
-        window_start = now - window_seconds
-        
-        # Remove requisições antigas
-        pipe.zremrangebyscore(key, 0, window_start)
-        
-        # Conta requisições na janela
-        pipe.zcard(key)
-        
-        # Adiciona requisição atual
-        pipe.zadd(key, {str(now): now})
-        
-        # Define TTL
-        pipe.expire(key, window_seconds)
-        
-        results = pipe.execute()
-        request_count = results[1]
-        
-        return request_count < max_requests
+        return rate_limiter.hit("security", key, max_requests, window_seconds).allowed
     
     def apply_rate_limit(self, identifier: str, endpoint: str):
         """
@@ -571,4 +559,4 @@ class SecurityService:
         """Verifica se o token está na blacklist"""
         if not jti:
             return False
-        return redis_client.exists(f"revoked_token:{jti}") > 0
+        return TokenBlacklist.is_blacklisted(jti)
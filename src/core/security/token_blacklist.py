@@ -1,14 +1,83 @@
-# src/core/token_blacklist.py
+# src/core/security/token_blacklist.py
 
-import redis
-from datetime import timedelta
+"""
+Token Blacklist
+===============
+
+Revogação de tokens JWT (por JTI) e índice dos tokens ativos por usuário.
+
+- Blacklist: uma chave por JTI revogado, com TTL até a expiração do token
+- Índice por usuário: sorted set com os JTIs ativos, score = expiração
+  (epoch). Membros vencidos são removidos a cada novo token registrado
+- Revogar todos os tokens de um usuário: ZRANGEBYSCORE do índice + 1
+  script Lua com todas as chaves declaradas em KEYS (grava a blacklist e
+  tira do índice só os JTIs lidos): custo proporcional aos tokens do
+  usuário, não ao tamanho do Redis
+- Usa o pool compartilhado de src.core.cache.redis_client
+- is_blacklisted passa antes pelo filtro de Bloom local
+  (revocation_filter): token fora do filtro não consulta o Redis. Toda
+  revogação incrementa a geração e é publicada para os outros workers
+
+Se o Redis estiver indisponível as operações levantam erro (como antes):
+um token não pode ser aceito sem consultar a blacklist.
+
+O script toca chaves de slots diferentes (índice, geração, blacklist):
+pressupõe Redis de nó único, como o resto do cache. Num Redis Cluster as
+chaves precisariam de um hash tag comum.
+
+Autor: PDVix Team
+"""
+
+import logging
+import time
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.core.cache.keys import CacheKeys
+from src.core.cache.redis_client import redis_client
 from src.core.config import config
+from src.core.security.revocation_filter import revoked_token_filter
+
+logger = logging.getLogger(__name__)
+
+# Revoga os JTIs lidos do índice com o TTL restante e os tira do índice.
+# Só remove o que foi lido: um login simultâneo (token novo no índice entre
+# a leitura e o script) continua valendo, como se tivesse entrado depois
+# KEYS[1] = índice do usuário | KEYS[2] = geração das revogações
+# KEYS[3..] = chave da blacklist de cada JTI
+# ARGV[1] = agora (epoch) | ARGV[2..] = pares (jti, expiração) na ordem de KEYS[3..]
+# Retorno: {geração, jti...}
+_REVOKE_ALL_SCRIPT = """
+local now = tonumber(ARGV[1])
+local result = {redis.call('INCR', KEYS[2])}
+for i = 3, #KEYS do
+    local jti = ARGV[2 * i - 4]
+    local ttl = math.ceil(tonumber(ARGV[2 * i - 3]) - now)
+    redis.call('ZREM', KEYS[1], jti)
+    if ttl > 0 then
+        redis.call('SET', KEYS[i], 'revoked', 'EX', ttl)
+        result[#result + 1] = jti
+    end
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+return result
+"""
+
+_revoke_all_script = None
 
-# ✅ Conexão Redis
-redis_client = redis.from_url(
-    config.REDIS_URL or "redis://localhost:6379/1",
-    decode_responses=True
-)
+# Formato antigo do registro de tokens (uma chave por token)
+_LEGACY_PREFIX = "user_tokens:"
+
+
+def _client():
+    client = redis_client.binary_client
+    if client is None:
+        raise RedisConnectionError("Redis indisponível para a blacklist de tokens")
+    return client
+
+
+def _max_token_ttl() -> int:
+    return config.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60
 
 
 class TokenBlacklist:
@@ -23,46 +92,116 @@ class TokenBlacklist:
             jti: ID único do token (JWT ID)
             ttl_seconds: Tempo até expiração natural do token
         """
-        key = f"blacklist:{jti}"
-        redis_client.setex(
-            key,
-            ttl_seconds,
-            "revoked"
-        )
+        pipe = _client().pipeline(transaction=True)
+        pipe.setex(CacheKeys.token_blacklist(jti), ttl_seconds, "revoked")
+        pipe.incr(CacheKeys.token_revocation_generation())
+        _, generation = pipe.execute()
+
+        revoked_token_filter.add([jti])
+        revoked_token_filter.publish(generation, [jti])
 
     @staticmethod
     def is_blacklisted(jti: str) -> bool:
         """Verifica se token está na blacklist"""
-        key = f"blacklist:{jti}"
-        return redis_client.exists(key) > 0
+        if not revoked_token_filter.might_contain(jti):
+            return False
+        return _client().exists(CacheKeys.token_blacklist(jti)) > 0
+
+    @staticmethod
+    def revoke_all_user_tokens(user_email: str) -> int:
+        """
+        Revoga TODOS os tokens ativos de um usuário.
+
+        Returns:
+            Quantidade de tokens revogados
+        """
+        global _revoke_all_script
+
+        client = _client()
+        if _revoke_all_script is None:
+            _revoke_all_script = client.register_script(_REVOKE_ALL_SCRIPT)
+
+        index = CacheKeys.user_sessions(user_email)
+        now = time.time()
+        entries = client.zrangebyscore(index, f"({now}", "+inf", withscores=True)
+        if not entries:
+            client.zremrangebyscore(index, "-inf", now)
+            return 0
+
+        # Todas as chaves que o script toca vão em KEYS
+        keys = [index, CacheKeys.token_revocation_generation()]
+        args = [now]
+        for jti, expires_at in entries:
+            jti = jti.decode()
+            keys.append(CacheKeys.token_blacklist(jti))
+            args.extend([jti, expires_at])
+
+        result = _revoke_all_script(keys=keys, args=args)
+
+        generation = int(result[0])
+        jtis = [jti.decode() for jti in result[1:]]
+        revoked_token_filter.add(jtis)
+        revoked_token_filter.publish(generation, jtis)
+
+        logger.info(f"🔐 {len(jtis)} token(s) revogado(s) de {user_email}")
+        return len(jtis)
+
+    @staticmethod
+    def store_user_token(user_email: str, jti: str, ttl_seconds: int):
+        """
+        Registra token ativo do usuário para possível revogação global.
+        """
+        key = CacheKeys.user_sessions(user_email)
+        now = time.time()
+
+        pipe = _client().pipeline(transaction=False)
+        pipe.zadd(key, {jti: now + ttl_seconds})
+        # Limpeza preguiçosa dos tokens já expirados
+        pipe.zremrangebyscore(key, "-inf", now)
+        pipe.expire(key, max(ttl_seconds, _max_token_ttl()))
+        pipe.execute()
 
-    # ✅ CORREÇÃO: Usar SCAN ao invés de KEYS
     @staticmethod
-    def revoke_all_user_tokens(user_email: str):
-        """Revoga TODOS os tokens de um usuário de forma segura."""
-        pattern = f"user_tokens:{user_email}:*"
+    def migrate_legacy_user_tokens() -> int:
+        """
+        Copia os registros antigos (uma chave 'user_tokens:{email}:{jti}' por
+        token) para o índice por usuário e apaga as chaves antigas.
+
+        Idempotente; roda no startup até os tokens antigos expirarem.
 
-        # ✅ SCAN não bloqueia o Redis
+        Returns:
+            Quantidade de tokens migrados
+        """
+        if not redis_client.is_available:
+            return 0
+
+        client = _client()
+        migrated = 0
         cursor = 0
+        now = time.time()
         while True:
-            cursor, keys = redis_client.scan(
-                cursor=cursor,
-                match=pattern,
-                count=100
-            )
+            cursor, keys = client.scan(cursor=cursor, match=f"{_LEGACY_PREFIX}*", count=500)
 
             if keys:
+                pipe = client.pipeline(transaction=False)
                 for key in keys:
-                    jti = key.split(":")[-1]
-                    TokenBlacklist.add_token(jti, 30 * 24 * 60 * 60)
+                    pipe.ttl(key)
+                ttls = pipe.execute()
+
+                pipe = client.pipeline(transaction=False)
+                for key, ttl in zip(keys, ttls):
+                    email, _, jti = key.decode()[len(_LEGACY_PREFIX):].rpartition(":")
+                    if email and jti and ttl > 0:
+                        index = CacheKeys.user_sessions(email)
+                        pipe.zadd(index, {jti: now + ttl})
+                        pipe.expire(index, _max_token_ttl())
+                        migrated += 1
+                    pipe.unlink(key)
+                pipe.execute()
 
             if cursor == 0:
                 break
 
-    @staticmethod
-    def store_user_token(user_email: str, jti: str, ttl_seconds: int):
-        """
-        Registra token ativo do usuário para possível revogação global.
-        """
-        key = f"user_tokens:{user_email}:{jti}"
-        redis_client.setex(key, ttl_seconds, "active")
\ No newline at end of file
+        if migrated:
+            logger.info(f"🔐 {migrated} token(s) migrados para o índice por usuário")
+        return migrated
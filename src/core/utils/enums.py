@@ -95,6 +95,16 @@ class OrderStatus(str, enum.Enum):
     CANCELED = 'canceled'    # Pedido foi cancelado em alguma etapa.
 
 
+class StockReservationStatus(str, enum.Enum):
+    """
+    Estado da reserva de estoque de um pedido (nulo = pedido sem reserva,
+    estoque baixado só na entrega).
+    """
+    RESERVED = 'reserved'    # Estoque descontado na criação, aguardando entrega.
+    COMMITTED = 'committed'  # Pedido entregue: a reserva virou baixa definitiva.
+    RELEASED = 'released'    # Reserva devolvida ao estoque (cancelamento ou expiração).
+
+
 class PaymentStatus(str, enum.Enum):
     """
     Status de pagamento do pedido.
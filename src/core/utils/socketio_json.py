@@ -0,0 +1,102 @@
+# src/core/utils/socketio_json.py
+
+"""
+Socket.IO JSON
+==============
+
+Módulo JSON (orjson) usado pelo servidor Socket.IO (AsyncServer(json=...)).
+
+- dumps/loads compatíveis com o módulo json da stdlib (o que o
+  python-socketio/engineio exigem), mas via orjson
+- PreEncodedJSON: trecho de JSON já serializado que é embutido no pacote
+  sem ser reprocessado (orjson.Fragment)
+
+Uso nos emitters (serializa a lista UMA vez, em Rust, pelo Pydantic):
+
+    products = dump_list(ProductOut, products_from_db)
+    await sio.emit('products_updated', {"products": products}, room=...)
+
+O pacote é codificado uma única vez por emit, qualquer que seja o tamanho
+da sala. PreEncodedJSON também é aceito pelo cache (CacheCodec).
+
+Autor: PDVix Team
+"""
+
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Iterable, Type
+
+import orjson
+from pydantic import BaseModel, TypeAdapter
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class PreEncodedJSON:
+    """
+    JSON já serializado (bytes) para ser embutido num payload
+
+    Não é subclasse de bytes de propósito: o python-socketio trataria
+    como anexo binário.
+    """
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def __reduce__(self):
+        # AsyncRedisManager usa pickle para repassar emits entre servidores
+        return PreEncodedJSON, (self.data,)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, PreEncodedJSON):
+        return orjson.Fragment(value.data)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps(obj: Any, **kwargs) -> str:
+    """json.dumps compatível (separators/indent são ignorados: saída sempre compacta)"""
+    return orjson.dumps(obj, default=_default, option=_OPTIONS).decode()
+
+
+def loads(s, **kwargs) -> Any:
+    """json.loads compatível (aceita str ou bytes)"""
+    return orjson.loads(s)
+
+
+# ═══════════════════════════════════════════════════════════
+# PRÉ-SERIALIZAÇÃO COM PYDANTIC
+# ═══════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=None)
+def _list_adapter(model: Type[BaseModel]) -> TypeAdapter:
+    # Criar TypeAdapter é caro: um por schema, reaproveitado
+    return TypeAdapter(list[model])
+
+
+def dump_list(model: Type[BaseModel], items: Iterable[Any]) -> PreEncodedJSON:
+    """
+    Valida (ORM ou instâncias do schema) e serializa a lista inteira de uma vez
+
+    Equivale a [model.model_validate(i).model_dump(mode='json') for i in items],
+    sem criar os dicts intermediários.
+    """
+    adapter = _list_adapter(model)
+    validated = adapter.validate_python(list(items), from_attributes=True)
+    return PreEncodedJSON(adapter.dump_json(validated))
+
+
+def dump_model(obj: BaseModel) -> PreEncodedJSON:
+    """Serializa uma instância de schema já validada"""
+    return PreEncodedJSON(obj.model_dump_json().encode())
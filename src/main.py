@@ -23,7 +23,7 @@ from src.api.admin.routes import monitoring
 from src.api.scheduler import start_scheduler, stop_scheduler
 from src.core.config import config
 
-from src.core.database import engine
+from src.core.database import engine, async_engine
 from src.core.db_initialization import (
     initialize_roles,
     seed_chatbot_templates,
@@ -32,12 +32,17 @@ from src.core.db_initialization import (
     seed_payment_methods
 )
 from src.api.admin.events.admin_namespace import AdminNamespace
+from src.api.admin.socketio.emit_coalescer import emit_coalescer
+from src.api.admin.services.product_view_ingestion import product_view_buffer
+from src.api.app.services.live_cart import live_cart_persister
 from src.api.app.events.totem_namespace import TotemNamespace
 from src.core.dependencies import GetCurrentAdminUserDep
 
 from src.core.monitoring.middleware import MetricsMiddleware
+from src.core.monitoring.metrics import monitor_event_loop_lag
 from src.core.middleware.correlation import CorrelationIdMiddleware
 from src.core.rate_limit.rate_limit import limiter, rate_limit_exceeded_handler, check_redis_connection
+from src.core.rate_limit.distributed import rate_limiter
 from src.socketio_instance import sio
 from src.api.admin import router as admin_router
 from src.api.app import router as app_router
@@ -48,7 +53,10 @@ from src.core.circuit_breaker import get_all_circuit_breakers_status
 
 # ✅ Sistema de cache
 from src.core.cache import cache_manager
+from src.core.cache.enterprise_cache import enterprise_cache
 from src.core.cache.redis_client import redis_client
+from src.core.security.revocation_filter import revoked_token_filter
+from src.core.security.token_blacklist import TokenBlacklist
 
 logging.basicConfig(
     level=logging.INFO,
@@ -79,9 +87,14 @@ async def lifespan(app: FastAPI):
 
             logger.info("✅ Seeding concluído")
 
-        logger.info("⏰ Iniciando scheduler...")
-        start_scheduler()
-        logger.info("✅ Scheduler iniciado")
+        # Com o worker dedicado (python -m src.worker) o web não agenda jobs
+        if config.RUN_SCHEDULER_IN_WEB:
+            logger.info("⏰ Iniciando scheduler...")
+            start_scheduler()
+            logger.info("✅ Scheduler iniciado")
+
+        # ✅ Monitor de atraso do event loop (exposto em /monitoring/metrics)
+        app.state.loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
 
         # ✅ Inicialização do Redis Cache
         logger.info("=" * 60)
@@ -89,6 +102,15 @@ async def lifespan(app: FastAPI):
         logger.info("=" * 60)
 
         if redis_client.is_available:
+            # ✅ Invalidação do L1 (memória) entre workers via pub/sub
+            enterprise_cache.start_invalidation_listener()
+
+            # ✅ Registros de tokens no formato antigo → índice por usuário
+            await asyncio.to_thread(TokenBlacklist.migrate_legacy_user_tokens)
+
+            # ✅ Filtro local dos tokens revogados (evita EXISTS por requisição)
+            await asyncio.to_thread(revoked_token_filter.start)
+
             stats = redis_client.get_stats()
             logger.info("✅ Redis Cache conectado!")
             logger.info(f"   ├─ Memória usada: {stats.get('used_memory_human', 'N/A')}")
@@ -128,6 +150,25 @@ async def lifespan(app: FastAPI):
         stop_scheduler()
         logger.info("✅ Scheduler desligado")
 
+        # Emissões agrupadas ainda na janela saem antes de fechar o banco
+        await emit_coalescer.flush_all()
+
+        # Visualizações de produtos ainda no buffer são gravadas
+        await asyncio.to_thread(product_view_buffer.stop)
+
+        # Carrinhos ao vivo alterados desde a última gravação vão para o banco
+        await asyncio.to_thread(live_cart_persister.stop)
+
+        loop_lag_task = getattr(app.state, "loop_lag_task", None)
+        if loop_lag_task:
+            loop_lag_task.cancel()
+
+        await async_engine.dispose()
+        logger.info("✅ Engine assíncrono encerrado")
+
+        enterprise_cache.stop_invalidation_listener()
+        revoked_token_filter.stop()
+
         # Encerramento do Redis com timeout
         if redis_client.is_available and redis_client._client:
             try:
@@ -144,6 +185,11 @@ async def lifespan(app: FastAPI):
                         asyncio.to_thread(redis_client._client.close),
                         timeout=5.0
                     )
+                    if redis_client.binary_client:
+                        await asyncio.wait_for(
+                            asyncio.to_thread(redis_client.binary_client.close),
+                            timeout=5.0
+                        )
                     logger.info("✅ Conexão Redis encerrada")
                 except asyncio.TimeoutError:
                     logger.warning("⚠️ Timeout ao fechar Redis - forçando encerramento")
@@ -319,6 +365,8 @@ async def cache_stats(current_admin: GetCurrentAdminUserDep) -> dict:
 
     return {
         **cache_manager.get_stats(),
+        "revoked_token_filter": revoked_token_filter.get_stats(),
+        "rate_limiter": rate_limiter.get_stats(),
         "accessed_by": current_admin.email,
         "accessed_at": datetime.utcnow().isoformat()
     }
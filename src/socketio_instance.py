@@ -1,5 +1,6 @@
 import socketio
 from src.core.config import config
+from src.core.utils import socketio_json
 
 # Restrict CORS for Socket.IO in production; allow all in development for local tooling
 cors_origins = "*" if config.is_development else config.get_allowed_origins_list()
@@ -17,6 +18,8 @@ sio = socketio.AsyncServer(
 	logger=True,
 	engineio_logger=True,
 	async_mode="asgi",
-	client_manager=client_manager
+	client_manager=client_manager,
+	# orjson: pacotes codificados mais rápido e PreEncodedJSON embutido sem reprocessar
+	json=socketio_json
 )
 
@@ -0,0 +1,58 @@
+# src/worker.py
+
+"""
+Worker de Jobs Agendados
+========================
+
+Processo dedicado aos jobs do APScheduler, fora dos workers web.
+
+Uso:
+    python -m src.worker
+
+Com o worker no ar, desligue o scheduler dos workers web
+(RUN_SCHEDULER_IN_WEB=false; o padrão é true para deploys sem worker).
+Rodar os dois ao mesmo tempo continua seguro: os disparos são alinhados
+ao relógio e o lock de cada slot (job_coordinator) garante uma execução
+por disparo, em qualquer processo. Emissões Socket.IO dos jobs chegam aos
+clientes pelo AsyncRedisManager (REDIS_URL).
+
+Autor: PDVix Team
+"""
+
+import asyncio
+import logging
+import signal
+import sys
+
+from src.api.admin.socketio.emit_coalescer import emit_coalescer
+from src.api.scheduler import start_scheduler, stop_scheduler
+from src.core.database import async_engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler(sys.stdout)]
+)
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+
+    logger.info("⏰ Iniciando worker de jobs agendados...")
+    start_scheduler()
+
+    await stopping.wait()
+
+    logger.info("🛑 Desligando worker de jobs...")
+    stop_scheduler()
+    await emit_coalescer.flush_all()
+    await async_engine.dispose()
+    logger.info("✅ Worker encerrado")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+# tests/test_cache_codec.py
+
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+
+from src.core.cache import codec as codec_module
+from src.core.cache.codec import (
+    CacheCodec,
+    CacheCodecError,
+    COMPRESSION_LZ4,
+    COMPRESSION_NONE,
+    COMPRESSION_ZSTD,
+    SERIALIZER_MSGPACK,
+    SERIALIZER_ORJSON,
+)
+from src.core.utils.socketio_json import PreEncodedJSON
+
+PAYLOAD = {
+    "store_id": 7,
+    "version": 42,
+    "products": [
+        {"id": i, "name": f"Produto {i}", "price": 1990 + i, "active": i % 2 == 0, "tags": None}
+        for i in range(200)
+    ],
+    "nested": {"a": [1, 2.5, "três"], "b": {"c": True}},
+}
+
+# Valores como o cache antigo gravava: json.dumps(value, default=str)
+LEGACY_VALUES = [
+    {"id": 1, "name": "Loja", "open": True},
+    [1, 2, 3],
+    "texto",
+    123,
+    -4.5,
+    True,
+    False,
+    None,
+    [],
+    {},
+]
+
+
+def _codecs():
+    serializers = ["orjson"] + (["msgpack"] if codec_module.msgpack else [])
+    compressions = ["none"]
+    if codec_module.zstandard:
+        compressions.append("zstd")
+    if codec_module.lz4_frame:
+        compressions.append("lz4")
+    return [(serializer, compression) for serializer in serializers for compression in compressions]
+
+
+@pytest.mark.parametrize("serializer,compression", _codecs())
+def test_round_trip(serializer, compression):
+    codec = CacheCodec(serializer=serializer, compression=compression, compression_min_bytes=0)
+
+    data = codec.encode(PAYLOAD)
+
+    assert codec.decode(data) == PAYLOAD
+
+
+@pytest.mark.parametrize("serializer,compression", _codecs())
+def test_header_describes_entry(serializer, compression):
+    codec = CacheCodec(serializer=serializer, compression=compression, compression_min_bytes=0)
+
+    header = codec.encode(PAYLOAD)[0]
+
+    expected_serializer = SERIALIZER_MSGPACK if serializer == "msgpack" else SERIALIZER_ORJSON
+    expected_compression = {"none": COMPRESSION_NONE, "zstd": COMPRESSION_ZSTD, "lz4": COMPRESSION_LZ4}[compression]
+    assert header == expected_serializer | expected_compression
+
+
+def test_small_bodies_are_not_compressed():
+    codec = CacheCodec(compression="zstd", compression_min_bytes=4096)
+
+    data = codec.encode({"id": 1})
+
+    assert data[0] == SERIALIZER_ORJSON | COMPRESSION_NONE
+    assert codec.decode(data) == {"id": 1}
+
+
+def test_reads_entries_written_with_another_configuration():
+    writer = CacheCodec(serializer="orjson", compression="zstd", compression_min_bytes=0)
+    reader = CacheCodec(serializer="orjson", compression="none")
+
+    assert reader.decode(writer.encode(PAYLOAD)) == PAYLOAD
+
+
+@pytest.mark.parametrize("value", LEGACY_VALUES)
+def test_decodes_legacy_json(value):
+    codec = CacheCodec()
+
+    assert codec.decode(json.dumps(value, default=str).encode()) == value
+
+
+def test_decodes_legacy_json_with_leading_whitespace():
+    codec = CacheCodec()
+
+    assert codec.decode(b'  {"id": 1}') == {"id": 1}
+
+
+def test_non_native_types():
+    codec = CacheCodec(compression="none")
+    moment = datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+
+    decoded = codec.decode(codec.encode({
+        "when": moment,
+        "amount": Decimal("10.50"),
+        "ids": {3},
+        "pair": (1, 2),
+        "products": PreEncodedJSON(b'[{"id":1}]'),
+    }))
+
+    assert decoded == {
+        "when": moment.isoformat(),
+        "amount": "10.50",
+        "ids": [3],
+        "pair": [1, 2],
+        "products": [{"id": 1}],
+    }
+
+
+def test_unknown_type_raises():
+    codec = CacheCodec()
+
+    with pytest.raises(CacheCodecError):
+        codec.encode({"value": object()})
+
+
+@pytest.mark.parametrize("data", [b"", bytes((SERIALIZER_ORJSON | COMPRESSION_ZSTD,)) + b"not zstd", b"{broken"])
+def test_invalid_entries_raise(data):
+    codec = CacheCodec()
+
+    with pytest.raises(CacheCodecError):
+        codec.decode(data)
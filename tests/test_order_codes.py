@@ -0,0 +1,82 @@
+# tests/test_order_codes.py
+
+"""
+Testes de concorrência dos códigos de pedido
+============================================
+
+Muitas transações assíncronas simultâneas pedindo (sequential_id,
+public_id) para a mesma loja, como o checkout do cardápio:
+
+- sequential_id sem repetição e sem buracos, mesmo com rollbacks
+- public_id sem repetição e com 7 caracteres
+
+Autor: PDVix Team
+"""
+
+import asyncio
+
+import pytest
+
+from conftest import create_test_tables, requires_postgres
+from src.api.admin.utils.order_code import PUBLIC_ID_LENGTH, next_order_codes
+from src.core import models
+from src.core.database import async_engine, engine, get_async_db_manager, run_db
+
+pytestmark = requires_postgres
+
+STORE_ID = 1
+TASKS = 200
+CONCURRENCY = 20
+
+
+@pytest.fixture(autouse=True)
+def order_tables():
+    metadata = create_test_tables(engine, models.StoreOrderCounter.__table__, models.Order.__table__)
+    models.order_public_id_seq.drop(engine, checkfirst=True)
+    models.order_public_id_seq.create(engine)
+
+    yield
+
+    models.order_public_id_seq.drop(engine, checkfirst=True)
+    metadata.drop_all(engine)
+
+
+async def _reserve_codes(semaphore: asyncio.Semaphore, commit: bool) -> tuple[int, str]:
+    async with semaphore:
+        async with get_async_db_manager() as db:
+            codes = await run_db(db, next_order_codes, STORE_ID)
+            if commit:
+                await db.commit()
+            else:
+                await db.rollback()
+            return codes
+
+
+async def _run_concurrently(commits: list[bool]) -> list[tuple[int, str]]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    try:
+        return await asyncio.gather(*[_reserve_codes(semaphore, commit) for commit in commits])
+    finally:
+        # As conexões do asyncpg pertencem a este event loop
+        await async_engine.dispose()
+
+
+def test_concurrent_codes_are_unique_and_gap_free():
+    results = asyncio.run(_run_concurrently([True] * TASKS))
+
+    sequential_ids = sorted(sequential_id for sequential_id, _ in results)
+    public_ids = [public_id for _, public_id in results]
+
+    assert sequential_ids == list(range(1, TASKS + 1))
+    assert len(set(public_ids)) == TASKS
+    assert all(len(public_id) == PUBLIC_ID_LENGTH for public_id in public_ids)
+
+
+def test_rolled_back_orders_do_not_consume_numbers():
+    commits = [index % 3 != 0 for index in range(TASKS)]
+    asyncio.run(_run_concurrently(commits))
+
+    committed = sum(commits)
+    (next_sequential_id, _), = asyncio.run(_run_concurrently([True]))
+
+    assert next_sequential_id == committed + 1
@@ -0,0 +1,221 @@
+# tests/test_stock_reservation.py
+
+"""
+Testes da reserva de estoque
+============================
+
+Checkouts simultâneos disputando as últimas unidades de um produto pela
+reserva real do pedido (stock_service.reserve_stock_for_order): vendas
+nunca passam do estoque inicial. Também cobre kits, complementos e a
+devolução das reservas vencidas.
+
+Autor: PDVix Team
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from conftest import create_test_tables, requires_postgres
+from src.api.admin.services.stock_service import (
+    InsufficientStockError,
+    _apply_stock_delta,
+    _lock_stock_rows,
+    release_expired_stock_reservations,
+    reserve_stock_for_order,
+)
+from src.core import models
+from src.core.database import SessionLocal, engine
+from src.core.utils.enums import StockReservationStatus
+
+pytestmark = requires_postgres
+
+STORE_ID = 1
+CATEGORY_ID = 1
+INITIAL_STOCK = 5
+CHECKOUTS = 20
+
+
+@pytest.fixture(autouse=True)
+def tables():
+    metadata = create_test_tables(
+        engine,
+        models.Product.__table__,
+        models.ProductCategoryLink.__table__,
+        models.KitComponent.__table__,
+        models.VariantOption.__table__,
+        models.Order.__table__,
+        models.OrderProduct.__table__,
+        models.OrderVariant.__table__,
+        models.OrderVariantOption.__table__,
+        models.OrderStockReservation.__table__,
+    )
+    yield
+    metadata.drop_all(engine)
+
+
+def _create_product(db, name: str, stock: int, control_stock: bool = True) -> int:
+    product = models.Product(name=name, store_id=STORE_ID, stock_quantity=stock, control_stock=control_stock)
+    db.add(product)
+    db.flush()
+    db.add(models.ProductCategoryLink(product_id=product.id, category_id=CATEGORY_ID, price=1000))
+    return product.id
+
+
+def _order(public_id: str, items: list[tuple[int, int, list[tuple[int, int]]]]) -> models.Order:
+    """Pedido como o do checkout: (product_id, quantidade, [(variant_option_id, quantidade)])"""
+    order = models.Order(
+        sequential_id=1, public_id=public_id, store_id=STORE_ID,
+        street="Rua", neighborhood="Centro", city="Cidade",
+        order_type="cardapio_digital", delivery_type="delivery",
+        total_price=0, discounted_total_price=0,
+    )
+    for product_id, quantity, options in items:
+        order_product = models.OrderProduct(
+            store_id=STORE_ID, product_id=product_id, category_id=CATEGORY_ID,
+            name="Item", price=1000, original_price=1000, quantity=quantity,
+        )
+        if options:
+            order_product.variants.append(models.OrderVariant(
+                variant_id=1, store_id=STORE_ID, name="Complementos",
+                options=[
+                    models.OrderVariantOption(
+                        variant_option_id=option_id, store_id=STORE_ID, name="Opção", price=0, quantity=option_quantity,
+                    )
+                    for option_id, option_quantity in options
+                ],
+            ))
+        order.products.append(order_product)
+    return order
+
+
+def _stock(db, model, row_id: int) -> int:
+    return db.execute(select(model.stock_quantity).where(model.id == row_id)).scalar_one()
+
+
+def _is_available(db, product_id: int) -> bool:
+    return db.execute(
+        select(models.ProductCategoryLink.is_available).where(models.ProductCategoryLink.product_id == product_id)
+    ).scalar_one()
+
+
+def _checkout(product_id: int, index: int, barrier: threading.Barrier) -> bool:
+    order = _order(f"ORDER-{index}", [(product_id, 1, [])])
+    barrier.wait()
+    with SessionLocal() as db:
+        try:
+            reserve_stock_for_order(order, db)
+        except InsufficientStockError:
+            db.rollback()
+            return False
+        db.add(order)
+        db.commit()
+        return True
+
+
+def test_concurrent_checkouts_never_oversell():
+    with SessionLocal() as db:
+        product_id = _create_product(db, "Produto concorrido", INITIAL_STOCK)
+        db.commit()
+
+    barrier = threading.Barrier(CHECKOUTS)
+    with ThreadPoolExecutor(max_workers=CHECKOUTS) as executor:
+        results = list(executor.map(lambda index: _checkout(product_id, index, barrier), range(CHECKOUTS)))
+
+    with SessionLocal() as db:
+        reserved_orders = db.execute(
+            select(func.count()).select_from(models.Order)
+            .where(models.Order.stock_reservation_status == StockReservationStatus.RESERVED)
+        ).scalar_one()
+        reserved_quantity = db.execute(select(func.sum(models.OrderStockReservation.quantity))).scalar_one()
+
+        assert sum(results) == INITIAL_STOCK
+        assert reserved_orders == INITIAL_STOCK
+        assert reserved_quantity == INITIAL_STOCK
+        assert _stock(db, models.Product, product_id) == 0
+        assert _is_available(db, product_id) is False
+
+
+def test_kit_components_and_options_are_reserved():
+    with SessionLocal() as db:
+        kit_id = _create_product(db, "Combo", 0, control_stock=False)
+        component_id = _create_product(db, "Refrigerante", 4)
+        db.add(models.KitComponent(kit_product_id=kit_id, component_product_id=component_id, quantity=2))
+        option = models.VariantOption(
+            variant_id=1, store_id=STORE_ID, name_override="Bacon", track_inventory=True, stock_quantity=3,
+        )
+        db.add(option)
+        db.commit()
+        option_id = option.id
+
+    # 2 combos com 1 bacon cada: 4 refrigerantes e 2 bacons
+    with SessionLocal() as db:
+        order = _order("KIT-1", [(kit_id, 2, [(option_id, 1)])])
+        change = reserve_stock_for_order(order, db)
+        db.add(order)
+        db.commit()
+
+        assert change.product_ids == [component_id]
+        assert change.availability_changed is True
+        assert _stock(db, models.Product, component_id) == 0
+        assert _stock(db, models.VariantOption, option_id) == 1
+        assert {(r.product_id, r.variant_option_id, r.quantity) for r in order.stock_reservations} == {
+            (component_id, None, 4), (None, option_id, 2),
+        }
+
+    # Sem refrigerante e com 1 bacon: o pedido inteiro é recusado
+    with SessionLocal() as db:
+        with pytest.raises(InsufficientStockError) as error:
+            reserve_stock_for_order(_order("KIT-2", [(kit_id, 1, [(option_id, 2)])]), db)
+        db.rollback()
+
+        assert len(error.value.shortages) == 2
+        assert "Bacon" in error.value.shortages[1]
+        assert _stock(db, models.VariantOption, option_id) == 1
+
+
+def test_expired_reservation_is_released():
+    with SessionLocal() as db:
+        product_id = _create_product(db, "Último pedaço", 1)
+        db.commit()
+
+        order = _order("EXPIRED-1", [(product_id, 1, [])])
+        reserve_stock_for_order(order, db)
+        db.add(order)
+        db.commit()
+        order_id = order.id
+        assert _is_available(db, product_id) is False
+
+    with SessionLocal() as db:
+        assert release_expired_stock_reservations(db) == []  # Ainda no prazo
+
+        db.get(models.Order, order_id).stock_reserved_until = datetime.now(timezone.utc) - timedelta(minutes=1)
+        db.commit()
+
+        released = release_expired_stock_reservations(db)
+        db.commit()
+
+        assert [(store_id, change.product_ids, change.availability_changed) for store_id, change in released] == [
+            (STORE_ID, [product_id], True),
+        ]
+        assert _stock(db, models.Product, product_id) == 1
+        assert _is_available(db, product_id) is True
+        assert db.get(models.Order, order_id).stock_reservation_status == StockReservationStatus.RELEASED
+        assert db.execute(select(func.count()).select_from(models.OrderStockReservation)).scalar_one() == 0
+
+
+def test_conditional_update_refuses_stale_quantity():
+    """A condição do UPDATE é a garantia final, mesmo com a leitura desatualizada"""
+    with SessionLocal() as db:
+        product_id = _create_product(db, "Produto concorrido", INITIAL_STOCK)
+        db.commit()
+
+        rows = _lock_stock_rows(db, models.Product, [product_id], models.Product.control_stock)
+        updated = _apply_stock_delta(db, rows, {product_id: INITIAL_STOCK + 1}, reserve=True)
+        db.commit()
+
+        assert updated == {}
+        assert _stock(db, models.Product, product_id) == INITIAL_STOCK